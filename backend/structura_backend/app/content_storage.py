@@ -0,0 +1,210 @@
+"""
+Content-addressed, deduplicating media storage.
+
+`ContentAddressedStorage` is the default storage (`STORAGES["default"]`).
+It keeps the normal Storage API and file layout: names are still
+`fieldworker_images/fw_3_12.jpg`, URLs and `MEDIA_ROOT` serving don't
+change. Underneath, every file's bytes live once in a blob named by their
+SHA-256:
+
+    <MEDIA_ROOT>/.blobs/ab/cd/abcd1234...    the content
+    <MEDIA_ROOT>/fieldworker_images/x.jpg    a hard link to it
+
+so re-uploading a photo (the same selfie for a retry, a client photo
+reused across records, unchanged derivatives) adds a directory entry,
+not another copy.
+
+Writes:
+    - Seekable uploads (all Django uploads are) are hashed first, which
+      only reads. If the blob exists, the save is one `link()`: no data
+      is written at all.
+    - Otherwise the upload is streamed into a temp file in the blob
+      directory while hashing, then published as the blob with `link()`
+      (two uploads racing on the same content keep the first blob).
+
+The digest is also recorded on the blob's inode as the `user.sha256`
+extended attribute (`stored_digest()`), which every linked name shares,
+so readers such as the media ETag never hash the file again. The tag
+carries the size and mtime it was taken at and is ignored once they no
+longer match, so a file rewritten in place is never served under its old
+digest.
+
+Reference counting is the inode's link count, kept by the filesystem:
+`refcount(name)` is the number of names sharing the content, and
+`delete()` removes the blob along with the last name pointing at it.
+
+Everything under `.blobs` must stay on the same filesystem as the media
+names. Where hard links aren't possible (another filesystem, no link
+support), saves fall back to a plain copy, as `FileSystemStorage` does.
+`manage.py dedupe_media` folds files written before this existed into
+blobs and removes orphaned blobs.
+"""
+
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+
+BLOB_DIR = ".blobs"
+# Extended attribute holding the content's hex SHA-256, with the size and
+# mtime_ns the file had when it was hashed: "<sha256>:<size>:<mtime_ns>".
+# It lives on the inode, so every name linked to a blob carries it
+# (rest_api.media uses it as the ETag without re-reading the file). A write
+# into the inode changes its mtime, which invalidates the tag.
+DIGEST_XATTR = "user.sha256"
+_HASH_CHUNK = 1024 * 1024
+
+
+def _as_bytes(chunk):
+    return chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stored_digest(path, stat=None):
+    """
+    The SHA-256 recorded on `path`'s inode, or None when it isn't tagged or
+    the file changed (size or mtime) since it was.
+    """
+    try:
+        value = os.getxattr(path, DIGEST_XATTR).decode("ascii")
+        digest, size, mtime_ns = value.split(":")
+        if stat is None:
+            stat = os.stat(path)
+        if (int(size), int(mtime_ns)) != (stat.st_size, stat.st_mtime_ns):
+            return None
+    except (AttributeError, OSError, UnicodeDecodeError, ValueError):
+        return None  # No xattr support, not tagged, or an old-style tag.
+    return digest if len(digest) == 64 else None
+
+
+def tag_digest(path, digest):
+    """Record `digest` on `path`'s inode; best-effort where xattrs aren't supported."""
+    try:
+        stat = os.stat(path)
+        value = f"{digest}:{stat.st_size}:{stat.st_mtime_ns}"
+        os.setxattr(path, DIGEST_XATTR, value.encode("ascii"))
+    except (AttributeError, OSError):
+        pass
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def blob_path(self, digest):
+        return os.path.join(self.location, BLOB_DIR, digest[:2], digest[2:4], digest)
+
+    def _content_digest(self, content):
+        """SHA-256 of a seekable upload, or None when it can't be re-read."""
+        try:
+            seekable = content.seekable() if hasattr(content, "seekable") else False
+        except (AttributeError, ValueError):
+            seekable = False
+        if not seekable:
+            return None
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(_as_bytes(chunk))
+        content.seek(0)
+        return digest.hexdigest()
+
+    def _write_blob(self, content):
+        """Stream `content` into its blob while hashing; returns the digest."""
+        root = os.path.join(self.location, BLOB_DIR)
+        os.makedirs(root, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=root, prefix="incoming-")
+        try:
+            digest = hashlib.sha256()
+            with os.fdopen(fd, "wb") as fh:
+                for chunk in content.chunks():
+                    chunk = _as_bytes(chunk)
+                    digest.update(chunk)
+                    fh.write(chunk)
+            digest = digest.hexdigest()
+            blob = self.blob_path(digest)
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            tag_digest(temp_path, digest)
+            try:
+                os.link(temp_path, blob)
+            except FileExistsError:
+                pass  # Same content published concurrently; keep that blob.
+            return digest
+        finally:
+            os.unlink(temp_path)
+
+    def _link_name(self, blob, name):
+        """Hard-link `blob` under `name` (or the next free variant of it)."""
+        while True:
+            full_path = self.path(name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            try:
+                os.link(blob, full_path)
+            except FileExistsError:
+                name = self.get_available_name(name)
+            else:
+                return name
+
+    def _save(self, name, content):
+        try:
+            digest = self._content_digest(content)
+            blob = self.blob_path(digest) if digest else None
+            if blob is None or not os.path.exists(blob):
+                digest = self._write_blob(content)
+                blob = self.blob_path(digest)
+            elif stored_digest(blob) is None:
+                tag_digest(blob, digest)  # A blob from before digests were recorded.
+            name = self._link_name(blob, name)
+        except OSError:
+            # No hard links here (cross-device, unsupported filesystem), or
+            # the blob was removed between the check and the link: write
+            # the content out as a plain file.
+            if hasattr(content, "seek"):
+                content.seek(0)
+            return super()._save(name, content)
+
+        full_path = self.path(name)
+        name = os.path.relpath(full_path, self.location)
+        return str(name).replace("\\", "/")
+
+    def refcount(self, name):
+        """How many media names share `name`'s content (1 when not deduplicated)."""
+        links = os.stat(self.path(name)).st_nlink
+        return links - 1 if self._blob_for(name) else links
+
+    def _blob_for(self, name):
+        """The blob `name` is linked to, or None."""
+        full_path = self.path(name)
+        try:
+            if os.stat(full_path).st_nlink < 2:
+                return None
+            blob = self.blob_path(file_digest(full_path))
+            return blob if os.path.exists(blob) and os.path.samefile(blob, full_path) else None
+        except FileNotFoundError:
+            return None
+
+    def delete(self, name):
+        if not name:
+            raise ValueError("The name must be given to delete().")
+        full_path = self.path(name)
+        blob = None
+        try:
+            # Only the last name (name + blob = 2 links) needs the hash.
+            if os.path.isfile(full_path) and os.stat(full_path).st_nlink == 2:
+                blob = self._blob_for(name)
+        except FileNotFoundError:
+            pass
+        super().delete(name)
+        if blob is not None:
+            try:
+                if os.stat(blob).st_nlink == 1:
+                    os.remove(blob)
+            except FileNotFoundError:
+                pass
@@ -15,7 +15,7 @@ import threading
 from collections.abc import Sequence
 from typing import Optional
 
-from PIL import Image, ImageOps
+from PIL import Image
 
 logger = logging.getLogger(__name__)
 
@@ -109,6 +109,82 @@ def _detect_with_haar(image_np) -> bool:
         return False
 
 
+def warm_detectors() -> None:
+    """
+    Build this thread's detectors ahead of the first image (the worker-pool
+    initializer); loading the MediaPipe graph takes far longer than a
+    detection.
+    """
+    try:
+        _get_face_detector()
+    except Exception:
+        logger.exception("MediaPipe face detector initialization failed")
+    _get_haar_classifier()
+
+
+# Longest side, in pixels, of the image handed to the detectors.
+DETECTION_MAX_SIDE = 640
+
+_ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+def load_detection_image(image_bytes: bytes, max_side: int = DETECTION_MAX_SIDE) -> Image.Image:
+    """
+    Decode straight to a small, upright RGB image for the detectors.
+
+    Nothing full-size is materialized for JPEG (nearly every phone upload):
+    `draft()` makes libjpeg scale by 1/2, 1/4 or 1/8 and convert to RGB
+    while decoding, so a 12MP selfie is decoded at roughly 1008x756. PNG
+    and WebP have no scale-on-decode, but `thumbnail`'s reducing gap
+    shrinks them by box-averaging before the resample, and the RGB convert
+    runs on the small image. The EXIF orientation is read from the header
+    up front and applied to the small image (`ImageOps.exif_transpose`
+    would load and copy the full-size one).
+    """
+    img = Image.open(io.BytesIO(image_bytes))
+    orientation = img.getexif().get(0x0112, 1)  # ExifTags.Base.Orientation
+
+    if img.format == "JPEG":
+        img.draft("RGB", (max_side, max_side))
+    elif img.mode in ("P", "1"):
+        # Resizing palette/bilevel images falls back to nearest-neighbour.
+        img = img.convert("RGB")
+
+    img.thumbnail((max_side, max_side), reducing_gap=2.0)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    method = _ORIENTATION_TRANSPOSE.get(orientation)
+    if method is not None:
+        img = img.transpose(method)
+    return img
+
+
+def detection_array(img: Image.Image):
+    """
+    Read-only, C-contiguous (H, W, 3) uint8 view of `img` for the detectors.
+
+    `np.asarray` builds the array directly over the buffer PIL exports
+    (no second `np.array` copy), and it's already immutable, which
+    MediaPipe expects.
+    """
+    import numpy as np
+
+    image_np = np.asarray(img)
+    if not image_np.flags.c_contiguous:
+        image_np = np.ascontiguousarray(image_np)
+    image_np.flags.writeable = False
+    return image_np
+
+
 def verify_image_has_human_face(image_bytes: bytes) -> bool:
     """
     Returns True when MediaPipe detects at least one face.
@@ -119,17 +195,8 @@ def verify_image_has_human_face(image_bytes: bytes) -> bool:
         return False
 
     try:
-        with Image.open(io.BytesIO(image_bytes)) as img:
-            img = ImageOps.exif_transpose(img)
-            img = img.convert("RGB")
-
-            # Reduce compute for very large images.
-            img.thumbnail((640, 640))
-
-            import numpy as np
-
-            image_np = np.ascontiguousarray(np.array(img))
-            image_np.flags.writeable = False  # MediaPipe expects immutable input
+        with load_detection_image(image_bytes) as img:
+            image_np = detection_array(img)
             if _detect_with_mediapipe(image_np):
                 return True
 
@@ -141,4 +208,3 @@ def verify_image_has_human_face(image_bytes: bytes) -> bool:
     except Exception:
         logger.exception("Image verification failed")
         return False
-
@@ -0,0 +1,71 @@
+"""
+Synthesize AuditEvent rows from existing data so `pm_audit_trail` shows
+history from before the table existed.
+
+Uses the rules the old merged query used (creation timestamps, latest
+subtask status, latest attendance state). Events that already exist for a
+(kind, record, PM) are skipped, so the command is safe to re-run.
+
+start.sh runs it with `--apply --if-empty` on every boot, so the first
+deploy with the AuditEvent table fills it and later boots skip it with a
+single query. The whole run is one transaction, so a failed run leaves the
+table empty and the next boot tries again.
+"""
+from django.core.management.base import BaseCommand
+
+from app.models import AuditEvent
+from app.services.audit_trail import backfill_audit_events
+
+
+class Command(BaseCommand):
+    help = (
+        'Backfill the PM audit trail from current projects, tasks, workforce, '
+        'inventory and attendance rows. Without --apply, only reports counts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--apply',
+            action='store_true',
+            help='Write the events. Without this flag, the command runs in dry-run mode.',
+        )
+        parser.add_argument(
+            '--user-id',
+            type=int,
+            dest='user_id',
+            help='Only backfill events for this Project Manager.',
+        )
+        parser.add_argument(
+            '--if-empty',
+            action='store_true',
+            dest='if_empty',
+            help='Do nothing when the audit trail already has events (start.sh).',
+        )
+        parser.add_argument(
+            '--quiet',
+            action='store_true',
+            help='Only print the summary line, not per-kind counts',
+        )
+
+    def handle(self, *args, **options):
+        apply_changes = bool(options.get('apply'))
+        quiet = options.get('quiet', False)
+
+        if options.get('if_empty') and AuditEvent.objects.exists():
+            self.stdout.write('Audit trail already has events; nothing to backfill.')
+            return
+
+        written = backfill_audit_events(
+            user_id=options.get('user_id'), dry_run=not apply_changes
+        )
+        if not quiet:
+            for kind, count in written.items():
+                self.stdout.write(f"{kind}: {count}")
+
+        total = sum(written.values())
+        if not apply_changes:
+            self.stdout.write(
+                f"Dry-run: {total} event(s) would be written. Re-run with --apply to write them."
+            )
+            return
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {total} audit event(s)."))
@@ -0,0 +1,81 @@
+"""
+Build the avatar/card/full derivatives for photos uploaded before the
+derivative pipeline existed (or after writes that bypassed the save
+signals, e.g. `QuerySet.update(photo=...)`).
+
+Rows whose manifest already matches their current photo are skipped
+unless `--force` is given, so the command is safe to re-run after an
+interrupted pass.
+"""
+from django.core.management.base import BaseCommand
+
+from app.services import image_derivatives
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate missing photo derivatives (avatar/card/full, WebP + JPEG). '
+        'Without --apply, only reports how many photos need them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--apply',
+            action='store_true',
+            help='Write the derivatives. Without this flag, the command runs in dry-run mode.',
+        )
+        parser.add_argument(
+            '--model',
+            action='append',
+            dest='models',
+            help='Only this model, e.g. FieldWorker (repeatable).',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild derivatives that are already up to date.',
+        )
+        parser.add_argument(
+            '--quiet',
+            action='store_true',
+            help='Only print the summary line',
+        )
+
+    def handle(self, *args, **options):
+        apply_changes = bool(options.get('apply'))
+        force = bool(options.get('force'))
+        quiet = options.get('quiet', False)
+        wanted = {name.lower() for name in options.get('models') or ()}
+
+        total = built = 0
+        for model, (source_attr, _) in image_derivatives.TARGETS.items():
+            if wanted and model.__name__.lower() not in wanted:
+                continue
+            rows = (
+                model._default_manager.exclude(**{f'{source_attr}__isnull': True})
+                .exclude(**{source_attr: ''})
+                .order_by('pk')
+            )
+            pending = [row for row in rows.iterator() if force or not image_derivatives.is_current(row)]
+            total += len(pending)
+            if not quiet:
+                self.stdout.write(f"{model.__name__}: {len(pending)} photo(s) need derivatives.")
+            if not apply_changes:
+                continue
+            for row in pending:
+                manifest = image_derivatives.generate_for(row)
+                if manifest.get('sizes'):
+                    built += 1
+                elif not quiet:
+                    self.stdout.write(
+                        self.style.WARNING(f"  {model.__name__} #{row.pk}: not a readable image")
+                    )
+
+        if not apply_changes:
+            self.stdout.write(
+                f"Dry-run: {total} photo(s) need derivatives; re-run with --apply to build them."
+            )
+            return
+        self.stdout.write(
+            self.style.SUCCESS(f"Built derivatives for {built} of {total} photo(s).")
+        )
@@ -0,0 +1,64 @@
+"""
+Seed (or re-seed) the DailySubtaskActivity rollup from the Subtask table.
+
+Each currently-completed subtask counts as one completion on the local date
+of its `updated_at`. Run with `--apply` after bulk `Subtask.objects.update()`
+writes or a restore, which bypass the signals that keep the rollup current.
+Reopen counts recorded since the rollup went live are discarded by a rebuild.
+"""
+from django.core.management.base import BaseCommand
+
+from app import models
+from app.services.subtask_activity import rebuild_daily_activity
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the DailySubtaskActivity rollup from completed subtasks. '
+        'Without --apply, only reports what would be written.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--apply',
+            action='store_true',
+            help='Rewrite the rollup. Without this flag, the command runs in dry-run mode.',
+        )
+        parser.add_argument(
+            '--project-id',
+            type=int,
+            action='append',
+            dest='project_ids',
+            help='Limit the rebuild to this project (repeatable).',
+        )
+        parser.add_argument(
+            '--quiet',
+            action='store_true',
+            help='Only print the summary line',
+        )
+
+    def handle(self, *args, **options):
+        apply_changes = bool(options.get('apply'))
+        project_ids = options.get('project_ids')
+        quiet = options.get('quiet', False)
+
+        existing = models.DailySubtaskActivity.objects.all()
+        completed = models.Subtask.objects.filter(status='completed')
+        if project_ids:
+            existing = existing.filter(project_id__in=project_ids)
+            completed = completed.filter(phase__project_id__in=project_ids)
+
+        if not quiet:
+            self.stdout.write(
+                f"{existing.count()} existing rollup row(s); "
+                f"{completed.count()} completed subtask(s) to seed from."
+            )
+
+        if not apply_changes:
+            self.stdout.write("Dry-run: re-run with --apply to rebuild the rollup.")
+            return
+
+        written = rebuild_daily_activity(project_ids=project_ids or None)
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt daily subtask activity: {written} row(s) written.")
+        )
@@ -0,0 +1,150 @@
+"""
+Compare the face-verification decode path against the old full-size one.
+
+    python manage.py bench_image_decode
+    python manage.py bench_image_decode --image selfie.jpg --image scan.png
+
+Without `--image` it generates 12MP (4032x3024) phone-style images, EXIF
+rotated like a portrait selfie, as JPEG, PNG and WebP. For every image it
+prints the median decode time (bytes -> detector-ready array) and the
+peak RSS growth of each path. Peak memory is measured in a fresh spawned
+process per path (Linux only; elsewhere only times are printed).
+"""
+import io
+import multiprocessing
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image, ImageOps
+
+from app.image_verification import DETECTION_MAX_SIDE, detection_array, load_detection_image
+
+
+def _legacy_array(image_bytes):
+    """What `verify_image_has_human_face` did before the reduced decode."""
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img = ImageOps.exif_transpose(img)
+        img = img.convert("RGB")
+        img.thumbnail((DETECTION_MAX_SIDE, DETECTION_MAX_SIDE))
+        image_np = np.ascontiguousarray(np.array(img))
+        image_np.flags.writeable = False
+        return image_np
+
+
+def _reduced_array(image_bytes):
+    return detection_array(load_detection_image(image_bytes))
+
+
+PATHS = (("full decode", _legacy_array), ("reduced decode", _reduced_array))
+
+
+def _status_kib(field):
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise OSError(f"{field} not in /proc/self/status")
+
+
+def _peak_rss_growth(fn, image_bytes):
+    """Runs in a spawned child: KiB the RSS high-water mark grows by (Linux)."""
+    # Warm up codecs on a tiny image so library loading isn't counted.
+    tiny = io.BytesIO()
+    Image.new("RGB", (8, 8)).save(tiny, "PNG")
+    fn(tiny.getvalue())
+    # ru_maxrss is inherited from the parent across fork/exec, so reset and
+    # read the per-process high-water mark (VmHWM) instead.
+    with open("/proc/self/clear_refs", "w") as fh:
+        fh.write("5")
+    before = _status_kib("VmRSS")
+    fn(image_bytes)
+    return _status_kib("VmHWM") - before
+
+
+def _synthetic_images():
+    height, width = 3024, 4032
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    x = np.linspace(0, 255, width, dtype=np.float32)[None, :]
+    noise = np.random.default_rng(0).normal(0, 6, (height, width)).astype(np.float32)
+    channels = [y * 0.6 + x * 0.3, (y + x) * 0.4, 255 - x * 0.7]
+    pixels = np.stack([np.clip(c + noise, 0, 255) for c in channels], axis=-1).astype(np.uint8)
+    image = Image.fromarray(pixels)
+
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 CW, as phones store portrait shots
+    images = []
+    for fmt, options in (
+        ("JPEG", {"quality": 90}),
+        ("PNG", {}),
+        ("WEBP", {"quality": 85}),
+    ):
+        buffer = io.BytesIO()
+        image.save(buffer, fmt, exif=exif.tobytes(), **options)
+        images.append((f"12MP {fmt}", buffer.getvalue()))
+    return images
+
+
+class Command(BaseCommand):
+    help = "Time and peak memory of the reduced-resolution decode vs. the full-size decode."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--image", action="append", default=[], help="Image file (repeatable)")
+        parser.add_argument("--repeat", type=int, default=5, help="Timed decodes per path")
+        parser.add_argument(
+            "--no-memory", action="store_true", help="Skip the spawned peak-memory runs"
+        )
+
+    def _images(self, options):
+        if not options["image"]:
+            return _synthetic_images()
+        images = []
+        for path in options["image"]:
+            try:
+                with open(path, "rb") as fh:
+                    images.append((path, fh.read()))
+            except OSError as exc:
+                raise CommandError(f"Can't read {path}: {exc}")
+        return images
+
+    @staticmethod
+    def _median_ms(fn, image_bytes, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(image_bytes)
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def handle(self, *args, **options):
+        repeat = max(1, options["repeat"])
+        context = multiprocessing.get_context("spawn")
+
+        for label, image_bytes in self._images(options):
+            legacy, reduced = _legacy_array(image_bytes), _reduced_array(image_bytes)
+            if legacy.shape != reduced.shape:
+                self.stdout.write(
+                    self.style.WARNING(f"{label}: shapes differ {legacy.shape} vs {reduced.shape}")
+                )
+
+            results = {}
+            for name, fn in PATHS:
+                results[name] = [self._median_ms(fn, image_bytes, repeat), None]
+            if not options["no_memory"]:
+                with context.Pool(1, maxtasksperchild=1) as pool:
+                    for name, fn in PATHS:
+                        try:
+                            results[name][1] = pool.apply(_peak_rss_growth, (fn, image_bytes))
+                        except OSError:
+                            # No /proc (not Linux): report time only.
+                            pass
+
+            self.stdout.write(f"{label} ({len(image_bytes) / 1024 / 1024:.1f} MiB) -> {reduced.shape}")
+            for name, (ms, peak_kib) in results.items():
+                memory = "" if peak_kib is None else f", peak +{peak_kib / 1024:.1f} MiB"
+                self.stdout.write(f"  {name:15s} {ms:8.1f} ms{memory}")
+            full_ms, reduced_ms = results["full decode"][0], results["reduced decode"][0]
+            self.stdout.write(
+                self.style.SUCCESS(f"  {full_ms / reduced_ms if reduced_ms else 0:.1f}x faster")
+            )
@@ -0,0 +1,98 @@
+"""
+Time the default JSON renderer against DRF's stdlib one on real payloads.
+
+    python manage.py bench_json_renderer --user-id 12
+    python manage.py bench_json_renderer --synthetic 5000
+
+`--user-id` renders that PM's `pm_dashboard_summary` payload and their
+full inventory item list; `--synthetic N` renders N generated
+Decimal/datetime-heavy rows, so it also runs on an empty database. Each
+payload is built once and rendered `--repeat` times by each renderer;
+the outputs are compared before anything is timed.
+"""
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from app import models
+from rest_api.renderers import FastJSONRenderer, StdJSONRenderer, orjson
+
+
+def _synthetic_rows(count):
+    now = timezone.now()
+    return [
+        {
+            'item_id': i,
+            'name': f'Item {i}',
+            'price': f'{Decimal(i) * Decimal("12.5"):.2f}',
+            'budget': Decimal(i) * Decimal('1000.25'),
+            'created_at': now - timedelta(minutes=i),
+            'attendance_date': (now - timedelta(days=i % 30)).date(),
+            'assigned_projects': [{'project_id': i % 7, 'quantity': i % 13}],
+        }
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Compare encode time of FastJSONRenderer and the stdlib JSON renderer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, help='PM whose dashboard and inventory to render')
+        parser.add_argument('--synthetic', type=int, default=0, help='Also render N generated rows')
+        parser.add_argument('--repeat', type=int, default=20, help='Renders per payload and renderer')
+
+    def _payloads(self, options):
+        payloads = []
+        user_id = options.get('user_id')
+        if user_id is not None:
+            # Imported here: rest_api.views pulls in the whole API module.
+            from rest_api.serializers import InventoryItemSerializer
+            from rest_api.views import _build_pm_dashboard_payload
+
+            if not models.User.objects.filter(pk=user_id).exists():
+                raise CommandError(f'User {user_id} not found')
+            payloads.append(('pm_dashboard_summary', _build_pm_dashboard_payload(user_id)))
+            items = models.InventoryItem.objects.filter(created_by_id=user_id).select_related('created_by')
+            payloads.append(
+                ('inventory items', InventoryItemSerializer(items, many=True).data)
+            )
+        if options.get('synthetic'):
+            payloads.append(
+                (f'synthetic x{options["synthetic"]}', _synthetic_rows(options['synthetic']))
+            )
+        if not payloads:
+            raise CommandError('Pass --user-id and/or --synthetic N')
+        return payloads
+
+    @staticmethod
+    def _time(renderer, data, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            renderer.render(data)
+        return (time.perf_counter() - start) / repeat * 1000
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(
+                self.style.WARNING('orjson is not installed: FastJSONRenderer uses stdlib json.')
+            )
+        repeat = max(1, options['repeat'])
+        fast, std = FastJSONRenderer(), StdJSONRenderer()
+
+        for label, data in self._payloads(options):
+            fast_bytes, std_bytes = fast.render(data), std.render(data)
+            if fast_bytes != std_bytes:
+                self.stdout.write(self.style.WARNING(f'{label}: outputs differ'))
+            fast_ms = self._time(fast, data, repeat)
+            std_ms = self._time(std, data, repeat)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'{label}: {len(std_bytes) / 1024:.1f} KiB, '
+                    f'stdlib {std_ms:.2f} ms, fast {fast_ms:.2f} ms '
+                    f'({std_ms / fast_ms if fast_ms else 0:.1f}x)'
+                )
+            )
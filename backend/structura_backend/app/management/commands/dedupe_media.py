@@ -0,0 +1,119 @@
+"""
+Fold existing media files into content-addressed blobs
+(`app.content_storage`), and drop blobs nothing links to any more.
+
+Files written before the storage switch are separate copies even when
+their bytes are identical. With `--apply` each file is hashed and, when
+its blob exists, atomically replaced by a hard link to it (the duplicate's
+disk space is freed); otherwise it becomes the blob. Without `--apply`
+only the savings are reported. Blobs are tagged with their digest
+(`user.sha256`) so media ETags need no hashing. Safe to re-run.
+"""
+import os
+import time
+
+from django.core.files.storage import storages
+from django.core.management.base import BaseCommand, CommandError
+
+from app.content_storage import (
+    BLOB_DIR,
+    ContentAddressedStorage,
+    file_digest,
+    stored_digest,
+    tag_digest,
+)
+
+
+STALE_UPLOAD_SECONDS = 3600
+
+
+class Command(BaseCommand):
+    help = (
+        'Deduplicate MEDIA_ROOT into SHA-256 blobs and remove orphaned blobs. '
+        'Without --apply, only reports what would be reclaimed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--apply',
+            action='store_true',
+            help='Relink files and delete orphans. Without this flag, the command runs in dry-run mode.',
+        )
+        parser.add_argument(
+            '--quiet',
+            action='store_true',
+            help='Only print the summary line',
+        )
+
+    def _media_files(self, root):
+        for directory, dirnames, filenames in os.walk(root):
+            if directory == root and BLOB_DIR in dirnames:
+                dirnames.remove(BLOB_DIR)
+            for filename in filenames:
+                yield os.path.join(directory, filename)
+
+    def handle(self, *args, **options):
+        storage = storages['default']
+        if not isinstance(storage, ContentAddressedStorage):
+            raise CommandError('The default storage is not ContentAddressedStorage.')
+        apply_changes = bool(options.get('apply'))
+        quiet = options.get('quiet', False)
+        root = storage.location
+
+        files = linked = reclaim = 0
+        seen = set()
+        for path in self._media_files(root):
+            stat = os.stat(path)
+            files += 1
+            digest = file_digest(path)
+            blob = storage.blob_path(digest)
+            if os.path.exists(blob) and os.path.samefile(blob, path):
+                if apply_changes and stored_digest(path) is None:
+                    tag_digest(path, digest)
+                continue
+            if os.path.exists(blob) or digest in seen:
+                reclaim += stat.st_size
+            seen.add(digest)
+            linked += 1
+            if not apply_changes:
+                continue
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            if not os.path.exists(blob):
+                tag_digest(path, digest)
+                os.link(path, blob)
+                continue
+            # Swap the copy for a link in one rename, so readers never
+            # see the name missing.
+            if stored_digest(blob) is None:
+                tag_digest(blob, digest)
+            temp = f'{path}.dedupe'
+            os.link(blob, temp)
+            os.replace(temp, path)
+            if not quiet:
+                self.stdout.write(f"  {os.path.relpath(path, root)}: relinked")
+
+        orphans = 0
+        blob_root = os.path.join(root, BLOB_DIR)
+        for directory, _, filenames in os.walk(blob_root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                stat = os.stat(path)
+                if filename.startswith('incoming-'):
+                    # An upload still being written, unless it's stale.
+                    orphaned = time.time() - stat.st_mtime > STALE_UPLOAD_SECONDS
+                else:
+                    orphaned = stat.st_nlink == 1
+                if orphaned:
+                    orphans += 1
+                    reclaim += stat.st_size
+                    if apply_changes:
+                        os.remove(path)
+
+        summary = (
+            f"{files} media file(s), {linked} to link into blobs, {orphans} orphaned blob(s), "
+            f"{reclaim / 1024 / 1024:.1f} MiB reclaimable."
+        )
+        if not apply_changes:
+            self.stdout.write(f"Dry-run: {summary} Re-run with --apply.")
+            return
+        self.stdout.write(self.style.SUCCESS(f"Deduplicated media: {summary}"))
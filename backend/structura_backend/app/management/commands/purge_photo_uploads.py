@@ -0,0 +1,47 @@
+"""
+Remove resumable subtask photo uploads (app.services.photo_uploads) that
+were started but never finalized, along with their staged bytes.
+
+start.sh runs it with --apply every PHOTO_UPLOAD_PURGE_INTERVAL_SECONDS;
+without `--apply` it only counts what would be removed.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app.models import SubtaskPhotoUpload
+from app.services.photo_uploads import pending_ttl, purge_stale
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete unfinished subtask photo uploads older than --older-than-hours. '
+        'Without --apply, only reports how many would be deleted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-hours',
+            type=float,
+            default=None,
+            help='Age after which an unfinished upload is abandoned (default PHOTO_UPLOAD_PENDING_TTL_HOURS)',
+        )
+        parser.add_argument(
+            '--apply',
+            action='store_true',
+            help='Delete the uploads. Without this flag, the command runs in dry-run mode.',
+        )
+
+    def handle(self, *args, **options):
+        hours = options.get('older_than_hours')
+        age = pending_ttl() if hours is None else timedelta(hours=hours)
+        cutoff = timezone.now() - age
+        if not options.get('apply'):
+            count = SubtaskPhotoUpload.objects.filter(
+                status=SubtaskPhotoUpload.STATUS_PENDING, created_at__lt=cutoff
+            ).count()
+            self.stdout.write(f"Dry-run: {count} stale upload(s). Re-run with --apply.")
+            return
+        count = purge_stale(cutoff)
+        self.stdout.write(self.style.SUCCESS(f"Removed {count} stale upload(s)."))
@@ -0,0 +1,63 @@
+"""
+Check (and optionally repair) the denormalized `total_subtasks` /
+`completed_subtasks` counters on Phase and Project.
+
+Run with `--apply` after bulk `Subtask.objects.update(...)` writes or a
+restore, which bypass the signals that normally keep the counters exact.
+"""
+from django.core.management.base import BaseCommand
+
+from app.services.subtask_counters import find_counter_drift, rebuild_subtask_counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare Phase/Project subtask counters against the Subtask table and '
+        'rebuild them. Without --apply, only reports drift.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--apply',
+            action='store_true',
+            help='Rebuild the counters. Without this flag, the command runs in dry-run mode.',
+        )
+        parser.add_argument(
+            '--quiet',
+            action='store_true',
+            help='Only print the summary line, not per-row drift',
+        )
+
+    def handle(self, *args, **options):
+        apply_changes = bool(options.get('apply'))
+        quiet = options.get('quiet', False)
+
+        drift = find_counter_drift()
+        if not quiet:
+            for row in drift:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"DRIFT {row.model} {row.pk}: "
+                        f"total {row.stored_total} (actual {row.actual_total}), "
+                        f"completed {row.stored_completed} (actual {row.actual_completed})"
+                    )
+                )
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Subtask counters are consistent."))
+            return
+
+        if not apply_changes:
+            self.stdout.write(
+                f"Dry-run: {len(drift)} row(s) drifted. Re-run with --apply to rebuild."
+            )
+            return
+
+        rebuild_subtask_counters()
+        remaining = find_counter_drift()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt subtask counters. {len(drift)} row(s) repaired, "
+                f"{len(remaining)} still drifting."
+            )
+        )
@@ -1,10 +1,16 @@
 """
 Recompute every project's status from subtask completion (and overdue rules).
 Use after fixing sync bugs or to repair stale Completed / Overdue / Active values.
+
+Runs through app.services.project_status, so the whole table is resynced
+with one aggregate query plus a handful of bulk UPDATEs.
 """
-from django.core.management.base import BaseCommand
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
 
 from app import models
+from app.services.project_status import sync_project_statuses
 
 
 class Command(BaseCommand):
@@ -19,32 +25,40 @@ class Command(BaseCommand):
             action='store_true',
             help='Only print the summary line, not per-project changes',
         )
+        parser.add_argument(
+            '--as-of',
+            dest='as_of',
+            default=None,
+            help='Evaluate overdue rules as of this date (YYYY-MM-DD). Defaults to today.',
+        )
 
     def handle(self, *args, **options):
         quiet = options.get('quiet', False)
-        total = 0
-        changed = 0
-        for pid in (
-            models.Project.objects.order_by('project_id')
-            .values_list('project_id', flat=True)
-            .iterator()
-        ):
-            total += 1
-            p = models.Project.objects.get(project_id=pid)
-            before = p.status
-            p.update_status_based_on_progress()
-            p.refresh_from_db()
-            p.refresh_overdue_status()
-            p.refresh_from_db()
-            after = p.status
-            if after != before:
-                changed += 1
-                if not quiet:
-                    self.stdout.write(
-                        f"  {pid} {p.project_name!r}: {before!r} -> {after!r}"
-                    )
+        as_of = None
+        if options.get('as_of'):
+            try:
+                as_of = date.fromisoformat(options['as_of'])
+            except ValueError as exc:
+                raise CommandError(f"--as-of must be YYYY-MM-DD: {exc}")
+
+        projects = models.Project.objects.all()
+        total = projects.count()
+        changes = sync_project_statuses(
+            projects, as_of=as_of, reopen_completed=True
+        )
+        if changes and not quiet:
+            names = dict(
+                models.Project.objects.filter(
+                    pk__in=[c.project_id for c in changes]
+                ).values_list('project_id', 'project_name')
+            )
+            for change in changes:
+                self.stdout.write(
+                    f"  {change.project_id} {names.get(change.project_id)!r}: "
+                    f"{change.before!r} -> {change.after!r}"
+                )
         self.stdout.write(
             self.style.SUCCESS(
-                f"Resynced {total} project(s). {changed} had a status change."
+                f"Resynced {total} project(s). {len(changes)} had a status change."
             )
         )
@@ -0,0 +1,90 @@
+"""
+Deliver queued email from the `EmailOutbox` table (app.services.email_outbox).
+
+Runs until SIGTERM/SIGINT, finishing the batch in hand before exiting.
+The SMTP connection (or SendGrid HTTP session) is reused across batches
+while there is work and closed whenever the queue runs dry. Several
+workers can run at once; claims use SKIP LOCKED, so none of them send
+the same message.
+"""
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from app.models import EmailOutbox
+from app.services import email_outbox
+
+
+class Command(BaseCommand):
+    help = 'Send queued emails from the outbox, with batching, connection reuse and retries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Send what is due now, then exit (for cron or a one-off drain)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Messages claimed per batch (default EMAIL_OUTBOX_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5.0,
+            help='Seconds to sleep when nothing is due (default 5)',
+        )
+        parser.add_argument(
+            '--quiet',
+            action='store_true',
+            help='Only print batch summaries',
+        )
+
+    def _report(self, rows, quiet):
+        counts = {}
+        for row in rows:
+            counts[row.status] = counts.get(row.status, 0) + 1
+            if quiet:
+                continue
+            line = f"  #{row.email_id} to {row.to_email}: {row.status} (attempt {row.attempts})"
+            if row.status == EmailOutbox.STATUS_SENT:
+                self.stdout.write(self.style.SUCCESS(line))
+            else:
+                self.stdout.write(self.style.WARNING(f"{line}: {row.last_error}"))
+        summary = ', '.join(f"{count} {status}" for status, count in sorted(counts.items()))
+        self.stdout.write(f"Batch of {len(rows)}: {summary}.")
+
+    def handle(self, *args, **options):
+        once = options.get('once', False)
+        quiet = options.get('quiet', False)
+        limit = options.get('batch_size')
+        poll_interval = options['poll_interval']
+
+        stopping = []
+        if not once:
+            def _stop(signum, frame):
+                stopping.append(signum)
+
+            signal.signal(signal.SIGTERM, _stop)
+            signal.signal(signal.SIGINT, _stop)
+
+        transport = email_outbox.get_transport()
+        self.stdout.write(f"Email worker started ({transport.name}).")
+        try:
+            while not stopping:
+                close_old_connections()
+                rows = email_outbox.process_batch(transport, limit)
+                if rows:
+                    self._report(rows, quiet)
+                    continue
+                transport.close()
+                if once:
+                    break
+                time.sleep(poll_interval)
+        finally:
+            transport.close()
+        self.stdout.write(self.style.SUCCESS('Email worker stopped.'))
@@ -0,0 +1,62 @@
+# Generated manually: denormalized subtask counters on Phase and Project.
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count(Subtask, outer_field, completed_only=False):
+    qs = Subtask.objects.filter(**{outer_field: OuterRef("pk")})
+    if completed_only:
+        qs = qs.filter(status="completed")
+    counted = (
+        qs.order_by()
+        .values(outer_field)
+        .annotate(c=Count("subtask_id"))
+        .values("c")
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
+
+
+def backfill_counters(apps, schema_editor):
+    Subtask = apps.get_model("app", "Subtask")
+    Phase = apps.get_model("app", "Phase")
+    Project = apps.get_model("app", "Project")
+    Phase.objects.update(
+        total_subtasks=_count(Subtask, "phase_id"),
+        completed_subtasks=_count(Subtask, "phase_id", completed_only=True),
+    )
+    Project.objects.update(
+        total_subtasks=_count(Subtask, "phase__project_id"),
+        completed_subtasks=_count(Subtask, "phase__project_id", completed_only=True),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0077_phasematerialplan_plans_per_subtask"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="phase",
+            name="total_subtasks",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="phase",
+            name="completed_subtasks",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="project",
+            name="total_subtasks",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="project",
+            name="completed_subtasks",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,166 @@
+# Generated manually: append-only project budget ledger + cached running totals.
+
+from decimal import Decimal
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_ledger(apps, schema_editor):
+    """
+    Seed the ledger from what history we have: the project budget at
+    creation, each phase allocation at phase creation, every phase-costed
+    InventoryUsage at its checkout time, then one adjustment per phase for
+    whatever used_budget the usages don't explain (legacy edits/returns)
+    and an opening payroll balance. Running totals are set to match.
+    """
+    Project = apps.get_model("app", "Project")
+    Phase = apps.get_model("app", "Phase")
+    InventoryUsage = apps.get_model("app", "InventoryUsage")
+    Entry = apps.get_model("app", "ProjectBudgetLedgerEntry")
+    now = django.utils.timezone.now()
+
+    batch = []
+
+    def add(**kwargs):
+        if kwargs["amount"]:
+            batch.append(Entry(**kwargs))
+        if len(batch) >= 500:
+            Entry.objects.bulk_create(batch)
+            batch.clear()
+
+    for project in Project.objects.order_by("project_id").iterator():
+        add(
+            project_id=project.project_id,
+            kind="budget",
+            amount=project.budget or Decimal("0"),
+            note="Opening balance",
+            created_at=project.created_at or now,
+        )
+        used_total = Decimal("0")
+        alloc_total = Decimal("0")
+        for phase in Phase.objects.filter(project_id=project.project_id).order_by("phase_id"):
+            alloc = phase.allocated_budget or Decimal("0")
+            used = phase.used_budget or Decimal("0")
+            alloc_total += alloc
+            used_total += used
+            add(
+                project_id=project.project_id,
+                phase_id=phase.phase_id,
+                kind="allocation",
+                amount=alloc,
+                note="Opening balance",
+                created_at=phase.created_at or now,
+            )
+            explained = Decimal("0")
+            for usage in InventoryUsage.objects.filter(
+                phase_id=phase.phase_id, total_cost__gt=0
+            ).order_by("usage_id"):
+                explained += usage.total_cost
+                add(
+                    project_id=project.project_id,
+                    phase_id=phase.phase_id,
+                    usage_id=usage.usage_id,
+                    kind="material_usage",
+                    amount=usage.total_cost,
+                    created_at=usage.checkout_date or now,
+                )
+            add(
+                project_id=project.project_id,
+                phase_id=phase.phase_id,
+                kind="material_adjustment",
+                amount=used - explained,
+                note="Opening balance",
+                created_at=now,
+            )
+        add(
+            project_id=project.project_id,
+            kind="payroll",
+            amount=project.payroll_used_budget or Decimal("0"),
+            note="Opening balance",
+            created_at=now,
+        )
+        Project.objects.filter(project_id=project.project_id).update(
+            used_materials_budget=used_total,
+            allocated_budget_total=alloc_total,
+        )
+    if batch:
+        Entry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0078_subtask_progress_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="project",
+            name="used_materials_budget",
+            field=models.DecimalField(decimal_places=2, default=Decimal("0"), max_digits=14),
+        ),
+        migrations.AddField(
+            model_name="project",
+            name="allocated_budget_total",
+            field=models.DecimalField(decimal_places=2, default=Decimal("0"), max_digits=14),
+        ),
+        migrations.CreateModel(
+            name="ProjectBudgetLedgerEntry",
+            fields=[
+                ("entry_id", models.AutoField(primary_key=True, serialize=False)),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("budget", "Budget"),
+                            ("allocation", "Phase allocation"),
+                            ("material_usage", "Material usage"),
+                            ("material_reversal", "Material usage reversal"),
+                            ("material_adjustment", "Material adjustment"),
+                            ("payroll", "Payroll"),
+                        ],
+                        max_length=30,
+                    ),
+                ),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=14)),
+                ("note", models.CharField(blank=True, default="", max_length=255)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "phase",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="budget_ledger",
+                        to="app.phase",
+                    ),
+                ),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="budget_ledger",
+                        to="app.project",
+                    ),
+                ),
+                (
+                    "usage",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="budget_ledger",
+                        to="app.inventoryusage",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["created_at", "entry_id"],
+                "indexes": [
+                    models.Index(fields=["project", "created_at"], name="budget_ledger_proj_ts_idx")
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated manually: (sort key, pk) indexes backing keyset pagination.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0079_project_budget_ledger"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="project",
+            index=models.Index(fields=["created_at", "project_id"], name="project_created_pk_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="fieldworker",
+            index=models.Index(fields=["created_at", "fieldworker_id"], name="fieldworker_created_pk_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="subtask",
+            index=models.Index(fields=["created_at", "subtask_id"], name="subtask_created_pk_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="attendance",
+            index=models.Index(fields=["attendance_date", "attendance_id"], name="attendance_date_pk_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="inventoryitem",
+            index=models.Index(fields=["created_at", "item_id"], name="invitem_created_pk_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="inventoryusage",
+            index=models.Index(fields=["checkout_date", "usage_id"], name="invusage_checkout_pk_idx"),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated manually: per-project daily subtask completion/reopen rollup.
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_activity(apps, schema_editor):
+    """One completion per completed subtask, on its `updated_at` day."""
+    Subtask = apps.get_model("app", "Subtask")
+    Activity = apps.get_model("app", "DailySubtaskActivity")
+    grouped = (
+        Subtask.objects.filter(status="completed")
+        .order_by()
+        .annotate(day=TruncDate("updated_at"))
+        .values("phase__project_id", "phase__project__user_id", "day")
+        .annotate(count=Count("subtask_id"))
+    )
+    Activity.objects.bulk_create(
+        [
+            Activity(
+                project_id=row["phase__project_id"],
+                user_id=row["phase__project__user_id"],
+                day=row["day"],
+                completed=row["count"],
+            )
+            for row in grouped
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0080_keyset_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailySubtaskActivity",
+            fields=[
+                ("activity_id", models.AutoField(primary_key=True, serialize=False)),
+                ("day", models.DateField()),
+                ("completed", models.PositiveIntegerField(default=0)),
+                ("reopened", models.PositiveIntegerField(default=0)),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_subtask_activity",
+                        to="app.project",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_subtask_activity",
+                        to="app.user",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["day", "project_id"],
+                "indexes": [
+                    models.Index(fields=["user", "day"], name="subtask_activity_user_day_idx")
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=["project", "day"], name="uniq_subtask_activity_project_day"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_activity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated manually: append-only PM audit trail.
+# Existing history is synthesized by `manage.py backfill_audit_events --apply`,
+# which start.sh runs (with --if-empty) on boot.
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0081_daily_subtask_activity"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AuditEvent",
+            fields=[
+                ("event_id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("ts", models.DateTimeField()),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("project_created", "Project created"),
+                            ("phase_created", "Phase created"),
+                            ("task_created", "Task created"),
+                            ("task_status", "Task status changed"),
+                            ("task_assigned", "Task assigned"),
+                            ("worker_added", "Field worker added"),
+                            ("supervisor_added", "Supervisor added"),
+                            ("client_added", "Client added"),
+                            ("inventory_item_added", "Inventory item added"),
+                            ("unit_moved", "Inventory unit moved"),
+                            ("attendance", "Attendance updated"),
+                        ],
+                        max_length=32,
+                    ),
+                ),
+                ("entity", models.CharField(max_length=64)),
+                ("payload", models.JSONField(default=dict)),
+                (
+                    "pm_user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="audit_events",
+                        to="app.user",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-ts", "-event_id"],
+                "indexes": [
+                    models.Index(fields=["pm_user", "ts", "event_id"], name="audit_pm_ts_idx"),
+                    models.Index(
+                        fields=["pm_user", "kind", "ts", "event_id"], name="audit_pm_kind_ts_idx"
+                    ),
+                    models.Index(fields=["entity"], name="audit_entity_idx"),
+                ],
+            },
+        ),
+    ]
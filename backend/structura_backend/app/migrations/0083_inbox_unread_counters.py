@@ -0,0 +1,50 @@
+# Generated manually: inbox composite indexes + per-recipient unread counters.
+# Counters are seeded lazily (one COUNT per recipient on first use).
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0082_audit_event"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="inappnotification",
+            index=models.Index(
+                fields=["recipient_kind", "recipient_user", "read_at", "created_at"],
+                name="notif_user_read_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="inappnotification",
+            index=models.Index(
+                fields=["recipient_kind", "recipient_supervisor", "read_at", "created_at"],
+                name="notif_sup_read_created_idx",
+            ),
+        ),
+        migrations.CreateModel(
+            name="InboxUnreadCounter",
+            fields=[
+                ("counter_id", models.AutoField(primary_key=True, serialize=False)),
+                (
+                    "recipient_kind",
+                    models.CharField(
+                        choices=[("supervisor", "Supervisor"), ("pm", "Project Manager")],
+                        max_length=20,
+                    ),
+                ),
+                ("recipient_id", models.IntegerField()),
+                ("unread", models.IntegerField(default=0)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=["recipient_kind", "recipient_id"],
+                        name="uniq_inbox_counter_recipient",
+                    )
+                ],
+            },
+        ),
+    ]
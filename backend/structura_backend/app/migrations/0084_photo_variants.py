@@ -0,0 +1,44 @@
+# Generated manually: per-photo manifest of the derivative sizes
+# (avatar/card/full in WebP + JPEG) written by app.services.image_derivatives.
+# Existing media is filled in by `manage.py backfill_photo_variants`.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0083_inbox_unread_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="project",
+            name="project_image_variants",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="supervisors",
+            name="photo_variants",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="fieldworker",
+            name="photo_variants",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="client",
+            name="photo_variants",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="subtaskphoto",
+            name="photo_variants",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="inventoryitem",
+            name="photo_variants",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
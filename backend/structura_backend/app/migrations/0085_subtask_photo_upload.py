@@ -0,0 +1,64 @@
+# Generated manually: resumable subtask photo uploads (init / PUT chunk /
+# finalize). Chunks are staged on disk; see app.services.photo_uploads.
+
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0084_photo_variants"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SubtaskPhotoUpload",
+            fields=[
+                (
+                    "upload_id",
+                    models.UUIDField(
+                        default=uuid.uuid4, editable=False, primary_key=True, serialize=False
+                    ),
+                ),
+                ("filename", models.CharField(max_length=255)),
+                ("content_type", models.CharField(blank=True, default="", max_length=100)),
+                ("size", models.BigIntegerField()),
+                ("sha256", models.CharField(blank=True, default="", max_length=64)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("pending", "Pending"), ("complete", "Complete")],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("completed_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "photo",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="upload",
+                        to="app.subtaskphoto",
+                    ),
+                ),
+                (
+                    "subtask",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="photo_uploads",
+                        to="app.subtask",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["status", "created_at"], name="photo_upload_status_idx")
+                ],
+            },
+        ),
+    ]
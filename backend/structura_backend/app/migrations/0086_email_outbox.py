@@ -0,0 +1,52 @@
+# Generated manually: durable outbox for outgoing email, delivered by
+# `manage.py run_email_worker` (see app.services.email_outbox).
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0085_subtask_photo_upload"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EmailOutbox",
+            fields=[
+                ("email_id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("to_email", models.CharField(max_length=254)),
+                ("subject", models.CharField(max_length=998)),
+                ("body", models.TextField()),
+                ("from_email", models.CharField(blank=True, default="", max_length=320)),
+                ("fallback_from_email", models.CharField(blank=True, default="", max_length=320)),
+                ("sender_header", models.CharField(blank=True, default="", max_length=320)),
+                ("reply_to", models.CharField(blank=True, default="", max_length=254)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("sending", "Sending"),
+                            ("sent", "Sent"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("next_attempt_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("claimed_at", models.DateTimeField(blank=True, null=True)),
+                ("last_error", models.TextField(blank=True, default="")),
+                ("provider_response", models.CharField(blank=True, default="", max_length=255)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["status", "next_attempt_at"], name="email_outbox_due_idx")
+                ],
+            },
+        ),
+    ]
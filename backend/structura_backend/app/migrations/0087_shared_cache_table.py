@@ -0,0 +1,20 @@
+# Generated manually: the table behind the shared DatabaseCache (CACHES in
+# settings), created wherever migrations run so no deploy path misses it.
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    # A no-op for cache backends that aren't DatabaseCache.
+    call_command("createcachetable", database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0086_email_outbox"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Q
 from django.contrib.auth.hashers import make_password
 from django.utils import timezone
 from datetime import timedelta
+import uuid
 from decimal import Decimal
 
 
@@ -244,8 +245,91 @@ class PaymentHistory(models.Model):
         return f"{self.user.email} - {self.amount} - {self.payment_date.strftime('%Y-%m-%d')}"
 
 
+SUBTASK_COUNTER_FIELDS = ('total_subtasks', 'completed_subtasks')
+
+
+class SubtaskCounterFieldsMixin(models.Model):
+    """
+    Denormalized subtask counters shared by Phase and Project.
+
+    The columns are only ever written with F() expressions by
+    app.services.subtask_counters (driven by the Subtask signals), so a plain
+    `instance.save()` on an already-stored row leaves them out of the UPDATE
+    instead of writing back whatever stale value the instance was loaded with.
+    `manage.py rebuild_subtask_counters` repairs drift.
+
+    Because such a save would silently drop a change to one of these fields,
+    it raises ValueError instead when a field no longer holds the value it
+    was loaded (or last saved) with. A service that has just stored a value
+    itself records it with `set_stored_value()`.
+    """
+
+    # Columns that only the services write (via F() / ledger postings).
+    WRITE_PROTECTED_FIELDS = SUBTASK_COUNTER_FIELDS
+
+    total_subtasks = models.IntegerField(default=0)
+    completed_subtasks = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_protected()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._snapshot_protected(fields)
+
+    def _snapshot_protected(self, fields=None):
+        snapshot = self.__dict__.setdefault('_protected_values', {})
+        for name in self.WRITE_PROTECTED_FIELDS:
+            if name in self.__dict__ and (fields is None or name in fields):
+                snapshot[name] = self.__dict__[name]
+
+    def set_stored_value(self, name, value):
+        """Set a protected field to a value its service has just written."""
+        setattr(self, name, value)
+        self._snapshot_protected([name])
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+        ):
+            snapshot = self.__dict__.get('_protected_values', {})
+            changed = [
+                name for name, value in snapshot.items()
+                if name in self.__dict__ and self.__dict__[name] != value
+            ]
+            if changed:
+                raise ValueError(
+                    f"{type(self).__name__}.save() does not write {', '.join(changed)}; "
+                    "change them through their service (or pass update_fields)."
+                )
+            kwargs['update_fields'] = [
+                f.name
+                for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.WRITE_PROTECTED_FIELDS
+            ]
+        # post_save receivers (counters, budget ledger) run inside the same
+        # transaction as the row write.
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+        self._snapshot_protected()
+
+    def get_progress(self):
+        """Completed / total subtasks as a 0..1 float (0.0 when there are none)."""
+        if not self.total_subtasks:
+            return 0.0
+        return self.completed_subtasks / self.total_subtasks
+
+
 # Project Model
-class Project(models.Model):
+class Project(SubtaskCounterFieldsMixin):
     STATUS_CHOICES = [
         ('Active', 'Active'),
         ('On Hold', 'On Hold'),
@@ -256,6 +340,8 @@ class Project(models.Model):
 
     project_id = models.AutoField(primary_key=True)
     project_image = models.CharField(max_length=500, null=True, blank=True)
+    # Derivative sizes of `project_image` (app.services.image_derivatives).
+    project_image_variants = models.JSONField(default=dict, blank=True)
     project_name = models.CharField(max_length=200)
     description = models.TextField(null=True, blank=True)
 
@@ -279,21 +365,27 @@ class Project(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Active')
     on_hold_reason = models.TextField(blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Running totals of the budget ledger (ProjectBudgetLedgerEntry), posted by
+    # app.services.budget_ledger in the same transaction as the phase write.
+    used_materials_budget = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    allocated_budget_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+
+    WRITE_PROTECTED_FIELDS = SUBTASK_COUNTER_FIELDS + (
+        'used_materials_budget',
+        'allocated_budget_total',
+        'payroll_used_budget',
+    )
 
-    def get_progress(self):
-        """Calculate project progress based on subtask completion"""
-        total_subtasks = 0
-        completed_subtasks = 0
-        
-        for phase in self.phases.all():
-            subtasks = phase.subtasks.all()
-            total_subtasks += subtasks.count()
-            completed_subtasks += subtasks.filter(status='completed').count()
-        
-        if total_subtasks == 0:
-            return 0.0
-        
-        return completed_subtasks / total_subtasks
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'project_id'], name='project_created_pk_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._ledger_budget = instance.__dict__.get('budget')
+        return instance
 
     def get_scheduled_end_date(self):
         """
@@ -330,30 +422,10 @@ class Project(models.Model):
         Skips: Completed, Deactivated, On Hold. Not overdue when all subtasks are done (100%).
 
         as_of_date: optional date for "as of" calculations (e.g. Flutter Test Time via ?as_of=).
-        """
-        if self.get_progress() >= 1.0 and self.status != 'Completed':
-            self.update_status_based_on_progress()
-        if self.status in ('Completed', 'Deactivated', 'On Hold'):
-            return False
-        if self.status not in ('Active', 'Overdue'):
-            return False
 
-        should_overdue = (
-            self.is_past_scheduled_end(as_of=as_of_date) and self.get_progress() < 1.0
-        )
-
-        if should_overdue:
-            if self.status != 'Overdue':
-                self.status = 'Overdue'
-                self.save(update_fields=['status'])
-                return True
-            return False
-
-        if self.status == 'Overdue' and not should_overdue:
-            self.status = 'Active'
-            self.save(update_fields=['status'])
-            return True
-        return False
+        Thin wrapper over app.services.project_status for a single row.
+        """
+        return self._sync_status(as_of=as_of_date, reopen_completed=False)
 
     def update_status_based_on_progress(self):
         """
@@ -361,26 +433,50 @@ class Project(models.Model):
         below 100% (e.g. subtask reverted to pending), clear Completed back to
         Active and re-apply overdue rules.
         """
-        progress = self.get_progress()
-        if progress >= 1.0 and self.status != 'Completed':
-            self.status = 'Completed'
-            self.on_hold_reason = ''
-            self.save(update_fields=['status', 'on_hold_reason'])
-            return True
-        if progress < 1.0 and self.status == 'Completed':
-            self.status = 'Active'
+        return self._sync_status(as_of=None, reopen_completed=True)
+
+    def _sync_status(self, *, as_of, reopen_completed):
+        from app.services.project_status import sync_project_statuses
+
+        changes = sync_project_statuses(
+            Project.objects.filter(pk=self.pk),
+            as_of=as_of,
+            reopen_completed=reopen_completed,
+        )
+        if not changes:
+            return False
+        change = changes[0]
+        self.status = change.after
+        if 'Completed' in (change.before, change.after):
             self.on_hold_reason = ''
-            self.save(update_fields=['status', 'on_hold_reason'])
-            self.refresh_overdue_status()
-            return True
-        return False
+        return True
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._budget_totals = None
+
+    def _fresh_budget_totals(self):
+        """
+        Ledger running totals straight from the row (one PK lookup), read
+        once per instance. `refresh_from_db()` and a save of one of its
+        loaded phases (app.services.budget_ledger) read them again.
+        """
+        if self.pk is None:
+            return self.used_materials_budget, self.allocated_budget_total
+        totals = self.__dict__.get('_budget_totals')
+        if totals is None:
+            row = (
+                Project.objects.filter(pk=self.pk)
+                .values_list('used_materials_budget', 'allocated_budget_total')
+                .first()
+            )
+            totals = self._budget_totals = row or (Decimal('0'), Decimal('0'))
+        return totals
 
     @property
     def total_used_budget(self):
         """Sum of used_budget across all phases of this project."""
-        from django.db.models import Sum
-        total = self.phases.aggregate(s=Sum('used_budget'))['s']
-        return total or Decimal('0')
+        return self._fresh_budget_totals()[0] or Decimal('0')
 
     @property
     def remaining_budget(self):
@@ -394,9 +490,16 @@ class Project(models.Model):
     @property
     def total_allocated_budget(self):
         """Sum of allocated_budget across all phases of this project."""
-        from django.db.models import Sum
-        total = self.phases.aggregate(s=Sum('allocated_budget'))['s']
-        return total or Decimal('0')
+        return self._fresh_budget_totals()[1] or Decimal('0')
+
+    @property
+    def cached_remaining_budget(self):
+        """remaining_budget from the columns already loaded on this instance."""
+        return (
+            (self.budget or Decimal('0'))
+            - (self.used_materials_budget or Decimal('0'))
+            - (self.payroll_used_budget or Decimal('0'))
+        )
 
     def __str__(self):
         return self.project_name
@@ -441,6 +544,8 @@ class Supervisors(models.Model):
     payrate = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
 
     photo = models.FileField(upload_to='supervisor_images/', null=True, blank=True)
+    # Derivative sizes of `photo` (app.services.image_derivatives).
+    photo_variants = models.JSONField(default=dict, blank=True)
     has_completed_quick_tour = models.BooleanField(default=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
@@ -525,8 +630,15 @@ class FieldWorker(models.Model):
     net_weekly_pay = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
 
     photo = models.FileField(upload_to='fieldworker_images/', null=True, blank=True)
+    # Derivative sizes of `photo` (app.services.image_derivatives).
+    photo_variants = models.JSONField(default=dict, blank=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'fieldworker_id'], name='fieldworker_created_pk_idx'),
+        ]
     
     def __str__(self):
         project_name = self.project_id.project_name if self.project_id else "Unassigned"
@@ -625,6 +737,8 @@ class Client(models.Model):
     barangay = models.ForeignKey(Barangay, on_delete=models.SET_NULL, null=True, blank=True)
 
     photo = models.FileField(upload_to='client_images/', null=True, blank=True)
+    # Derivative sizes of `photo` (app.services.image_derivatives).
+    photo_variants = models.JSONField(default=dict, blank=True)
     has_completed_quick_tour = models.BooleanField(default=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
@@ -706,7 +820,7 @@ class SupervisorReportSubmission(models.Model):
 
 
 # Phase Model
-class Phase(models.Model):
+class Phase(SubtaskCounterFieldsMixin):
     PHASE_CHOICES = [
         ('PHASE 1 - Pre-Construction Phase', 'PHASE 1 - Pre-Construction Phase'),
         ('PHASE 2 - Design Phase', 'PHASE 2 - Design Phase'),
@@ -737,6 +851,20 @@ class Phase(models.Model):
     class Meta:
         ordering = ['created_at']
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets the signals carry this phase's subtask counts over if it is
+        # re-parented to another project (and invalidate both PMs' dashboards).
+        instance._counted_project_id = instance.__dict__.get('project_id')
+        instance._dashboard_project_id = instance._counted_project_id
+        instance._ledger_budget_state = (
+            instance.__dict__.get('project_id'),
+            instance.__dict__.get('allocated_budget'),
+            instance.__dict__.get('used_budget'),
+        )
+        return instance
+
     @property
     def remaining_phase_budget(self):
         """Allocated minus used for this phase."""
@@ -768,6 +896,36 @@ class Subtask(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'subtask_id'], name='subtask_created_pk_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Snapshot of what the phase/project counters currently account for;
+        # app.services.subtask_counters diffs against it on save.
+        instance._counted_state = (
+            instance.__dict__.get('phase_id'),
+            instance.__dict__.get('status'),
+        )
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Diff against what is stored, not what was loaded: re-read the row
+        # under a lock in the write's transaction, so two requests saving
+        # the same transition apply it once between them.
+        with transaction.atomic(using=kwargs.get('using')):
+            if not self._state.adding and self.pk is not None:
+                stored = (
+                    type(self)._default_manager.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list('phase_id', 'status')
+                    .first()
+                )
+                if stored is not None:
+                    self._counted_state = stored
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.title} - {self.phase.phase_name}"
@@ -822,6 +980,8 @@ class SubtaskPhoto(models.Model):
         related_name='update_photos',
     )
     photo = models.FileField(upload_to='subtask_update_photos/')
+    # Derivative sizes of `photo` (app.services.image_derivatives).
+    photo_variants = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -831,6 +991,46 @@ class SubtaskPhoto(models.Model):
         return f"SubtaskPhoto #{self.photo_id} - Subtask {self.subtask_id}"
 
 
+class SubtaskPhotoUpload(models.Model):
+    """
+    A resumable upload of one subtask photo (app.services.photo_uploads).
+    The bytes are staged on disk until finalize; the staged file's size is
+    the upload offset, so nothing here changes per chunk.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_COMPLETE = 'complete'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_COMPLETE, 'Complete'),
+    ]
+
+    upload_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    subtask = models.ForeignKey(Subtask, on_delete=models.CASCADE, related_name='photo_uploads')
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True, default='')
+    size = models.BigIntegerField()
+    # Optional hex SHA-256 the client sent at init, checked at finalize.
+    sha256 = models.CharField(max_length=64, blank=True, default='')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    photo = models.OneToOneField(
+        SubtaskPhoto,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='upload',
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='photo_upload_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"SubtaskPhotoUpload {self.upload_id} ({self.status})"
+
+
 # SubtaskFieldWorker Assignment Model
 class SubtaskFieldWorker(models.Model):
     """Tracks which field workers are assigned to which subtasks"""
@@ -875,6 +1075,9 @@ class Attendance(models.Model):
     class Meta:
         unique_together = ('field_worker', 'project', 'attendance_date')
         ordering = ['-attendance_date']
+        indexes = [
+            models.Index(fields=['attendance_date', 'attendance_id'], name='attendance_date_pk_idx'),
+        ]
 
     def __str__(self):
         return f"{self.field_worker.first_name} {self.field_worker.last_name} - {self.attendance_date}"
@@ -914,6 +1117,8 @@ class InventoryItem(models.Model):
     notes = models.TextField(null=True, blank=True)
     price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     photo = models.FileField(upload_to='inventory_images/', null=True, blank=True)
+    # Derivative sizes of `photo` (app.services.image_derivatives).
+    photo_variants = models.JSONField(default=dict, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Available')
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='inventory_items')
     project = models.ForeignKey('Project', on_delete=models.SET_NULL, null=True, blank=True, related_name='inventory_items', db_column='project_id')
@@ -922,6 +1127,9 @@ class InventoryItem(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'item_id'], name='invitem_created_pk_idx'),
+        ]
 
     def sync_quantity_from_units(self):
         """Keep profile quantity aligned with the number of unit records."""
@@ -1070,6 +1278,9 @@ class InventoryUsage(models.Model):
 
     class Meta:
         ordering = ['-checkout_date']
+        indexes = [
+            models.Index(fields=['checkout_date', 'usage_id'], name='invusage_checkout_pk_idx'),
+        ]
 
     def __str__(self):
         return f"{self.inventory_item.name} → {self.checked_out_by.first_name} ({self.status})"
@@ -1151,6 +1362,158 @@ class PhaseMaterialPlan(models.Model):
         return f"{self.phase.phase_name} plan: {self.inventory_item.name} x{self.planned_quantity}"
 
 
+class ProjectBudgetLedgerEntry(models.Model):
+    """
+    Append-only record of every change to a project's budget figures.
+    Signed `amount`s; Project.used_materials_budget / allocated_budget_total /
+    payroll_used_budget are the running sums. Written only through
+    app.services.budget_ledger.
+    """
+
+    KIND_BUDGET = 'budget'
+    KIND_ALLOCATION = 'allocation'
+    KIND_MATERIAL_USAGE = 'material_usage'
+    KIND_MATERIAL_REVERSAL = 'material_reversal'
+    KIND_MATERIAL_ADJUSTMENT = 'material_adjustment'
+    KIND_PAYROLL = 'payroll'
+    KIND_CHOICES = [
+        (KIND_BUDGET, 'Budget'),
+        (KIND_ALLOCATION, 'Phase allocation'),
+        (KIND_MATERIAL_USAGE, 'Material usage'),
+        (KIND_MATERIAL_REVERSAL, 'Material usage reversal'),
+        (KIND_MATERIAL_ADJUSTMENT, 'Material adjustment'),
+        (KIND_PAYROLL, 'Payroll'),
+    ]
+    MATERIAL_KINDS = (KIND_MATERIAL_USAGE, KIND_MATERIAL_REVERSAL, KIND_MATERIAL_ADJUSTMENT)
+
+    entry_id = models.AutoField(primary_key=True)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='budget_ledger')
+    phase = models.ForeignKey(
+        Phase,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='budget_ledger',
+    )
+    usage = models.ForeignKey(
+        InventoryUsage,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='budget_ledger',
+    )
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    note = models.CharField(max_length=255, blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['created_at', 'entry_id']
+        indexes = [
+            models.Index(fields=['project', 'created_at'], name='budget_ledger_proj_ts_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Budget ledger entries are append-only.')
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.project_id} {self.kind} {self.amount}"
+
+
+class DailySubtaskActivity(models.Model):
+    """
+    Per-project, per-day rollup of subtask status transitions: how many
+    subtasks were marked completed and how many were reopened that day.
+    `user` is the project's PM, denormalized so dashboard range reads are
+    one index scan. Maintained by app.services.subtask_activity.
+    """
+
+    activity_id = models.AutoField(primary_key=True)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='daily_subtask_activity',
+    )
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='daily_subtask_activity')
+    day = models.DateField()
+    completed = models.PositiveIntegerField(default=0)
+    reopened = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['day', 'project_id']
+        constraints = [
+            models.UniqueConstraint(fields=['project', 'day'], name='uniq_subtask_activity_project_day'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'day'], name='subtask_activity_user_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.project_id} {self.day}: +{self.completed} / -{self.reopened}"
+
+
+class AuditEvent(models.Model):
+    """
+    Append-only audit trail row, scoped to the Project Manager whose
+    organization it belongs to. `payload` holds the rendered row exactly
+    as `pm_audit_trail` returns it (actor, action text, old/new values…),
+    snapshotted at write time. Written only through app.services.audit_trail.
+    """
+
+    KIND_PROJECT_CREATED = 'project_created'
+    KIND_PHASE_CREATED = 'phase_created'
+    KIND_TASK_CREATED = 'task_created'
+    KIND_TASK_STATUS = 'task_status'
+    KIND_TASK_ASSIGNED = 'task_assigned'
+    KIND_WORKER_ADDED = 'worker_added'
+    KIND_SUPERVISOR_ADDED = 'supervisor_added'
+    KIND_CLIENT_ADDED = 'client_added'
+    KIND_INVENTORY_ITEM_ADDED = 'inventory_item_added'
+    KIND_UNIT_MOVED = 'unit_moved'
+    KIND_ATTENDANCE = 'attendance'
+    KIND_CHOICES = [
+        (KIND_PROJECT_CREATED, 'Project created'),
+        (KIND_PHASE_CREATED, 'Phase created'),
+        (KIND_TASK_CREATED, 'Task created'),
+        (KIND_TASK_STATUS, 'Task status changed'),
+        (KIND_TASK_ASSIGNED, 'Task assigned'),
+        (KIND_WORKER_ADDED, 'Field worker added'),
+        (KIND_SUPERVISOR_ADDED, 'Supervisor added'),
+        (KIND_CLIENT_ADDED, 'Client added'),
+        (KIND_INVENTORY_ITEM_ADDED, 'Inventory item added'),
+        (KIND_UNIT_MOVED, 'Inventory unit moved'),
+        (KIND_ATTENDANCE, 'Attendance updated'),
+    ]
+
+    event_id = models.BigAutoField(primary_key=True)
+    pm_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='audit_events')
+    ts = models.DateTimeField()
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES)
+    # "<model>:<pk>" of the record the event is about, e.g. "subtask:42".
+    entity = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict)
+
+    class Meta:
+        ordering = ['-ts', '-event_id']
+        indexes = [
+            models.Index(fields=['pm_user', 'ts', 'event_id'], name='audit_pm_ts_idx'),
+            models.Index(fields=['pm_user', 'kind', 'ts', 'event_id'], name='audit_pm_kind_ts_idx'),
+            models.Index(fields=['entity'], name='audit_entity_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Audit events are append-only.')
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.pm_user_id} {self.ts:%Y-%m-%d %H:%M} {self.kind} {self.entity}"
+
+
 class InAppNotification(models.Model):
     """Generic in-app row for PM / supervisor; payload holds deep-link data as JSON."""
 
@@ -1160,6 +1523,14 @@ class InAppNotification(models.Model):
         (KIND_SUPERVISOR, 'Supervisor'),
         (KIND_PM, 'Project Manager'),
     ]
+    # "Subtask created" style rows are hidden from the PM inbox (and its
+    # unread count) per PM requirement.
+    PM_HIDDEN_KINDS = (
+        'pm_subtask_created',
+        'pm_subtask_added',
+        'subtask_created',
+        'subtask_added',
+    )
 
     notification_id = models.AutoField(primary_key=True)
     recipient_kind = models.CharField(max_length=20, choices=RECIPIENT_KIND_CHOICES)
@@ -1186,6 +1557,107 @@ class InAppNotification(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['recipient_kind', 'recipient_user', 'read_at', 'created_at'],
+                name='notif_user_read_created_idx',
+            ),
+            models.Index(
+                fields=['recipient_kind', 'recipient_supervisor', 'read_at', 'created_at'],
+                name='notif_sup_read_created_idx',
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What the recipient's unread counter currently accounts for;
+        # app.services.inbox diffs against it on save.
+        loaded = all(
+            name in instance.__dict__
+            for name in ('recipient_kind', 'kind', 'read_at')
+        )
+        instance._counted_unread = instance.counts_as_unread() if loaded else None
+        return instance
+
+    @property
+    def recipient_id(self):
+        if self.recipient_kind == self.KIND_SUPERVISOR:
+            return self.recipient_supervisor_id
+        return self.recipient_user_id
+
+    def counts_as_unread(self):
+        if self.read_at is not None:
+            return False
+        return not (self.recipient_kind == self.KIND_PM and self.kind in self.PM_HIDDEN_KINDS)
 
     def __str__(self):
         return f"{self.title} ({self.kind})"
+
+
+class InboxUnreadCounter(models.Model):
+    """
+    Unread in-app notifications per recipient, so inbox polls never COUNT.
+    `recipient_id` is a User id for `pm` and a Supervisors id for
+    `supervisor`. Maintained by app.services.inbox.
+    """
+
+    counter_id = models.AutoField(primary_key=True)
+    recipient_kind = models.CharField(max_length=20, choices=InAppNotification.RECIPIENT_KIND_CHOICES)
+    recipient_id = models.IntegerField()
+    unread = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipient_kind', 'recipient_id'], name='uniq_inbox_counter_recipient'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient_kind}:{self.recipient_id} unread={self.unread}"
+
+
+class EmailOutbox(models.Model):
+    """
+    An outgoing email, written in the request's transaction and delivered
+    by `manage.py run_email_worker` (app.services.email_outbox).
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    email_id = models.BigAutoField(primary_key=True)
+    to_email = models.CharField(max_length=254)
+    subject = models.CharField(max_length=998)
+    body = models.TextField()
+    from_email = models.CharField(max_length=320, blank=True, default='')
+    # Retried as the From when `from_email` (a PM's address) is rejected.
+    fallback_from_email = models.CharField(max_length=320, blank=True, default='')
+    sender_header = models.CharField(max_length=320, blank=True, default='')
+    reply_to = models.CharField(max_length=254, blank=True, default='')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # When a worker claimed it; a `sending` row claimed long ago belongs
+    # to a worker that died and is claimed again.
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    provider_response = models.CharField(max_length=255, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='email_outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"Email {self.email_id} to {self.to_email} ({self.status})"
@@ -0,0 +1,733 @@
+"""
+PM audit trail — `AuditEvent` rows written as things happen, so
+`pm_audit_trail` is one indexed range scan over (pm_user, ts) instead of a
+ten-way merge of recent rows from every table.
+
+What gets recorded (one event per affected PM):
+    project_created       Project created                     (Project.user)
+    phase_created         Phase created                       (project's PM)
+    task_created          Subtask created                     (project's PM)
+    task_status           Subtask status changed              (project's PM)
+    task_assigned         SubtaskFieldWorker created          (project's PM)
+    worker_added          FieldWorker created                 (FieldWorker.user_id)
+    supervisor_added      Supervisors created     (created_by and project's PM)
+    client_added          Client created          (created_by and project's PM)
+    inventory_item_added  InventoryItem created               (created_by)
+    unit_moved            InventoryUnitMovement   (item owner, from/to PMs)
+    attendance            Attendance saved                    (project's PM)
+
+`app.signals` calls `record_saved` on post_save for those models, so every
+write path (viewsets, function views, admin, services) is covered. The
+rendered row (`payload`) is a snapshot: later renames don't rewrite history.
+
+`backfill_audit_events()` (`manage.py backfill_audit_events`) synthesizes
+events from current data with the rules the old endpoint used, skipping
+any (kind, entity) that already has an event.
+
+`iter_audit_events()` walks a PM's whole history oldest-first in constant
+memory for exports: a server-side cursor where the database allows it,
+keyset batches where it doesn't (`DISABLE_SERVER_SIDE_CURSORS`, set for
+the Supabase transaction pooler). `aiter_audit_event_pages()` is the ASGI
+variant: always keyset pages, each fetched with `sync_to_async`.
+"""
+
+from asgiref.sync import sync_to_async
+from django.db import connections, router, transaction
+from django.db.models import Q
+
+from app import models as app_models
+from app.models import AuditEvent
+
+
+PM_ROLE_LABEL = "Project Manager"
+
+TASK_STATUS_LABELS = {
+    "pending": "Pending",
+    "in_progress": "In Progress",
+    "completed": "Completed",
+}
+ATTENDANCE_ACTION_LABELS = {
+    "on_site": "Checked in (On Site)",
+    "on_break": "Started break",
+    "absent": "Marked absent",
+}
+ATTENDANCE_STATUS_LABELS = {
+    "on_site": "On Site",
+    "on_break": "On Break",
+    "absent": "Absent",
+}
+
+
+def full_name(first, middle, last):
+    parts = [p for p in (first, middle, last) if p]
+    name = " ".join(str(part).strip() for part in parts if str(part).strip())
+    return name or "Unknown"
+
+
+class PMNames:
+    """Display names for PM user ids, fetched once per id."""
+
+    def __init__(self):
+        self._names = {}
+
+    def __getitem__(self, user_id):
+        if user_id not in self._names:
+            row = (
+                app_models.User.objects.filter(pk=user_id)
+                .values("first_name", "middle_name", "last_name")
+                .first()
+            ) or {}
+            self._names[user_id] = full_name(
+                row.get("first_name"), row.get("middle_name"), row.get("last_name")
+            )
+        return self._names[user_id]
+
+
+def _payload(
+    user_name,
+    user_role,
+    action_text,
+    category,
+    affected_record="—",
+    old_value="—",
+    new_value="—",
+    module="General",
+    status_result="Success",
+):
+    return {
+        "user_name": user_name or "Unknown",
+        "user_role": user_role or "User",
+        "action": action_text,
+        "category": category,
+        "affected_record": affected_record or "—",
+        "old_value": old_value or "—",
+        "new_value": new_value or "—",
+        "module": module or "General",
+        "status_result": status_result or "Success",
+    }
+
+
+def _events(pm_user_ids, ts, kind, entity, payload_for):
+    """One unsaved AuditEvent per distinct PM; `payload_for(pm_id)` renders it."""
+    if ts is None:
+        return []
+    seen = []
+    for pm_id in pm_user_ids:
+        if pm_id and pm_id not in seen:
+            seen.append(pm_id)
+    return [
+        AuditEvent(pm_user_id=pm_id, ts=ts, kind=kind, entity=entity, payload=payload_for(pm_id))
+        for pm_id in seen
+    ]
+
+
+def _project_name(project):
+    return project.project_name if project is not None else "N/A"
+
+
+def project_events(project, names):
+    return _events(
+        [project.user_id],
+        project.created_at,
+        AuditEvent.KIND_PROJECT_CREATED,
+        f"project:{project.pk}",
+        lambda pm_id: _payload(
+            names[pm_id],
+            PM_ROLE_LABEL,
+            f"Created project '{project.project_name}'",
+            "Project",
+            affected_record=f"Project #{project.pk} - {project.project_name}",
+            new_value=f"Status: {project.status or 'Active'}",
+            module="Projects",
+        ),
+    )
+
+
+def phase_events(phase, names):
+    project = phase.project if phase.project_id else None
+    proj_name = _project_name(project)
+    return _events(
+        [getattr(project, "user_id", None)],
+        phase.created_at,
+        AuditEvent.KIND_PHASE_CREATED,
+        f"phase:{phase.pk}",
+        lambda pm_id: _payload(
+            names[pm_id],
+            PM_ROLE_LABEL,
+            f"Added phase '{phase.phase_name}' to '{proj_name}'",
+            "Phase",
+            affected_record=f"Phase #{phase.pk} - {phase.phase_name}",
+            new_value=f"Project: {proj_name}",
+            module="Projects",
+        ),
+    )
+
+
+def subtask_created_events(subtask, names):
+    project = subtask.phase.project if subtask.phase_id else None
+    proj_name = _project_name(project)
+    return _events(
+        [getattr(project, "user_id", None)],
+        subtask.created_at,
+        AuditEvent.KIND_TASK_CREATED,
+        f"subtask:{subtask.pk}",
+        lambda pm_id: _payload(
+            names[pm_id],
+            PM_ROLE_LABEL,
+            f"Created task '{subtask.title}' in '{proj_name}'",
+            "Task",
+            affected_record=f"Task #{subtask.pk} - {subtask.title}",
+            new_value=f"Status: {subtask.status or 'pending'}",
+            module="Tasks",
+        ),
+    )
+
+
+def _status_label(value):
+    return TASK_STATUS_LABELS.get(value, (value or "Updated").title())
+
+
+def subtask_status_events(subtask, names, *, old_status=None):
+    project = subtask.phase.project if subtask.phase_id else None
+    proj_name = _project_name(project)
+    supervisor = project.supervisor if project is not None and project.supervisor_id else None
+    label = _status_label(subtask.status)
+    result = "Completed" if (subtask.status or "").lower() == "completed" else "Success"
+
+    def render(pm_id):
+        if supervisor is not None:
+            actor = full_name(supervisor.first_name, supervisor.middle_name, supervisor.last_name)
+            role = "Supervisor"
+        else:
+            actor, role = names[pm_id], PM_ROLE_LABEL
+        return _payload(
+            actor,
+            role,
+            f"Updated task '{subtask.title}' to {label} in '{proj_name}'",
+            "Task",
+            affected_record=f"Task #{subtask.pk} - {subtask.title}",
+            old_value=(
+                f"Status: {_status_label(old_status)}" if old_status else "Previous status"
+            ),
+            new_value=f"Status: {label}",
+            module="Tasks",
+            status_result=result,
+        )
+
+    return _events(
+        [getattr(project, "user_id", None)],
+        subtask.updated_at,
+        AuditEvent.KIND_TASK_STATUS,
+        f"subtask:{subtask.pk}",
+        render,
+    )
+
+
+def assignment_events(assignment, names):
+    subtask = assignment.subtask if assignment.subtask_id else None
+    project = subtask.phase.project if subtask is not None and subtask.phase_id else None
+    fw = assignment.field_worker if assignment.field_worker_id else None
+    worker_name = full_name(fw.first_name, fw.middle_name, fw.last_name) if fw else "Unknown"
+    task_title = subtask.title if subtask is not None else "Unknown task"
+    return _events(
+        [getattr(project, "user_id", None)],
+        assignment.assigned_at,
+        AuditEvent.KIND_TASK_ASSIGNED,
+        f"assignment:{assignment.pk}",
+        lambda pm_id: _payload(
+            names[pm_id],
+            PM_ROLE_LABEL,
+            f"Assigned {worker_name} to task '{task_title}'",
+            "Assignment",
+            affected_record=f"Task #{assignment.subtask_id} - {task_title}",
+            old_value="Unassigned",
+            new_value=f"Assigned: {worker_name}",
+            module="Tasks",
+        ),
+    )
+
+
+def field_worker_events(fw, names):
+    name = full_name(fw.first_name, fw.middle_name, fw.last_name)
+    role_label = fw.role or "Field Worker"
+    return _events(
+        [fw.user_id_id],
+        fw.created_at,
+        AuditEvent.KIND_WORKER_ADDED,
+        f"fieldworker:{fw.pk}",
+        lambda pm_id: _payload(
+            names[pm_id],
+            PM_ROLE_LABEL,
+            f"Added field worker {name} ({role_label})",
+            "Worker",
+            affected_record=f"Field Worker #{fw.pk} - {name}",
+            new_value=f"Role: {role_label}",
+            module="Workforce",
+        ),
+    )
+
+
+def _owner_and_project_pm(record):
+    project = record.project_id if record.project_id_id else None
+    return [record.created_by_id, getattr(project, "user_id", None)]
+
+
+def supervisor_events(sv, names):
+    name = full_name(sv.first_name, sv.middle_name, sv.last_name)
+    return _events(
+        _owner_and_project_pm(sv),
+        sv.created_at,
+        AuditEvent.KIND_SUPERVISOR_ADDED,
+        f"supervisor:{sv.pk}",
+        lambda pm_id: _payload(
+            names[pm_id],
+            PM_ROLE_LABEL,
+            f"Added supervisor {name}",
+            "Supervisor",
+            affected_record=f"Supervisor #{sv.pk} - {name}",
+            new_value="Role: Supervisor",
+            module="Workforce",
+        ),
+    )
+
+
+def client_events(client, names):
+    name = full_name(client.first_name, client.middle_name, client.last_name)
+    return _events(
+        _owner_and_project_pm(client),
+        client.created_at,
+        AuditEvent.KIND_CLIENT_ADDED,
+        f"client:{client.pk}",
+        lambda pm_id: _payload(
+            names[pm_id],
+            PM_ROLE_LABEL,
+            f"Added client {name}",
+            "Client",
+            affected_record=f"Client #{client.pk} - {name}",
+            new_value=f"Status: {client.status or 'active'}",
+            module="Clients",
+        ),
+    )
+
+
+def inventory_item_events(item, names):
+    return _events(
+        [item.created_by_id],
+        item.created_at,
+        AuditEvent.KIND_INVENTORY_ITEM_ADDED,
+        f"inventoryitem:{item.pk}",
+        lambda pm_id: _payload(
+            names[pm_id],
+            PM_ROLE_LABEL,
+            f"Added inventory item '{item.name}'",
+            "Inventory",
+            affected_record=f"Item #{item.pk} - {item.name}",
+            new_value=f"Status: {item.status or 'Available'} • Qty: {item.quantity}",
+            module="Inventory",
+        ),
+    )
+
+
+def unit_movement_events(mv, names):
+    actor = mv.moved_by if mv.moved_by_id else None
+    if actor is not None:
+        actor_name = full_name(actor.first_name, actor.middle_name, actor.last_name)
+        if (actor.role or "").lower() == "projectmanager":
+            actor_role = PM_ROLE_LABEL
+        else:
+            actor_role = actor.role or "User"
+    else:
+        actor_name = actor_role = "System"
+
+    unit = mv.unit if mv.unit_id else None
+    unit_code = unit.unit_code if unit is not None else "Unit"
+    from_project = mv.from_project if mv.from_project_id else None
+    to_project = mv.to_project if mv.to_project_id else None
+    from_name = getattr(from_project, "project_name", None)
+    to_name = getattr(to_project, "project_name", None)
+    if mv.action == "Transferred" and from_name and to_name:
+        desc = f"Transferred unit {unit_code} from '{from_name}' to '{to_name}'"
+        old_val, new_val = f"Project: {from_name}", f"Project: {to_name}"
+    elif mv.action == "Assigned" and to_name:
+        desc = f"Assigned unit {unit_code} to '{to_name}'"
+        old_val, new_val = "Unassigned", f"Project: {to_name}"
+    elif mv.action == "Returned" and from_name:
+        desc = f"Returned unit {unit_code} from '{from_name}'"
+        old_val, new_val = f"Project: {from_name}", "Returned to inventory"
+    else:
+        desc = f"Unit {unit_code} {mv.action}"
+        old_val, new_val = "—", f"Action: {mv.action}"
+
+    item_owner = unit.inventory_item.created_by_id if unit is not None else None
+    return _events(
+        [item_owner, getattr(from_project, "user_id", None), getattr(to_project, "user_id", None)],
+        mv.created_at,
+        AuditEvent.KIND_UNIT_MOVED,
+        f"unitmovement:{mv.pk}",
+        lambda pm_id: _payload(
+            actor_name,
+            actor_role,
+            desc,
+            "Inventory",
+            affected_record=f"Unit {unit_code}",
+            old_value=old_val,
+            new_value=new_val,
+            module="Inventory",
+        ),
+    )
+
+
+def attendance_events(at, names):
+    fw = at.field_worker if at.field_worker_id else None
+    worker_name = full_name(fw.first_name, fw.middle_name, fw.last_name) if fw else "Unknown"
+    project = at.project if at.project_id else None
+    proj_name = _project_name(project)
+    action_label = ATTENDANCE_ACTION_LABELS.get(
+        at.status, (at.status or "Attendance update").title()
+    )
+    status_label = ATTENDANCE_STATUS_LABELS.get(at.status, (at.status or "—").title())
+    result = "Absent" if (at.status or "").lower() == "absent" else "Success"
+    return _events(
+        [getattr(project, "user_id", None)],
+        at.updated_at,
+        AuditEvent.KIND_ATTENDANCE,
+        f"attendance:{at.pk}",
+        lambda pm_id: _payload(
+            worker_name,
+            "Field Worker",
+            f"{action_label} at '{proj_name}' ({at.attendance_date})",
+            "Attendance",
+            affected_record=f"Attendance #{at.pk} - {worker_name}",
+            old_value="Previous attendance state",
+            new_value=f"Status: {status_label} • {at.attendance_date}",
+            module="Attendance",
+            status_result=result,
+        ),
+    )
+
+
+# Models whose *creation* is an audit event, with their renderer.
+_CREATED_EVENTS = {
+    app_models.Project: project_events,
+    app_models.Phase: phase_events,
+    app_models.Subtask: subtask_created_events,
+    app_models.SubtaskFieldWorker: assignment_events,
+    app_models.FieldWorker: field_worker_events,
+    app_models.Supervisors: supervisor_events,
+    app_models.Client: client_events,
+    app_models.InventoryItem: inventory_item_events,
+    app_models.InventoryUnitMovement: unit_movement_events,
+}
+AUDITED_MODELS = (*_CREATED_EVENTS, app_models.Attendance)
+
+
+def record_saved(instance, *, created, old_status=None):
+    """
+    Record the audit events for one save. `old_status` is the Subtask's
+    status before the save (None when unknown or newly created).
+    """
+    names = PMNames()
+    events = []
+    if isinstance(instance, app_models.Attendance):
+        events = attendance_events(instance, names)
+    elif created:
+        render = _CREATED_EVENTS.get(type(instance))
+        if render is not None:
+            events = render(instance, names)
+    elif (
+        isinstance(instance, app_models.Subtask)
+        and old_status is not None
+        and old_status != instance.status
+    ):
+        events = subtask_status_events(instance, names, old_status=old_status)
+    if events:
+        AuditEvent.objects.bulk_create(events)
+    return events
+
+
+# Column order of an audit row (API items and CSV export).
+AUDIT_ROW_FIELDS = (
+    "event_id",
+    "kind",
+    "user_name",
+    "user_role",
+    "action",
+    "timestamp",
+    "category",
+    "affected_record",
+    "old_value",
+    "new_value",
+    "module",
+    "status_result",
+)
+
+
+def audit_row(event_id, kind, ts, payload):
+    """Flatten one event into the row shape `pm_audit_trail` returns."""
+    pl = payload if isinstance(payload, dict) else {}
+    return {
+        "event_id": event_id,
+        "kind": kind,
+        "user_name": pl.get("user_name") or "Unknown",
+        "user_role": pl.get("user_role") or "User",
+        "action": pl.get("action") or "",
+        "timestamp": ts.isoformat(),
+        "category": pl.get("category") or "",
+        "affected_record": pl.get("affected_record") or "—",
+        "old_value": pl.get("old_value") or "—",
+        "new_value": pl.get("new_value") or "—",
+        "module": pl.get("module") or "General",
+        "status_result": pl.get("status_result") or "Success",
+    }
+
+
+def audit_events_for(pm_user_id, *, kinds=None, since=None, until=None):
+    """
+    A PM's events, optionally narrowed to `kinds` and the half-open
+    timestamp range [since, until).
+    """
+    qs = AuditEvent.objects.filter(pm_user_id=pm_user_id)
+    if kinds:
+        qs = qs.filter(kind__in=kinds)
+    if since is not None:
+        qs = qs.filter(ts__gte=since)
+    if until is not None:
+        qs = qs.filter(ts__lt=until)
+    return qs
+
+
+def _export_queryset(pm_user_id, kinds, since, until):
+    return (
+        audit_events_for(pm_user_id, kinds=kinds, since=since, until=until)
+        .order_by("ts", "event_id")
+        .values_list("event_id", "kind", "ts", "payload")
+    )
+
+
+def audit_event_page(pm_user_id, *, kinds=None, since=None, until=None, after=None, limit=2000):
+    """
+    Up to `limit` `(event_id, kind, ts, payload)` rows oldest-first, starting
+    after the `(ts, event_id)` position `after`: one range scan of the
+    (pm_user, ts, event_id) index, no cursor left open between pages.
+    """
+    page = _export_queryset(pm_user_id, kinds, since, until)
+    if after is not None:
+        last_ts, last_id = after
+        page = page.filter(Q(ts__gt=last_ts) | Q(ts=last_ts, event_id__gt=last_id))
+    return list(page[:limit])
+
+
+def _page_position(rows):
+    return rows[-1][2], rows[-1][0]
+
+
+def iter_audit_event_pages(pm_user_id, *, kinds=None, since=None, until=None, chunk_size=2000):
+    """Yield lists of at most `chunk_size` rows, oldest-first."""
+    settings_dict = connections[router.db_for_read(AuditEvent)].settings_dict
+    if not settings_dict.get("DISABLE_SERVER_SIDE_CURSORS"):
+        page = []
+        for row in _export_queryset(pm_user_id, kinds, since, until).iterator(chunk_size=chunk_size):
+            page.append(row)
+            if len(page) >= chunk_size:
+                yield page
+                page = []
+        if page:
+            yield page
+        return
+
+    # Without server-side cursors the driver buffers the whole result set,
+    # so page through the index instead.
+    after = None
+    while True:
+        rows = audit_event_page(
+            pm_user_id, kinds=kinds, since=since, until=until, after=after, limit=chunk_size
+        )
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        after = _page_position(rows)
+
+
+async def aiter_audit_event_pages(pm_user_id, *, kinds=None, since=None, until=None, chunk_size=2000):
+    """
+    Async `iter_audit_event_pages` for ASGI streaming: each page is one
+    `audit_event_page` query run with `sync_to_async`, so only one page is
+    in memory and the shared sync thread is held for one query at a time.
+    """
+    fetch = sync_to_async(audit_event_page)
+    after = None
+    while True:
+        rows = await fetch(
+            pm_user_id, kinds=kinds, since=since, until=until, after=after, limit=chunk_size
+        )
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        after = _page_position(rows)
+
+
+def iter_audit_events(pm_user_id, *, kinds=None, since=None, until=None, chunk_size=2000):
+    """
+    Yield `(event_id, kind, ts, payload)` oldest-first without holding more
+    than `chunk_size` rows in memory.
+    """
+    for page in iter_audit_event_pages(
+        pm_user_id, kinds=kinds, since=since, until=until, chunk_size=chunk_size
+    ):
+        yield from page
+
+
+def _backfill_sources(user_id):
+    """(kind, queryset, renderer) triples mirroring the old endpoint's queries."""
+    def scoped(qs, *lookups):
+        if user_id is None:
+            return qs
+        cond = None
+        for lookup in lookups:
+            q = Q(**{lookup: user_id})
+            cond = q if cond is None else cond | q
+        return qs.filter(cond).distinct()
+
+    return [
+        (
+            AuditEvent.KIND_PROJECT_CREATED,
+            scoped(app_models.Project.objects.all(), "user_id"),
+            project_events,
+        ),
+        (
+            AuditEvent.KIND_PHASE_CREATED,
+            scoped(app_models.Phase.objects.select_related("project"), "project__user_id"),
+            phase_events,
+        ),
+        (
+            AuditEvent.KIND_TASK_CREATED,
+            scoped(
+                app_models.Subtask.objects.select_related("phase__project"),
+                "phase__project__user_id",
+            ),
+            subtask_created_events,
+        ),
+        (
+            AuditEvent.KIND_TASK_STATUS,
+            # Only the latest status is known: one event per subtask that
+            # was touched after creation, as the old endpoint showed.
+            scoped(
+                app_models.Subtask.objects.select_related(
+                    "phase__project", "phase__project__supervisor"
+                ),
+                "phase__project__user_id",
+            ),
+            _backfilled_status_events,
+        ),
+        (
+            AuditEvent.KIND_TASK_ASSIGNED,
+            scoped(
+                app_models.SubtaskFieldWorker.objects.select_related(
+                    "subtask__phase__project", "field_worker"
+                ),
+                "subtask__phase__project__user_id",
+            ),
+            assignment_events,
+        ),
+        (
+            AuditEvent.KIND_WORKER_ADDED,
+            scoped(app_models.FieldWorker.objects.all(), "user_id"),
+            field_worker_events,
+        ),
+        (
+            AuditEvent.KIND_SUPERVISOR_ADDED,
+            scoped(
+                app_models.Supervisors.objects.select_related("project_id"),
+                "created_by_id",
+                "project_id__user_id",
+            ),
+            supervisor_events,
+        ),
+        (
+            AuditEvent.KIND_CLIENT_ADDED,
+            scoped(
+                app_models.Client.objects.select_related("project_id"),
+                "created_by_id",
+                "project_id__user_id",
+            ),
+            client_events,
+        ),
+        (
+            AuditEvent.KIND_INVENTORY_ITEM_ADDED,
+            scoped(app_models.InventoryItem.objects.all(), "created_by_id"),
+            inventory_item_events,
+        ),
+        (
+            AuditEvent.KIND_UNIT_MOVED,
+            scoped(
+                app_models.InventoryUnitMovement.objects.select_related(
+                    "unit__inventory_item", "moved_by", "from_project", "to_project"
+                ),
+                "unit__inventory_item__created_by_id",
+                "from_project__user_id",
+                "to_project__user_id",
+            ),
+            unit_movement_events,
+        ),
+        (
+            AuditEvent.KIND_ATTENDANCE,
+            scoped(
+                app_models.Attendance.objects.select_related("field_worker", "project"),
+                "project__user_id",
+            ),
+            attendance_events,
+        ),
+    ]
+
+
+def _backfilled_status_events(subtask, names):
+    if not (subtask.created_at and subtask.updated_at):
+        return []
+    if (subtask.updated_at - subtask.created_at).total_seconds() < 2:
+        return []
+    return subtask_status_events(subtask, names)
+
+
+BACKFILL_BATCH_SIZE = 500
+
+
+@transaction.atomic
+def backfill_audit_events(*, user_id=None, dry_run=False):
+    """
+    Synthesize events for existing rows (optionally only PM `user_id`).
+    (kind, entity, pm) triples that already have an event are skipped, so
+    re-running is safe. One kind at a time: only that kind's existing keys
+    are held, and events are written every BACKFILL_BATCH_SIZE. Returns
+    `{kind: events_written}`.
+    """
+    names = PMNames()
+    written = {}
+    for kind, queryset, render in _backfill_sources(user_id):
+        existing_qs = AuditEvent.objects.filter(kind=kind)
+        if user_id is not None:
+            existing_qs = existing_qs.filter(pm_user_id=user_id)
+        existing = set(existing_qs.values_list("entity", "pm_user_id").iterator(chunk_size=2000))
+
+        count = 0
+        batch = []
+        for instance in queryset.iterator(chunk_size=BACKFILL_BATCH_SIZE):
+            for event in render(instance, names):
+                if user_id is not None and event.pm_user_id != user_id:
+                    continue
+                key = (event.entity, event.pm_user_id)
+                if key in existing:
+                    continue
+                existing.add(key)
+                count += 1
+                if dry_run:
+                    continue
+                batch.append(event)
+                if len(batch) >= BACKFILL_BATCH_SIZE:
+                    AuditEvent.objects.bulk_create(batch)
+                    batch = []
+        if batch:
+            AuditEvent.objects.bulk_create(batch)
+        written[kind] = count
+    return written
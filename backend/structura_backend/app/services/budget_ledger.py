@@ -0,0 +1,275 @@
+"""
+Project budget ledger — an append-only trail of every change to a
+project's budget figures, with the running totals cached on the project
+row so reads never have to aggregate over phases.
+
+Kinds and the Project column each one moves:
+    budget              -> (none; `Project.budget` is written directly)
+    allocation          -> allocated_budget_total
+    material_usage      -> used_materials_budget
+    material_reversal   -> used_materials_budget
+    material_adjustment -> used_materials_budget
+    payroll             -> payroll_used_budget
+
+How entries get posted:
+    - Phase budget fields (`allocated_budget`, `used_budget`) are diffed
+      on every Phase save/delete by `app.signals`, against the snapshot
+      taken in `Phase.from_db`. Callers that know *why* the figure moved
+      (the material usage service) set `phase._ledger_context` first so
+      the entry carries its kind and InventoryUsage; everything else
+      (admin edits, serializer writes, allocate-budget) is posted as an
+      allocation / material_adjustment.
+    - Project budget changes are diffed the same way on Project save.
+    - Payroll deltas go through `post_payroll_delta`.
+
+Phase/Project saves run inside `transaction.atomic` (see
+`SubtaskCounterFieldsMixin.save`), so the row write, the ledger insert
+and the running-total UPDATE commit or roll back together.
+
+`budget_as_of(project, as_of)` answers historic "what did the budget look
+like on date X" questions from the ledger alone.
+"""
+
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from app import models as app_models
+from app.models import ProjectBudgetLedgerEntry as Entry
+
+
+_TOTAL_COLUMN_BY_KIND = {
+    Entry.KIND_ALLOCATION: "allocated_budget_total",
+    Entry.KIND_MATERIAL_USAGE: "used_materials_budget",
+    Entry.KIND_MATERIAL_REVERSAL: "used_materials_budget",
+    Entry.KIND_MATERIAL_ADJUSTMENT: "used_materials_budget",
+    Entry.KIND_PAYROLL: "payroll_used_budget",
+}
+
+
+def _as_decimal(value) -> Decimal:
+    if value is None:
+        return Decimal("0")
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+@transaction.atomic
+def post_entry(
+    *, project_id, kind, amount, phase_id=None, usage=None, note="", move_total=True
+):
+    """
+    Append one ledger entry and move the matching running total on the
+    project row (unless `move_total=False`, for opening balances the row
+    already holds). Zero amounts are not recorded. Returns the entry or None.
+    """
+    amount = _as_decimal(amount)
+    if not project_id or amount == 0:
+        return None
+    entry = Entry.objects.create(
+        project_id=project_id,
+        phase_id=phase_id,
+        usage=usage,
+        kind=kind,
+        amount=amount,
+        note=(note or "")[:255],
+    )
+    column = _TOTAL_COLUMN_BY_KIND.get(kind)
+    if column and move_total:
+        app_models.Project.objects.filter(pk=project_id).update(
+            **{column: F(column) + amount}
+        )
+    return entry
+
+
+def _forget_project_totals(phase):
+    # The totals just moved under the phase's loaded project, if any.
+    if app_models.Phase.project.is_cached(phase):
+        phase.project._budget_totals = None
+
+
+def record_phase_saved(phase, *, created):
+    """Post ledger entries for whatever budget figures this save changed."""
+    _forget_project_totals(phase)
+    context = getattr(phase, "_ledger_context", None) or {}
+    phase._ledger_context = None
+    old_state = (
+        (None, Decimal("0"), Decimal("0"))
+        if created
+        else getattr(phase, "_ledger_budget_state", None)
+    )
+    new_state = (
+        phase.project_id,
+        _as_decimal(phase.allocated_budget),
+        _as_decimal(phase.used_budget),
+    )
+    if old_state is None or old_state[1] is None or old_state[2] is None:
+        # Hand-built instance: we can't diff, so true the totals up instead.
+        resync_project_totals(project_id=phase.project_id)
+    else:
+        old_project_id, old_alloc, old_used = old_state
+        old_alloc, old_used = _as_decimal(old_alloc), _as_decimal(old_used)
+        if old_project_id and old_project_id != phase.project_id:
+            _post_phase_figures(
+                old_project_id, phase.pk, -old_alloc, -old_used, note="Phase moved out"
+            )
+            old_alloc = old_used = Decimal("0")
+        _post_phase_figures(
+            phase.project_id,
+            phase.pk,
+            new_state[1] - old_alloc,
+            new_state[2] - old_used,
+            kind=context.get("kind"),
+            usage=context.get("usage"),
+        )
+    phase._ledger_budget_state = new_state
+
+
+def record_phase_deleted(phase):
+    _forget_project_totals(phase)
+    project_id, alloc, used = getattr(
+        phase,
+        "_ledger_budget_state",
+        (phase.project_id, phase.allocated_budget, phase.used_budget),
+    )
+    _post_phase_figures(
+        project_id,
+        None,
+        -_as_decimal(alloc),
+        -_as_decimal(used),
+        note=f"Phase {phase.pk} deleted",
+    )
+
+
+def _post_phase_figures(
+    project_id, phase_id, alloc_delta, used_delta, *, kind=None, usage=None, note=""
+):
+    post_entry(
+        project_id=project_id,
+        kind=Entry.KIND_ALLOCATION,
+        amount=alloc_delta,
+        phase_id=phase_id,
+        note=note,
+    )
+    post_entry(
+        project_id=project_id,
+        kind=kind or Entry.KIND_MATERIAL_ADJUSTMENT,
+        amount=used_delta,
+        phase_id=phase_id,
+        usage=usage,
+        note=note,
+    )
+
+
+def record_project_saved(project, *, created):
+    old_budget = Decimal("0") if created else getattr(project, "_ledger_budget", None)
+    if old_budget is not None:
+        post_entry(
+            project_id=project.pk,
+            kind=Entry.KIND_BUDGET,
+            amount=_as_decimal(project.budget) - _as_decimal(old_budget),
+        )
+    if created:
+        post_entry(
+            project_id=project.pk,
+            kind=Entry.KIND_PAYROLL,
+            amount=project.payroll_used_budget,
+            note="Opening balance",
+            move_total=False,
+        )
+    project._ledger_budget = project.budget
+
+
+@transaction.atomic
+def post_payroll_delta(*, project, delta, note=""):
+    """
+    Apply a payroll spend delta, clamped so payroll never goes below zero.
+    Posts the *effective* delta and refreshes `project.payroll_used_budget`.
+    """
+    current = (
+        app_models.Project.objects.select_for_update()
+        .values_list("payroll_used_budget", flat=True)
+        .get(pk=project.pk)
+    ) or Decimal("0")
+    next_value = current + _as_decimal(delta)
+    if next_value < Decimal("0"):
+        next_value = Decimal("0")
+    next_value = next_value.quantize(Decimal("0.01"))
+    post_entry(
+        project_id=project.pk,
+        kind=Entry.KIND_PAYROLL,
+        amount=next_value - current,
+        note=note,
+    )
+    project.set_stored_value("payroll_used_budget", next_value)
+    return next_value
+
+
+@transaction.atomic
+def resync_project_totals(*, project_id):
+    """
+    Post material_adjustment / allocation entries so the running totals
+    match the phase rows again. Used when a change could not be diffed.
+    """
+    if not project_id:
+        return
+    sums = app_models.Phase.objects.filter(project_id=project_id).aggregate(
+        alloc=Sum("allocated_budget"), used=Sum("used_budget")
+    )
+    row = (
+        app_models.Project.objects.select_for_update()
+        .filter(pk=project_id)
+        .values("allocated_budget_total", "used_materials_budget")
+        .first()
+    )
+    if row is None:
+        return
+    post_entry(
+        project_id=project_id,
+        kind=Entry.KIND_ALLOCATION,
+        amount=_as_decimal(sums["alloc"]) - _as_decimal(row["allocated_budget_total"]),
+        note="Resync",
+    )
+    post_entry(
+        project_id=project_id,
+        kind=Entry.KIND_MATERIAL_ADJUSTMENT,
+        amount=_as_decimal(sums["used"]) - _as_decimal(row["used_materials_budget"]),
+        note="Resync",
+    )
+
+
+def budget_as_of(project, as_of):
+    """
+    Budget figures for `project` at the end of `as_of` (a date), replayed
+    from the ledger. Same keys as `project_budget_summary` minus `phases`.
+    """
+    if isinstance(as_of, datetime):
+        as_of = as_of.date()
+    totals = {
+        row["kind"]: _as_decimal(row["total"])
+        for row in (
+            Entry.objects.filter(project_id=project.pk, created_at__date__lte=as_of)
+            .order_by()
+            .values("kind")
+            .annotate(total=Sum("amount"))
+        )
+    }
+    materials = sum(
+        (totals.get(kind, Decimal("0")) for kind in Entry.MATERIAL_KINDS),
+        Decimal("0"),
+    )
+    payroll = totals.get(Entry.KIND_PAYROLL, Decimal("0"))
+    budget = totals.get(Entry.KIND_BUDGET, Decimal("0"))
+    return {
+        "project_id": project.pk,
+        "as_of": as_of.isoformat(),
+        "total_budget": budget,
+        "total_allocated": totals.get(Entry.KIND_ALLOCATION, Decimal("0")),
+        "total_used_materials": materials,
+        "total_used_payroll": payroll,
+        "total_used": materials + payroll,
+        "remaining_budget": budget - materials - payroll,
+    }
@@ -0,0 +1,184 @@
+"""
+PM dashboard cache — the `pm_dashboard_summary` payload cached per PM
+`user_id`, keyed under a generation counter that writes bump.
+
+Keys (all in the default Django cache, a DatabaseCache shared by every
+web worker, so a bump made by one worker is seen by all; a hit costs one
+cache-table read instead of the dashboard's queries):
+    pm_dashboard:gen:<user_id>                     current generation
+    pm_dashboard:payload:<user_id>:<gen>:<date>    cached payload
+    pm_dashboard:metrics:<hit|miss|bypass>         running counters, only
+                                                   with PM_DASHBOARD_CACHE_METRICS
+
+How invalidation works:
+    - `app.signals` calls `bump_for_instance` on every save/delete of a
+      Project, Phase, Subtask, SubtaskFieldWorker, FieldWorker, Supervisors
+      or PM InAppNotification. The owning PM's generation is incremented,
+      so the next dashboard read misses and rebuilds; stale payloads are
+      never read again and simply age out.
+    - The bump runs immediately and again on commit, so a dashboard read
+      that raced the open transaction can't keep an uncommitted-state
+      payload alive under the new generation.
+    - The local date is part of the payload key because the 7-day and
+      monthly series roll over at midnight even without writes.
+    - Bulk status updates (`app.services.project_status`) bump explicitly;
+      `PAYLOAD_TIMEOUT` bounds the damage from any other write that
+      bypasses signals (`QuerySet.update()`, raw SQL).
+
+The hit/miss counters cost a cache-table write (a read-modify-write, not
+atomic on DatabaseCache) on every dashboard read, so they are off unless
+PM_DASHBOARD_CACHE_METRICS is set; otherwise each lookup is only logged at
+debug level.
+
+`?fresh=1` on the endpoint rebuilds the payload and stores it under the
+current generation, so the next normal read is a hit again.
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from app import models as app_models
+
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_TIMEOUT = 300
+
+STATE_HIT = "hit"
+STATE_MISS = "miss"
+STATE_BYPASS = "bypass"
+METRIC_STATES = (STATE_HIT, STATE_MISS, STATE_BYPASS)
+
+
+def _generation_key(user_id):
+    return f"pm_dashboard:gen:{user_id}"
+
+
+def _payload_key(user_id, generation):
+    return f"pm_dashboard:payload:{user_id}:{generation}:{timezone.localdate().isoformat()}"
+
+
+def _metric_key(state):
+    return f"pm_dashboard:metrics:{state}"
+
+
+def _incr(key):
+    """Increment a counter key, creating it first if it's missing/evicted."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Seed with the clock rather than 0 so a counter that was evicted
+        # never repeats a generation an old payload is still stored under.
+        cache.add(key, time.time_ns(), timeout=None)
+        return cache.incr(key)
+
+
+def get_generation(user_id):
+    key = _generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(*user_ids):
+    """Invalidate the cached dashboard of every PM in `user_ids`."""
+    for user_id in {uid for uid in user_ids if uid}:
+        _incr(_generation_key(user_id))
+
+
+def metrics_enabled():
+    return bool(getattr(settings, "PM_DASHBOARD_CACHE_METRICS", False))
+
+
+def _record(state):
+    if not metrics_enabled():
+        return
+    try:
+        cache.incr(_metric_key(state))
+    except ValueError:
+        cache.add(_metric_key(state), 0, timeout=None)
+        cache.incr(_metric_key(state))
+
+
+def get_dashboard_payload(user_id, builder, *, fresh=False):
+    """
+    Return `(payload, state)` for `user_id`, calling `builder()` only when
+    the current generation has nothing cached or `fresh=True`.
+    `state` is one of "hit", "miss", "bypass".
+    """
+    key = _payload_key(user_id, get_generation(user_id))
+    if not fresh:
+        payload = cache.get(key)
+        if payload is not None:
+            _record(STATE_HIT)
+            logger.debug("pm_dashboard cache hit for user_id=%s", user_id)
+            return payload, STATE_HIT
+    state = STATE_BYPASS if fresh else STATE_MISS
+    payload = builder()
+    cache.set(key, payload, PAYLOAD_TIMEOUT)
+    _record(state)
+    logger.debug("pm_dashboard cache %s for user_id=%s", state, user_id)
+    return payload, state
+
+
+def dashboard_cache_metrics():
+    """
+    Running hit/miss/bypass counts plus the hit ratio over hit+miss; all
+    zero (and `enabled` False) unless PM_DASHBOARD_CACHE_METRICS is set.
+    """
+    values = cache.get_many([_metric_key(state) for state in METRIC_STATES])
+    counts = {state: int(values.get(_metric_key(state)) or 0) for state in METRIC_STATES}
+    lookups = counts[STATE_HIT] + counts[STATE_MISS]
+    counts["hit_ratio"] = (counts[STATE_HIT] / lookups) if lookups else 0.0
+    counts["enabled"] = metrics_enabled()
+    return counts
+
+
+def reset_dashboard_cache_metrics():
+    cache.delete_many([_metric_key(state) for state in METRIC_STATES])
+
+
+def _pm_ids_for_projects(**filters):
+    return list(
+        app_models.Project.objects.filter(**filters)
+        .exclude(user_id__isnull=True)
+        .values_list("user_id", flat=True)
+        .distinct()
+    )
+
+
+def pm_user_ids_for(instance):
+    """Resolve the PM user ids whose dashboard `instance` appears on."""
+    if isinstance(instance, app_models.Project):
+        return [instance.user_id]
+    if isinstance(instance, app_models.Phase):
+        return _pm_ids_for_projects(pk=instance.project_id)
+    if isinstance(instance, app_models.Subtask):
+        return _pm_ids_for_projects(phases__phase_id=instance.phase_id)
+    if isinstance(instance, app_models.SubtaskFieldWorker):
+        return _pm_ids_for_projects(phases__subtasks__subtask_id=instance.subtask_id)
+    if isinstance(instance, (app_models.FieldWorker, app_models.Supervisors)):
+        project_id = instance.project_id_id
+        return _pm_ids_for_projects(pk=project_id) if project_id else []
+    if isinstance(instance, app_models.InAppNotification):
+        if instance.recipient_kind == app_models.InAppNotification.KIND_PM:
+            return [instance.recipient_user_id]
+        return []
+    return []
+
+
+def bump_for_instance(instance, *, extra_user_ids=()):
+    """Bump the generation of every PM affected by a write to `instance`."""
+    user_ids = [*pm_user_ids_for(instance), *extra_user_ids]
+    user_ids = [uid for uid in user_ids if uid]
+    if not user_ids:
+        return
+    bump_generation(*user_ids)
+    transaction.on_commit(lambda: bump_generation(*user_ids))
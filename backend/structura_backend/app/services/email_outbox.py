@@ -0,0 +1,277 @@
+"""
+Durable outbox for outgoing email.
+
+`rest_api.email_utils` used to start a daemon thread per email and open
+a fresh SMTP (or SendGrid) connection in it: a restart lost whatever was
+in flight, a failure was only logged, and a burst of invitations or
+phase updates meant a burst of threads and TLS handshakes.
+
+Now `enqueue()` writes an `EmailOutbox` row, inside the caller's
+transaction, so an email exists exactly when the change that caused it
+committed. `manage.py run_email_worker` delivers them:
+
+    claim       up to EMAIL_OUTBOX_BATCH_SIZE due rows with
+                SELECT ... FOR UPDATE SKIP LOCKED, marked `sending`, so
+                any number of workers can run without sending twice.
+    send        the whole batch over one open SMTP connection, or one
+                pooled keep-alive HTTP session for SendGrid; both stay
+                open across batches while there is work.
+    record      per message: `sent` (with the provider's answer), back
+                to `pending` with exponential backoff and jitter, or
+                `failed` once EMAIL_OUTBOX_MAX_ATTEMPTS are used up or
+                the provider rejected it for good. `last_error` keeps
+                the reason.
+
+A row left `sending` by a worker that died is claimed again after
+EMAIL_OUTBOX_CLAIM_TIMEOUT_SECONDS, so delivery is at-least-once.
+As before, a message whose From (a PM's address) is refused is retried
+at once from DEFAULT_FROM_EMAIL.
+
+`start.sh` runs the worker next to the web server (set RUN_EMAIL_WORKER=0
+when it runs elsewhere). Where no worker runs at all, such as
+`runserver`, EMAIL_OUTBOX_DELIVER_INLINE (on by default with DEBUG) sends
+each message right after its transaction commits, through the same
+claim, so mail is never left queued.
+"""
+
+import logging
+import random
+import smtplib
+from datetime import timedelta
+from email.utils import parseaddr
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from app import models as app_models
+
+
+logger = logging.getLogger(__name__)
+
+SENDGRID_URL = "https://api.sendgrid.com/v3/mail/send"
+
+
+class PermanentEmailError(Exception):
+    """The provider rejected the message; retrying can't help."""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def batch_size():
+    return _setting("EMAIL_OUTBOX_BATCH_SIZE", 50)
+
+
+def max_attempts():
+    return _setting("EMAIL_OUTBOX_MAX_ATTEMPTS", 6)
+
+
+def claim_timeout():
+    return timedelta(seconds=_setting("EMAIL_OUTBOX_CLAIM_TIMEOUT_SECONDS", 600))
+
+
+def backoff_delay(attempts):
+    """Seconds before retry number `attempts`: doubling, capped, with jitter."""
+    base = _setting("EMAIL_OUTBOX_RETRY_BASE_SECONDS", 30)
+    cap = _setting("EMAIL_OUTBOX_RETRY_MAX_SECONDS", 3600)
+    delay = min(cap, base * 2 ** max(attempts - 1, 0))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def enqueue(*, to_email, subject, body, from_email="", fallback_from_email="", sender_header="", reply_to=""):
+    return app_models.EmailOutbox.objects.create(
+        to_email=to_email,
+        subject=subject,
+        body=body,
+        from_email=from_email or "",
+        fallback_from_email=fallback_from_email or "",
+        sender_header=sender_header or "",
+        reply_to=reply_to or "",
+    )
+
+
+def claim_batch(limit=None, pks=None):
+    """Mark up to `limit` due messages (only `pks`, when given) `sending` and return them."""
+    Outbox = app_models.EmailOutbox
+    now = timezone.now()
+    due = Q(status=Outbox.STATUS_PENDING, next_attempt_at__lte=now) | Q(
+        status=Outbox.STATUS_SENDING, claimed_at__lt=now - claim_timeout()
+    )
+    if pks is not None:
+        due &= Q(pk__in=pks)
+    with transaction.atomic():
+        rows = list(
+            Outbox.objects.select_for_update(skip_locked=True)
+            .filter(due)
+            .order_by("next_attempt_at", "email_id")[: limit or batch_size()]
+        )
+        if rows:
+            Outbox.objects.filter(pk__in=[row.pk for row in rows]).update(
+                status=Outbox.STATUS_SENDING, claimed_at=now, attempts=F("attempts") + 1
+            )
+    for row in rows:
+        row.status = Outbox.STATUS_SENDING
+        row.claimed_at = now
+        row.attempts += 1
+    return rows
+
+
+class SmtpTransport:
+    """Sends through Django's email backend over one reused connection."""
+
+    name = "smtp"
+
+    def __init__(self, connection=None):
+        self.connection = connection or get_connection(fail_silently=False)
+
+    def _send(self, message):
+        # No-op when already open; an open connection is left open by send().
+        self.connection.open()
+        sent = message.send(fail_silently=False)
+        return f"accepted={sent}"
+
+    def send(self, row, from_email, sender):
+        message = EmailMessage(
+            subject=row.subject,
+            body=row.body,
+            from_email=from_email or None,
+            to=[row.to_email],
+            reply_to=[row.reply_to] if row.reply_to else None,
+            headers={"Sender": sender} if sender else None,
+            connection=self.connection,
+        )
+        try:
+            return self._send(message)
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped the idle connection: reconnect once.
+            self.connection.close()
+            return self._send(message)
+        except smtplib.SMTPRecipientsRefused as exc:
+            raise PermanentEmailError(f"Recipient refused: {exc.recipients}") from exc
+
+    def close(self):
+        self.connection.close()
+
+
+class SendGridTransport:
+    """SendGrid v3 API over one keep-alive `requests.Session`."""
+
+    name = "sendgrid"
+
+    def __init__(self, api_key, from_override="", session=None, timeout=20):
+        self.api_key = api_key
+        self.from_override = from_override
+        self.timeout = timeout
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        session.headers.update({"Authorization": f"Bearer {api_key}"})
+        self.session = session
+
+    def payload(self, row, from_email):
+        from_name, from_addr = parseaddr(self.from_override or from_email or settings.DEFAULT_FROM_EMAIL or "")
+        if not from_addr:
+            raise PermanentEmailError("SendGrid from_email is not configured")
+        payload = {
+            "personalizations": [{"to": [{"email": row.to_email}], "subject": row.subject}],
+            "from": {"email": from_addr},
+            "content": [{"type": "text/plain", "value": row.body}],
+        }
+        if from_name:
+            payload["from"]["name"] = from_name
+        if row.reply_to:
+            payload["reply_to"] = {"email": row.reply_to}
+        return payload
+
+    def send(self, row, from_email, sender):
+        response = self.session.post(SENDGRID_URL, json=self.payload(row, from_email), timeout=self.timeout)
+        if response.status_code < 300:
+            return f"sendgrid {response.status_code}"
+        detail = f"SendGrid {response.status_code}: {response.text[:500]}"
+        if response.status_code == 429 or response.status_code >= 500:
+            raise RuntimeError(detail)
+        raise PermanentEmailError(detail)
+
+    def close(self):
+        self.session.close()
+
+
+def get_transport():
+    api_key = (_setting("SENDGRID_API_KEY", "") or "").strip()
+    if api_key:
+        return SendGridTransport(api_key, (_setting("SENDGRID_FROM_EMAIL", "") or "").strip())
+    if _setting("EMAIL_BACKEND", "").endswith("console.EmailBackend"):
+        logger.warning("Email backend is console; no real email will be delivered")
+    return SmtpTransport()
+
+
+def _send_one(transport, row):
+    try:
+        return transport.send(row, row.from_email, row.sender_header)
+    except Exception as exc:  # noqa: BLE001
+        fallback = row.fallback_from_email
+        if not fallback or fallback == row.from_email:
+            raise
+        logger.warning("Email %s refused from %r (%s); retrying from %r", row.pk, row.from_email, exc, fallback)
+        return transport.send(row, fallback, "")
+
+
+def deliver(rows, transport):
+    """Send claimed `rows` and record each outcome; returns the rows."""
+    Outbox = app_models.EmailOutbox
+    for row in rows:
+        try:
+            response = _send_one(transport, row)
+        except Exception as exc:  # noqa: BLE001
+            permanent = isinstance(exc, PermanentEmailError) or row.attempts >= max_attempts()
+            row.last_error = f"{type(exc).__name__}: {exc}"[:2000]
+            if permanent:
+                row.status = Outbox.STATUS_FAILED
+            else:
+                row.status = Outbox.STATUS_PENDING
+                row.next_attempt_at = timezone.now() + timedelta(seconds=backoff_delay(row.attempts))
+            logger.warning(
+                "Email %s to %s failed (attempt %s, %s): %s",
+                row.pk, row.to_email, row.attempts, row.status, row.last_error,
+            )
+            row.save(update_fields=["status", "next_attempt_at", "last_error"])
+            continue
+        row.status = Outbox.STATUS_SENT
+        row.sent_at = timezone.now()
+        row.provider_response = str(response or "")[:255]
+        row.last_error = ""
+        row.save(update_fields=["status", "sent_at", "provider_response", "last_error"])
+    return rows
+
+
+def process_batch(transport, limit=None):
+    """Claim and deliver one batch; returns the processed rows."""
+    rows = claim_batch(limit)
+    if rows:
+        deliver(rows, transport)
+    return rows
+
+
+def deliver_now(pk):
+    """
+    Send one queued message from the current process (EMAIL_OUTBOX_DELIVER_INLINE).
+    Claimed like any batch, so a running worker never sends it too; a
+    failure leaves it queued for retry.
+    """
+    try:
+        rows = claim_batch(pks=[pk])
+        if not rows:
+            return
+        transport = get_transport()
+        try:
+            deliver(rows, transport)
+        finally:
+            transport.close()
+    except Exception:  # noqa: BLE001
+        logger.exception("Inline delivery of email %s failed", pk)
@@ -0,0 +1,252 @@
+"""
+Fixed-size derivatives of uploaded photos.
+
+Photos used to be served only as the uploaded original, so list screens
+downloaded multi-MB phone pictures to draw 40px avatars. Every photo now
+gets, once, when it is uploaded:
+
+    avatar   128x128 center crop
+    card     longest side 480
+    full     longest side 1600 (never upscaled)
+
+each as WebP and as JPEG (for clients without WebP), stored next to the
+media as `derivatives/<original path minus extension>/<size>.<hash>.<ext>`.
+
+The paths are recorded on the row in a manifest JSON field
+(`photo_variants`, `project_image_variants` on Project):
+
+    {"source": "<original name>", "sizes": {"avatar": {"webp": ..., "jpeg": ...}, ...}}
+
+`source` ties the manifest to the file it was built from; serializers
+ignore a manifest whose source isn't the current photo, so a replaced
+photo never shows the old one's thumbnails. A file Pillow can't open gets
+`{"source": name, "sizes": {}}` so it isn't retried on every save.
+
+`app.signals` calls `schedule_for` on every save of a model in TARGETS;
+once the transaction commits the build (six encodes) is handed to a small
+thread pool of PHOTO_DERIVATIVE_THREADS, so the request that saved the
+photo doesn't wait for it (0 builds inline, as tests do). The job reloads
+the row, so a photo replaced again in the meantime is built only once.
+Jobs are in memory: one lost to a restart is picked up by
+`manage.py backfill_photo_variants`, which also builds them for media
+uploaded before this existed.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+from app import models as app_models
+from app.image_verification import load_detection_image
+
+
+logger = logging.getLogger(__name__)
+
+# name -> (longest side, square crop)
+SIZES = {
+    "avatar": (128, True),
+    "card": (480, False),
+    "full": (1600, False),
+}
+
+# extension -> (Pillow format, save options)
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+# model -> (source attribute, manifest attribute)
+TARGETS = {
+    app_models.Supervisors: ("photo", "photo_variants"),
+    app_models.FieldWorker: ("photo", "photo_variants"),
+    app_models.Client: ("photo", "photo_variants"),
+    app_models.SubtaskPhoto: ("photo", "photo_variants"),
+    app_models.InventoryItem: ("photo", "photo_variants"),
+    app_models.Project: ("project_image", "project_image_variants"),
+}
+
+
+def derivative_name(source_name, size, ext, data):
+    """
+    Names carry a hash of the derivative's bytes, so a derivative URL never
+    changes content and can be cached forever (see rest_api.media).
+    """
+    stem = os.path.splitext(source_name)[0].lstrip("/")
+    tag = hashlib.sha256(data).hexdigest()[:12]
+    return f"derivatives/{stem}/{size}.{tag}.{ext}"
+
+
+def render_derivatives(image_bytes):
+    """{size: {ext: encoded bytes}} for one original."""
+    largest = max(side for side, _ in SIZES.values())
+    base = load_detection_image(image_bytes, max_side=largest)
+    rendered = {}
+    for size, (side, crop) in SIZES.items():
+        if crop:
+            img = ImageOps.fit(base, (side, side), method=Image.Resampling.LANCZOS)
+        else:
+            img = base.copy()
+            img.thumbnail((side, side), Image.Resampling.LANCZOS)
+        rendered[size] = {}
+        for ext, (fmt, options) in FORMATS.items():
+            buffer = io.BytesIO()
+            img.save(buffer, fmt, **options)
+            rendered[size][ext] = buffer.getvalue()
+    return rendered
+
+
+def _source(instance):
+    """(storage, name) of the instance's original, name '' when unset."""
+    source_attr, _ = TARGETS[type(instance)]
+    value = getattr(instance, source_attr, None)
+    if hasattr(value, "storage"):
+        return value.storage, value.name or ""
+    # Project.project_image is a plain path under MEDIA_ROOT.
+    return default_storage, value or ""
+
+
+def _manifest(instance):
+    _, manifest_attr = TARGETS[type(instance)]
+    return getattr(instance, manifest_attr, None) or {}
+
+
+def _delete_files(storage, manifest):
+    for formats in (manifest.get("sizes") or {}).values():
+        for name in formats.values():
+            try:
+                storage.delete(name)
+            except Exception:  # noqa: BLE001
+                logger.warning("Could not delete derivative %s", name, exc_info=True)
+
+
+def discard_derivatives(instance):
+    """
+    Delete the files of `instance`'s manifest and clear it (not saved). For
+    callers that overwrite the original under the same name, where the
+    rebuild can't tell the old derivatives apart from the new source.
+    """
+    _, manifest_attr = TARGETS[type(instance)]
+    storage, _ = _source(instance)
+    _delete_files(storage, _manifest(instance))
+    setattr(instance, manifest_attr, {})
+
+
+def _store_manifest(instance, manifest):
+    _, manifest_attr = TARGETS[type(instance)]
+    setattr(instance, manifest_attr, manifest)
+    # .update() so the save signals (and this module) don't run again.
+    type(instance)._default_manager.filter(pk=instance.pk).update(**{manifest_attr: manifest})
+
+
+def is_current(instance):
+    _, name = _source(instance)
+    return _manifest(instance).get("source", "") == name
+
+
+def generate_for(instance):
+    """Build, store and record the derivatives of `instance`'s current photo."""
+    storage, name = _source(instance)
+    previous = _manifest(instance)
+    if previous:
+        _delete_files(storage, previous)
+    if not name:
+        if previous:
+            _store_manifest(instance, {})
+        return {}
+
+    manifest = {"source": name, "sizes": {}}
+    try:
+        with storage.open(name, "rb") as fh:
+            rendered = render_derivatives(fh.read())
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("No derivatives for %s: not a readable image (%s)", name, exc)
+        _store_manifest(instance, manifest)
+        return manifest
+
+    for size, formats in rendered.items():
+        manifest["sizes"][size] = {}
+        for ext, data in formats.items():
+            target = derivative_name(name, size, ext, data)
+            # Same name means same bytes: reuse it rather than get a suffix.
+            if not storage.exists(target):
+                target = storage.save(target, ContentFile(data))
+            manifest["sizes"][size][ext] = target
+    _store_manifest(instance, manifest)
+    return manifest
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """The shared build pool, or None to build inline (PHOTO_DERIVATIVE_THREADS = 0)."""
+    global _executor
+    threads = getattr(settings, "PHOTO_DERIVATIVE_THREADS", 1)
+    if threads <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="photo-derivatives")
+        return _executor
+
+
+def _build(model, pk):
+    try:
+        instance = model._default_manager.filter(pk=pk).first()
+        if instance is not None and not is_current(instance):
+            generate_for(instance)
+    except Exception:  # noqa: BLE001
+        logger.exception("Building photo derivatives failed for %s %s", model.__name__, pk)
+
+
+def _build_in_pool(model, pk):
+    try:
+        _build(model, pk)
+    finally:
+        # Pool threads outlive requests; don't leave their connections open.
+        connections.close_all()
+
+
+def schedule_for(instance):
+    """post_save hook: (re)build derivatives after commit if the photo changed."""
+    if is_current(instance):
+        return
+    model, pk = type(instance), instance.pk
+
+    def _run():
+        executor = _get_executor()
+        if executor is None:
+            _build(model, pk)
+        else:
+            executor.submit(_build_in_pool, model, pk)
+
+    transaction.on_commit(_run)
+
+
+def variant_urls(manifest, source_name, build_url=None):
+    """
+    {size: {ext: url}} from a manifest, or None when it doesn't describe
+    `source_name` (not built yet, photo replaced, or not an image).
+    """
+    if not source_name or not manifest or manifest.get("source") != source_name:
+        return None
+    sizes = manifest.get("sizes") or {}
+    if not sizes:
+        return None
+    urls = {}
+    for size, formats in sizes.items():
+        urls[size] = {}
+        for ext, name in formats.items():
+            url = default_storage.url(name)
+            urls[size][ext] = build_url(url) if build_url else url
+    return urls
@@ -0,0 +1,220 @@
+"""
+In-app inbox service — per-recipient unread counters and the `?since=`
+delta feed used by the PM and supervisor inbox endpoints.
+
+Unread counters (`InboxUnreadCounter`):
+    - `app.signals` calls `record_notification_saved` / `_deleted` on every
+      InAppNotification write. The change in "counts as unread" (unread,
+      and for PMs not one of `PM_HIDDEN_KINDS`) is diffed against the
+      `_counted_unread` snapshot from `from_db` and applied with F().
+    - A recipient without a counter row is seeded with one COUNT the first
+      time it is read or written, so no backfill is needed and a counter
+      can be repaired by deleting its row (or `rebuild_unread_counters`).
+    - The mark-read endpoints go through `mark_read`, a conditional
+      `UPDATE ... WHERE read_at IS NULL`: of two concurrent requests only
+      the one that changed the row moves the counter.
+    - Other `QuerySet.update(read_at=...)` calls bypass signals; call
+      `rebuild_unread_counters` after such bulk writes.
+
+Delta feed (`inbox_delta`):
+    `since` is either a notification id (the newest one the client has)
+    or an ISO timestamp (the `next_since` of the previous response).
+    The response carries rows created after it plus `tombstones`: ids of
+    older rows that were read since then (e.g. on another device).
+"""
+
+from collections import namedtuple
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from app.models import InAppNotification, InboxUnreadCounter
+
+
+DELTA_MAX_ITEMS = 500
+# `created_at` / `read_at` are stamped before commit, so a row can appear
+# with a timestamp slightly older than the poll that should have seen it.
+# Cursors are handed back this far in the past; clients de-duplicate by id.
+DELTA_OVERLAP = timedelta(seconds=5)
+
+InboxDelta = namedtuple("InboxDelta", ["items", "tombstones", "next_since", "resync"])
+
+
+class InvalidSince(ValueError):
+    pass
+
+
+def recipient_queryset(recipient_kind, recipient_id):
+    """Every notification visible in this recipient's inbox."""
+    qs = InAppNotification.objects.filter(recipient_kind=recipient_kind)
+    if recipient_kind == InAppNotification.KIND_SUPERVISOR:
+        return qs.filter(recipient_supervisor_id=recipient_id)
+    return qs.filter(recipient_user_id=recipient_id).exclude(
+        kind__in=InAppNotification.PM_HIDDEN_KINDS
+    )
+
+
+def _count_unread(recipient_kind, recipient_id):
+    return recipient_queryset(recipient_kind, recipient_id).filter(read_at__isnull=True).count()
+
+
+def _seed_counter(recipient_kind, recipient_id):
+    unread = _count_unread(recipient_kind, recipient_id)
+    try:
+        with transaction.atomic():
+            InboxUnreadCounter.objects.create(
+                recipient_kind=recipient_kind, recipient_id=recipient_id, unread=unread
+            )
+    except IntegrityError:
+        # Seeded concurrently; that row already reflects our write.
+        pass
+    return unread
+
+
+def unread_count(recipient_kind, recipient_id):
+    value = (
+        InboxUnreadCounter.objects.filter(
+            recipient_kind=recipient_kind, recipient_id=recipient_id
+        )
+        .values_list("unread", flat=True)
+        .first()
+    )
+    if value is None:
+        return _seed_counter(recipient_kind, recipient_id)
+    return max(int(value), 0)
+
+
+def _apply_unread_delta(recipient_kind, recipient_id, delta):
+    if not recipient_id or not delta:
+        return
+    updated = InboxUnreadCounter.objects.filter(
+        recipient_kind=recipient_kind, recipient_id=recipient_id
+    ).update(unread=F("unread") + delta)
+    if not updated:
+        # The seeding COUNT runs after this write, so it already includes it.
+        _seed_counter(recipient_kind, recipient_id)
+
+
+def record_notification_saved(notification, *, created):
+    now_counted = notification.counts_as_unread()
+    was_counted = False if created else getattr(notification, "_counted_unread", None)
+    if was_counted is None:
+        rebuild_unread_counters(
+            recipients=[(notification.recipient_kind, notification.recipient_id)]
+        )
+    elif was_counted != now_counted:
+        _apply_unread_delta(
+            notification.recipient_kind,
+            notification.recipient_id,
+            1 if now_counted else -1,
+        )
+    notification._counted_unread = now_counted
+
+
+def mark_read(notification, *, at=None):
+    """
+    Mark `notification` read with `UPDATE ... WHERE read_at IS NULL`. Only
+    the call that changed the row sends post_save (unread counter, live
+    stream, dashboard), so racing requests move the counter once. Returns
+    True when this call marked it.
+    """
+    at = at or timezone.now()
+    with transaction.atomic():
+        changed = InAppNotification.objects.filter(
+            pk=notification.pk, read_at__isnull=True
+        ).update(read_at=at)
+        if not changed:
+            return False
+        # The row was unread up to this UPDATE: diff from that state.
+        notification.read_at = None
+        notification._counted_unread = notification.counts_as_unread()
+        notification.read_at = at
+        post_save.send(
+            sender=InAppNotification,
+            instance=notification,
+            created=False,
+            update_fields=frozenset(["read_at"]),
+            raw=False,
+            using=notification._state.db or "default",
+        )
+    return True
+
+
+def record_notification_deleted(notification):
+    counted = getattr(notification, "_counted_unread", None)
+    if counted is None:
+        counted = notification.counts_as_unread()
+    if counted:
+        _apply_unread_delta(notification.recipient_kind, notification.recipient_id, -1)
+
+
+@transaction.atomic
+def rebuild_unread_counters(*, recipients=None):
+    """
+    Drop the counters of `recipients` (`[(recipient_kind, recipient_id)]`,
+    or every counter when None) so they are re-seeded on next use.
+    """
+    counters = InboxUnreadCounter.objects.all()
+    if recipients is None:
+        counters.delete()
+        return
+    for recipient_kind, recipient_id in recipients:
+        if recipient_id:
+            counters.filter(recipient_kind=recipient_kind, recipient_id=recipient_id).delete()
+
+
+def parse_since(raw):
+    """Return `("id", int)` or `("ts", aware datetime)`; raise InvalidSince."""
+    raw = (raw or "").strip()
+    if raw.isdigit():
+        return "id", int(raw)
+    try:
+        ts = parse_datetime(raw.replace(" ", "+"))
+    except ValueError:
+        ts = None
+    if ts is None:
+        raise InvalidSince("since must be a notification id or an ISO timestamp")
+    if timezone.is_naive(ts):
+        ts = timezone.make_aware(ts)
+    return "ts", ts
+
+
+def inbox_delta(recipient_kind, recipient_id, since):
+    """
+    Rows created after `since` (oldest first) and ids of older rows read
+    after it. `resync` is True when there are more than DELTA_MAX_ITEMS new
+    rows and the client should reload the full inbox instead.
+    """
+    next_since = timezone.now() - DELTA_OVERLAP
+    mode, value = parse_since(since)
+    qs = recipient_queryset(recipient_kind, recipient_id)
+    if mode == "id":
+        new_rows = qs.filter(notification_id__gt=value)
+        # Reads are tracked by time: use the creation time of the newest
+        # row the client had as the reference point.
+        ref_ts = (
+            qs.filter(notification_id__lte=value)
+            .order_by("-notification_id")
+            .values_list("created_at", flat=True)
+            .first()
+        )
+        read_since = (
+            qs.filter(notification_id__lte=value, read_at__gt=ref_ts)
+            if ref_ts is not None
+            else qs.none()
+        )
+    else:
+        new_rows = qs.filter(created_at__gt=value)
+        read_since = qs.filter(created_at__lte=value, read_at__gt=value)
+
+    items = list(new_rows.order_by("created_at", "notification_id")[: DELTA_MAX_ITEMS + 1])
+    resync = len(items) > DELTA_MAX_ITEMS
+    if resync:
+        items = []
+    tombstones = sorted(read_since.values_list("notification_id", flat=True))
+    return InboxDelta(items, tombstones, next_since, resync)
+
@@ -29,6 +29,8 @@ from app.models import (
     InventoryItem,
     InventoryUsage,
     Phase,
+    Project,
+    ProjectBudgetLedgerEntry,
     Supervisors,
     FieldWorker,
 )
@@ -85,7 +87,9 @@ def record_material_usage(
         InventoryItem.objects.select_for_update().get(pk=inventory_item.pk)
     )
     phase = Phase.objects.select_for_update().get(pk=phase.pk)
-    project = phase.project
+    # Locking the project serializes the remaining-budget check below
+    # against concurrent usages on sibling phases.
+    project = Project.objects.select_for_update().get(pk=phase.project_id)
 
     # Rule 1 — inventory (optional in reservation-based flows)
     if enforce_inventory and inventory_item.quantity < quantity:
@@ -109,7 +113,7 @@ def record_material_usage(
 
     # Rule 3 — project budget (hard block)
     project_budget = _as_decimal(project.budget)
-    remaining = _as_decimal(project.remaining_budget)
+    remaining = _as_decimal(project.cached_remaining_budget)
     if cost > remaining:
         raise MaterialUsageError(
             f"This usage would exceed the project's remaining budget. "
@@ -122,9 +126,6 @@ def record_material_usage(
         inventory_item.quantity = inventory_item.quantity - quantity
         inventory_item.save(update_fields=["quantity", "updated_at"])
 
-    phase.used_budget = used + cost
-    phase.save(update_fields=["used_budget", "updated_at"])
-
     usage = InventoryUsage.objects.create(
         inventory_item=inventory_item,
         phase=phase,
@@ -138,6 +139,14 @@ def record_material_usage(
         notes=notes or "",
     )
 
+    # The Phase post_save receiver posts this to the budget ledger.
+    phase.used_budget = used + cost
+    phase._ledger_context = {
+        "kind": ProjectBudgetLedgerEntry.KIND_MATERIAL_USAGE,
+        "usage": usage,
+    }
+    phase.save(update_fields=["used_budget", "updated_at"])
+
     warnings = _collect_warnings(project, phase)
     return usage, warnings
 
@@ -168,6 +177,10 @@ def reverse_material_usage(*, usage: InventoryUsage):
     phase.used_budget = max(
         Decimal("0"), _as_decimal(phase.used_budget) - _as_decimal(usage.total_cost)
     )
+    phase._ledger_context = {
+        "kind": ProjectBudgetLedgerEntry.KIND_MATERIAL_REVERSAL,
+        "usage": usage,
+    }
     phase.save(update_fields=["used_budget", "updated_at"])
 
     usage.status = "Returned"
@@ -209,7 +222,20 @@ def project_budget_summary(project):
     """
     Convenience read-model used by the summary endpoint in Step 3.
     Returns a plain dict so the view can JSON-serialize it directly.
+
+    Totals come from the budget ledger's running sums on the project row,
+    so this is two cheap queries regardless of phase/usage counts.
     """
+    totals = (
+        Project.objects.filter(pk=project.pk)
+        .values(
+            "budget",
+            "payroll_used_budget",
+            "used_materials_budget",
+            "allocated_budget_total",
+        )
+        .first()
+    ) or {}
     phases = list(
         project.phases.values(
             "phase_id",
@@ -223,13 +249,16 @@ def project_budget_summary(project):
             p["used_budget"]
         )
 
+    budget = _as_decimal(totals.get("budget", project.budget))
+    used_materials = _as_decimal(totals.get("used_materials_budget"))
+    used_payroll = _as_decimal(totals.get("payroll_used_budget"))
     return {
         "project_id": project.project_id,
-        "total_budget": _as_decimal(project.budget),
-        "total_allocated": project.total_allocated_budget,
-        "total_used_materials": project.total_used_budget,
-        "total_used_payroll": _as_decimal(project.payroll_used_budget),
-        "total_used": _as_decimal(project.total_used_budget) + _as_decimal(project.payroll_used_budget),
-        "remaining_budget": project.remaining_budget,
+        "total_budget": budget,
+        "total_allocated": _as_decimal(totals.get("allocated_budget_total")),
+        "total_used_materials": used_materials,
+        "total_used_payroll": used_payroll,
+        "total_used": used_materials + used_payroll,
+        "remaining_budget": budget - used_materials - used_payroll,
         "phases": phases,
     }
@@ -0,0 +1,187 @@
+"""
+Notification bus — fans InAppNotification events out to the open
+Server-Sent Events streams (`rest_api.streams`) of their recipient.
+
+Channels are per recipient: `inbox:pm:<user_id>` and
+`inbox:supervisor:<supervisor_id>`. Messages are small dicts:
+    {"event": "notification", "id": <notification_id>, "data": {...}}
+    {"event": "read", "id": <notification_id>, "data": {...}}
+
+Publishing happens from `app.signals` after the transaction commits, so a
+client never hears about a row it can't read yet. Whatever created the
+notification (`_create_supervisor_inbox_from_pm`, `_create_pm_inbox_*`,
+admin…) goes through the same path.
+
+Backends:
+    The default `InProcessBackend` keeps subscribers in memory, which is
+    exact for a single ASGI worker (the free-tier deploy). For several
+    workers, point `NOTIFICATION_BUS_BACKEND` at a class with the same
+    `publish(channel, message)` / `subscribe(channel)` interface backed by
+    a broker (Redis pub/sub, Postgres LISTEN/NOTIFY…); clients resync via
+    `Last-Event-ID` either way, so a dropped message is never lost data.
+"""
+
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from app.models import InAppNotification
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = "app.services.notification_bus.InProcessBackend"
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Subscription:
+    """One open stream's mailbox. Use as an async context manager."""
+
+    def __init__(self, backend, channel, loop, maxsize):
+        self.backend = backend
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        # Set when a message had to be dropped; the stream tells the
+        # client to resync instead of silently missing it.
+        self.overflowed = False
+
+    def deliver(self, message):
+        """Thread-safe: hand `message` to the subscriber's event loop."""
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # The loop is gone (worker shutting down); forget this stream.
+            self.backend.unsubscribe(self)
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        """Next message, or None if nothing arrives within `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.backend.unsubscribe(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+
+class InProcessBackend:
+    """In-memory pub/sub; publishers may run on any thread."""
+
+    def __init__(self, *, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+        return len(subscribers)
+
+    def subscribe(self, channel):
+        """Must be called from the event loop that will consume it."""
+        subscription = Subscription(
+            self, channel, asyncio.get_running_loop(), self.queue_size
+        )
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._subscribers.get(channel, ()))
+            return sum(len(subs) for subs in self._subscribers.values())
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def get_bus():
+    global _bus
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                path = getattr(settings, "NOTIFICATION_BUS_BACKEND", DEFAULT_BACKEND)
+                _bus = import_string(path)()
+    return _bus
+
+
+def set_bus(backend):
+    """Swap the process-wide backend (tests, or a custom broker at startup)."""
+    global _bus
+    with _bus_lock:
+        _bus = backend
+
+
+def inbox_channel(recipient_kind, recipient_id):
+    return f"inbox:{recipient_kind}:{recipient_id}"
+
+
+def notification_message(notification, event="notification"):
+    pl = notification.payload if isinstance(notification.payload, dict) else {}
+    return {
+        "event": event,
+        "id": notification.notification_id,
+        "data": {
+            "notification_id": notification.notification_id,
+            "kind": notification.kind,
+            "title": notification.title,
+            "body": notification.body,
+            "read": notification.read_at is not None,
+            "created_at": (
+                notification.created_at.isoformat() if notification.created_at else None
+            ),
+            "payload": pl,
+        },
+    }
+
+
+def _is_visible(notification):
+    return not (
+        notification.recipient_kind == InAppNotification.KIND_PM
+        and notification.kind in InAppNotification.PM_HIDDEN_KINDS
+    )
+
+
+def publish_notification(notification, *, event="notification"):
+    """Push a notification event to its recipient's open streams."""
+    recipient_id = notification.recipient_id
+    if not recipient_id or not _is_visible(notification):
+        return 0
+    try:
+        return get_bus().publish(
+            inbox_channel(notification.recipient_kind, recipient_id),
+            notification_message(notification, event=event),
+        )
+    except Exception as exc:  # noqa: BLE001
+        # Push is best-effort: clients fall back to `?since=` sync.
+        logger.exception("Notification publish failed: %s", exc)
+        return 0
@@ -0,0 +1,269 @@
+"""
+Resumable subtask photo uploads.
+
+The subtask PATCH used to carry the status change and up to five photos in
+one multipart request; on a flaky site connection any failure resent all
+of it. Photos now go through a three-step protocol and the status update
+is a small JSON request:
+
+    POST subtasks/<id>/photo-uploads/               {filename, size, [content_type, sha256]}
+        -> {upload_id, offset: 0, chunk_size}
+    PUT  subtasks/<id>/photo-uploads/<upload_id>/   raw bytes, `Upload-Offset: <n>`
+        -> {offset}                                 (409 + current offset on a mismatch)
+    GET  subtasks/<id>/photo-uploads/<upload_id>/   -> {offset, size, status}
+    POST subtasks/<id>/photo-uploads/<upload_id>/finalize/
+        -> the SubtaskPhoto
+
+After a dropped connection the client GETs the offset and resumes from
+there, so only the missing bytes are resent.
+
+Chunks are appended to `<PHOTO_UPLOAD_STAGING_ROOT>/<upload_id>.part`
+under an exclusive file lock. The file's size *is* the offset, so a crash
+mid-chunk loses at most that chunk and no DB write happens per chunk.
+Finalize checks the size (and the optional SHA-256), stores the file
+through the default storage as a `SubtaskPhoto` and removes the staged
+file. Finalizing twice returns the same photo.
+
+    GET    subtasks/<id>/photo-uploads/             -> {uploads: [pending uploads]}
+    DELETE subtasks/<id>/photo-uploads/<upload_id>/ cancels a pending upload
+
+Pending uploads hold one of the subtask's MAX_PHOTOS_PER_SUBTASK slots.
+A client that lost an `upload_id` can list and cancel them; one left
+alone expires after PHOTO_UPLOAD_PENDING_TTL_HOURS: it stops counting
+and the next init for that subtask removes it. `manage.py
+purge_photo_uploads` (run hourly by start.sh) removes the rest, with
+their staged files.
+"""
+
+import hashlib
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files import locks
+from django.db import transaction
+from django.utils import timezone
+
+from app import models as app_models
+
+
+MAX_PHOTOS_PER_SUBTASK = 5
+_COPY_CHUNK = 64 * 1024
+
+
+class UploadError(Exception):
+    """Rejected upload request; `status` is the HTTP status to answer with."""
+
+    status = 400
+
+    def __init__(self, message, **extra):
+        super().__init__(message)
+        self.message = message
+        self.extra = extra
+
+
+class OffsetMismatch(UploadError):
+    status = 409
+
+
+class UploadIncomplete(UploadError):
+    status = 409
+
+
+class ChecksumMismatch(UploadError):
+    status = 422
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def max_upload_bytes():
+    return _setting("PHOTO_UPLOAD_MAX_BYTES", 25 * 1024 * 1024)
+
+
+def chunk_size():
+    return _setting("PHOTO_UPLOAD_CHUNK_BYTES", 1024 * 1024)
+
+
+def pending_ttl():
+    return timedelta(hours=_setting("PHOTO_UPLOAD_PENDING_TTL_HOURS", 24))
+
+
+def staging_path(upload):
+    # Never under MEDIA_ROOT: staged bytes must not be servable.
+    root = _setting("PHOTO_UPLOAD_STAGING_ROOT", None) or os.path.join(
+        os.path.dirname(os.path.abspath(settings.MEDIA_ROOT)), "upload_staging"
+    )
+    return os.path.join(root, f"{upload.upload_id}.part")
+
+
+def current_offset(upload):
+    if upload.status == app_models.SubtaskPhotoUpload.STATUS_COMPLETE:
+        return upload.size
+    try:
+        return os.path.getsize(staging_path(upload))
+    except FileNotFoundError:
+        return 0
+
+
+def start_upload(subtask, *, filename, size, content_type="", sha256=""):
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError("size must be an integer number of bytes")
+    if size <= 0:
+        raise UploadError("size must be positive")
+    if size > max_upload_bytes():
+        raise UploadError(f"Photos are limited to {max_upload_bytes()} bytes")
+    filename = os.path.basename(str(filename or "").strip()) or "photo.jpg"
+    sha256 = str(sha256 or "").strip().lower()
+    if sha256 and (len(sha256) != 64 or any(c not in "0123456789abcdef" for c in sha256)):
+        raise UploadError("sha256 must be 64 hex characters")
+
+    with transaction.atomic():
+        # Lock the subtask so concurrent inits can't overshoot the limit.
+        app_models.Subtask.objects.select_for_update().filter(pk=subtask.pk).first()
+        # Expired uploads (a client that lost its upload_id) free their slot.
+        purge_stale(timezone.now() - pending_ttl(), subtask=subtask)
+        used = (
+            app_models.SubtaskPhoto.objects.filter(subtask=subtask).count()
+            + pending_uploads(subtask).count()
+        )
+        if used >= MAX_PHOTOS_PER_SUBTASK:
+            raise UploadError(f"A subtask can have at most {MAX_PHOTOS_PER_SUBTASK} photos")
+        upload = app_models.SubtaskPhotoUpload.objects.create(
+            subtask=subtask,
+            filename=filename[:255],
+            content_type=str(content_type or "")[:100],
+            size=size,
+            sha256=sha256,
+        )
+    path = staging_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "ab").close()
+    return upload
+
+
+def append_chunk(upload, offset, stream, length=None):
+    """
+    Append the bytes of `stream` at `offset`; returns the new offset.
+    `length` (the request's Content-Length) bounds the read when given.
+    """
+    if upload.status != app_models.SubtaskPhotoUpload.STATUS_PENDING:
+        raise UploadError("Upload is already finalized")
+    try:
+        offset = int(offset)
+    except (TypeError, ValueError):
+        raise UploadError("Upload-Offset header is required")
+
+    path = staging_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "ab") as fh:
+        locks.lock(fh, locks.LOCK_EX)
+        try:
+            current = fh.seek(0, os.SEEK_END)
+            if offset != current:
+                raise OffsetMismatch("Offset does not match the uploaded size", offset=current)
+            remaining = upload.size - current
+            if length is not None and int(length) > remaining:
+                raise UploadError("Chunk runs past the declared size", offset=current)
+            written = 0
+            while True:
+                want = _COPY_CHUNK if length is None else min(_COPY_CHUNK, int(length) - written)
+                if want <= 0:
+                    break
+                data = stream.read(want)
+                if not data:
+                    break
+                if written + len(data) > remaining:
+                    fh.truncate(current)
+                    raise UploadError("Chunk runs past the declared size", offset=current)
+                fh.write(data)
+                written += len(data)
+            fh.flush()
+            return current + written
+        finally:
+            locks.unlock(fh)
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def finalize_upload(upload):
+    """Attach the staged file as a SubtaskPhoto; idempotent."""
+    with transaction.atomic():
+        upload = app_models.SubtaskPhotoUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.status == app_models.SubtaskPhotoUpload.STATUS_COMPLETE and upload.photo_id:
+            return upload.photo
+
+        path = staging_path(upload)
+        offset = current_offset(upload)
+        if offset != upload.size:
+            raise UploadIncomplete("Upload is not complete", offset=offset)
+        if upload.sha256 and _file_sha256(path) != upload.sha256:
+            # The bytes are wrong somewhere: start over rather than resume.
+            os.remove(path)
+            open(path, "ab").close()
+            raise ChecksumMismatch("Checksum does not match; upload again", offset=0)
+
+        with open(path, "rb") as fh:
+            photo = app_models.SubtaskPhoto(subtask_id=upload.subtask_id)
+            photo.photo.save(upload.filename, File(fh), save=False)
+            photo.save()
+        upload.status = app_models.SubtaskPhotoUpload.STATUS_COMPLETE
+        upload.photo = photo
+        upload.completed_at = timezone.now()
+        upload.save(update_fields=["status", "photo", "completed_at"])
+
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    return photo
+
+
+def pending_uploads(subtask):
+    """The subtask's unfinished uploads that still hold a photo slot."""
+    return app_models.SubtaskPhotoUpload.objects.filter(
+        subtask=subtask,
+        status=app_models.SubtaskPhotoUpload.STATUS_PENDING,
+        created_at__gte=timezone.now() - pending_ttl(),
+    )
+
+
+def _discard(upload):
+    try:
+        os.remove(staging_path(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
+
+
+def cancel_upload(upload):
+    """Drop a pending upload and its staged bytes, freeing its slot."""
+    with transaction.atomic():
+        upload = app_models.SubtaskPhotoUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.status != app_models.SubtaskPhotoUpload.STATUS_PENDING:
+            raise UploadError("Upload is already finalized")
+        _discard(upload)
+
+
+def purge_stale(older_than, *, subtask=None):
+    """Delete unfinished uploads started before `older_than`; returns how many."""
+    stale = app_models.SubtaskPhotoUpload.objects.filter(
+        status=app_models.SubtaskPhotoUpload.STATUS_PENDING, created_at__lt=older_than
+    )
+    if subtask is not None:
+        stale = stale.filter(subtask=subtask)
+    count = 0
+    for upload in stale.iterator():
+        _discard(upload)
+        count += 1
+    return count
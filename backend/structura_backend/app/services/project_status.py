@@ -0,0 +1,140 @@
+"""
+Project status engine — recomputes Completed / Overdue / Active for a
+whole queryset of projects in a constant number of SQL statements.
+
+The rules are the same ones `Project.refresh_overdue_status` and
+`Project.update_status_based_on_progress` have always applied:
+
+    1. A project with at least one subtask and every subtask completed is
+       `Completed` (its `on_hold_reason` is cleared), whatever its
+       previous status.
+    2. Only when `reopen_completed=True`: a `Completed` project that is no
+       longer at 100% goes back to `Active` (reason cleared) and then
+       falls through to rule 3.
+    3. `Active` / `Overdue` projects are `Overdue` when `as_of` is after
+       the scheduled end (`end_date`, or `start_date + duration_days`) and
+       they are not finished; otherwise `Active`.
+    4. `On Hold` and `Deactivated` are never touched by rules 2–3.
+
+Cost: one SELECT (progress comes from the denormalized subtask counters
+maintained by app.services.subtask_counters) plus at most one bulk UPDATE
+per distinct target state, regardless of how many projects are in the
+queryset. Bulk updates bypass `Project.save()`, so no
+`post_save` fires for the rewritten rows; the owning PMs' dashboard cache
+generations (app.services.dashboard_cache) are bumped here instead.
+"""
+
+from collections import defaultdict, namedtuple
+from datetime import date, datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from app import models as app_models
+from app.services.dashboard_cache import bump_generation
+
+
+STATUS_ACTIVE = "Active"
+STATUS_OVERDUE = "Overdue"
+STATUS_COMPLETED = "Completed"
+
+ProjectStatusChange = namedtuple(
+    "ProjectStatusChange", ["project_id", "before", "after"]
+)
+
+
+def _coerce_as_of(as_of) -> date:
+    if isinstance(as_of, datetime):
+        return as_of.date()
+    if isinstance(as_of, date):
+        return as_of
+    return timezone.localdate()
+
+
+def _scheduled_end(start_date, end_date, duration_days):
+    if end_date is not None:
+        return end_date
+    if start_date is not None and duration_days:
+        return start_date + timedelta(days=int(duration_days))
+    return None
+
+
+def _target_status(row, as_of: date, reopen_completed: bool):
+    """Return `(new_status, clear_on_hold_reason)` for one project row."""
+    current = row["status"]
+    total = row["total_subtasks"] or 0
+    done = row["completed_subtasks"] or 0
+    finished = total > 0 and done >= total
+
+    if finished:
+        return STATUS_COMPLETED, current != STATUS_COMPLETED
+
+    status = current
+    clear_reason = False
+    if status == STATUS_COMPLETED and reopen_completed:
+        status = STATUS_ACTIVE
+        clear_reason = True
+    if status not in (STATUS_ACTIVE, STATUS_OVERDUE):
+        return status, clear_reason
+
+    end = _scheduled_end(row["start_date"], row["end_date"], row["duration_days"])
+    overdue = end is not None and as_of > end
+    return (STATUS_OVERDUE if overdue else STATUS_ACTIVE), clear_reason
+
+
+def sync_project_statuses(projects, *, as_of=None, reopen_completed=False):
+    """
+    Bring every project in `projects` (a Project queryset) in line with the
+    status rules above.
+
+    as_of: optional date used for the overdue check (Flutter "Test Time"
+        via `?as_of=`); defaults to today.
+    reopen_completed: also demote Completed projects that are no longer at
+        100% (what `update_status_based_on_progress` does after a subtask
+        is reverted or added).
+
+    Returns a list of `ProjectStatusChange` for the rows that changed.
+    """
+    as_of = _coerce_as_of(as_of)
+    rows = (
+        app_models.Project.objects
+        .filter(pk__in=projects.order_by().values("pk"))
+        .order_by()
+        .values(
+            "project_id",
+            "user_id",
+            "status",
+            "start_date",
+            "end_date",
+            "duration_days",
+            "total_subtasks",
+            "completed_subtasks",
+        )
+    )
+
+    changes = []
+    buckets = defaultdict(list)
+    user_ids = set()
+    for row in rows:
+        new_status, clear_reason = _target_status(row, as_of, reopen_completed)
+        if new_status == row["status"] and not clear_reason:
+            continue
+        buckets[(new_status, clear_reason)].append(row["project_id"])
+        user_ids.add(row["user_id"])
+        if new_status != row["status"]:
+            changes.append(
+                ProjectStatusChange(row["project_id"], row["status"], new_status)
+            )
+
+    for (new_status, clear_reason), ids in buckets.items():
+        fields = {"status": new_status}
+        if clear_reason:
+            fields["on_hold_reason"] = ""
+        app_models.Project.objects.filter(pk__in=ids).update(**fields)
+    if buckets:
+        # Same as app.signals does for saves: now, and again on commit.
+        bump_generation(*user_ids)
+        transaction.on_commit(lambda: bump_generation(*user_ids))
+
+    changes.sort(key=lambda c: c.project_id)
+    return changes
@@ -0,0 +1,164 @@
+"""
+Daily subtask activity rollup — one `DailySubtaskActivity` row per
+(project, day) counting completions and reopens, so dashboard series of
+any length read pre-aggregated rows instead of scanning `Subtask`.
+
+How the rollup stays current:
+    - `app.signals` calls `record_subtask_saved` on every Subtask save with
+      the status the row had before: the `_counted_state` that
+      `Subtask.save()` re-reads under a row lock in the write's
+      transaction, so two requests saving the same transition roll it up
+      once. A move into `completed` adds to that day's `completed`; a move
+      out of it adds to `reopened`. Other edits don't touch the rollup.
+    - "That day" is the local date of the subtask's `updated_at`, the same
+      clock the dashboard used when it grouped `Subtask` rows directly.
+    - Deleting a subtask leaves history alone: the completion still happened.
+
+`rebuild_daily_activity()` (and `manage.py backfill_subtask_activity`)
+re-seeds the table from current Subtask state: one completion per
+completed subtask on its `updated_at` day. Reopen history from before the
+rollup existed can't be reconstructed.
+"""
+
+from collections import namedtuple
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractMonth, TruncDate
+from django.utils import timezone
+
+from app import models as app_models
+
+
+STATUS_COMPLETED = "completed"
+
+ActivityDay = namedtuple("ActivityDay", ["day", "completed", "reopened"])
+
+
+def _activity_day(subtask):
+    stamp = getattr(subtask, "updated_at", None)
+    if stamp is None:
+        return timezone.localdate()
+    return timezone.localtime(stamp).date() if timezone.is_aware(stamp) else stamp.date()
+
+
+@transaction.atomic
+def bump_activity(*, project_id, user_id, day, completed=0, reopened=0):
+    """Add to the (project, day) row, creating it on first use."""
+    if not project_id or (not completed and not reopened):
+        return
+    changes = {
+        "completed": F("completed") + completed,
+        "reopened": F("reopened") + reopened,
+    }
+    rows = app_models.DailySubtaskActivity.objects.filter(project_id=project_id, day=day)
+    if rows.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            app_models.DailySubtaskActivity.objects.create(
+                project_id=project_id,
+                user_id=user_id,
+                day=day,
+                completed=completed,
+                reopened=reopened,
+            )
+    except IntegrityError:
+        # A concurrent writer created the row first; add to theirs.
+        rows.update(**changes)
+
+
+def record_subtask_saved(subtask, *, created, old_status=None):
+    """Roll up a status transition into `completed`/`reopened`."""
+    was_completed = (not created) and old_status == STATUS_COMPLETED
+    is_completed = subtask.status == STATUS_COMPLETED
+    if not created and old_status is None:
+        # No stored row to compare with: we can't tell what changed.
+        return
+    if was_completed == is_completed:
+        return
+    owner = (
+        app_models.Phase.objects.filter(pk=subtask.phase_id)
+        .values("project_id", "project__user_id")
+        .first()
+    )
+    if owner is None:
+        return
+    bump_activity(
+        project_id=owner["project_id"],
+        user_id=owner["project__user_id"],
+        day=_activity_day(subtask),
+        completed=1 if is_completed else 0,
+        reopened=1 if was_completed else 0,
+    )
+
+
+@transaction.atomic
+def rebuild_daily_activity(*, project_ids=None):
+    """
+    Replace the rollup for `project_ids` (all projects when None) with one
+    completion per currently-completed subtask. Returns rows written.
+    """
+    activity = app_models.DailySubtaskActivity.objects.all()
+    subtasks = app_models.Subtask.objects.filter(status=STATUS_COMPLETED)
+    if project_ids is not None:
+        activity = activity.filter(project_id__in=project_ids)
+        subtasks = subtasks.filter(phase__project_id__in=project_ids)
+    activity.delete()
+    grouped = (
+        subtasks.order_by()
+        .annotate(day=TruncDate("updated_at"))
+        .values("phase__project_id", "phase__project__user_id", "day")
+        .annotate(count=Count("subtask_id"))
+    )
+    rows = [
+        app_models.DailySubtaskActivity(
+            project_id=row["phase__project_id"],
+            user_id=row["phase__project__user_id"],
+            day=row["day"],
+            completed=row["count"],
+        )
+        for row in grouped
+    ]
+    app_models.DailySubtaskActivity.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def daily_series(*, user_id, start_day, end_day):
+    """`ActivityDay` for every day in [start_day, end_day], zero-filled."""
+    totals = {
+        row["day"]: row
+        for row in (
+            app_models.DailySubtaskActivity.objects.filter(
+                user_id=user_id, day__range=(start_day, end_day)
+            )
+            .order_by()
+            .values("day")
+            .annotate(completed_total=Sum("completed"), reopened_total=Sum("reopened"))
+        )
+    }
+    series = []
+    for offset in range((end_day - start_day).days + 1):
+        day = start_day + timedelta(days=offset)
+        row = totals.get(day) or {}
+        series.append(
+            ActivityDay(
+                day,
+                int(row.get("completed_total") or 0),
+                int(row.get("reopened_total") or 0),
+            )
+        )
+    return series
+
+
+def monthly_completed(*, user_id, year):
+    """`{month_index: completed}` for `year` (months without activity omitted)."""
+    rows = (
+        app_models.DailySubtaskActivity.objects.filter(user_id=user_id, day__year=year)
+        .order_by()
+        .annotate(month_index=ExtractMonth("day"))
+        .values("month_index")
+        .annotate(total=Sum("completed"))
+    )
+    return {row["month_index"]: int(row["total"] or 0) for row in rows}
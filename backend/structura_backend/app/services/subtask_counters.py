@@ -0,0 +1,199 @@
+"""
+Subtask counter service — keeps `total_subtasks` / `completed_subtasks` on
+Phase and Project exact so progress reads never have to recount subtasks.
+
+How the counters stay exact:
+    - Every Subtask save/delete goes through `app.signals`, which calls
+      `record_subtask_saved` / `record_subtask_deleted` here. That covers
+      `SubtaskViewSet.perform_*`, the revert-request approval flow, admin
+      edits and cascades from Phase/Project deletes.
+    - Subtasks carry `_counted_state = (phase_id, status)`, i.e. what the
+      counters currently account for. `Subtask.save()` re-reads it from
+      the row with SELECT ... FOR UPDATE in the write's transaction, so a
+      concurrent save of the same subtask waits and then diffs against
+      what the other one stored (not the state both loaded). The delta is
+      applied with F() expressions (one UPDATE on the phase, one on its
+      project), so concurrent writers never lose increments.
+    - A Phase that moves to another project carries its counts along.
+    - Anything we cannot diff (a hand-built instance whose row wasn't
+      there to re-read) falls back to an exact recount of the affected
+      phase/project.
+
+`QuerySet.update()` on Subtask bypasses signals; run
+`manage.py rebuild_subtask_counters --apply` after such bulk writes.
+"""
+
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from app import models as app_models
+
+
+STATUS_COMPLETED = "completed"
+
+CounterDrift = namedtuple(
+    "CounterDrift",
+    [
+        "model",
+        "pk",
+        "stored_total",
+        "actual_total",
+        "stored_completed",
+        "actual_completed",
+    ],
+)
+
+
+def _is_completed(status) -> int:
+    return 1 if status == STATUS_COMPLETED else 0
+
+
+@transaction.atomic
+def apply_subtask_delta(*, phase_id, total=0, completed=0):
+    """Shift the counters of `phase_id` and its project by the given amounts."""
+    if not phase_id or (not total and not completed):
+        return
+    changes = {
+        "total_subtasks": F("total_subtasks") + total,
+        "completed_subtasks": F("completed_subtasks") + completed,
+    }
+    app_models.Phase.objects.filter(pk=phase_id).update(**changes)
+    app_models.Project.objects.filter(phases__phase_id=phase_id).update(**changes)
+
+
+def record_subtask_saved(subtask, *, created):
+    new_state = (subtask.phase_id, subtask.status)
+    old_state = None if created else getattr(subtask, "_counted_state", None)
+
+    if not created and (old_state is None or old_state[1] is None):
+        rebuild_subtask_counters(phase_ids=[subtask.phase_id])
+    elif old_state is None:
+        apply_subtask_delta(
+            phase_id=subtask.phase_id, total=1, completed=_is_completed(subtask.status)
+        )
+    elif old_state != new_state:
+        old_phase_id, old_status = old_state
+        if old_phase_id == subtask.phase_id:
+            apply_subtask_delta(
+                phase_id=subtask.phase_id,
+                completed=_is_completed(subtask.status) - _is_completed(old_status),
+            )
+        else:
+            apply_subtask_delta(
+                phase_id=old_phase_id, total=-1, completed=-_is_completed(old_status)
+            )
+            apply_subtask_delta(
+                phase_id=subtask.phase_id,
+                total=1,
+                completed=_is_completed(subtask.status),
+            )
+    subtask._counted_state = new_state
+
+
+def record_subtask_deleted(subtask):
+    phase_id, status = getattr(
+        subtask, "_counted_state", (subtask.phase_id, subtask.status)
+    )
+    if status is None:
+        rebuild_subtask_counters(phase_ids=[phase_id])
+        return
+    apply_subtask_delta(phase_id=phase_id, total=-1, completed=-_is_completed(status))
+
+
+@transaction.atomic
+def record_phase_moved(*, phase, old_project_id):
+    """Move a phase's counts from `old_project_id` to `phase.project_id`."""
+    if not old_project_id or old_project_id == phase.project_id:
+        return
+    row = (
+        app_models.Phase.objects.filter(pk=phase.pk)
+        .values("total_subtasks", "completed_subtasks")
+        .first()
+    )
+    if row is None:
+        return
+    for project_id, sign in ((old_project_id, -1), (phase.project_id, 1)):
+        app_models.Project.objects.filter(pk=project_id).update(
+            total_subtasks=F("total_subtasks") + sign * row["total_subtasks"],
+            completed_subtasks=F("completed_subtasks") + sign * row["completed_subtasks"],
+        )
+
+
+def _count_subquery(outer_field, completed_only=False):
+    qs = app_models.Subtask.objects.filter(**{outer_field: OuterRef("pk")})
+    if completed_only:
+        qs = qs.filter(status=STATUS_COMPLETED)
+    counted = (
+        qs.order_by()
+        .values(outer_field)
+        .annotate(c=Count("subtask_id"))
+        .values("c")
+    )
+    return Coalesce(
+        Subquery(counted, output_field=IntegerField()), Value(0)
+    )
+
+
+@transaction.atomic
+def rebuild_subtask_counters(*, phase_ids=None):
+    """
+    Recompute the counters from the Subtask table with set-based UPDATEs.
+
+    phase_ids: limit the rebuild to these phases and their projects;
+        `None` rebuilds every Phase and Project.
+    """
+    phases = app_models.Phase.objects.all()
+    projects = app_models.Project.objects.all()
+    if phase_ids is not None:
+        phase_ids = [pid for pid in phase_ids if pid]
+        if not phase_ids:
+            return
+        phases = phases.filter(pk__in=phase_ids)
+        projects = projects.filter(phases__phase_id__in=phase_ids)
+    phases.update(
+        total_subtasks=_count_subquery("phase_id"),
+        completed_subtasks=_count_subquery("phase_id", completed_only=True),
+    )
+    projects.update(
+        total_subtasks=_count_subquery("phase__project_id"),
+        completed_subtasks=_count_subquery("phase__project_id", completed_only=True),
+    )
+
+
+def find_counter_drift():
+    """Return a `CounterDrift` for every Phase/Project whose counters are off."""
+    drift = []
+    for model, rel in (
+        (app_models.Phase, "subtasks"),
+        (app_models.Project, "phases__subtasks"),
+    ):
+        rows = (
+            model.objects.order_by()
+            .values("pk", "total_subtasks", "completed_subtasks")
+            .annotate(
+                actual_total=Count(rel),
+                actual_completed=Count(
+                    rel, filter=Q(**{f"{rel}__status": STATUS_COMPLETED})
+                ),
+            )
+            .order_by("pk")
+        )
+        for row in rows:
+            if (
+                row["total_subtasks"] != row["actual_total"]
+                or row["completed_subtasks"] != row["actual_completed"]
+            ):
+                drift.append(
+                    CounterDrift(
+                        model.__name__,
+                        row["pk"],
+                        row["total_subtasks"],
+                        row["actual_total"],
+                        row["completed_subtasks"],
+                        row["actual_completed"],
+                    )
+                )
+    return drift
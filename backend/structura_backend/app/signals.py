@@ -1,18 +1,51 @@
-from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 from . import models
+from .services import (
+    audit_trail,
+    budget_ledger,
+    dashboard_cache,
+    image_derivatives,
+    inbox,
+    notification_bus,
+    subtask_activity,
+    subtask_counters,
+)
+from .services.project_status import sync_project_statuses
 
 
 @receiver(post_save, sender=models.Subtask)
+def subtask_saved_refresh_counters_and_overdue(sender, instance, created, **kwargs):
+    # The stored status Subtask.save() re-read under lock; read it before
+    # record_subtask_saved moves it forward.
+    old_status = (getattr(instance, '_counted_state', None) or (None, None))[1]
+    subtask_activity.record_subtask_saved(instance, created=created, old_status=old_status)
+    audit_trail.record_saved(instance, created=created, old_status=old_status)
+    subtask_counters.record_subtask_saved(instance, created=created)
+    _sync_project_for_phase(getattr(instance, 'phase_id', None))
+
+
 @receiver(post_delete, sender=models.Subtask)
-def subtask_changed_refresh_overdue(sender, instance, **kwargs):
-    try:
-        project = instance.phase.project
-    except (ObjectDoesNotExist, AttributeError):
+def subtask_deleted_refresh_counters_and_overdue(sender, instance, **kwargs):
+    subtask_counters.record_subtask_deleted(instance)
+    _sync_project_for_phase(getattr(instance, 'phase_id', None))
+
+
+def _sync_project_for_phase(phase_id):
+    if not phase_id:
         return
-    project.refresh_overdue_status()
+    # Resolve the project through the join so a subtask save costs one
+    # read + (at most) one UPDATE, with no Phase/Project fetches.
+    sync_project_statuses(
+        models.Project.objects.filter(phases__phase_id=phase_id)
+    )
+
+
+@receiver(post_save, sender=models.Project)
+def project_saved_post_budget_ledger(sender, instance, created, **kwargs):
+    budget_ledger.record_project_saved(instance, created=created)
 
 
 @receiver(post_save, sender=models.Phase)
@@ -20,8 +53,111 @@ def subtask_changed_refresh_overdue(sender, instance, **kwargs):
 def phase_changed_refresh_overdue(sender, instance, **kwargs):
     if not getattr(instance, 'project_id', None):
         return
-    try:
-        project = models.Project.objects.get(project_id=instance.project_id)
-    except models.Project.DoesNotExist:
+    if kwargs.get('signal') is post_delete:
+        # Skip cascades from a Project delete: its ledger is going away too.
+        origin = kwargs.get('origin')
+        if getattr(origin, 'model', type(origin)) is models.Phase:
+            budget_ledger.record_phase_deleted(instance)
+    if kwargs.get('signal') is post_save:
+        budget_ledger.record_phase_saved(instance, created=kwargs.get('created', False))
+        old_project_id = getattr(instance, '_counted_project_id', None)
+        if old_project_id and old_project_id != instance.project_id:
+            subtask_counters.record_phase_moved(
+                phase=instance, old_project_id=old_project_id
+            )
+            sync_project_statuses(
+                models.Project.objects.filter(project_id=old_project_id)
+            )
+        instance._counted_project_id = instance.project_id
+    sync_project_statuses(
+        models.Project.objects.filter(project_id=instance.project_id)
+    )
+
+
+_DASHBOARD_MODELS = (
+    models.Project,
+    models.Phase,
+    models.Subtask,
+    models.SubtaskFieldWorker,
+    models.FieldWorker,
+    models.Supervisors,
+    models.InAppNotification,
+)
+_DASHBOARD_CASCADE_ROOTS = (models.Project, models.Phase, models.Subtask)
+
+
+def _bump_pm_dashboard(sender, instance, **kwargs):
+    extra_user_ids = []
+    if kwargs.get('signal') is post_delete:
+        # The root of a cascade already bumps its PM; skip the per-row
+        # lookups for every phase/subtask/assignment it takes with it.
+        origin = kwargs.get('origin')
+        origin_model = getattr(origin, 'model', type(origin))
+        if origin_model is not sender and origin_model in _DASHBOARD_CASCADE_ROOTS:
+            return
+    elif sender is models.Phase:
+        old_project_id = getattr(instance, '_dashboard_project_id', None)
+        if old_project_id and old_project_id != instance.project_id:
+            extra_user_ids = models.Project.objects.filter(
+                pk=old_project_id
+            ).values_list('user_id', flat=True)
+        instance._dashboard_project_id = instance.project_id
+    dashboard_cache.bump_for_instance(instance, extra_user_ids=list(extra_user_ids))
+
+
+for _model in _DASHBOARD_MODELS:
+    post_save.connect(
+        _bump_pm_dashboard, sender=_model, dispatch_uid=f'pm_dashboard_{_model.__name__}_save'
+    )
+    post_delete.connect(
+        _bump_pm_dashboard, sender=_model, dispatch_uid=f'pm_dashboard_{_model.__name__}_delete'
+    )
+
+
+def _record_audit_event(sender, instance, created, **kwargs):
+    if kwargs.get('raw'):
+        return
+    audit_trail.record_saved(instance, created=created)
+
+
+for _model in audit_trail.AUDITED_MODELS:
+    if _model is models.Subtask:
+        # Recorded from subtask_saved_refresh_counters_and_overdue, which
+        # still has the pre-save status.
+        continue
+    post_save.connect(
+        _record_audit_event, sender=_model, dispatch_uid=f'audit_{_model.__name__}_save'
+    )
+
+
+def _build_photo_derivatives(sender, instance, **kwargs):
+    if kwargs.get('raw'):
         return
-    project.refresh_overdue_status()
+    image_derivatives.schedule_for(instance)
+
+
+for _model in image_derivatives.TARGETS:
+    post_save.connect(
+        _build_photo_derivatives,
+        sender=_model,
+        dispatch_uid=f'photo_derivatives_{_model.__name__}_save',
+    )
+
+
+@receiver(post_save, sender=models.InAppNotification)
+def notification_saved_update_unread_counter(sender, instance, created, **kwargs):
+    inbox.record_notification_saved(instance, created=created)
+    if created:
+        event = 'notification'
+    elif instance.read_at is not None and 'read_at' in (kwargs.get('update_fields') or ()):
+        event = 'read'
+    else:
+        return
+    transaction.on_commit(
+        lambda: notification_bus.publish_notification(instance, event=event)
+    )
+
+
+@receiver(post_delete, sender=models.InAppNotification)
+def notification_deleted_update_unread_counter(sender, instance, **kwargs):
+    inbox.record_notification_deleted(instance)
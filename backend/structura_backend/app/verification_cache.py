@@ -0,0 +1,139 @@
+"""
+Face-verification results cached by content hash.
+
+The same bytes are often verified more than once: a worker/supervisor/
+client photo upload is checked in the serializer's `validate_photo`, the
+`image-verification/` pre-check is followed by the real upload, and
+clients retry failed requests with the same selfie. Detection is
+deterministic for given bytes, so the answer is cached under the SHA-256
+of the raw upload:
+
+    1. an in-process LRU (`FACE_VERIFICATION_CACHE_MAX_ENTRIES` digests),
+       free to hit and enough for the validate-then-save double check;
+    2. the Django cache (`FACE_VERIFICATION_CACHE_ALIAS`; the default is
+       the DatabaseCache in settings.CACHES, shared between web workers),
+       for pre-check/retry landing on another worker.
+
+Both tiers expire after `FACE_VERIFICATION_CACHE_TTL_SECONDS`; 0 turns the
+cache off. Only definite ACCEPT/REJECT answers are stored; a busy or
+timed-out check is never cached. Keys carry `CACHE_VERSION`; bump it when
+the detector or its thresholds change so old verdicts aren't reused.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+
+
+def content_digest(image_bytes):
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def _cache_key(digest):
+    return f"face_verify:v{CACHE_VERSION}:{digest}"
+
+
+class VerificationResultCache:
+    def __init__(self, *, ttl, max_entries, alias="default"):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.alias = alias
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def _shared(self):
+        if not self.alias:
+            return None
+        return caches[self.alias]
+
+    def _remember(self, digest, result):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._local[digest] = (result, time.monotonic() + self.ttl)
+            self._local.move_to_end(digest)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def get(self, digest):
+        """The cached verdict for `digest`, or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._local.get(digest)
+            if entry is not None:
+                result, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._local.move_to_end(digest)
+                    return result
+                del self._local[digest]
+
+        shared = self._shared()
+        if shared is None:
+            return None
+        try:
+            stored = shared.get(_cache_key(digest))
+        except Exception:
+            logger.exception("Face verification cache read failed")
+            return None
+        if stored is None:
+            return None
+        result = bool(stored)
+        self._remember(digest, result)
+        return result
+
+    def set(self, digest, result):
+        if not self.enabled:
+            return
+        result = bool(result)
+        self._remember(digest, result)
+        shared = self._shared()
+        if shared is None:
+            return
+        try:
+            # Stored as 1/0: some backends can't tell a cached False from a miss.
+            shared.set(_cache_key(digest), int(result), timeout=self.ttl)
+        except Exception:
+            logger.exception("Face verification cache write failed")
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = VerificationResultCache(
+                    ttl=int(getattr(settings, "FACE_VERIFICATION_CACHE_TTL_SECONDS", 86400)),
+                    max_entries=int(getattr(settings, "FACE_VERIFICATION_CACHE_MAX_ENTRIES", 1024)),
+                    alias=getattr(settings, "FACE_VERIFICATION_CACHE_ALIAS", "default"),
+                )
+    return _cache
+
+
+def set_result_cache(result_cache):
+    """Swap the process-wide cache (tests)."""
+    global _cache
+    with _cache_lock:
+        _cache = result_cache
@@ -0,0 +1,368 @@
+"""
+Out-of-process face verification.
+
+`verify_image_has_human_face` is CPU-bound (image decode, MediaPipe, then
+the Haar cascade) and used to run inline in the request thread. Under the
+ASGI server every sync view shares one thread per worker, so a single
+selfie upload stalled every other request on that worker.
+
+`verify_face()` instead hands the bytes to a small pool of detector
+processes and waits on the future:
+
+    - Workers are spawned (not forked, the web worker has threads) and
+      build their MediaPipe / OpenCV detectors once, in the initializer.
+      They start on the first verification, or at boot from asgi.py /
+      wsgi.py (`prewarm_in_background()`) with FACE_VERIFICATION_PREWARM.
+    - At most `workers + queue_size` verifications are in flight per web
+      worker. Past that, `VerificationBusy` is raised immediately instead
+      of queueing without bound; the API answers 503 + Retry-After.
+      A batch (`call_many`) runs at most `workers` jobs at a time, so the
+      queue slots stay free for single uploads.
+    - Each call waits at most `timeout` seconds (`VerificationTimeout`).
+      A timed-out job keeps its slot until it finishes; if every worker
+      is stuck on one, the pool is killed and rebuilt.
+    - A crashed worker (OOM, segfault in native code) breaks the pool; it
+      is rebuilt on the next call and the current one gets
+      `VerificationUnavailable`.
+
+Settings: FACE_VERIFICATION_WORKERS (0 = run inline, the old behaviour),
+FACE_VERIFICATION_QUEUE_SIZE, FACE_VERIFICATION_TIMEOUT_SECONDS,
+FACE_VERIFICATION_PREWARM.
+
+Verdicts are cached by content hash (`app.verification_cache`), so bytes
+already checked never reach the pool again.
+"""
+
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from app.image_verification import verify_image_has_human_face, warm_detectors
+from app.verification_cache import content_digest, get_result_cache
+
+
+logger = logging.getLogger(__name__)
+
+
+class VerificationUnavailable(Exception):
+    """The detector couldn't give an answer; the client should retry."""
+
+
+class VerificationBusy(VerificationUnavailable):
+    pass
+
+
+class VerificationTimeout(VerificationUnavailable):
+    pass
+
+
+def _ping():
+    return True
+
+
+class VerificationPool:
+    """Bounded pool of pre-warmed detector processes."""
+
+    def __init__(
+        self,
+        *,
+        workers,
+        queue_size,
+        timeout,
+        fn=verify_image_has_human_face,
+        initializer=warm_detectors,
+    ):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.fn = fn
+        self.initializer = initializer
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._in_flight = 0
+        self._stuck = 0
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=self.initializer,
+                )
+                self._stuck = 0
+            return self._executor
+
+    def _discard_executor(self, executor, *, kill=False):
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        if kill:
+            # Terminating is the only way to stop a hung native call. Waiting
+            # for the shutdown lets the executor fail the pending futures
+            # (BrokenProcessPool), which gives their slots back.
+            for process in list((getattr(executor, "_processes", None) or {}).values()):
+                process.terminate()
+        executor.shutdown(wait=kill, cancel_futures=True)
+
+    def _release(self, future):
+        with self._lock:
+            self._in_flight -= 1
+            if getattr(future, "_timed_out", False):
+                self._stuck = max(self._stuck - 1, 0)
+        self._slots.release()
+
+    def submit(self, *args):
+        if not self._slots.acquire(blocking=False):
+            raise VerificationBusy("All face verification workers are busy")
+        with self._lock:
+            self._in_flight += 1
+        executor = self._get_executor()
+        try:
+            future = executor.submit(self.fn, *args)
+        except (BrokenProcessPool, RuntimeError) as exc:
+            # RuntimeError: submitted while the executor was being shut down.
+            self._discard_executor(executor)
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+            raise VerificationUnavailable("Face verification pool restarted") from exc
+        future._executor_ref = executor
+        future.add_done_callback(self._release)
+        return future
+
+    def call(self, *args, timeout=None):
+        future = self.submit(*args)
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except FutureTimeout:
+            self._mark_stuck(future)
+            raise VerificationTimeout("Face verification timed out") from None
+        except BrokenProcessPool as exc:
+            self._discard_executor(future._executor_ref)
+            raise VerificationUnavailable("Face verification worker crashed") from exc
+
+    def call_many(self, items, timeout=None):
+        """
+        `fn(item)` for every item, run concurrently. Returns results in
+        order; an item that couldn't be verified gets its
+        VerificationUnavailable instance instead of a result.
+
+        At most `workers` items run at once: the rest wait for this batch's
+        own earlier jobs to finish, so a batch never takes the queue slots
+        single calls rely on. Only an item that can't get a slot while none
+        of the batch is running is reported busy. Each job gets `timeout`
+        seconds from its submission.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        limit = max(self.workers, 1)
+        results = [None] * len(items)
+        pending = list(enumerate(items))
+        pending.reverse()
+        running = {}
+
+        while pending or running:
+            while pending and len(running) < limit:
+                index, item = pending[-1]
+                try:
+                    future = self.submit(item)
+                except VerificationBusy as exc:
+                    if running:
+                        break
+                    results[index] = exc
+                except VerificationUnavailable as exc:
+                    results[index] = exc
+                else:
+                    running[future] = (index, time.monotonic() + timeout)
+                pending.pop()
+            if not running:
+                break
+
+            nearest = min(deadline for _, deadline in running.values())
+            done, _ = wait(
+                running, timeout=max(nearest - time.monotonic(), 0), return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                index, _ = running.pop(future)
+                try:
+                    results[index] = future.result()
+                except BrokenProcessPool:
+                    self._discard_executor(future._executor_ref)
+                    results[index] = VerificationUnavailable("Face verification worker crashed")
+                except Exception as exc:  # noqa: BLE001
+                    logger.exception("Face verification job failed")
+                    results[index] = VerificationUnavailable(str(exc))
+            now = time.monotonic()
+            for future, (index, deadline) in list(running.items()):
+                if deadline <= now and not future.done():
+                    del running[future]
+                    self._mark_stuck(future)
+                    results[index] = VerificationTimeout("Face verification timed out")
+        return results
+
+    def _mark_stuck(self, future):
+        with self._lock:
+            if future.done():
+                return
+            future._timed_out = True
+            self._stuck += 1
+            recycle = self._stuck >= self.workers
+        if recycle:
+            logger.error("All face verification workers timed out; restarting the pool")
+            self._discard_executor(future._executor_ref, kill=True)
+
+    def warm(self):
+        """Start every worker now (running the initializer) instead of on first use."""
+        executor = self._get_executor()
+        for future in [executor.submit(_ping) for _ in range(self.workers)]:
+            try:
+                future.result(timeout=max(self.timeout, 60))
+            except Exception:  # noqa: BLE001
+                logger.exception("Face verification worker failed to start")
+                return False
+        return True
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """The process-wide pool, or None when FACE_VERIFICATION_WORKERS is 0."""
+    global _pool
+    workers = int(getattr(settings, "FACE_VERIFICATION_WORKERS", 0) or 0)
+    if workers <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = VerificationPool(
+                    workers=workers,
+                    queue_size=int(getattr(settings, "FACE_VERIFICATION_QUEUE_SIZE", 8)),
+                    timeout=float(getattr(settings, "FACE_VERIFICATION_TIMEOUT_SECONDS", 10)),
+                )
+    return _pool
+
+
+def set_pool(pool):
+    """Swap the process-wide pool (tests)."""
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, pool
+    if old is not None and old is not pool:
+        old.shutdown()
+
+
+def prewarm():
+    pool = get_pool()
+    if pool is None:
+        return False
+    return pool.warm()
+
+
+def _prewarm_logged():
+    try:
+        prewarm()
+    except Exception:  # noqa: BLE001
+        logger.exception("Face verification prewarm failed")
+
+
+def prewarm_in_background():
+    """
+    `prewarm()` in a daemon thread, for the server entry points (asgi.py,
+    wsgi.py): starting the detectors can take a minute, and worker boot
+    shouldn't wait for it. Only with FACE_VERIFICATION_PREWARM; otherwise
+    the workers start on the first verification. Returns the thread, or
+    None when nothing is warmed.
+    """
+    if not getattr(settings, "FACE_VERIFICATION_PREWARM", False) or get_pool() is None:
+        return None
+    thread = threading.Thread(target=_prewarm_logged, name="face-verification-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+def verify_face(image_bytes):
+    """
+    `verify_image_has_human_face` on the pool (inline when it's disabled),
+    answered from the content-hash cache when these bytes were seen before.
+    Raises VerificationUnavailable when no answer can be given right now.
+    """
+    if not image_bytes:
+        return False
+    result_cache = get_result_cache()
+    digest = content_digest(image_bytes) if result_cache.enabled else None
+    if digest is not None:
+        cached = result_cache.get(digest)
+        if cached is not None:
+            return cached
+
+    pool = get_pool()
+    if pool is None:
+        result = bool(verify_image_has_human_face(image_bytes))
+    else:
+        result = bool(pool.call(image_bytes))
+
+    if digest is not None:
+        result_cache.set(digest, result)
+    return result
+
+
+def verify_faces(images):
+    """
+    `verify_face` for several images at once: cached verdicts are answered
+    directly, duplicates are checked once, and the rest run concurrently
+    on the pool. Returns one entry per image, True/False or the
+    VerificationUnavailable explaining why there's no answer.
+    """
+    result_cache = get_result_cache()
+    results = [False] * len(images)
+    to_check = {}  # digest -> (image bytes, indexes)
+    for index, image_bytes in enumerate(images):
+        if not image_bytes:
+            continue
+        digest = content_digest(image_bytes)
+        if digest in to_check:
+            to_check[digest][1].append(index)
+            continue
+        cached = result_cache.get(digest)
+        if cached is not None:
+            results[index] = cached
+        else:
+            to_check[digest] = (image_bytes, [index])
+    if not to_check:
+        return results
+
+    digests = list(to_check)
+    batch = [to_check[digest][0] for digest in digests]
+    pool = get_pool()
+    if pool is None:
+        verdicts = [verify_image_has_human_face(image_bytes) for image_bytes in batch]
+    else:
+        verdicts = pool.call_many(batch)
+
+    for digest, verdict in zip(digests, verdicts):
+        if not isinstance(verdict, VerificationUnavailable):
+            verdict = bool(verdict)
+            result_cache.set(digest, verdict)
+        for index in to_check[digest][1]:
+            results[index] = verdict
+    return results
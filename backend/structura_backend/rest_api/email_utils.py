@@ -1,15 +1,13 @@
 from __future__ import annotations
 
 import logging
-import json
-import os
-import threading
 from email.utils import formataddr, parseaddr
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError, URLError
+from functools import partial
 
 from django.conf import settings
-from django.core.mail import EmailMessage
+from django.db import transaction
+
+from app.services import email_outbox
 
 
 logger = logging.getLogger(__name__)
@@ -51,26 +49,11 @@ def _send_email_best_effort(
     if not to_email:
         return
 
-    email_backend = getattr(settings, "EMAIL_BACKEND", "")
-    if email_backend.endswith("console.EmailBackend"):
-        logger.warning("Email backend is console; no real email will be delivered (to=%s)", to_email)
-
-    smtp_host = getattr(settings, "EMAIL_HOST", "")
-    smtp_port = getattr(settings, "EMAIL_PORT", None)
-    smtp_tls = getattr(settings, "EMAIL_USE_TLS", None)
-    smtp_user = getattr(settings, "EMAIL_HOST_USER", "")
-
     invited_by_email = (invited_by_email or "").strip()
     invited_by_name = (invited_by_name or "").strip()
-    reply_to = [invited_by_email] if invited_by_email else None
-
-    default_from_email = getattr(settings, "DEFAULT_FROM_EMAIL", None)
-    sendgrid_key = (getattr(settings, "SENDGRID_API_KEY", "") or "").strip()
-    sendgrid_from_override = (getattr(settings, "SENDGRID_FROM_EMAIL", "") or "").strip()
+    default_from_email = getattr(settings, "DEFAULT_FROM_EMAIL", None) or ""
 
     from_email = default_from_email
-    sender_header_value = default_from_email
-
     if invited_by_email and "@" in invited_by_email:
         _, parsed_email = parseaddr(invited_by_email)
         if parsed_email:
@@ -79,138 +62,26 @@ def _send_email_best_effort(
         else:
             logger.warning("Invalid invited_by_email for From header: %r", invited_by_email)
 
-    def _send_attempt(*, attempt_from: str | None, attempt_sender: str | None) -> None:
-        if sendgrid_key:
-            from_for_sendgrid = sendgrid_from_override or attempt_from or default_from_email
-            status = _send_via_sendgrid(
-                api_key=sendgrid_key,
-                subject=subject,
-                message=message,
-                to_email=to_email,
-                from_email=from_for_sendgrid,
-                reply_to=reply_to,
-            )
-            logger.info(
-                "Email sendgrid status=%s to=%s subject=%r from=%r reply_to=%r",
-                status,
-                to_email,
-                subject,
-                from_for_sendgrid,
-                reply_to,
-            )
-            return
-
-        email = EmailMessage(
+    # Delivered (and retried) by `manage.py run_email_worker`; the row
+    # commits or rolls back with the caller's transaction. Without a
+    # worker (local runserver), EMAIL_OUTBOX_DELIVER_INLINE sends it
+    # right after the commit.
+    try:
+        queued = email_outbox.enqueue(
+            to_email=to_email,
             subject=subject,
             body=message,
-            from_email=attempt_from,
-            to=[to_email],
-            reply_to=reply_to,
-            headers={"Sender": attempt_sender} if attempt_sender else None,
+            from_email=from_email,
+            fallback_from_email=default_from_email,
+            sender_header=default_from_email,
+            reply_to=invited_by_email,
         )
-        sent_count = email.send(fail_silently=False)
-        logger.info(
-            "Email send result=%s to=%s subject=%r from=%r sender=%r reply_to=%r",
-            sent_count,
-            to_email,
-            subject,
-            attempt_from,
-            attempt_sender,
-            reply_to,
-        )
-
-    def _send_background() -> None:
-        try:
-            _send_attempt(attempt_from=from_email, attempt_sender=sender_header_value)
-            return
-        except Exception:
-            logger.exception(
-                "Failed sending email (to=%s subject=%r from=%r sender=%r reply_to=%r smtp_host=%r smtp_port=%r smtp_tls=%r smtp_user=%r backend=%r)",
-                to_email,
-                subject,
-                from_email,
-                sender_header_value,
-                reply_to,
-                smtp_host,
-                smtp_port,
-                smtp_tls,
-                smtp_user,
-                email_backend,
-            )
-
-        if default_from_email and from_email != default_from_email:
-            try:
-                _send_attempt(attempt_from=default_from_email, attempt_sender=None)
-            except Exception:
-                logger.exception(
-                    "Email fallback also failed (to=%s subject=%r from=%r reply_to=%r smtp_host=%r smtp_port=%r smtp_tls=%r smtp_user=%r backend=%r)",
-                    to_email,
-                    subject,
-                    default_from_email,
-                    reply_to,
-                    smtp_host,
-                    smtp_port,
-                    smtp_tls,
-                    smtp_user,
-                    email_backend,
-                )
-
-    threading.Thread(target=_send_background, daemon=True).start()
-
-
-def _send_via_sendgrid(
-    *,
-    api_key: str,
-    subject: str,
-    message: str,
-    to_email: str,
-    from_email: str | None,
-    reply_to: list[str] | None,
-) -> int:
-    """Send using SendGrid v3 API. Returns HTTP status code (202 means accepted)."""
-
-    from_name, from_addr = parseaddr(from_email or "")
-    if not from_addr:
-        # Fallback to env var if DEFAULT_FROM_EMAIL isn't a real address.
-        from_name, from_addr = parseaddr(os.getenv("SENDGRID_FROM_EMAIL", ""))
-
-    if not from_addr:
-        raise ValueError("SendGrid from_email is not configured")
-
-    payload: dict = {
-        "personalizations": [{"to": [{"email": to_email}], "subject": subject}],
-        "from": {"email": from_addr},
-        "content": [{"type": "text/plain", "value": message}],
-    }
-    if from_name:
-        payload["from"]["name"] = from_name
-
-    if reply_to and reply_to[0]:
-        payload["reply_to"] = {"email": reply_to[0]}
-
-    body = json.dumps(payload).encode("utf-8")
-    req = Request(
-        "https://api.sendgrid.com/v3/mail/send",
-        data=body,
-        method="POST",
-        headers={
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json",
-        },
-    )
+    except Exception:
+        logger.exception("Failed queueing email (to=%s subject=%r)", to_email, subject)
+        return
 
-    try:
-        with urlopen(req, timeout=20) as resp:
-            return int(getattr(resp, "status", 0) or 0)
-    except HTTPError as e:
-        # Consume body for better logs.
-        try:
-            details = e.read().decode("utf-8", errors="replace")
-        except Exception:
-            details = "<unable to read body>"
-        raise RuntimeError(f"SendGrid HTTPError {e.code}: {details}")
-    except URLError as e:
-        raise RuntimeError(f"SendGrid URLError: {e}")
+    if getattr(settings, "EMAIL_OUTBOX_DELIVER_INLINE", False):
+        transaction.on_commit(partial(email_outbox.deliver_now, queued.pk))
 
 
 def send_invitation_email(
@@ -469,7 +340,7 @@ def send_phase_update_summary_email(
 
 
 def send_signup_otp_email(*, to_email: str, otp_code: str) -> None:
-    """Send signup OTP email in a best-effort background thread."""
+    """Queue the signup OTP email (see app.services.email_outbox)."""
     app_name = getattr(settings, "APP_NAME", "Structura")
     subject = f"{app_name} signup verification code"
     message = "\n".join(
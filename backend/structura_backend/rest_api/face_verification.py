@@ -0,0 +1,53 @@
+"""
+API-side wrapper around the face-verification pool (`app.verification_pool`).
+
+`has_human_face()` is what views and serializers call. When the pool can't
+answer (saturated, timed out, worker crashed) it raises
+`FaceVerificationUnavailable`, which DRF renders as 503 with a
+`Retry-After` header; the photo is neither accepted nor rejected.
+`has_human_faces()` is the batch form used by `image-verification/batch/`.
+"""
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from app.verification_pool import (
+    VerificationBusy,
+    VerificationUnavailable,
+    verify_face,
+    verify_faces,
+)
+
+
+class FaceVerificationUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Photo verification is busy right now. Please try again in a few seconds.'
+    default_code = 'face_verification_unavailable'
+
+    def __init__(self, detail=None, code=None, wait=5):
+        super().__init__(detail, code)
+        # Sent as Retry-After by DRF's exception handler.
+        self.wait = wait
+
+
+def has_human_face(image_bytes):
+    try:
+        return verify_face(image_bytes)
+    except VerificationBusy:
+        raise FaceVerificationUnavailable(wait=2)
+    except VerificationUnavailable:
+        raise FaceVerificationUnavailable()
+
+
+def has_human_faces(images):
+    """
+    One True/False per image. If any image couldn't be checked the whole
+    batch is answered 503; the verdicts already reached are cached, so the
+    retry only runs the missing ones.
+    """
+    results = verify_faces(images)
+    unavailable = [r for r in results if isinstance(r, VerificationUnavailable)]
+    if unavailable:
+        busy = all(isinstance(r, VerificationBusy) for r in unavailable)
+        raise FaceVerificationUnavailable(wait=2 if busy else 5)
+    return results
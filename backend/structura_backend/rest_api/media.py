@@ -0,0 +1,190 @@
+"""
+Media serving with cache validators and byte ranges.
+
+Replaces `django.views.static.serve` under `MEDIA_URL`, which sent no
+validators, so the app re-downloaded every worker/subtask photo on each
+list render. Every response carries:
+
+    ETag            strong, the SHA-256 of the file's bytes
+    Last-Modified   the file's mtime
+    Accept-Ranges   bytes
+    Cache-Control   `public, max-age=31536000, immutable` for derivatives
+                    (their names embed a content hash, see
+                    app.services.image_derivatives); `no-cache` for
+                    originals, which can be replaced under the same name,
+                    so clients revalidate (a 304) instead of re-downloading.
+
+Conditional requests: `If-None-Match` (then `If-Modified-Since`) answer
+304. `Range: bytes=...` with a single range answers 206 (416 when
+unsatisfiable); `If-Range` that doesn't match sends the whole file.
+Multi-range requests get the whole file, which RFC 9110 allows.
+
+The ETag is the digest `ContentAddressedStorage` recorded on the file's
+inode when it was stored (`app.content_storage.stored_digest`), so serving
+never hashes. The tag is only trusted while the file's size and mtime
+match the ones recorded with it; files stored before that, or changed
+since, are hashed once per version and tagged again on the spot.
+
+Bodies are streamed for the server in use (see rest_api/streaming.py):
+under ASGI an async iterator reading 64 KiB per chunk in a worker thread;
+under WSGI `FileResponse` (sendfile where available) or a sync generator
+for ranges. Nothing is read into memory whole.
+"""
+
+import mimetypes
+import os
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.http import StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+
+from app.content_storage import file_digest, stored_digest, tag_digest
+
+from .streaming import aiter_file, is_asgi, iter_file
+
+
+IMMUTABLE_PREFIXES = ('derivatives/',)
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+@lru_cache(maxsize=4096)
+def _digest(path, inode, size, mtime_ns):
+    digest = file_digest(path)
+    tag_digest(path, digest)
+    return digest
+
+
+def file_etag(path, stat):
+    digest = stored_digest(path, stat)
+    if digest is None:
+        # Stored before digests were recorded, changed since it was tagged,
+        # or no xattr support here: hash once per file version, and record
+        # it where possible.
+        digest = _digest(path, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    return f'"{digest}"'
+
+
+def _etag_matches(header, etag):
+    if header.strip() == '*':
+        return True
+    # If-None-Match uses the weak comparison.
+    candidates = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+    return etag in candidates
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since') or '')
+    return since is not None and int(mtime) <= since
+
+
+def _parse_range(header, size):
+    """(start, end) inclusive for a single satisfiable range, 'invalid', or None."""
+    match = _RANGE_RE.match(header.replace(' ', ''))
+    if match is None:
+        return None  # Unsupported or multi-range: serve everything.
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            return 'invalid'
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        return 'invalid'
+    return start, end
+
+
+def _if_range_allows(request, etag, mtime):
+    if_range = request.headers.get('If-Range')
+    if if_range is None:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag  # strong comparison
+    since = parse_http_date_safe(if_range)
+    return since is not None and int(mtime) <= since
+
+
+def _cache_control(path):
+    if path.startswith(IMMUTABLE_PREFIXES):
+        return IMMUTABLE_CACHE_CONTROL
+    return REVALIDATE_CACHE_CONTROL
+
+
+def serve_media(request, path, document_root=None):
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponse(status=405, headers={'Allow': 'GET, HEAD'})
+    document_root = document_root or settings.MEDIA_ROOT
+    try:
+        full_path = safe_join(document_root, path)
+    except Exception:
+        raise Http404('Not found')
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404('Not found')
+    if not os.path.isfile(full_path):
+        raise Http404('Not found')
+
+    etag = file_etag(full_path, stat)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': _cache_control(path),
+        'Accept-Ranges': 'bytes',
+    }
+    if _not_modified(request, etag, stat.st_mtime):
+        response = HttpResponseNotModified()
+        for key, value in headers.items():
+            response[key] = value
+        return response
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    size = stat.st_size
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if range_header and _if_range_allows(request, etag, stat.st_mtime):
+        byte_range = _parse_range(range_header, size)
+    if byte_range == 'invalid':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        for key, value in headers.items():
+            response[key] = value
+        return response
+
+    start, length, status = 0, size, 200
+    if byte_range is not None:
+        start, end = byte_range
+        length, status = end - start + 1, 206
+    if is_asgi(request):
+        response = StreamingHttpResponse(
+            aiter_file(full_path, start, length), status=status, content_type=content_type
+        )
+    elif byte_range is None:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    else:
+        response = StreamingHttpResponse(
+            iter_file(full_path, start, length), status=status, content_type=content_type
+        )
+    response['Content-Length'] = str(length)
+    if byte_range is not None:
+        response['Content-Range'] = f'bytes {start}-{byte_range[1]}/{size}'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    for key, value in headers.items():
+        response[key] = value
+    return response
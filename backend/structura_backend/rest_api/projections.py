@@ -0,0 +1,189 @@
+"""
+Serializer-free read path for the hot list endpoints.
+
+A `Projection` declares, field by field, how to build a serializer's JSON
+shape from `.values()` rows: which column(s) to fetch and how to format
+them. Listing then costs one flat query and a dict per row, with no model
+instances and no per-row serializer/field machinery.
+
+Values are formatted with the same DRF field classes the serializers use
+(dates, times, decimals), so the output is identical; `tests.py` keeps
+each projection in parity with its serializer. When a serializer gains a
+field, add it here too.
+
+    rows = AttendanceProjection.values(queryset)   # lazy .values() queryset
+    data = AttendanceProjection.render(rows)       # list of dicts
+"""
+
+from rest_framework import serializers
+
+
+def _formatter(field):
+    to_representation = field.to_representation
+    return lambda value: None if value is None else to_representation(value)
+
+
+DATE = _formatter(serializers.DateField())
+TIME = _formatter(serializers.TimeField())
+DATETIME = _formatter(serializers.DateTimeField())
+MONEY = _formatter(serializers.DecimalField(max_digits=12, decimal_places=2))
+
+
+class Col:
+    """One `.values()` lookup, optionally passed through a formatter."""
+
+    def __init__(self, lookup, format=None):
+        self.lookups = (lookup,)
+        self.format = format
+
+    def __call__(self, row):
+        value = row[self.lookups[0]]
+        return value if self.format is None else self.format(value)
+
+
+class Computed:
+    """`fn(*values)` over several lookups, e.g. a display name."""
+
+    def __init__(self, fn, *lookups):
+        self.lookups = lookups
+        self.fn = fn
+
+    def __call__(self, row):
+        return self.fn(*(row[lookup] for lookup in self.lookups))
+
+
+# Returned by a spec to leave its key out of the row.
+SKIP = object()
+
+
+class Source:
+    """
+    A `source='rel.attr'` field: like DRF, the key is left out of the row
+    entirely when the relation is unset.
+    """
+
+    def __init__(self, fk_lookup, lookup):
+        self.lookups = (fk_lookup, lookup)
+
+    def __call__(self, row):
+        if row[self.lookups[0]] is None:
+            return SKIP
+        return row[self.lookups[1]]
+
+
+def display_name(pk, first_name, last_name):
+    """`"First Last"` of an optional related person, '' when unset."""
+    if pk is None:
+        return ''
+    return f'{first_name} {last_name}'.strip()
+
+
+def related_attr(pk, value):
+    """`obj.rel.attr if obj.rel else ''`."""
+    return value if pk is not None else ''
+
+
+class Projection:
+    """
+    Subclasses set `fields` to `(output key, Col | Computed | Source)` pairs
+    in the serializer's field order.
+    """
+
+    fields = ()
+
+    @classmethod
+    def lookups(cls):
+        seen = []
+        for _, spec in cls.fields:
+            for lookup in spec.lookups:
+                if lookup not in seen:
+                    seen.append(lookup)
+        return seen
+
+    @classmethod
+    def values(cls, queryset):
+        return queryset.values(*cls.lookups())
+
+    @classmethod
+    def render(cls, rows):
+        fields = cls.fields
+        out = []
+        for row in rows:
+            item = {}
+            for key, spec in fields:
+                value = spec(row)
+                if value is not SKIP:
+                    item[key] = value
+            out.append(item)
+        return out
+
+
+class AttendanceProjection(Projection):
+    """`AttendanceSerializer`."""
+
+    fields = (
+        ('attendance_id', Col('attendance_id')),
+        ('field_worker', Col('field_worker_id')),
+        (
+            'field_worker_name',
+            Computed(
+                lambda first, last: f'{first} {last}',
+                'field_worker__first_name',
+                'field_worker__last_name',
+            ),
+        ),
+        ('project', Col('project_id')),
+        ('attendance_date', Col('attendance_date', DATE)),
+        ('check_in_time', Col('check_in_time', TIME)),
+        ('check_out_time', Col('check_out_time', TIME)),
+        ('break_in_time', Col('break_in_time', TIME)),
+        ('break_out_time', Col('break_out_time', TIME)),
+        ('status', Col('status')),
+        ('created_at', Col('created_at', DATETIME)),
+        ('updated_at', Col('updated_at', DATETIME)),
+    )
+
+
+class InventoryUsageProjection(Projection):
+    """`InventoryUsageSerializer`."""
+
+    fields = (
+        ('usage_id', Col('usage_id')),
+        ('inventory_item', Col('inventory_item_id')),
+        ('inventory_item_name', Source('inventory_item_id', 'inventory_item__name')),
+        ('inventory_unit', Col('inventory_unit_id')),
+        ('unit_code', Computed(related_attr, 'inventory_unit_id', 'inventory_unit__unit_code')),
+        ('checked_out_by', Col('checked_out_by_id')),
+        (
+            'supervisor_name',
+            Computed(
+                display_name,
+                'checked_out_by_id',
+                'checked_out_by__first_name',
+                'checked_out_by__last_name',
+            ),
+        ),
+        ('field_worker', Col('field_worker_id')),
+        (
+            'field_worker_name',
+            Computed(
+                display_name,
+                'field_worker_id',
+                'field_worker__first_name',
+                'field_worker__last_name',
+            ),
+        ),
+        ('project', Col('project_id')),
+        ('project_name', Computed(related_attr, 'project_id', 'project__project_name')),
+        ('phase', Col('phase_id')),
+        ('phase_name', Source('phase_id', 'phase__phase_name')),
+        ('quantity_used', Col('quantity_used')),
+        ('unit_price_at_use', Col('unit_price_at_use', MONEY)),
+        ('total_cost', Col('total_cost', MONEY)),
+        ('checkout_date', Col('checkout_date', DATETIME)),
+        ('expected_return_date', Col('expected_return_date', DATE)),
+        ('actual_return_date', Col('actual_return_date', DATETIME)),
+        ('status', Col('status')),
+        ('purpose', Col('purpose')),
+        ('notes', Col('notes')),
+    )
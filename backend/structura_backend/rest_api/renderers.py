@@ -0,0 +1,103 @@
+"""
+JSON renderers.
+
+`FastJSONRenderer` is the default (`REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']`).
+It encodes with orjson, which builds the bytes in C instead of walking the
+payload in Python; on the Decimal/datetime-heavy list and dashboard
+payloads most of the render time is the encoder itself.
+
+Output matches DRF's `JSONRenderer`:
+    - compact separators, UTF-8, U+2028/U+2029 escaped
+    - anything orjson doesn't encode natively, including date/datetime
+      (passed through on purpose: DRF writes UTC as `Z`) and Decimal, is
+      handed to DRF's own `JSONEncoder.default`. Serializer fields already
+      turn Decimals into strings ("1250.00"); a raw Decimal put straight
+      into a `Response` stays a number, as before.
+    - floats keep their digits; only the exponent spelling of very large
+      or small magnitudes differs (`1e16` vs `1e+16`, `0.00001` vs
+      `1e-05`), and non-finite floats become `null` where the stdlib
+      encoder raises (STRICT_JSON, the default) or writes `NaN`.
+
+The stdlib path is used instead when orjson isn't installed, when the
+client asks for indentation (`Accept: application/json; indent=4`, the
+browsable API), when UNICODE_JSON / COMPACT_JSON are changed from their
+defaults, or when orjson rejects a value (e.g. integers beyond 64 bits).
+
+`StdJSONRenderer` is the reference encoder, still negotiable with
+`?format=json-std` for comparing output.
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+_LINE_SEPARATOR = '\u2028'.encode()
+_PARAGRAPH_SEPARATOR = '\u2029'.encode()
+
+
+_drf_default = JSONEncoder().default
+
+
+def _default(obj):
+    """
+    DRF's `JSONEncoder.default`, with its common cases inlined: the
+    isinstance chain there costs more than orjson's whole encode.
+    """
+    kind = type(obj)
+    if kind is datetime:
+        representation = obj.isoformat()
+        if representation.endswith('+00:00'):
+            representation = representation[:-6] + 'Z'
+        return representation
+    if kind is date:
+        return obj.isoformat()
+    if kind is Decimal:
+        return float(obj)
+    return _drf_default(obj)
+
+
+class StdJSONRenderer(JSONRenderer):
+    """DRF's stdlib-json renderer, reachable with `?format=json-std`."""
+
+    format = 'json-std'
+
+
+class FastJSONRenderer(JSONRenderer):
+    options = (
+        orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if orjson is not None
+        else 0
+    )
+
+    def _fast_path_allowed(self, indent):
+        return (
+            orjson is not None
+            and indent is None
+            and self.compact
+            and not self.ensure_ascii
+        )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if not self._fast_path_allowed(indent):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_default, option=self.options)
+        except TypeError:
+            # orjson.JSONEncodeError is a TypeError.
+            return super().render(data, accepted_media_type, renderer_context)
+        if _LINE_SEPARATOR in ret or _PARAGRAPH_SEPARATOR in ret:
+            ret = ret.replace(_LINE_SEPARATOR, b'\\u2028').replace(
+                _PARAGRAPH_SEPARATOR, b'\\u2029'
+            )
+        return ret
@@ -1,9 +1,13 @@
 from rest_framework import serializers
 from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.db.models.manager import BaseManager
+from collections import namedtuple
 from decimal import Decimal, ROUND_HALF_UP
 from .email_utils import send_invitation_email, send_project_assignment_email
 from app import models
-from app.image_verification import verify_image_has_human_face
+from app.services.image_derivatives import variant_urls
+from .face_verification import has_human_face
 from app.services.budget_validation import (
     check_project_budget,
     check_phase_allocation,
@@ -67,6 +71,95 @@ def _weekly_statutory_minimums(weekly_salary):
     }
 
 
+def _csv_param(params, name):
+    """`?name=a,b` as a set; None when the parameter is absent."""
+    if name not in params:
+        return None
+    return {
+        part.strip()
+        for raw in params.getlist(name)
+        for part in raw.split(',')
+        if part.strip()
+    }
+
+
+class FieldSelectionMixin:
+    """
+    Sparse fieldsets for GET responses of the top-level serializer:
+
+        ?fields=a,b    only these fields
+        ?omit=a,b      everything but these
+        ?expand=a,b    of the expensive fields (`Meta.expensive_fields`),
+                       only these; `?expand=` alone drops them all
+
+    Without any of the parameters the full representation is returned.
+    Dropped fields are removed before serialization, so their
+    SerializerMethodField (and any page loader keyed on them) never runs.
+    Unknown names are ignored. Writes and nested serializers are never
+    filtered.
+    """
+
+    def _field_selection(self):
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return None
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is not None:
+            return None
+        params = getattr(request, 'query_params', request.GET)
+        only = _csv_param(params, 'fields')
+        omit = _csv_param(params, 'omit') or set()
+        expand = _csv_param(params, 'expand')
+        if not only:
+            only = None
+        if only is None and not omit and expand is None:
+            return None
+        return only, omit, expand
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = self._field_selection()
+        if selection is None:
+            return fields
+        only, omit, expand = selection
+        expensive = set(getattr(self.Meta, 'expensive_fields', ()))
+        for name in list(fields):
+            if (
+                (only is not None and name not in only)
+                or name in omit
+                or (expand is not None and name in expensive and name not in expand)
+            ):
+                fields.pop(name)
+        return fields
+
+
+class PhotoVariantsField(serializers.Field):
+    """
+    Read-only `{size: {ext: url}}` of a photo's derivatives (avatar, card,
+    full; see app.services.image_derivatives), or None until they exist.
+    Comes from the manifest column on the row: no storage calls.
+    """
+
+    def __init__(self, source_attr='photo', manifest_attr='photo_variants', **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+        self.source_attr = source_attr
+        self.manifest_attr = manifest_attr
+
+    def to_representation(self, obj):
+        source = getattr(obj, self.source_attr, None)
+        source_name = getattr(source, 'name', source) or ''
+        request = self.context.get('request')
+        return variant_urls(
+            getattr(obj, self.manifest_attr, None),
+            source_name,
+            build_url=request.build_absolute_uri if request is not None else None,
+        )
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.User
@@ -154,15 +247,25 @@ class ProjectSerializer(serializers.ModelSerializer):
     client_email = serializers.CharField(source='client.email', read_only=True)
     client_phone_number = serializers.CharField(source='client.phone_number', read_only=True)
     client_photo = serializers.CharField(source='client.photo', read_only=True)
-    remaining_budget = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
-    total_used_budget = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
-    total_allocated_budget = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    project_image_variants = PhotoVariantsField('project_image', 'project_image_variants')
+    # Read the budget ledger's running totals off the row instead of the
+    # aggregating model properties.
+    remaining_budget = serializers.DecimalField(
+        source='cached_remaining_budget', max_digits=12, decimal_places=2, read_only=True
+    )
+    total_used_budget = serializers.DecimalField(
+        source='used_materials_budget', max_digits=14, decimal_places=2, read_only=True
+    )
+    total_allocated_budget = serializers.DecimalField(
+        source='allocated_budget_total', max_digits=14, decimal_places=2, read_only=True
+    )
     
     class Meta:
         model = models.Project
         fields = [
             'project_id',
             'project_image',
+            'project_image_variants',
             'project_name',
             'description',
             'user',
@@ -319,6 +422,7 @@ class ProjectSerializer(serializers.ModelSerializer):
 
 
 class SupervisorsSerializer(serializers.ModelSerializer):
+    photo_variants = PhotoVariantsField()
     invited_by_email = serializers.EmailField(
         write_only=True,
         required=False,
@@ -361,6 +465,7 @@ class SupervisorsSerializer(serializers.ModelSerializer):
             'pagibig_id',
             'payrate',
             'photo',
+            'photo_variants',
             'has_completed_quick_tour',
             'created_at',
         ]
@@ -420,7 +525,7 @@ class SupervisorsSerializer(serializers.ModelSerializer):
         except Exception:
             return value  # Let model/save handle file errors; don't block unexpectedly.
 
-        if not verify_image_has_human_face(image_bytes):
+        if not has_human_face(image_bytes):
             raise serializers.ValidationError({
                 'image_verification': 'REJECT',
                 'detail': 'No human face detected. Please upload another photo containing the face of a human.',
@@ -429,6 +534,7 @@ class SupervisorsSerializer(serializers.ModelSerializer):
 
 
 class SupervisorSerializer(serializers.ModelSerializer):
+    photo_variants = PhotoVariantsField()
     invited_by_email = serializers.EmailField(
         write_only=True,
         required=False,
@@ -471,6 +577,7 @@ class SupervisorSerializer(serializers.ModelSerializer):
             'pagibig_id',
             'payrate',
             'photo',
+            'photo_variants',
             'has_completed_quick_tour',
             'created_at',
         ]
@@ -528,7 +635,7 @@ class SupervisorSerializer(serializers.ModelSerializer):
         except Exception:
             return value
 
-        if not verify_image_has_human_face(image_bytes):
+        if not has_human_face(image_bytes):
             raise serializers.ValidationError({
                 'image_verification': 'REJECT',
                 'detail': 'No human face detected. Please upload another photo containing the face of a human.',
@@ -551,7 +658,52 @@ class FieldWorkerDamageSerializer(serializers.ModelSerializer):
         ]
 
 
-class FieldWorkerSerializer(serializers.ModelSerializer):
+# Computed from the worker's SubtaskFieldWorker rows.
+_FIELD_WORKER_ASSIGNMENT_FIELDS = frozenset({
+    'assignment_status',
+    'assigned_projects',
+    'shift_schedule',
+    'current_project_shift_start',
+    'current_project_shift_end',
+})
+
+
+class FieldWorkerListSerializer(serializers.ListSerializer):
+    """
+    Loads every SubtaskFieldWorker row for the page in one query and hands
+    the per-worker lists to the child, instead of 4 queries per worker.
+    """
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, BaseManager) else data
+        workers = list(iterable)
+        if _FIELD_WORKER_ASSIGNMENT_FIELDS & set(self.child.fields):
+            self.child._assignment_map = load_field_worker_assignments(workers)
+        try:
+            return [self.child.to_representation(item) for item in workers]
+        finally:
+            self.child._assignment_map = None
+
+
+def load_field_worker_assignments(workers):
+    """`{fieldworker_id: [SubtaskFieldWorker, ...]}` in per-worker query order."""
+    worker_ids = [w.fieldworker_id for w in workers]
+    assignment_map = {worker_id: [] for worker_id in worker_ids}
+    if not worker_ids:
+        return assignment_map
+    rows = (
+        models.SubtaskFieldWorker.objects
+        .filter(field_worker_id__in=worker_ids)
+        .select_related('subtask__phase__project')
+        .order_by('assigned_at', 'assignment_id')
+    )
+    for row in rows:
+        assignment_map[row.field_worker_id].append(row)
+    return assignment_map
+
+
+class FieldWorkerSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    photo_variants = PhotoVariantsField()
     assignment_status = serializers.SerializerMethodField()
     assigned_projects = serializers.SerializerMethodField()
     shift_schedule = serializers.SerializerMethodField()
@@ -561,6 +713,8 @@ class FieldWorkerSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = models.FieldWorker
+        list_serializer_class = FieldWorkerListSerializer
+        expensive_fields = _FIELD_WORKER_ASSIGNMENT_FIELDS
         fields = [
             'fieldworker_id',
             'user_id',
@@ -594,6 +748,7 @@ class FieldWorkerSerializer(serializers.ModelSerializer):
             'total_weekly_deduction',
             'net_weekly_pay',
             'photo',
+            'photo_variants',
             'assignment_status',
             'assigned_projects',
             'shift_schedule',
@@ -640,6 +795,23 @@ class FieldWorkerSerializer(serializers.ModelSerializer):
             'damages_pm_covers': {'required': False},
         }
 
+    _assignment_map = None
+
+    def _get_assignments(self, obj):
+        """The worker's assignment rows, from the page loader when present."""
+        if self._assignment_map is not None and obj.fieldworker_id in self._assignment_map:
+            return self._assignment_map[obj.fieldworker_id]
+        return list(
+            models.SubtaskFieldWorker.objects
+            .filter(field_worker_id=obj.fieldworker_id)
+            .select_related('subtask__phase__project')
+            .order_by('assigned_at', 'assignment_id')
+        )
+
+    @staticmethod
+    def _assignment_project_id(assignment):
+        return getattr(getattr(assignment.subtask, 'phase', None), 'project_id', None)
+
     def get_assignment_status(self, obj):
         """
         Determine if a field worker is 'Available' or 'Assigned' to another project.
@@ -656,13 +828,11 @@ class FieldWorkerSerializer(serializers.ModelSerializer):
             return 'Available'
         
         # Check if this worker is assigned to ANY subtask in OTHER projects
-        from django.db.models import Q
-        other_project_assignments = models.SubtaskFieldWorker.objects.filter(
-            field_worker_id=obj.fieldworker_id
-        ).filter(
-            Q(subtask__phase__project_id__isnull=True) |  # Subtasks without a project
-            ~Q(subtask__phase__project_id=current_project_id)  # OR subtasks in other projects
-        ).exists()
+        # (or to a subtask without a project)
+        other_project_assignments = any(
+            self._assignment_project_id(row) != current_project_id
+            for row in self._get_assignments(obj)
+        )
         
         if other_project_assignments:
             return 'Assigned'
@@ -674,12 +844,7 @@ class FieldWorkerSerializer(serializers.ModelSerializer):
         if obj.project_id is not None:
             project_map[obj.project_id.project_id] = obj.project_id.project_name
 
-        assigned = (
-            models.SubtaskFieldWorker.objects
-            .filter(field_worker_id=obj.fieldworker_id)
-            .select_related('subtask__phase__project')
-        )
-        for row in assigned:
+        for row in self._get_assignments(obj):
             project = getattr(getattr(row.subtask, 'phase', None), 'project', None)
             if project is not None:
                 project_map[project.project_id] = project.project_name
@@ -690,15 +855,9 @@ class FieldWorkerSerializer(serializers.ModelSerializer):
         ]
 
     def get_shift_schedule(self, obj):
-        assignments = (
-            models.SubtaskFieldWorker.objects
-            .filter(field_worker_id=obj.fieldworker_id)
-            .select_related('subtask__phase__project')
-        )
-
         formatted_ranges = []
         seen = set()
-        for assignment in assignments:
+        for assignment in self._get_assignments(obj):
             shift_start = assignment.shift_start
             shift_end = assignment.shift_end
             if shift_start is None and shift_end is None:
@@ -722,17 +881,15 @@ class FieldWorkerSerializer(serializers.ModelSerializer):
         current_project_id = self.context.get('current_project_id')
         if current_project_id is None:
             return None
-        return (
-            models.SubtaskFieldWorker.objects
-            .filter(
-                field_worker_id=obj.fieldworker_id,
-                subtask__phase__project_id=current_project_id,
-                shift_start__isnull=False,
-                shift_end__isnull=False,
-            )
-            .order_by('shift_start', 'assignment_id')
-            .first()
-        )
+        candidates = [
+            row for row in self._get_assignments(obj)
+            if self._assignment_project_id(row) == current_project_id
+            and row.shift_start is not None
+            and row.shift_end is not None
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda row: (row.shift_start, row.assignment_id))
 
     def get_current_project_shift_start(self, obj):
         assignment = self._get_current_project_shift_assignment(obj)
@@ -845,7 +1002,7 @@ class FieldWorkerSerializer(serializers.ModelSerializer):
         except Exception:
             return value
 
-        if not verify_image_has_human_face(image_bytes):
+        if not has_human_face(image_bytes):
             raise serializers.ValidationError({
                 'image_verification': 'REJECT',
                 'detail': 'No human face detected. Please upload another photo containing the face of a human.',
@@ -866,6 +1023,7 @@ class FieldWorkerSerializer(serializers.ModelSerializer):
 
 
 class ClientSerializer(serializers.ModelSerializer):
+    photo_variants = PhotoVariantsField()
     invited_by_email = serializers.EmailField(
         write_only=True,
         required=False,
@@ -904,6 +1062,7 @@ class ClientSerializer(serializers.ModelSerializer):
             'city',
             'barangay',
             'photo',
+            'photo_variants',
             'has_completed_quick_tour',
             'status',
             'created_at',
@@ -969,7 +1128,7 @@ class ClientSerializer(serializers.ModelSerializer):
         except Exception:
             return value
 
-        if not verify_image_has_human_face(image_bytes):
+        if not has_human_face(image_bytes):
             raise serializers.ValidationError({
                 'image_verification': 'REJECT',
                 'detail': 'No human face detected. Please upload another photo containing the face of a human.',
@@ -1054,7 +1213,31 @@ class BackJobReviewSerializer(serializers.ModelSerializer):
         return 'Client'
 
 
-class SubtaskSerializer(serializers.ModelSerializer):
+def subtask_prefetches(prefix=''):
+    """
+    Prefetch objects that SubtaskSerializer reads instead of querying per
+    subtask. `prefix` is the lookup path to the subtasks, e.g. 'subtasks__'
+    when prefetching through Phase.
+    """
+    return [
+        Prefetch(
+            f'{prefix}assigned_workers',
+            queryset=models.SubtaskFieldWorker.objects.select_related('field_worker'),
+        ),
+        Prefetch(f'{prefix}update_photos'),
+        Prefetch(
+            f'{prefix}completion_revert_requests',
+            queryset=(
+                models.SubtaskCompletionRevertRequest.objects
+                .filter(status=models.SubtaskCompletionRevertRequest.STATUS_PENDING)
+                .order_by('-created_at')
+            ),
+            to_attr='pending_revert_requests',
+        ),
+    ]
+
+
+class SubtaskSerializer(FieldSelectionMixin, serializers.ModelSerializer):
     """`phase` is always a single id; never a nested object (avoids stack overflow with PhaseSerializer)."""
     phase = serializers.PrimaryKeyRelatedField(
         queryset=models.Phase.objects.all(),
@@ -1079,6 +1262,7 @@ class SubtaskSerializer(serializers.ModelSerializer):
             'update_photos',
             'pending_revert_request',
         ]
+        expensive_fields = ['assigned_workers', 'update_photos', 'pending_revert_request']
         extra_kwargs = {
             'subtask_id': {'read_only': True},
             'created_at': {'read_only': True},
@@ -1087,7 +1271,10 @@ class SubtaskSerializer(serializers.ModelSerializer):
         }
 
     def get_assigned_workers(self, obj):
-        assignments = obj.assigned_workers.select_related('field_worker')
+        if 'assigned_workers' in getattr(obj, '_prefetched_objects_cache', {}):
+            assignments = obj.assigned_workers.all()
+        else:
+            assignments = obj.assigned_workers.select_related('field_worker')
         workers = []
         for assignment in assignments:
             worker = assignment.field_worker
@@ -1110,6 +1297,9 @@ class SubtaskSerializer(serializers.ModelSerializer):
                 'phone_number': worker.phone_number,
                 'role': worker.role,
                 'photo': photo_url,
+                'photo_variants': variant_urls(
+                    worker.photo_variants, getattr(worker.photo, 'name', None)
+                ),
             })
         return workers
 
@@ -1128,18 +1318,25 @@ class SubtaskSerializer(serializers.ModelSerializer):
                 {
                     'photo_id': photo.photo_id,
                     'photo': photo_path,
+                    'photo_variants': variant_urls(
+                        photo.photo_variants, getattr(photo.photo, 'name', None)
+                    ),
                     'created_at': created.isoformat() if created is not None else None,
                 }
             )
         return out
 
     def get_pending_revert_request(self, obj):
-        req = (
-            obj.completion_revert_requests
-            .filter(status=models.SubtaskCompletionRevertRequest.STATUS_PENDING)
-            .order_by('-created_at')
-            .first()
-        )
+        prefetched = getattr(obj, 'pending_revert_requests', None)
+        if prefetched is not None:
+            req = prefetched[0] if prefetched else None
+        else:
+            req = (
+                obj.completion_revert_requests
+                .filter(status=models.SubtaskCompletionRevertRequest.STATUS_PENDING)
+                .order_by('-created_at')
+                .first()
+            )
         if not req:
             return None
         return {
@@ -1760,13 +1957,153 @@ class InventoryUnitSerializer(serializers.ModelSerializer):
         return obj.current_project.project_name if obj.current_project else ''
 
     def get_active_usage(self, obj):
-        usage = obj.usages.filter(status='Checked Out').order_by('-checkout_date').first()
+        prefetched = getattr(obj, 'checked_out_usages', None)
+        if prefetched is not None:
+            usage = prefetched[0] if prefetched else None
+        else:
+            usage = obj.usages.filter(status='Checked Out').order_by('-checkout_date').first()
         if not usage:
             return None
         return InventoryUsageSerializer(usage).data
 
 
-class InventoryItemSerializer(serializers.ModelSerializer):
+def _supervisor_project_ids(supervisor_id):
+    """Projects a supervisor runs or is attached to; [] for an unknown id."""
+    try:
+        sv = models.Supervisors.objects.get(supervisor_id=int(supervisor_id))
+    except (models.Supervisors.DoesNotExist, ValueError, TypeError):
+        return []
+    from django.db.models import Q
+    return list(
+        models.Project.objects
+        .filter(
+            Q(supervisor_id=sv.supervisor_id)
+            | Q(supervisors__supervisor_id=sv.supervisor_id)
+        )
+        .distinct()
+        .values_list('project_id', flat=True)
+    )
+
+
+def _material_summaries(item_ids, project_ids=None):
+    """
+    Per-material `(breakdown, assigned_quantity)` for `item_ids`, from two
+    grouped queries (active plan totals per phase, usage totals per phase).
+
+    `breakdown` collapses the phase plans into per-project rows with
+    planned / used / remaining counts so the UI can render "Plywood –
+    swimming pool (8 pcs left)". `assigned_quantity` is everything planned
+    net of usage against those plans, or None when the material has no
+    plans in scope. `project_ids` restricts both to a supervisor's
+    projects. Closed plans are excluded — once a phase wraps up its
+    leftovers are returned to inventory and shouldn't keep inflating the
+    supervisor's visible count.
+    """
+    from django.db.models import Sum
+    plans = models.PhaseMaterialPlan.objects.filter(
+        inventory_item_id__in=item_ids,
+        status=models.PhaseMaterialPlan.STATUS_ACTIVE,
+    )
+    if project_ids is not None:
+        plans = plans.filter(phase__project_id__in=project_ids)
+    plan_rows = (
+        plans
+        .values('inventory_item_id', 'phase_id', 'phase__project_id', 'phase__project__project_name')
+        .annotate(planned=Sum('planned_quantity'))
+        .order_by('phase_id')
+    )
+
+    planned_by_item = {}
+    phases_by_item = {}
+    by_project = {item_id: {} for item_id in item_ids}
+    phase_project = {}
+    for row in plan_rows:
+        item_id = row['inventory_item_id']
+        planned_by_item[item_id] = planned_by_item.get(item_id, 0) + int(row['planned'] or 0)
+        phases_by_item.setdefault(item_id, set()).add(row['phase_id'])
+        pid = row['phase__project_id']
+        if not pid:
+            continue
+        phase_project[(item_id, row['phase_id'])] = pid
+        entry = by_project[item_id].setdefault(
+            pid,
+            {
+                'project_id': pid,
+                'project_name': row['phase__project__project_name'] or '',
+                'planned_quantity': 0,
+                'used_quantity': 0,
+            },
+        )
+        entry['planned_quantity'] += int(row['planned'] or 0)
+
+    used_by_item = {}
+    all_phase_ids = set().union(*phases_by_item.values()) if phases_by_item else set()
+    if all_phase_ids:
+        usage_rows = (
+            models.InventoryUsage.objects
+            .filter(inventory_item_id__in=list(phases_by_item), phase_id__in=all_phase_ids)
+            .values('inventory_item_id', 'phase_id')
+            .annotate(total=Sum('quantity_used'))
+            .order_by()
+        )
+        for u in usage_rows:
+            item_id, phase_id = u['inventory_item_id'], u['phase_id']
+            if phase_id not in phases_by_item.get(item_id, ()):
+                continue
+            total = int(u['total'] or 0)
+            used_by_item[item_id] = used_by_item.get(item_id, 0) + total
+            pid = phase_project.get((item_id, phase_id))
+            if pid is not None:
+                by_project[item_id][pid]['used_quantity'] += total
+
+    summaries = {}
+    for item_id in item_ids:
+        breakdown = []
+        for row in by_project[item_id].values():
+            remaining = max(0, row['planned_quantity'] - row['used_quantity'])
+            row['remaining_quantity'] = remaining
+            row['quantity'] = remaining
+            breakdown.append(row)
+        breakdown.sort(key=lambda r: (r['project_name'] or '').lower())
+        assigned = None
+        if item_id in planned_by_item:
+            assigned = max(0, planned_by_item[item_id] - used_by_item.get(item_id, 0))
+        summaries[item_id] = (breakdown, assigned)
+    return summaries
+
+
+def _usage_with_relations(queryset):
+    """Everything InventoryUsageSerializer reads, joined in."""
+    return queryset.select_related(
+        'inventory_item',
+        'inventory_unit',
+        'checked_out_by',
+        'field_worker',
+        'project',
+        'phase',
+    )
+
+
+_InventoryItemPageData = namedtuple(
+    '_InventoryItemPageData', ['breakdown', 'assigned_quantity', 'units', 'active_usages']
+)
+
+
+class InventoryItemListSerializer(serializers.ListSerializer):
+    """Loads the computed fields' data for the whole page up front."""
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, BaseManager) else data
+        items = list(iterable)
+        self.child._page_data = self.child.load_page(items)
+        try:
+            return [self.child.to_representation(item) for item in items]
+        finally:
+            self.child._page_data = None
+
+
+class InventoryItemSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    photo_variants = PhotoVariantsField()
     quantity = serializers.SerializerMethodField()
     created_by_name = serializers.SerializerMethodField()
     active_usages = serializers.SerializerMethodField()
@@ -1778,6 +2115,8 @@ class InventoryItemSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = models.InventoryItem
+        list_serializer_class = InventoryItemListSerializer
+        expensive_fields = ['units', 'active_usages', 'assigned_projects']
         fields = [
             'item_id',
             'name',
@@ -1790,6 +2129,7 @@ class InventoryItemSerializer(serializers.ModelSerializer):
             'location',
             'notes',
             'photo',
+            'photo_variants',
             'photo_url',
             'status',
             'created_by',
@@ -1827,34 +2167,24 @@ class InventoryItemSerializer(serializers.ModelSerializer):
         except (TypeError, ValueError):
             return None
 
+    _page_data = None
+
     def _get_supervisor_project_ids(self):
+        """
+        Projects visible to the supervisor in `?supervisor_id=`, or None for
+        PM callers. Resolved once per request: the result is memoized in the
+        serializer context, which nested and list serializers share.
+        """
         request = self.context.get('request')
         if not request:
             return None
         supervisor_id = request.query_params.get('supervisor_id')
         if not supervisor_id:
             return None
-        try:
-            sv = models.Supervisors.objects.get(supervisor_id=int(supervisor_id))
-        except (models.Supervisors.DoesNotExist, ValueError, TypeError):
-            return []
-        from django.db.models import Q
-        return list(
-            models.Project.objects
-            .filter(
-                Q(supervisor_id=sv.supervisor_id)
-                | Q(supervisors__supervisor_id=sv.supervisor_id)
-            )
-            .distinct()
-            .values_list('project_id', flat=True)
-        )
-
-    def _get_visible_units_queryset(self, obj):
-        units_qs = obj.units.select_related('current_project').all()
-        project_ids = self._get_supervisor_project_ids()
-        if project_ids is None:
-            return units_qs
-        return units_qs.filter(current_project_id__in=project_ids)
+        memo = self.context.setdefault('_supervisor_project_ids', {})
+        if supervisor_id not in memo:
+            memo[supervisor_id] = _supervisor_project_ids(supervisor_id)
+        return memo[supervisor_id]
 
     def _is_material(self, obj):
         # `item_type` is the canonical column; fall back to `category` only
@@ -1864,121 +2194,69 @@ class InventoryItemSerializer(serializers.ModelSerializer):
         cat = (obj.category or '').strip().lower().rstrip('s')
         return cat == 'material'
 
-    def _get_material_plans_qs(self, obj, project_ids=None, active_only=True):
+    def load_page(self, items):
         """
-        All PhaseMaterialPlan rows for this material, optionally
-        restricted to a set of projects (e.g. the supervisor's).
-        Closed plans are excluded by default — once a phase wraps up its
-        leftovers are returned to inventory and shouldn't keep inflating
-        the supervisor's visible count.
+        Everything the computed fields need for `items`, keyed by item_id,
+        in a fixed number of queries: material plans and usage sums (two
+        grouped queries), visible units, and active usages. Parts whose
+        fields were dropped by `?fields=` / `?omit=` / `?expand=` are skipped.
         """
-        qs = models.PhaseMaterialPlan.objects.filter(inventory_item=obj)
-        if active_only:
-            qs = qs.filter(status=models.PhaseMaterialPlan.STATUS_ACTIVE)
-        if project_ids is not None:
-            qs = qs.filter(phase__project_id__in=project_ids)
-        return qs.select_related('phase__project')
-
-    def _get_material_project_breakdown(self, obj, project_ids=None):
-        """
-        For a Material, collapse the phase plans into per-project
-        rows with planned / used / remaining counts so the UI can
-        render "Plywood – swimming pool (8 pcs left)".
-        """
-        plans = self._get_material_plans_qs(obj, project_ids)
-        by_project = {}
-        phase_ids_by_project = {}
-        for plan in plans:
-            phase = plan.phase
-            if not phase or not phase.project_id:
-                continue
-            pid = phase.project_id
-            row = by_project.setdefault(
-                pid,
-                {
-                    'project_id': pid,
-                    'project_name': phase.project.project_name if phase.project else '',
-                    'planned_quantity': 0,
-                    'used_quantity': 0,
-                },
-            )
-            row['planned_quantity'] += int(plan.planned_quantity or 0)
-            phase_ids_by_project.setdefault(pid, []).append(phase.phase_id)
-
-        if phase_ids_by_project:
-            from django.db.models import Sum
-            all_phase_ids = [
-                pid for ids in phase_ids_by_project.values() for pid in ids
-            ]
-            usage_rows = (
-                models.InventoryUsage.objects
-                .filter(inventory_item=obj, phase_id__in=all_phase_ids)
-                .values('phase__project_id')
-                .annotate(total=Sum('quantity_used'))
+        project_ids = self._get_supervisor_project_ids()
+        requested = set(self.fields)
+        scoped = requested & {'quantity', 'project_name', 'assigned_projects', 'assigned_projects_count'}
+        materials = [obj.item_id for obj in items if self._is_material(obj)]
+        others = [obj.item_id for obj in items if not self._is_material(obj)]
+        page = {
+            obj.item_id: _InventoryItemPageData([], None, [], [])
+            for obj in items
+        }
+        if materials and scoped:
+            for item_id, (breakdown, assigned) in _material_summaries(
+                materials, project_ids
+            ).items():
+                page[item_id] = page[item_id]._replace(
+                    breakdown=breakdown, assigned_quantity=assigned
+                )
+        if others and (scoped or 'units' in requested):
+            units = (
+                models.InventoryUnit.objects
+                .filter(inventory_item_id__in=others)
+                .select_related('current_project')
             )
-            for u in usage_rows:
-                pid = u['phase__project_id']
-                if pid in by_project:
-                    by_project[pid]['used_quantity'] = int(u['total'] or 0)
-
-        breakdown = []
-        for row in by_project.values():
-            remaining = max(0, row['planned_quantity'] - row['used_quantity'])
-            row['remaining_quantity'] = remaining
-            row['quantity'] = remaining
-            breakdown.append(row)
-        breakdown.sort(key=lambda r: (r['project_name'] or '').lower())
-        return breakdown
-
-    def _get_material_assigned_quantity(self, obj, project_ids):
-        """
-        Quantity of `obj` (a Material) that has been assigned to the
-        requesting supervisor via PhaseMaterialPlan rows, net of any
-        usage already recorded against those plans.
-
-        Returns `None` if no plans exist for this supervisor on this
-        material (so callers can distinguish "nothing assigned" from
-        "assigned 0 left").
-        """
-        from django.db.models import Sum
-        plans = self._get_material_plans_qs(obj, project_ids)
-        total_planned = plans.aggregate(s=Sum('planned_quantity'))['s']
-        if total_planned is None:
-            return None
-        phase_ids = list(plans.values_list('phase_id', flat=True))
-        total_used = (
-            models.InventoryUsage.objects.filter(
-                inventory_item=obj,
-                phase_id__in=phase_ids,
-            ).aggregate(s=Sum('quantity_used'))['s']
-            or 0
-        )
-        return max(0, int(total_planned) - int(total_used))
-
-    def get_quantity(self, obj):
-        # Materials are bulk stock — the scalar column is authoritative
-        # for PMs. Supervisors, though, should only see what's been
-        # assigned to their phases via PhaseMaterialPlan rows, net of
-        # whatever has already been consumed.
-        if self._is_material(obj):
-            project_ids = self._get_supervisor_project_ids()
+            if 'units' in requested:
+                # InventoryUnitSerializer.active_usage reads this.
+                units = units.prefetch_related(
+                    Prefetch(
+                        'usages',
+                        queryset=_usage_with_relations(
+                            models.InventoryUsage.objects.filter(status='Checked Out')
+                        ).order_by('-checkout_date'),
+                        to_attr='checked_out_usages',
+                    )
+                )
             if project_ids is not None:
-                assigned = self._get_material_assigned_quantity(obj, project_ids)
-                return assigned if assigned is not None else 0
-            return obj.quantity or 0
-        return self._get_visible_units_queryset(obj).count()
-
-    def get_units(self, obj):
-        if self._is_material(obj):
-            return []
-        units_qs = self._get_visible_units_queryset(obj)
-        return InventoryUnitSerializer(units_qs, many=True).data
-
-    def get_active_usages(self, obj):
-        active = obj.usages.filter(status='Checked Out')
+                units = units.filter(current_project_id__in=project_ids)
+            for unit in units:
+                page[unit.inventory_item_id].units.append(unit)
+        if 'active_usages' in requested:
+            for usage in self._active_usages_qs([obj.item_id for obj in items]):
+                page[usage.inventory_item_id].active_usages.append(usage)
+        return page
+
+    def _item_data(self, obj):
+        if self._page_data is None or obj.item_id not in self._page_data:
+            # Serialized on its own (detail / write responses): load a page of one.
+            self._page_data = self.load_page([obj])
+        return self._page_data[obj.item_id]
+
+    def _active_usages_qs(self, item_ids):
+        from django.db.models import Q
+        active = _usage_with_relations(
+            models.InventoryUsage.objects
+            .filter(inventory_item_id__in=item_ids, status='Checked Out')
+        )
         project_ids = self._get_supervisor_project_ids()
         if project_ids is not None:
-            from django.db.models import Q
             sup_id = self._get_request_supervisor_id()
             parts = []
             if project_ids:
@@ -1992,12 +2270,31 @@ class InventoryItemSerializer(serializers.ModelSerializer):
                 active = active.filter(combined)
             else:
                 active = active.none()
-        return InventoryUsageSerializer(active, many=True).data
+        return active
+
+    def get_quantity(self, obj):
+        # Materials are bulk stock — the scalar column is authoritative
+        # for PMs. Supervisors, though, should only see what's been
+        # assigned to their phases via PhaseMaterialPlan rows, net of
+        # whatever has already been consumed.
+        if self._is_material(obj):
+            if self._get_supervisor_project_ids() is not None:
+                assigned = self._item_data(obj).assigned_quantity
+                return assigned if assigned is not None else 0
+            return obj.quantity or 0
+        return len(self._item_data(obj).units)
+
+    def get_units(self, obj):
+        if self._is_material(obj):
+            return []
+        return InventoryUnitSerializer(self._item_data(obj).units, many=True).data
+
+    def get_active_usages(self, obj):
+        return InventoryUsageSerializer(self._item_data(obj).active_usages, many=True).data
 
     def get_project_name(self, obj):
         if self._is_material(obj):
-            project_ids = self._get_supervisor_project_ids()
-            breakdown = self._get_material_project_breakdown(obj, project_ids)
+            breakdown = self._item_data(obj).breakdown
             names = [b['project_name'] for b in breakdown if b['project_name']]
             if len(names) == 1:
                 return names[0]
@@ -2006,7 +2303,7 @@ class InventoryItemSerializer(serializers.ModelSerializer):
             return ''
         project_names = {
             u.current_project.project_name
-            for u in self._get_visible_units_queryset(obj)
+            for u in self._item_data(obj).units
             if u.current_project
         }
         if len(project_names) == 1:
@@ -2022,13 +2319,11 @@ class InventoryItemSerializer(serializers.ModelSerializer):
         Tools / machines stay unit-driven for backward compatibility.
         """
         if self._is_material(obj):
-            project_ids = self._get_supervisor_project_ids()
-            return self._get_material_project_breakdown(obj, project_ids)
-        units_qs = self._get_visible_units_queryset(obj).exclude(
-            current_project__isnull=True
-        )
+            return self._item_data(obj).breakdown
         seen = {}
-        for u in units_qs:
+        for u in self._item_data(obj).units:
+            if u.current_project_id is None:
+                continue
             pid = u.current_project_id
             row = seen.setdefault(
                 pid,
@@ -2045,14 +2340,12 @@ class InventoryItemSerializer(serializers.ModelSerializer):
 
     def get_assigned_projects_count(self, obj):
         if self._is_material(obj):
-            return len(self.get_assigned_projects(obj))
-        return (
-            self._get_visible_units_queryset(obj)
-            .exclude(current_project__isnull=True)
-            .values('current_project')
-            .distinct()
-            .count()
-        )
+            return len(self._item_data(obj).breakdown)
+        return len({
+            u.current_project_id
+            for u in self._item_data(obj).units
+            if u.current_project_id is not None
+        })
 
     def get_photo_url(self, obj):
         if obj.photo and hasattr(obj.photo, 'url'):
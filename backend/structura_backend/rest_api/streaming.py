@@ -0,0 +1,67 @@
+"""
+Streaming response bodies that stay streamed under both servers.
+
+Django serves a `StreamingHttpResponse` with the iterator type it was
+given. Under ASGI a *sync* iterator is drained with
+`sync_to_async(list)` before the first byte goes out, which builds the
+whole body in memory on the shared sync thread. Under WSGI an *async*
+iterator is drained the same way through `async_to_sync`. So views that
+stream pick the body for the server they are running under:
+
+    if is_asgi(request):
+        body = <async generator>
+    else:
+        body = <sync generator>
+
+File bodies (`iter_file` / `aiter_file`) read one chunk at a time; the
+async variant reads each chunk in a worker thread (`thread_sensitive=
+False`) so file I/O never queues behind the ORM on the shared thread.
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def is_asgi(request):
+    """True for requests served by the ASGI handler (DRF `Request`s too)."""
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+def _read(fh, size):
+    return fh.read(size)
+
+
+def iter_file(path, start=0, length=None, chunk_size=FILE_CHUNK_SIZE):
+    """`length` bytes of `path` from `start` (to EOF when None), in chunks."""
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        while length is None or length > 0:
+            size = chunk_size if length is None else min(chunk_size, length)
+            chunk = fh.read(size)
+            if not chunk:
+                return
+            if length is not None:
+                length -= len(chunk)
+            yield chunk
+
+
+async def aiter_file(path, start=0, length=None, chunk_size=FILE_CHUNK_SIZE):
+    """Async `iter_file`: each read runs in a thread, off the event loop."""
+    fh = await sync_to_async(open, thread_sensitive=False)(path, 'rb')
+    try:
+        if start:
+            await sync_to_async(fh.seek, thread_sensitive=False)(start)
+        read = sync_to_async(_read, thread_sensitive=False)
+        while length is None or length > 0:
+            size = chunk_size if length is None else min(chunk_size, length)
+            chunk = await read(fh, size)
+            if not chunk:
+                return
+            if length is not None:
+                length -= len(chunk)
+            yield chunk
+    finally:
+        await sync_to_async(fh.close, thread_sensitive=False)()
@@ -0,0 +1,143 @@
+"""
+Server-Sent Events stream of in-app notifications.
+
+    GET /api/notifications/stream/?supervisor_id=<id>
+    GET /api/notifications/stream/?user_id=<pm user id>
+
+An async view: each open stream is one coroutine parked on its
+subscription queue, so idle connections cost no thread and no DB
+connection. Only meaningful under ASGI (`structura_backend.asgi`);
+under WSGI it answers 501 and clients keep polling `?since=`.
+
+Events:
+    event: notification   a new row (`id:` is its notification_id)
+    event: read           a row was marked read elsewhere (tombstone)
+    event: resync         messages were dropped; reload via `?since=`
+    : keep-alive          comment line every heartbeat interval
+
+On reconnect the browser/EventSource sends `Last-Event-ID`; rows newer
+than it are replayed from the DB before live events resume. Streams are
+closed after `NOTIFICATION_STREAM_MAX_SECONDS` so the client reconnects
+(and replays) periodically instead of holding a socket forever.
+"""
+
+import json
+import time
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+
+from app import models
+from app.services.inbox import recipient_queryset
+from app.services.notification_bus import get_bus, inbox_channel, notification_message
+
+
+REPLAY_LIMIT = 100
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _sse(message):
+    lines = []
+    if message.get('id') is not None:
+        lines.append(f"id: {message['id']}")
+    lines.append(f"event: {message['event']}")
+    lines.append(f"data: {json.dumps(message.get('data', {}), separators=(',', ':'))}")
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+def _parse_last_event_id(request):
+    raw = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id') or ''
+    raw = raw.strip()
+    return int(raw) if raw.isdigit() else None
+
+
+async def _replay(recipient_kind, recipient_id, last_event_id):
+    qs = (
+        recipient_queryset(recipient_kind, recipient_id)
+        .filter(notification_id__gt=last_event_id)
+        .order_by('notification_id')[:REPLAY_LIMIT]
+    )
+    return [n async for n in qs]
+
+
+async def _event_stream(recipient_kind, recipient_id, last_event_id):
+    heartbeat = _setting('NOTIFICATION_STREAM_HEARTBEAT_SECONDS', 20)
+    deadline = time.monotonic() + _setting('NOTIFICATION_STREAM_MAX_SECONDS', 30 * 60)
+
+    # Subscribe before replaying so nothing published in between is lost;
+    # duplicates are filtered by id below.
+    async with get_bus().subscribe(inbox_channel(recipient_kind, recipient_id)) as sub:
+        yield f"retry: {_setting('NOTIFICATION_STREAM_RETRY_MS', 5000)}\n\n".encode('utf-8')
+        yield _sse({'event': 'ready', 'data': {'recipient_kind': recipient_kind}})
+
+        sent_up_to = last_event_id or 0
+        if last_event_id is not None:
+            rows = await _replay(recipient_kind, recipient_id, last_event_id)
+            for n in rows:
+                yield _sse(notification_message(n))
+                sent_up_to = max(sent_up_to, n.notification_id)
+            if len(rows) == REPLAY_LIMIT:
+                yield _sse({'event': 'resync', 'data': {'reason': 'replay_limit'}})
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            message = await sub.get(timeout=min(heartbeat, remaining))
+            if sub.overflowed:
+                sub.overflowed = False
+                yield _sse({'event': 'resync', 'data': {'reason': 'overflow'}})
+            if message is None:
+                yield b': keep-alive\n\n'
+                continue
+            if message['event'] == 'notification':
+                if message['id'] <= sent_up_to:
+                    continue
+                sent_up_to = message['id']
+            yield _sse(message)
+
+
+async def notification_stream(request):
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'message': 'Method not allowed'}, status=405)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {
+                'success': False,
+                'message': 'Streaming requires the ASGI server; poll the inbox with ?since= instead.',
+            },
+            status=501,
+        )
+
+    if request.GET.get('supervisor_id'):
+        recipient_kind = models.InAppNotification.KIND_SUPERVISOR
+        raw, model = request.GET['supervisor_id'], models.Supervisors
+    elif request.GET.get('user_id'):
+        recipient_kind = models.InAppNotification.KIND_PM
+        raw, model = request.GET['user_id'], models.User
+    else:
+        return JsonResponse(
+            {'success': False, 'message': 'supervisor_id or user_id is required'}, status=400
+        )
+    try:
+        recipient_id = int(raw)
+    except (TypeError, ValueError):
+        return JsonResponse(
+            {'success': False, 'message': 'supervisor_id / user_id must be an integer'},
+            status=400,
+        )
+    if not await model.objects.filter(pk=recipient_id).aexists():
+        return JsonResponse({'success': False, 'message': 'Recipient not found'}, status=404)
+
+    response = StreamingHttpResponse(
+        _event_stream(recipient_kind, recipient_id, _parse_last_event_id(request)),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies (Render's included) from buffering the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
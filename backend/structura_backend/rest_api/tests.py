@@ -10,17 +10,65 @@ Covers:
   * Destructive guards on Phase and InventoryItem
   * Direct service-layer tests for record_material_usage / reverse_material_usage
   * Model property sanity checks
+  * Set-based project status engine (app.services.project_status)
+  * Denormalized subtask counters + rebuild_subtask_counters command
+  * Project budget ledger (running totals, payroll deltas, as-of replay)
+  * Opt-in keyset pagination on list endpoints
+  * Versioned pm_dashboard_summary cache and its write-driven invalidation
+  * DailySubtaskActivity rollup feeding the dashboard activity series
+  * AuditEvent-backed pm_audit_trail (write-time events, cursor paging, backfill)
+  * Streaming NDJSON/CSV audit export
+  * Inbox unread counters and `?since=` delta sync
+  * Notification bus + SSE notification stream
+  * Batched assignment loading for the field worker list
+  * Prefetch-backed subtask fields in the phase list
+  * Page-level loading for the inventory item list (supervisor scope)
+  * Sparse fieldsets (?fields= / ?omit= / ?expand=)
+  * `.values()` projections vs. their serializers (attendance, inventory usage)
+  * orjson-backed FastJSONRenderer vs. the stdlib renderer
+  * Out-of-process face verification pool (back-pressure, timeouts, 503)
+  * Content-hash cache of face verification verdicts
+  * Reduced-resolution decode for face detection
+  * Batch face verification endpoint
+  * Photo derivatives (avatar/card/full) + backfill_photo_variants
+  * Content-addressed media storage + dedupe_media
+  * Media serving: ETag/Last-Modified, 304s, Cache-Control, byte ranges, ASGI bodies
+  * Resumable subtask photo uploads + purge_photo_uploads
+  * Email outbox + run_email_worker (claiming, connection reuse, retries)
 """
 
-from datetime import date
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
 from decimal import Decimal
-from io import StringIO
-
+import asyncio
+import csv
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import uuid
+import warnings
+from io import BytesIO, StringIO
+from time import monotonic, sleep
+from unittest import mock
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.management import call_command
-from django.test import TestCase
+from django.db import connection
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from PIL import Image
 from rest_framework import status
 from rest_framework.test import APITestCase
+from rest_framework.utils.serializer_helpers import ReturnDict
 
 from app import models
 from app.services.material_usage import (
@@ -30,6 +78,34 @@ from app.services.material_usage import (
     record_material_usage,
     reverse_material_usage,
 )
+from app.content_storage import ContentAddressedStorage, stored_digest
+from app.image_verification import detection_array, load_detection_image
+from app.verification_cache import VerificationResultCache, content_digest, set_result_cache
+from app.verification_pool import (
+    VerificationBusy,
+    VerificationPool,
+    VerificationTimeout,
+    prewarm_in_background,
+    verify_face,
+    verify_faces,
+)
+from app.services import email_outbox
+from app.services.audit_trail import iter_audit_events
+from app.services import image_derivatives
+from app.services.image_derivatives import derivative_name
+from app.services.inbox import mark_read as inbox_mark_read
+from app.services.budget_ledger import budget_as_of, post_payroll_delta
+from app.services.notification_bus import InProcessBackend, set_bus
+from app.services.project_status import sync_project_statuses
+from rest_api.email_utils import send_invitation_email, send_signup_otp_email
+from rest_api.projections import AttendanceProjection, InventoryUsageProjection
+from rest_api.renderers import FastJSONRenderer, StdJSONRenderer
+from rest_api.serializers import (
+    AttendanceSerializer,
+    FieldWorkerSerializer,
+    InventoryUsageSerializer,
+    PhaseSerializer,
+)
 
 
 # ---------------------------------------------------------------------------
@@ -108,6 +184,18 @@ class ModelPropertyTests(BudgetTestMixin, APITestCase):
         self.assertEqual(self.project.total_used_budget, Decimal('0'))
         self.assertEqual(self.project.remaining_budget, Decimal('1000000'))
 
+    def test_project_budget_totals_are_read_once(self):
+        project = models.Project.objects.get(pk=self.project.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(project.total_allocated_budget, Decimal('150000'))
+            self.assertEqual(project.total_used_budget, Decimal('0'))
+            self.assertEqual(project.remaining_budget, Decimal('1000000'))
+        # A save of one of its loaded phases moves the totals under it.
+        phase = project.phases.get(pk=self.phase_1.pk)
+        phase.used_budget = Decimal('500')
+        phase.save()
+        self.assertEqual(phase.project.total_used_budget, Decimal('500'))
+
     def test_phase_remaining_and_over_budget(self):
         self.assertEqual(self.phase_1.remaining_phase_budget, Decimal('100000'))
         self.assertFalse(self.phase_1.is_over_budget)
@@ -847,3 +935,2121 @@ class SeedBudgetDemoCommandTests(TestCase):
         )
         output = out.getvalue()
         self.assertIn('PROJECT_50_PERCENT', output)
+
+
+# ---------------------------------------------------------------------------
+# Set-based project status engine
+# ---------------------------------------------------------------------------
+
+class ProjectStatusEngineTests(BudgetTestMixin, APITestCase):
+    def _add_subtask(self, phase, status_value='pending'):
+        return models.Subtask.objects.create(
+            phase=phase, title=f'Task {status_value}', status=status_value
+        )
+
+    def test_all_subtasks_completed_marks_project_completed(self):
+        self._add_subtask(self.phase_1, 'completed')
+        self._add_subtask(self.phase_2, 'completed')
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.status, 'Completed')
+
+    def test_overdue_uses_as_of_and_reverts_to_active(self):
+        self._add_subtask(self.phase_1)
+        models.Project.objects.filter(pk=self.project.pk).update(end_date=date(2026, 2, 1))
+        qs = models.Project.objects.filter(pk=self.project.pk)
+
+        changes = sync_project_statuses(qs, as_of=date(2026, 3, 1))
+        self.assertEqual(
+            [(c.before, c.after) for c in changes], [('Active', 'Overdue')]
+        )
+        sync_project_statuses(qs, as_of=date(2026, 1, 15))
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.status, 'Active')
+
+    def test_reopen_completed_only_when_requested(self):
+        done = self._add_subtask(self.phase_1, 'completed')
+        self._add_subtask(self.phase_2, 'completed')
+        done.status = 'pending'
+        done.save()
+        qs = models.Project.objects.filter(pk=self.project.pk)
+
+        self.assertEqual(sync_project_statuses(qs), [])
+        sync_project_statuses(qs, reopen_completed=True)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.status, 'Active')
+
+    def test_query_count_is_constant_for_many_projects(self):
+        for i in range(5):
+            p = models.Project.objects.create(
+                project_name=f'Late {i}',
+                project_type='Residential',
+                start_date=date(2025, 1, 1),
+                end_date=date(2025, 6, 1),
+                budget=Decimal('1000'),
+                user=self.pm_user,
+            )
+            phase = models.Phase.objects.create(project=p, phase_name='P')
+            self._add_subtask(phase)
+        models.Project.objects.update(status='Active')
+        # One aggregate + one bulk UPDATE for all five overdue projects.
+        with self.assertNumQueries(2):
+            changes = sync_project_statuses(models.Project.objects.all())
+        self.assertEqual(len(changes), 5)
+
+    def test_resync_command_reports_changes(self):
+        self._add_subtask(self.phase_1)
+        models.Project.objects.filter(pk=self.project.pk).update(status='Completed')
+        out = StringIO()
+        call_command('resync_project_statuses', stdout=out)
+        self.assertIn("'Completed' -> 'Active'", out.getvalue())
+        self.assertIn('1 had a status change', out.getvalue())
+
+
+# ---------------------------------------------------------------------------
+# Denormalized subtask counters
+# ---------------------------------------------------------------------------
+
+class SubtaskCounterTests(BudgetTestMixin, APITestCase):
+    def _counters(self, obj):
+        obj.refresh_from_db()
+        return obj.total_subtasks, obj.completed_subtasks
+
+    def test_create_update_delete_keep_counters_exact(self):
+        a = models.Subtask.objects.create(phase=self.phase_1, title='A')
+        b = models.Subtask.objects.create(
+            phase=self.phase_1, title='B', status='completed'
+        )
+        self.assertEqual(self._counters(self.phase_1), (2, 1))
+        self.assertEqual(self._counters(self.project), (2, 1))
+
+        a = models.Subtask.objects.get(pk=a.pk)
+        a.status = 'completed'
+        a.save()
+        a.phase = self.phase_2
+        a.save()
+        self.assertEqual(self._counters(self.phase_1), (1, 1))
+        self.assertEqual(self._counters(self.phase_2), (1, 1))
+        self.assertEqual(self._counters(self.project), (2, 2))
+        self.assertEqual(self.project.get_progress(), 1.0)
+
+        b.delete()
+        self.assertEqual(self._counters(self.phase_1), (0, 0))
+        self.assertEqual(self._counters(self.project), (1, 1))
+
+    def test_racing_saves_of_one_transition_count_once(self):
+        task = models.Subtask.objects.create(phase=self.phase_1, title='A')
+        first = models.Subtask.objects.get(pk=task.pk)
+        second = models.Subtask.objects.get(pk=task.pk)
+        # Both requests loaded it pending and both mark it completed.
+        for request_copy in (first, second):
+            request_copy.status = 'completed'
+            request_copy.save()
+        self.assertEqual(self._counters(self.phase_1), (1, 1))
+        self.assertEqual(self._counters(self.project), (1, 1))
+
+    def test_full_project_save_does_not_clobber_counters(self):
+        stale = models.Project.objects.get(pk=self.project.pk)
+        models.Subtask.objects.create(phase=self.phase_1, title='A')
+        stale.description = 'edited'
+        stale.save()
+        self.assertEqual(self._counters(self.project), (1, 0))
+
+    def test_subtask_endpoint_updates_counters(self):
+        url = reverse('subtask-list')
+        response = self.client.post(
+            url, {'phase': self.phase_2.pk, 'title': 'Via API'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual(self._counters(self.phase_2), (1, 0))
+        self.assertEqual(self._counters(self.project), (1, 0))
+
+    def test_rebuild_command_repairs_drift(self):
+        models.Subtask.objects.create(phase=self.phase_1, title='A')
+        models.Subtask.objects.filter(phase=self.phase_1).update(status='completed')
+
+        out = StringIO()
+        call_command('rebuild_subtask_counters', stdout=out)
+        self.assertIn('DRIFT Phase', out.getvalue())
+        self.assertEqual(self._counters(self.phase_1), (1, 0))
+
+        call_command('rebuild_subtask_counters', '--apply', stdout=StringIO())
+        self.assertEqual(self._counters(self.phase_1), (1, 1))
+        self.assertEqual(self._counters(self.project), (1, 1))
+
+
+# ---------------------------------------------------------------------------
+# Project budget ledger
+# ---------------------------------------------------------------------------
+
+class BudgetLedgerTests(BudgetTestMixin, APITestCase):
+    def _kinds(self):
+        return list(
+            models.ProjectBudgetLedgerEntry.objects.filter(project=self.project)
+            .values_list('kind', 'amount')
+        )
+
+    def test_fixture_is_posted_as_opening_entries(self):
+        self.assertEqual(
+            self._kinds(),
+            [
+                ('budget', Decimal('1000000')),
+                ('allocation', Decimal('100000')),
+                ('allocation', Decimal('50000')),
+            ],
+        )
+
+    def test_usage_and_reversal_move_running_totals(self):
+        usage, _ = record_material_usage(
+            phase=self.phase_1,
+            inventory_item=self.cement,
+            quantity=10,
+            supervisor=self.supervisor,
+        )
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.used_materials_budget, Decimal('500'))
+        self.assertEqual(self.project.cached_remaining_budget, Decimal('999500'))
+        entry = models.ProjectBudgetLedgerEntry.objects.get(kind='material_usage')
+        self.assertEqual(entry.usage_id, usage.pk)
+        self.assertEqual(entry.phase_id, self.phase_1.pk)
+
+        reverse_material_usage(usage=usage)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.used_materials_budget, Decimal('0'))
+        self.assertTrue(
+            models.ProjectBudgetLedgerEntry.objects.filter(
+                kind='material_reversal', amount=Decimal('-500')
+            ).exists()
+        )
+
+    def test_payroll_delta_is_clamped_and_posted(self):
+        post_payroll_delta(project=self.project, delta=Decimal('1200'))
+        post_payroll_delta(project=self.project, delta=Decimal('-5000'))
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.payroll_used_budget, Decimal('0'))
+        payroll = [a for k, a in self._kinds() if k == 'payroll']
+        self.assertEqual(payroll, [Decimal('1200'), Decimal('-1200')])
+
+    def test_stale_full_save_keeps_running_totals(self):
+        stale = models.Project.objects.get(pk=self.project.pk)
+        record_material_usage(
+            phase=self.phase_1,
+            inventory_item=self.cement,
+            quantity=10,
+            supervisor=self.supervisor,
+        )
+        stale.description = 'edited'
+        stale.save()
+        stale.refresh_from_db()
+        self.assertEqual(stale.used_materials_budget, Decimal('500'))
+
+    def test_full_save_refuses_to_drop_a_running_total_change(self):
+        project = models.Project.objects.get(pk=self.project.pk)
+        project.payroll_used_budget = Decimal('750')
+        with self.assertRaisesMessage(ValueError, 'does not write payroll_used_budget'):
+            project.save()
+        project.refresh_from_db()
+        self.assertEqual(project.payroll_used_budget, Decimal('0'))
+
+        # Values a service stored are in sync, so the next save goes through.
+        post_payroll_delta(project=project, delta=Decimal('300'))
+        project.description = 'edited'
+        project.save()
+        project.refresh_from_db()
+        self.assertEqual(
+            (project.description, project.payroll_used_budget), ('edited', Decimal('300.00'))
+        )
+
+    def test_budget_as_of_replays_history(self):
+        record_material_usage(
+            phase=self.phase_1,
+            inventory_item=self.cement,
+            quantity=10,
+            supervisor=self.supervisor,
+        )
+        models.ProjectBudgetLedgerEntry.objects.filter(
+            kind='material_usage'
+        ).update(created_at=timezone.now() + timedelta(days=3))
+
+        today = budget_as_of(self.project, timezone.localdate())
+        self.assertEqual(today['total_used_materials'], Decimal('0'))
+        self.assertEqual(today['total_allocated'], Decimal('150000'))
+
+        later = budget_as_of(self.project, timezone.localdate() + timedelta(days=3))
+        self.assertEqual(later['remaining_budget'], Decimal('999500'))
+
+    def test_budget_as_of_endpoint(self):
+        url = reverse('project-budget-as-of', kwargs={'pk': self.project.pk})
+        self.assertEqual(self.client.get(url).status_code, 400)
+        r = self.client.get(url, {'date': timezone.localdate().isoformat()})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(Decimal(str(r.data['total_budget'])), Decimal('1000000'))
+
+
+# ---------------------------------------------------------------------------
+# Opt-in keyset pagination
+# ---------------------------------------------------------------------------
+
+class KeysetPaginationTests(BudgetTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Seven rows over three dates so pages have to cut through ties.
+        for i in range(7):
+            worker = models.FieldWorker.objects.create(
+                project_id=cls.project,
+                first_name=f'W{i}',
+                last_name='Test',
+                phone_number='0917',
+            )
+            models.Attendance.objects.create(
+                field_worker=worker,
+                project=cls.project,
+                attendance_date=date(2026, 3, 1 + i % 3),
+                status='present',
+            )
+
+    def test_no_cursor_keeps_plain_list(self):
+        r = self.client.get(reverse('attendance-list'), {'project_id': self.project.pk})
+        self.assertEqual(r.status_code, 200)
+        self.assertIsInstance(r.data, list)
+        self.assertEqual(len(r.data), 7)
+
+    def test_walks_all_rows_once_in_model_order(self):
+        seen = []
+        params = {'project_id': self.project.pk, 'page_size': 3}
+        url = reverse('attendance-list')
+        pages = 0
+        while True:
+            r = self.client.get(url, params)
+            self.assertEqual(r.status_code, 200)
+            seen.extend((row['attendance_date'], row['attendance_id']) for row in r.data['results'])
+            pages += 1
+            if not r.data['next_cursor']:
+                break
+            params['cursor'] = r.data['next_cursor']
+        self.assertEqual(pages, 3)
+        expected = list(
+            models.Attendance.objects.order_by('-attendance_date', '-attendance_id')
+            .values_list('attendance_date', 'attendance_id')
+        )
+        self.assertEqual(seen, [(d.isoformat(), pk) for d, pk in expected])
+
+    def test_projects_first_page_via_empty_cursor(self):
+        r = self.client.get(
+            reverse('project-list'), {'user_id': self.pm_user.pk, 'cursor': ''}
+        )
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(len(r.data['results']), 1)
+        self.assertIsNone(r.data['next'])
+
+    def test_invalid_cursor_is_404(self):
+        r = self.client.get(reverse('attendance-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(r.status_code, 404)
+
+
+# ---------------------------------------------------------------------------
+# PM dashboard cache
+# ---------------------------------------------------------------------------
+
+class PMDashboardCacheTests(BudgetTestMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('pm_dashboard_summary')
+        self.params = {'user_id': self.pm_user.user_id}
+
+    def test_repeat_call_is_a_hit_without_queries(self):
+        first = self.client.get(self.url, self.params)
+        self.assertEqual(first['X-Dashboard-Cache'], 'miss')
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url, self.params)
+        self.assertEqual(second['X-Dashboard-Cache'], 'hit')
+        self.assertEqual(second.data, first.data)
+
+    def test_subtask_write_invalidates(self):
+        self.client.get(self.url, self.params)
+        models.Subtask.objects.create(phase=self.phase_1, title='Pour slab')
+        r = self.client.get(self.url, self.params)
+        self.assertEqual(r['X-Dashboard-Cache'], 'miss')
+        self.assertEqual(r.data['tasks']['total'], 1)
+
+    def test_pm_notification_invalidates_only_that_pm(self):
+        other_pm = models.User.objects.create(
+            email='other-pm@example.com', first_name='O', last_name='PM', password_hash='x'
+        )
+        other = {'user_id': other_pm.user_id}
+        self.client.get(self.url, self.params)
+        self.client.get(self.url, other)
+        models.InAppNotification.objects.create(
+            recipient_kind=models.InAppNotification.KIND_PM,
+            recipient_user=self.pm_user,
+            kind='budget_warning',
+            title='Heads up',
+        )
+        self.assertEqual(self.client.get(self.url, self.params)['X-Dashboard-Cache'], 'miss')
+        self.assertEqual(self.client.get(self.url, other)['X-Dashboard-Cache'], 'hit')
+
+    def test_fresh_bypasses_and_refills(self):
+        self.client.get(self.url, self.params)
+        r = self.client.get(self.url, {**self.params, 'fresh': '1'})
+        self.assertEqual(r['X-Dashboard-Cache'], 'bypass')
+        self.assertEqual(self.client.get(self.url, self.params)['X-Dashboard-Cache'], 'hit')
+
+    @override_settings(PM_DASHBOARD_CACHE_METRICS=True)
+    def test_metrics_endpoint_counts_hits_and_misses(self):
+        self.client.get(self.url, self.params)
+        self.client.get(self.url, self.params)
+        self.client.get(self.url, {**self.params, 'fresh': 'true'})
+        r = self.client.get(reverse('pm_dashboard_cache_metrics'))
+        self.assertEqual(r.status_code, 200)
+        metrics = r.data['metrics']
+        self.assertEqual(
+            (metrics['hit'], metrics['miss'], metrics['bypass']), (1, 1, 1)
+        )
+        self.assertAlmostEqual(metrics['hit_ratio'], 0.5)
+
+    def test_metrics_are_off_by_default(self):
+        self.client.get(self.url, self.params)
+        self.client.get(self.url, self.params)
+        metrics = self.client.get(reverse('pm_dashboard_cache_metrics')).data['metrics']
+        self.assertEqual((metrics['hit'], metrics['miss'], metrics['enabled']), (0, 0, False))
+
+    def test_bulk_status_sync_invalidates(self):
+        models.Project.objects.filter(pk=self.project.pk).update(
+            end_date=timezone.localdate() - timedelta(days=1), status='Active'
+        )
+        self.client.get(self.url, self.params)
+        changes = sync_project_statuses(models.Project.objects.filter(pk=self.project.pk))
+        self.assertEqual([c.after for c in changes], ['Overdue'])
+        self.assertEqual(self.client.get(self.url, self.params)['X-Dashboard-Cache'], 'miss')
+
+
+# ---------------------------------------------------------------------------
+# Daily subtask activity rollup
+# ---------------------------------------------------------------------------
+
+class DailySubtaskActivityTests(BudgetTestMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _row(self):
+        return models.DailySubtaskActivity.objects.get(
+            project=self.project, day=timezone.localdate()
+        )
+
+    def test_status_transitions_roll_up(self):
+        st = models.Subtask.objects.create(phase=self.phase_1, title='Frame')
+        self.assertFalse(models.DailySubtaskActivity.objects.exists())
+        st.status = 'completed'
+        st.save()
+        done = models.Subtask.objects.create(
+            phase=self.phase_2, title='Roof', status='completed'
+        )
+        row = self._row()
+        self.assertEqual((row.completed, row.reopened, row.user_id), (2, 0, self.pm_user.pk))
+
+        st = models.Subtask.objects.get(pk=st.pk)
+        st.status = 'in_progress'
+        st.save()
+        done.title = 'Roof (east)'
+        done.save()
+        row = self._row()
+        self.assertEqual((row.completed, row.reopened), (2, 1))
+
+    def test_racing_completions_roll_up_once(self):
+        st = models.Subtask.objects.create(phase=self.phase_1, title='Frame')
+        copies = [models.Subtask.objects.get(pk=st.pk) for _ in range(2)]
+        for request_copy in copies:
+            request_copy.status = 'completed'
+            request_copy.save()
+        row = self._row()
+        self.assertEqual((row.completed, row.reopened), (1, 0))
+
+    def test_dashboard_series_reads_rollup(self):
+        models.Subtask.objects.create(phase=self.phase_1, title='A', status='completed')
+        today = timezone.localdate()
+        models.DailySubtaskActivity.objects.create(
+            project=self.project, user=self.pm_user, day=today - timedelta(days=3), completed=4
+        )
+        r = self.client.get(reverse('pm_dashboard_summary'), {'user_id': self.pm_user.pk})
+        series = {row['day']: row['completed'] for row in r.data['activity']['series']}
+        self.assertEqual(len(series), 7)
+        self.assertEqual(series[today.isoformat()], 1)
+        self.assertEqual(series[(today - timedelta(days=3)).isoformat()], 4)
+        monthly = {row['month']: row['completed'] for row in r.data['activity']['monthly_series']}
+        expected_month = 1 + (4 if (today - timedelta(days=3)).month == today.month else 0)
+        self.assertEqual(monthly[today.month], expected_month)
+
+    def test_backfill_command_reseeds_from_subtasks(self):
+        models.Subtask.objects.create(phase=self.phase_1, title='A', status='completed')
+        models.Subtask.objects.create(phase=self.phase_1, title='B', status='completed')
+        models.DailySubtaskActivity.objects.all().delete()
+
+        out = StringIO()
+        call_command('backfill_subtask_activity', stdout=out)
+        self.assertIn('Dry-run', out.getvalue())
+        self.assertFalse(models.DailySubtaskActivity.objects.exists())
+
+        call_command('backfill_subtask_activity', '--apply', stdout=StringIO())
+        self.assertEqual(self._row().completed, 2)
+
+
+# ---------------------------------------------------------------------------
+# PM audit trail
+# ---------------------------------------------------------------------------
+
+class AuditTrailTests(BudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.url = reverse('pm_audit_trail')
+        self.params = {'user_id': self.pm_user.pk}
+
+    def test_fixture_writes_are_recorded_and_read_in_one_scan(self):
+        with self.assertNumQueries(2):
+            r = self.client.get(self.url, self.params)
+        self.assertEqual(r.status_code, 200)
+        kinds = sorted(item['kind'] for item in r.data['items'])
+        self.assertEqual(
+            kinds,
+            sorted([
+                'supervisor_added', 'project_created', 'phase_created', 'phase_created',
+                'inventory_item_added', 'inventory_item_added',
+            ]),
+        )
+        stamps = [item['timestamp'] for item in r.data['items']]
+        self.assertEqual(stamps, sorted(stamps, reverse=True))
+        project_row = next(i for i in r.data['items'] if i['kind'] == 'project_created')
+        self.assertEqual(project_row['user_name'], 'PM Tester')
+        self.assertEqual(project_row['action'], "Created project 'Budget Test Project'")
+        self.assertIsNone(r.data['next_cursor'])
+
+    def test_status_change_records_old_and_new_value(self):
+        st = models.Subtask.objects.create(phase=self.phase_1, title='Dig')
+        st = models.Subtask.objects.get(pk=st.pk)
+        st.status = 'in_progress'
+        st.save()
+        st.progress_notes = 'halfway'
+        st.save()
+        r = self.client.get(self.url, {**self.params, 'kind': 'task_status'})
+        self.assertEqual(r.data['count'], 1)
+        row = r.data['items'][0]
+        self.assertEqual(row['old_value'], 'Status: Pending')
+        self.assertEqual(row['new_value'], 'Status: In Progress')
+        self.assertEqual(row['user_role'], 'Supervisor')
+
+    def test_cursor_pages_cover_every_event_once(self):
+        seen = []
+        params = {**self.params, 'limit': 4}
+        while True:
+            r = self.client.get(self.url, params)
+            seen.extend(item['event_id'] for item in r.data['items'])
+            if not r.data['next_cursor']:
+                break
+            params['cursor'] = r.data['next_cursor']
+        expected = list(
+            models.AuditEvent.objects.filter(pm_user=self.pm_user)
+            .order_by('-ts', '-event_id')
+            .values_list('event_id', flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_kind_filter_accepts_lists_and_rejects_unknown(self):
+        r = self.client.get(self.url, {**self.params, 'kind': 'phase_created,project_created'})
+        self.assertEqual(r.data['count'], 3)
+        r = self.client.get(self.url, {**self.params, 'kind': 'nope'})
+        self.assertEqual(r.status_code, 400)
+
+    def test_backfill_rebuilds_missing_events_idempotently(self):
+        models.AuditEvent.objects.all().delete()
+        call_command('backfill_audit_events', '--apply', stdout=StringIO())
+        self.assertEqual(models.AuditEvent.objects.filter(pm_user=self.pm_user).count(), 6)
+        out = StringIO()
+        call_command('backfill_audit_events', '--apply', '--quiet', stdout=out)
+        self.assertIn('Backfilled 0 audit event(s)', out.getvalue())
+
+    def test_boot_backfill_runs_once_in_small_batches(self):
+        models.AuditEvent.objects.all().delete()
+        with mock.patch('app.services.audit_trail.BACKFILL_BATCH_SIZE', 2), \
+                mock.patch.object(
+                    models.AuditEvent.objects, 'bulk_create',
+                    wraps=models.AuditEvent.objects.bulk_create,
+                ) as bulk_create:
+            call_command('backfill_audit_events', '--apply', '--if-empty', '--quiet', stdout=StringIO())
+        self.assertEqual(models.AuditEvent.objects.filter(pm_user=self.pm_user).count(), 6)
+        self.assertLessEqual(max(len(call.args[0]) for call in bulk_create.call_args_list), 2)
+
+        out = StringIO()
+        call_command('backfill_audit_events', '--apply', '--if-empty', stdout=out)
+        self.assertIn('already has events', out.getvalue())
+
+
+# ---------------------------------------------------------------------------
+# Audit trail export
+# ---------------------------------------------------------------------------
+
+class AuditTrailExportTests(BudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.url = reverse('pm_audit_trail_export')
+        self.params = {'user_id': self.pm_user.pk}
+
+    def _body(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def _expected_ids(self):
+        return list(
+            models.AuditEvent.objects.filter(pm_user=self.pm_user)
+            .order_by('ts', 'event_id')
+            .values_list('event_id', flat=True)
+        )
+
+    def test_ndjson_streams_every_event_oldest_first(self):
+        r = self.client.get(self.url, self.params)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in self._body(r).decode('utf-8').splitlines()]
+        self.assertEqual([row['event_id'] for row in lines], self._expected_ids())
+
+    async def test_asgi_export_streams_pages_without_buffering(self):
+        expected = await sync_to_async(self._expected_ids)()
+        with mock.patch('rest_api.views._AUDIT_EXPORT_PAGE_SIZE', 2), \
+                warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            r = await self.async_client.get(self.url, self.params)
+            # An async body: the ASGI handler sends it chunk by chunk.
+            self.assertTrue(r.is_async)
+            chunks = [chunk async for chunk in r]
+        self.assertEqual(
+            [str(w.message) for w in caught if 'StreamingHttpResponse' in str(w.message)], []
+        )
+        self.assertEqual(len(chunks), (len(expected) + 1) // 2)
+        lines = [json.loads(line) for line in b''.join(chunks).decode('utf-8').splitlines()]
+        self.assertEqual([row['event_id'] for row in lines], expected)
+
+    def test_keyset_batches_without_server_side_cursors(self):
+        with mock.patch.dict(connection.settings_dict, {'DISABLE_SERVER_SIDE_CURSORS': True}):
+            rows = list(iter_audit_events(self.pm_user.pk, chunk_size=4))
+        self.assertEqual([row[0] for row in rows], self._expected_ids())
+
+    def test_gzip_csv_with_filters(self):
+        r = self.client.get(
+            self.url,
+            {
+                **self.params,
+                'output': 'csv',
+                'gzip': '1',
+                'kind': 'phase_created',
+                'from': timezone.localdate().isoformat(),
+                'to': timezone.localdate().isoformat(),
+            },
+        )
+        self.assertEqual(r['Content-Type'], 'application/gzip')
+        self.assertIn('.csv.gz', r['Content-Disposition'])
+        rows = list(csv.DictReader(gzip.decompress(self._body(r)).decode('utf-8').splitlines()))
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(all(row['kind'] == 'phase_created' for row in rows))
+
+    def test_date_range_excludes_outside_events(self):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        r = self.client.get(self.url, {**self.params, 'to': yesterday.isoformat()})
+        self.assertEqual(self._body(r), b'')
+
+    def test_rejects_bad_parameters(self):
+        self.assertEqual(self.client.get(self.url, {**self.params, 'output': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {**self.params, 'from': '2026-13-01'}).status_code, 400)
+
+
+# ---------------------------------------------------------------------------
+# Inbox counters and delta sync
+# ---------------------------------------------------------------------------
+
+class InboxDeltaTests(BudgetTestMixin, APITestCase):
+    def _notify_supervisor(self, title):
+        return models.InAppNotification.objects.create(
+            recipient_kind=models.InAppNotification.KIND_SUPERVISOR,
+            recipient_supervisor=self.supervisor,
+            kind='pm_note',
+            title=title,
+        )
+
+    def _notify_pm(self, title, kind='budget_warning'):
+        return models.InAppNotification.objects.create(
+            recipient_kind=models.InAppNotification.KIND_PM,
+            recipient_user=self.pm_user,
+            kind=kind,
+            title=title,
+        )
+
+    def _counter(self, kind, recipient_id):
+        return models.InboxUnreadCounter.objects.get(
+            recipient_kind=kind, recipient_id=recipient_id
+        ).unread
+
+    def test_counter_tracks_create_read_and_delete(self):
+        a = self._notify_pm('A')
+        self._notify_pm('B')
+        self._notify_pm('Hidden', kind='subtask_created')
+        self.assertEqual(self._counter('pm', self.pm_user.pk), 2)
+
+        self.client.post(
+            reverse('pm_inbox_mark_read', args=[a.pk]), {'user_id': self.pm_user.pk}
+        )
+        self.assertEqual(self._counter('pm', self.pm_user.pk), 1)
+        models.InAppNotification.objects.filter(title='B').first().delete()
+        self.assertEqual(self._counter('pm', self.pm_user.pk), 0)
+
+    def test_racing_mark_reads_count_once(self):
+        a = self._notify_pm('A')
+        self._notify_pm('B')
+        first = models.InAppNotification.objects.get(pk=a.pk)
+        second = models.InAppNotification.objects.get(pk=a.pk)
+        # Both requests loaded it unread; only the first UPDATE changes the row.
+        with mock.patch('app.services.notification_bus.publish_notification') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertTrue(inbox_mark_read(first))
+                self.assertFalse(inbox_mark_read(second))
+        publish.assert_called_once_with(first, event='read')
+        self.assertEqual(self._counter('pm', self.pm_user.pk), 1)
+
+    def test_unread_count_is_not_counted_per_request(self):
+        self._notify_supervisor('One')
+        url = reverse('supervisor_inbox')
+        params = {'supervisor_id': self.supervisor.pk}
+        # supervisor exists, counter read, newest rows.
+        with self.assertNumQueries(3):
+            r = self.client.get(url, params)
+        self.assertEqual(r.data['inbox']['unread_count'], 1)
+
+    def test_missing_counter_is_seeded(self):
+        self._notify_pm('A')
+        models.InboxUnreadCounter.objects.all().delete()
+        r = self.client.get(reverse('pm_inbox'), {'user_id': self.pm_user.pk})
+        self.assertEqual(r.data['inbox']['unread_count'], 1)
+        self.assertEqual(self._counter('pm', self.pm_user.pk), 1)
+
+    def test_since_id_returns_new_rows_and_tombstones(self):
+        first = self._notify_supervisor('First')
+        models.InAppNotification.objects.filter(pk=first.pk).update(
+            created_at=timezone.now() - timedelta(hours=1)
+        )
+        second = self._notify_supervisor('Second')
+        models.InAppNotification.objects.filter(pk=second.pk).update(
+            created_at=timezone.now() - timedelta(minutes=30)
+        )
+        self.client.post(
+            reverse('supervisor_inbox_mark_read', args=[first.pk]),
+            {'supervisor_id': self.supervisor.pk},
+        )
+        third = self._notify_supervisor('Third')
+
+        r = self.client.get(
+            reverse('supervisor_inbox'),
+            {'supervisor_id': self.supervisor.pk, 'since': second.pk},
+        )
+        inbox = r.data['inbox']
+        self.assertTrue(inbox['delta'])
+        self.assertEqual([i['notification_id'] for i in inbox['items']], [third.pk])
+        self.assertEqual(inbox['tombstones'], [first.pk])
+        self.assertEqual(inbox['unread_count'], 2)
+
+    def test_since_timestamp_round_trip(self):
+        r = self.client.get(reverse('pm_inbox'), {'user_id': self.pm_user.pk})
+        since = r.data['inbox']['next_since']
+        new = self._notify_pm('Fresh')
+        self._notify_pm('Hidden', kind='pm_subtask_added')
+        r = self.client.get(reverse('pm_inbox'), {'user_id': self.pm_user.pk, 'since': since})
+        self.assertEqual([i['notification_id'] for i in r.data['inbox']['items']], [new.pk])
+        self.assertFalse(r.data['inbox']['resync'])
+
+    def test_invalid_since_is_400(self):
+        r = self.client.get(reverse('pm_inbox'), {'user_id': self.pm_user.pk, 'since': 'yesterday'})
+        self.assertEqual(r.status_code, 400)
+
+
+# ---------------------------------------------------------------------------
+# Notification push (SSE)
+# ---------------------------------------------------------------------------
+
+class NotificationBusTests(TestCase):
+    def test_publish_from_another_thread_reaches_subscriber(self):
+        bus = InProcessBackend()
+
+        async def scenario():
+            async with bus.subscribe('inbox:pm:1') as sub:
+                thread = threading.Thread(
+                    target=bus.publish, args=('inbox:pm:1', {'event': 'notification', 'id': 7})
+                )
+                thread.start()
+                thread.join()
+                message = await sub.get(timeout=1)
+                other = await sub.get(timeout=0.01)
+            return message, other, bus.subscriber_count()
+
+        message, other, remaining = asyncio.run(scenario())
+        self.assertEqual(message['id'], 7)
+        self.assertIsNone(other)
+        self.assertEqual(remaining, 0)
+
+    def test_slow_subscriber_is_flagged_not_blocked(self):
+        bus = InProcessBackend(queue_size=1)
+
+        async def scenario():
+            async with bus.subscribe('c') as sub:
+                bus.publish('c', {'event': 'notification', 'id': 1})
+                bus.publish('c', {'event': 'notification', 'id': 2})
+                await asyncio.sleep(0)
+                return sub.overflowed
+
+        self.assertTrue(asyncio.run(scenario()))
+
+
+@override_settings(NOTIFICATION_STREAM_HEARTBEAT_SECONDS=1, NOTIFICATION_STREAM_MAX_SECONDS=5)
+class NotificationStreamTests(BudgetTestMixin, TestCase):
+    def setUp(self):
+        set_bus(InProcessBackend())
+        self.addCleanup(set_bus, None)
+
+    def _notify(self, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            return models.InAppNotification.objects.create(
+                recipient_kind=models.InAppNotification.KIND_SUPERVISOR,
+                recipient_supervisor=self.supervisor,
+                kind='pm_note',
+                title=title,
+            )
+
+    async def _next_event(self, stream):
+        while True:
+            chunk = await asyncio.wait_for(anext(stream), timeout=3)
+            if not chunk.startswith(b':'):
+                return chunk.decode('utf-8')
+
+    async def test_pushes_new_notifications(self):
+        response = await self.async_client.get(
+            reverse('notification_stream'), {'supervisor_id': self.supervisor.pk}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        self.assertTrue((await self._next_event(stream)).startswith('retry:'))
+        self.assertIn('event: ready', await self._next_event(stream))
+
+        n = await sync_to_async(self._notify)('Hello')
+        event = await self._next_event(stream)
+        self.assertIn(f'id: {n.pk}', event)
+        self.assertIn('event: notification', event)
+        self.assertIn('"title":"Hello"', event)
+        await stream.aclose()
+
+    async def test_replays_after_last_event_id(self):
+        first = await sync_to_async(self._notify)('First')
+        second = await sync_to_async(self._notify)('Second')
+        response = await self.async_client.get(
+            reverse('notification_stream'),
+            {'supervisor_id': self.supervisor.pk},
+            headers={'Last-Event-ID': str(first.pk)},
+        )
+        stream = response.streaming_content
+        await self._next_event(stream)  # retry
+        await self._next_event(stream)  # ready
+        self.assertIn(f'id: {second.pk}', await self._next_event(stream))
+        await stream.aclose()
+
+    def test_wsgi_requests_are_told_to_poll(self):
+        r = self.client.get(reverse('notification_stream'), {'supervisor_id': self.supervisor.pk})
+        self.assertEqual(r.status_code, 501)
+
+    async def test_unknown_recipient_is_404(self):
+        r = await self.async_client.get(reverse('notification_stream'), {'user_id': 999999})
+        self.assertEqual(r.status_code, 404)
+
+
+# ---------------------------------------------------------------------------
+# Field worker list: batched assignment loading
+# ---------------------------------------------------------------------------
+
+class FieldWorkerAssignmentLoaderTests(BudgetTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_project = models.Project.objects.create(
+            project_name='another Site',
+            project_type='Commercial',
+            start_date=date(2026, 2, 1),
+            budget=Decimal('500000'),
+            user=cls.pm_user,
+        )
+        other_phase = models.Phase.objects.create(
+            project=cls.other_project, phase_name='PHASE 1 - Pre-Construction Phase'
+        )
+        here = models.Subtask.objects.create(phase=cls.phase_1, title='Layout')
+        there = models.Subtask.objects.create(phase=other_phase, title='Survey')
+        for i in range(4):
+            worker = models.FieldWorker.objects.create(
+                project_id=cls.project,
+                first_name=f'FW{i}',
+                last_name='Loader',
+                phone_number='0917',
+            )
+            if i >= 1:
+                models.SubtaskFieldWorker.objects.create(
+                    subtask=here,
+                    field_worker=worker,
+                    shift_start=time(7 + i),
+                    shift_end=time(16),
+                )
+            if i >= 2:
+                models.SubtaskFieldWorker.objects.create(
+                    subtask=there, field_worker=worker
+                )
+
+    def _list(self):
+        return self.client.get(
+            reverse('fieldworker-list'), {'project_id': self.project.pk}
+        )
+
+    def test_matches_per_worker_serialization(self):
+        r = self._list()
+        self.assertEqual(r.status_code, 200)
+        workers = models.FieldWorker.objects.filter(project_id=self.project)
+        context = {'current_project_id': self.project.pk}
+        expected = {
+            w.fieldworker_id: FieldWorkerSerializer(w, context=context).data
+            for w in workers
+        }
+        self.assertEqual(len(r.data), 4)
+        for row in r.data:
+            self.assertEqual(
+                json.dumps(row, default=str),
+                json.dumps(expected[row['fieldworker_id']], default=str),
+            )
+        statuses = sorted(row['assignment_status'] for row in r.data)
+        self.assertEqual(statuses, ['Assigned', 'Assigned', 'Available', 'Available'])
+
+    def test_query_count_is_independent_of_page_size(self):
+        with self.assertNumQueries(3):
+            self._list()
+        models.FieldWorker.objects.create(
+            project_id=self.project, first_name='Late', last_name='Joiner', phone_number='0917'
+        )
+        with self.assertNumQueries(3):
+            self._list()
+
+
+# ---------------------------------------------------------------------------
+# Phase list: prefetch-backed nested subtasks
+# ---------------------------------------------------------------------------
+
+class PhaseSubtaskPrefetchTests(BudgetTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.worker = models.FieldWorker.objects.create(
+            project_id=cls.project, first_name='Pre', last_name='Fetch', phone_number='0917'
+        )
+        for phase in (cls.phase_1, cls.phase_2):
+            cls._add_subtask(phase, 'First')
+
+    @classmethod
+    def _add_subtask(cls, phase, title):
+        subtask = models.Subtask.objects.create(phase=phase, title=title, status='completed')
+        models.SubtaskFieldWorker.objects.create(subtask=subtask, field_worker=cls.worker)
+        models.SubtaskPhoto.objects.create(subtask=subtask, photo='subtask_update_photos/a.jpg')
+        models.SubtaskCompletionRevertRequest.objects.create(
+            subtask=subtask, supervisor=cls.supervisor, reason='old', status='denied'
+        )
+        models.SubtaskCompletionRevertRequest.objects.create(
+            subtask=subtask, supervisor=cls.supervisor, reason='redo'
+        )
+        return subtask
+
+    def _list(self):
+        return self.client.get(reverse('phase-list'), {'project_id': self.project.pk})
+
+    def test_matches_unprefetched_serialization(self):
+        r = self._list()
+        self.assertEqual(r.status_code, 200)
+        phases = models.Phase.objects.filter(project=self.project).order_by('created_at', 'phase_id')
+        expected = PhaseSerializer(phases, many=True).data
+        self.assertEqual(json.dumps(r.data, default=str), json.dumps(expected, default=str))
+        subtask = r.data[0]['subtasks'][0]
+        self.assertEqual(subtask['pending_revert_request']['reason'], 'redo')
+        self.assertEqual(subtask['assigned_workers'][0]['fieldworker_id'], self.worker.pk)
+        self.assertEqual(len(subtask['update_photos']), 1)
+
+    def test_query_count_is_independent_of_subtask_count(self):
+        with self.assertNumQueries(5):
+            self._list()
+        for i in range(3):
+            self._add_subtask(self.phase_1, f'Extra {i}')
+        with self.assertNumQueries(5):
+            self._list()
+
+
+# ---------------------------------------------------------------------------
+# Inventory item list: page-level loading
+# ---------------------------------------------------------------------------
+
+class InventoryPageFixtureMixin(BudgetTestMixin):
+    """Materials planned across two projects plus a tool with scoped units."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.cement.item_type = 'Material'
+        cls.cement.save()
+        cls.rebar.item_type = 'Material'
+        cls.rebar.save()
+        cls.other_project = models.Project.objects.create(
+            project_name='Annex',
+            project_type='Commercial',
+            start_date=date(2026, 2, 1),
+            budget=Decimal('500000'),
+            user=cls.pm_user,
+        )
+        cls.other_phase = models.Phase.objects.create(
+            project=cls.other_project, phase_name='PHASE 1 - Pre-Construction Phase'
+        )
+        models.PhaseMaterialPlan.objects.create(
+            phase=cls.phase_1, inventory_item=cls.cement, planned_quantity=10
+        )
+        models.PhaseMaterialPlan.objects.create(
+            phase=cls.phase_2, inventory_item=cls.cement, planned_quantity=5
+        )
+        models.PhaseMaterialPlan.objects.create(
+            phase=cls.other_phase, inventory_item=cls.cement, planned_quantity=7
+        )
+        models.PhaseMaterialPlan.objects.create(
+            phase=cls.phase_1, inventory_item=cls.rebar, planned_quantity=3,
+            status=models.PhaseMaterialPlan.STATUS_CLOSED,
+        )
+        models.InventoryUsage.objects.create(
+            inventory_item=cls.cement, checked_out_by=cls.supervisor,
+            project=cls.project, phase=cls.phase_1, quantity_used=4, status='Returned',
+        )
+        models.InventoryUsage.objects.create(
+            inventory_item=cls.cement, checked_out_by=cls.supervisor,
+            project=cls.other_project, phase=cls.other_phase, quantity_used=2, status='Returned',
+        )
+        cls.drill = models.InventoryItem.objects.create(
+            name='Drill', category='Tools', item_type='Tool', quantity=0,
+            price=Decimal('1500'), created_by=cls.pm_user, project=cls.project,
+        )
+        here = models.InventoryUnit.objects.create(
+            inventory_item=cls.drill, unit_code='DRL-1', current_project=cls.project
+        )
+        models.InventoryUnit.objects.create(
+            inventory_item=cls.drill, unit_code='DRL-2', current_project=cls.other_project
+        )
+        models.InventoryUsage.objects.create(
+            inventory_item=cls.drill, inventory_unit=here, checked_out_by=cls.supervisor,
+            project=cls.project, quantity_used=1,
+        )
+
+
+class InventoryItemPageLoadingTests(InventoryPageFixtureMixin, APITestCase):
+    def _list(self, **params):
+        r = self.client.get(reverse('inventory-item-list'), params)
+        self.assertEqual(r.status_code, 200)
+        return {row['name']: row for row in r.data}
+
+    def test_supervisor_sees_only_their_projects(self):
+        rows = self._list(supervisor_id=self.supervisor.pk)
+        cement = rows['Cement']
+        # 15 planned across both phases of the project, 4 used.
+        self.assertEqual(cement['quantity'], 11)
+        self.assertEqual(cement['project_name'], 'Budget Test Project')
+        self.assertEqual(cement['assigned_projects_count'], 1)
+        self.assertEqual(cement['assigned_projects'][0]['planned_quantity'], 15)
+        self.assertEqual(cement['assigned_projects'][0]['used_quantity'], 4)
+        self.assertEqual(cement['assigned_projects'][0]['remaining_quantity'], 11)
+        # Only a closed plan: nothing assigned.
+        self.assertEqual(rows['Rebar']['quantity'], 0)
+        self.assertEqual(rows['Rebar']['assigned_projects'], [])
+        drill = rows['Drill']
+        self.assertEqual(drill['quantity'], 1)
+        self.assertEqual([u['unit_code'] for u in drill['units']], ['DRL-1'])
+        self.assertEqual(len(drill['active_usages']), 1)
+
+    def test_pm_sees_every_project(self):
+        rows = self._list(user_id=self.pm_user.pk)
+        self.assertEqual(rows['Cement']['quantity'], self.cement.quantity)
+        self.assertEqual(
+            [(p['project_name'], p['remaining_quantity']) for p in rows['Cement']['assigned_projects']],
+            [('Annex', 5), ('Budget Test Project', 11)],
+        )
+        self.assertEqual(rows['Cement']['project_name'], 'Multiple Projects')
+        self.assertEqual(rows['Drill']['assigned_projects_count'], 2)
+
+    def test_detail_matches_list(self):
+        rows = self._list(supervisor_id=self.supervisor.pk)
+        for item in (self.cement, self.drill):
+            r = self.client.get(
+                reverse('inventory-item-detail', args=[item.pk]),
+                {'supervisor_id': self.supervisor.pk},
+            )
+            self.assertEqual(r.status_code, 200)
+            self.assertEqual(
+                json.dumps(r.data, default=str), json.dumps(rows[item.name], default=str)
+            )
+
+    def test_query_count_is_independent_of_page_size(self):
+        with self.assertNumQueries(11):
+            self._list(supervisor_id=self.supervisor.pk)
+        for i in range(3):
+            item = models.InventoryItem.objects.create(
+                name=f'Sand {i}', category='Material', item_type='Material', quantity=10,
+                price=Decimal('5'), created_by=self.pm_user, project=self.project,
+            )
+            models.PhaseMaterialPlan.objects.create(
+                phase=self.phase_2, inventory_item=item, planned_quantity=2
+            )
+        with self.assertNumQueries(11):
+            self._list(supervisor_id=self.supervisor.pk)
+
+
+# ---------------------------------------------------------------------------
+# Sparse fieldsets
+# ---------------------------------------------------------------------------
+
+class FieldSelectionTests(InventoryPageFixtureMixin, APITestCase):
+    def _inventory(self, **params):
+        r = self.client.get(
+            reverse('inventory-item-list'), {'supervisor_id': self.supervisor.pk, **params}
+        )
+        self.assertEqual(r.status_code, 200)
+        return r.data
+
+    def test_fields_keeps_only_requested(self):
+        rows = self._inventory(fields='item_id,name,bogus')
+        self.assertEqual({tuple(sorted(row)) for row in rows}, {('item_id', 'name')})
+
+    def test_fields_skips_computed_work(self):
+        # get_queryset (3) + the page + the serializer's scope lookup (2).
+        with self.assertNumQueries(6):
+            self._inventory(fields='item_id,name')
+        # ... + plan totals, usage totals and units; no active usages.
+        with self.assertNumQueries(9):
+            self._inventory(fields='item_id,quantity')
+
+    def test_omit_and_expand(self):
+        rows = self._inventory(omit='units,created_by_name')
+        self.assertNotIn('units', rows[0])
+        self.assertNotIn('created_by_name', rows[0])
+        self.assertIn('active_usages', rows[0])
+
+        rows = self._inventory(expand='')
+        for name in ('units', 'active_usages', 'assigned_projects'):
+            self.assertNotIn(name, rows[0])
+        self.assertIn('assigned_projects_count', rows[0])
+
+        rows = self._inventory(expand='units')
+        self.assertIn('units', rows[0])
+        self.assertNotIn('active_usages', rows[0])
+
+    def test_no_parameters_keeps_full_representation(self):
+        self.assertIn('active_usages', self._inventory()[0])
+
+    def test_subtask_and_field_worker_lists(self):
+        subtask = models.Subtask.objects.create(phase=self.phase_1, title='Pour')
+        r = self.client.get(reverse('subtask-list'), {'phase_id': self.phase_1.pk, 'expand': ''})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data[0]['subtask_id'], subtask.pk)
+        self.assertNotIn('update_photos', r.data[0])
+        self.assertNotIn('assigned_workers', r.data[0])
+
+        models.FieldWorker.objects.create(
+            project_id=self.project, first_name='Sparse', last_name='Set', phone_number='0917'
+        )
+        with self.assertNumQueries(2):
+            r = self.client.get(
+                reverse('fieldworker-list'),
+                {'project_id': self.project.pk, 'fields': 'fieldworker_id,first_name'},
+            )
+        self.assertEqual(r.data, [{'fieldworker_id': r.data[0]['fieldworker_id'], 'first_name': 'Sparse'}])
+
+    def test_writes_are_not_filtered(self):
+        r = self.client.patch(
+            reverse('subtask-detail', args=[
+                models.Subtask.objects.create(phase=self.phase_1, title='Old').pk
+            ]) + '?fields=subtask_id',
+            {'title': 'New'},
+            format='json',
+        )
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data['title'], 'New')
+
+
+# ---------------------------------------------------------------------------
+# Projection read path parity
+# ---------------------------------------------------------------------------
+
+class ProjectionParityTests(InventoryPageFixtureMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.worker = models.FieldWorker.objects.create(
+            project_id=cls.project, first_name='Ana', last_name=None, phone_number='0917'
+        )
+        models.Attendance.objects.create(
+            field_worker=cls.worker, project=cls.project, attendance_date=date(2026, 3, 2),
+            check_in_time=time(7, 30), break_in_time=time(12, 0, 15), status='on_site',
+        )
+        models.Attendance.objects.create(
+            field_worker=cls.worker, project=cls.project, attendance_date=date(2026, 3, 1),
+        )
+        models.InventoryUsage.objects.create(
+            inventory_item=cls.rebar, checked_out_by=cls.supervisor, field_worker=cls.worker,
+            quantity_used=3, unit_price_at_use=Decimal('200'), total_cost=Decimal('600.5'),
+            expected_return_date=date(2026, 4, 1), purpose='Slab',
+        )
+
+    def assertSameJson(self, a, b):
+        self.assertEqual(json.dumps(a, default=str), json.dumps(b, default=str))
+
+    def test_attendance_matches_serializer(self):
+        qs = models.Attendance.objects.order_by('-attendance_date', 'attendance_id')
+        self.assertSameJson(
+            AttendanceProjection.render(AttendanceProjection.values(qs)),
+            AttendanceSerializer(qs, many=True).data,
+        )
+
+    def test_inventory_usage_matches_serializer(self):
+        qs = models.InventoryUsage.objects.order_by('usage_id')
+        self.assertEqual(qs.count(), 4)
+        self.assertSameJson(
+            InventoryUsageProjection.render(InventoryUsageProjection.values(qs)),
+            InventoryUsageSerializer(qs, many=True).data,
+        )
+
+    def test_list_endpoints_serve_projection(self):
+        r = self.client.get(reverse('attendance-list'), {'project_id': self.project.pk})
+        self.assertEqual(r.status_code, 200)
+        self.assertSameJson(
+            r.data,
+            AttendanceSerializer(
+                models.Attendance.objects.filter(project=self.project), many=True
+            ).data,
+        )
+        with self.assertNumQueries(1):
+            r = self.client.get(
+                reverse('inventory-usage-list'),
+                {'supervisor_id': self.supervisor.pk, 'page_size': 2},
+            )
+        self.assertEqual(len(r.data['results']), 2)
+        r = self.client.get(r.data['next'])
+        self.assertEqual(len(r.data['results']), 2)
+        self.assertIsNone(r.data['next_cursor'])
+
+
+# ---------------------------------------------------------------------------
+# JSON renderer
+# ---------------------------------------------------------------------------
+
+class FastJSONRendererTests(BudgetTestMixin, APITestCase):
+    def _payload(self):
+        return {
+            'budget': Decimal('1250.50'),
+            'price': '12.50',
+            'utc': datetime(2026, 3, 1, 8, 30, 15, 250000, tzinfo=dt_timezone.utc),
+            'offset': datetime(2026, 3, 1, 8, 30, tzinfo=dt_timezone(timedelta(hours=8))),
+            'naive': datetime(2026, 3, 1, 8, 30),
+            'day': date(2026, 3, 1),
+            'clock': time(7, 45),
+            'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'label': gettext_lazy('Available'),
+            'text': 'Ñiño – line\u2028break',
+            'nested': ReturnDict({'ratio': 0.125, 'keys': {1: 'one'}}, serializer=None),
+            'rows': [None, True, 3, [Decimal('0.10')]],
+        }
+
+    def test_matches_stdlib_renderer(self):
+        data = self._payload()
+        self.assertEqual(FastJSONRenderer().render(data), StdJSONRenderer().render(data))
+
+    def test_falls_back_for_indent_and_unsupported_values(self):
+        data = self._payload()
+        indented = 'application/json; indent=2'
+        self.assertEqual(
+            FastJSONRenderer().render(data, indented),
+            StdJSONRenderer().render(data, indented),
+        )
+        huge = {'n': 2 ** 70}
+        self.assertEqual(FastJSONRenderer().render(huge), b'{"n":1180591620717411303424}')
+
+    def test_default_and_negotiated_stdlib_renderer(self):
+        url = reverse('project-list')
+        r = self.client.get(url, {'user_id': self.pm_user.pk})
+        self.assertIsInstance(r.accepted_renderer, FastJSONRenderer)
+        self.assertEqual(r['Content-Type'], 'application/json')
+        std = self.client.get(url, {'user_id': self.pm_user.pk, 'format': 'json-std'})
+        self.assertIsInstance(std.accepted_renderer, StdJSONRenderer)
+        self.assertEqual(r.content, std.content)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command(
+            'bench_json_renderer', user_id=self.pm_user.pk, synthetic=50, repeat=1, stdout=out
+        )
+        report = out.getvalue()
+        self.assertIn('pm_dashboard_summary', report)
+        self.assertIn('synthetic x50', report)
+        self.assertNotIn('differ', report)
+
+
+# ---------------------------------------------------------------------------
+# Face verification pool
+# ---------------------------------------------------------------------------
+
+class VerificationPoolTests(TestCase):
+    """Real worker processes running builtins instead of the detector."""
+
+    def _pool(self, **kwargs):
+        options = {'workers': 1, 'queue_size': 0, 'timeout': 30, 'initializer': None}
+        options.update(kwargs)
+        pool = VerificationPool(**options)
+        self.addCleanup(pool.shutdown)
+        return pool
+
+    def test_returns_worker_result(self):
+        pool = self._pool(fn=len)
+        self.assertEqual(pool.call(b'abcd'), 4)
+        self.assertEqual(pool.in_flight, 0)
+
+    def test_rejects_when_saturated(self):
+        pool = self._pool(fn=sleep)
+        self.assertTrue(pool.warm())
+        pending = pool.submit(0.5)
+        with self.assertRaises(VerificationBusy):
+            pool.submit(0)
+        pending.result(timeout=10)
+        # The slot comes back once the job finishes.
+        self.assertIsNone(pool.call(0))
+
+    def test_call_many_queues_past_capacity(self):
+        pool = self._pool(fn=len)
+        # One slot: every item after the first waits for the batch's own jobs.
+        self.assertEqual(pool.call_many([b'a', b'bb', b'ccc', b'']), [1, 2, 3, 0])
+        self.assertEqual(pool.in_flight, 0)
+
+    def test_call_many_leaves_the_queue_to_single_calls(self):
+        pool = self._pool(fn=sleep, queue_size=2)
+        self.assertTrue(pool.warm())
+        batch = threading.Thread(target=pool.call_many, args=([0.3] * 4,))
+        batch.start()
+        self.addCleanup(batch.join)
+        deadline = monotonic() + 5
+        while pool.in_flight == 0 and monotonic() < deadline:
+            sleep(0.01)
+        # The batch runs one job per worker, so both queue slots are free.
+        self.assertEqual(pool.in_flight, 1)
+        self.assertIsNone(pool.call(0))
+
+    def test_timeout_recycles_stuck_pool(self):
+        pool = self._pool(fn=sleep)
+        with self.assertRaises(VerificationTimeout):
+            pool.call(30, timeout=0.2)
+        # The only worker was stuck, so it was killed and a fresh pool serves this.
+        self.assertIsNone(pool.call(0))
+        self.assertEqual(pool.in_flight, 0)
+
+    def test_prewarm_runs_in_background_and_logs_failures(self):
+        pool = mock.Mock()
+        started = threading.Event()
+
+        def warm():
+            started.set()
+            raise RuntimeError('detector missing')
+
+        pool.warm.side_effect = warm
+        with mock.patch('app.verification_pool.get_pool', return_value=pool):
+            # Off by default: the workers start on the first verification.
+            self.assertIsNone(prewarm_in_background())
+        with override_settings(FACE_VERIFICATION_PREWARM=True), \
+                mock.patch('app.verification_pool.get_pool', return_value=pool), \
+                self.assertLogs('app.verification_pool', 'ERROR') as logs:
+            thread = prewarm_in_background()
+            self.assertIsNot(thread, threading.current_thread())
+            thread.join(timeout=10)
+        self.assertTrue(started.is_set())
+        self.assertIn('Face verification prewarm failed', logs.output[0])
+        self.assertIn('detector missing', logs.output[0])
+
+        with override_settings(FACE_VERIFICATION_PREWARM=True), \
+                mock.patch('app.verification_pool.get_pool', return_value=None):
+            self.assertIsNone(prewarm_in_background())
+
+
+class FaceVerificationEndpointTests(APITestCase):
+    def _upload(self):
+        return SimpleUploadedFile('selfie.jpg', b'not-really-a-jpeg', content_type='image/jpeg')
+
+    def test_busy_pool_answers_503_with_retry_after(self):
+        with mock.patch(
+            'rest_api.face_verification.verify_face', side_effect=VerificationBusy('busy')
+        ):
+            r = self.client.post(
+                reverse('verify_profile_photo'), {'image': self._upload()}, format='multipart'
+            )
+        self.assertEqual(r.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(r['Retry-After'], '2')
+
+    def test_verdict_comes_from_the_pool(self):
+        with mock.patch('rest_api.face_verification.verify_face', return_value=True) as verify:
+            r = self.client.post(
+                reverse('verify_profile_photo'), {'image': self._upload()}, format='multipart'
+            )
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertEqual(r.data['image_verification'], 'ACCEPT')
+        verify.assert_called_once_with(b'not-really-a-jpeg')
+
+
+# ---------------------------------------------------------------------------
+# Face verification result cache
+# ---------------------------------------------------------------------------
+
+class VerificationResultCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _use(self, result_cache):
+        set_result_cache(result_cache)
+        self.addCleanup(set_result_cache, None)
+        return result_cache
+
+    def test_local_lru_evicts_oldest_and_expires(self):
+        local = VerificationResultCache(ttl=60, max_entries=2, alias=None)
+        local.set('a', True)
+        local.set('b', False)
+        self.assertTrue(local.get('a'))
+        local.set('c', True)
+        # 'b' was least recently used.
+        self.assertIsNone(local.get('b'))
+        self.assertTrue(local.get('a'))
+        self.assertTrue(local.get('c'))
+
+        with mock.patch('app.verification_cache.time.monotonic', return_value=10 ** 9):
+            self.assertIsNone(local.get('a'))
+
+    def test_shared_tier_serves_other_processes(self):
+        VerificationResultCache(ttl=60, max_entries=8).set('d1', False)
+        other = VerificationResultCache(ttl=60, max_entries=8)
+        self.assertIs(other.get('d1'), False)
+        self.assertIs(VerificationResultCache(ttl=0, max_entries=8).get('d1'), None)
+
+    def test_same_bytes_are_detected_once(self):
+        self._use(VerificationResultCache(ttl=60, max_entries=8))
+        image = b'selfie-bytes'
+        with mock.patch(
+            'app.verification_pool.verify_image_has_human_face', return_value=True
+        ) as detect:
+            self.assertTrue(verify_face(image))
+            self.assertTrue(verify_face(image))
+            self.assertFalse(verify_face(b''))
+        detect.assert_called_once_with(image)
+        self.assertEqual(cache.get(f'face_verify:v1:{content_digest(image)}'), 1)
+
+    def test_unavailable_answers_are_not_cached(self):
+        result_cache = self._use(VerificationResultCache(ttl=60, max_entries=8))
+        pool = mock.Mock()
+        pool.call.side_effect = VerificationBusy('busy')
+        with mock.patch('app.verification_pool.get_pool', return_value=pool):
+            with self.assertRaises(VerificationBusy):
+                verify_face(b'retry-me')
+        self.assertIsNone(result_cache.get(content_digest(b'retry-me')))
+
+
+# ---------------------------------------------------------------------------
+# Reduced-resolution decode for face detection
+# ---------------------------------------------------------------------------
+
+class DetectionDecodeTests(TestCase):
+    def _encode(self, image, fmt, orientation=None, **options):
+        buffer = BytesIO()
+        if orientation is not None:
+            exif = Image.Exif()
+            exif[0x0112] = orientation
+            options['exif'] = exif.tobytes()
+        image.save(buffer, fmt, **options)
+        return buffer.getvalue()
+
+    def _landscape(self):
+        # Red top-left corner marks the orientation.
+        image = Image.new('RGB', (2000, 1500), (0, 0, 255))
+        image.paste((255, 0, 0), (0, 0, 400, 300))
+        return image
+
+    def test_jpeg_is_scaled_and_rotated_upright(self):
+        data = self._encode(self._landscape(), 'JPEG', orientation=6, quality=90)
+        img = load_detection_image(data)
+        # Orientation 6 is a portrait shot stored sideways: the marker ends
+        # up in the top-right corner once rotated.
+        self.assertEqual((img.mode, img.size), ('RGB', (480, 640)))
+        r, g, b = img.getpixel((470, 10))
+        self.assertGreater(r, 200)
+        self.assertLess(b, 60)
+
+    def test_palette_png_and_webp(self):
+        palette = self._landscape().convert('P')
+        for data in (
+            self._encode(palette, 'PNG'),
+            self._encode(self._landscape(), 'WEBP', orientation=3),
+        ):
+            img = load_detection_image(data)
+            self.assertEqual((img.mode, img.size), ('RGB', (640, 480)))
+
+    def test_detector_array_is_readonly_contiguous(self):
+        array = detection_array(load_detection_image(self._encode(self._landscape(), 'PNG')))
+        self.assertEqual(array.shape, (480, 640, 3))
+        self.assertTrue(array.flags.c_contiguous)
+        self.assertFalse(array.flags.writeable)
+
+    def test_benchmark_command(self):
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as fh:
+            fh.write(self._encode(self._landscape(), 'JPEG', orientation=6))
+            fh.flush()
+            out = StringIO()
+            call_command('bench_image_decode', image=[fh.name], repeat=1, no_memory=True, stdout=out)
+        report = out.getvalue()
+        self.assertIn('(640, 480, 3)', report)
+        self.assertNotIn('differ', report)
+
+
+# ---------------------------------------------------------------------------
+# Batch face verification
+# ---------------------------------------------------------------------------
+
+class BatchFaceVerificationTests(APITestCase):
+    url = reverse('verify_profile_photos_batch')
+
+    def setUp(self):
+        set_result_cache(VerificationResultCache(ttl=60, max_entries=8, alias=None))
+        self.addCleanup(set_result_cache, None)
+
+    def _file(self, name, content):
+        return SimpleUploadedFile(name, content, content_type='image/jpeg')
+
+    def _post(self, files):
+        return self.client.post(self.url, {'images': files}, format='multipart')
+
+    def test_per_image_verdicts(self):
+        with mock.patch(
+            'app.verification_pool.verify_image_has_human_face',
+            side_effect=lambda data: data.startswith(b'face'),
+        ) as detect:
+            r = self._post([
+                self._file('a.jpg', b'face-1'),
+                self._file('b.jpg', b'cat'),
+                self._file('c.jpg', b''),
+                self._file('d.jpg', b'face-1'),
+            ])
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(x['filename'], x['image_verification']) for x in r.data['results']],
+            [('a.jpg', 'ACCEPT'), ('b.jpg', 'REJECT'), ('c.jpg', 'REJECT'), ('d.jpg', 'ACCEPT')],
+        )
+        self.assertEqual(r.data['results'][2]['detail'], 'Uploaded image appears to be empty.')
+        self.assertEqual((r.data['accepted'], r.data['rejected']), (2, 2))
+        # The duplicate and the empty file never reach the detector.
+        self.assertEqual(detect.call_count, 2)
+
+    @override_settings(FACE_VERIFICATION_BATCH_MAX_IMAGES=2)
+    def test_validation(self):
+        self.assertEqual(self.client.post(self.url, {}, format='multipart').status_code, 400)
+        r = self._post([self._file(f'{i}.jpg', b'x') for i in range(3)])
+        self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(FACE_VERIFICATION_BATCH_MAX_BYTES=10)
+    def test_total_size_is_capped_before_reading(self):
+        with mock.patch('app.verification_pool.verify_image_has_human_face') as detect:
+            r = self._post([self._file('a.jpg', b'x' * 6), self._file('b.jpg', b'y' * 6)])
+        self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
+        detect.assert_not_called()
+
+    def test_unverifiable_image_fails_the_batch_and_keeps_verdicts(self):
+        pool = mock.Mock()
+        pool.call_many.return_value = [True, VerificationBusy('busy')]
+        with mock.patch('app.verification_pool.get_pool', return_value=pool):
+            r = self._post([self._file('a.jpg', b'face-a'), self._file('b.jpg', b'face-b')])
+        self.assertEqual(r.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(r['Retry-After'], '2')
+
+        with mock.patch(
+            'app.verification_pool.verify_image_has_human_face', return_value=False
+        ) as detect:
+            self.assertEqual(verify_faces([b'face-a', b'face-b']), [True, False])
+        detect.assert_called_once_with(b'face-b')
+
+
+# ---------------------------------------------------------------------------
+# Photo derivatives
+# ---------------------------------------------------------------------------
+
+class PhotoDerivativeTests(BudgetTestMixin, TestCase):
+    def setUp(self):
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def _jpeg(self, size=(2000, 1500), color=(200, 120, 40)):
+        buffer = BytesIO()
+        Image.new('RGB', size, color).save(buffer, 'JPEG')
+        return SimpleUploadedFile('face.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def _worker(self, **kwargs):
+        return models.FieldWorker.objects.create(
+            project_id=self.project, first_name='Photo', last_name='Worker', phone_number='0917', **kwargs
+        )
+
+    def _open(self, name):
+        return Image.open(default_storage.open(name))
+
+    def test_upload_builds_sizes_and_serializer_urls(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            worker = self._worker(photo=self._jpeg())
+        worker.refresh_from_db()
+        manifest = worker.photo_variants
+        self.assertEqual(manifest['source'], worker.photo.name)
+        self.assertEqual(set(manifest['sizes']), {'avatar', 'card', 'full'})
+        avatar_name = manifest['sizes']['avatar']['webp']
+        with default_storage.open(avatar_name) as fh:
+            self.assertEqual(
+                avatar_name, derivative_name(worker.photo.name, 'avatar', 'webp', fh.read())
+            )
+        with self._open(manifest['sizes']['avatar']['webp']) as avatar:
+            self.assertEqual((avatar.format, avatar.size), ('WEBP', (128, 128)))
+        with self._open(manifest['sizes']['card']['jpeg']) as card:
+            self.assertEqual((card.format, card.size), ('JPEG', (480, 360)))
+        with self._open(manifest['sizes']['full']['webp']) as full:
+            self.assertEqual(full.size, (1600, 1200))
+
+        variants = FieldWorkerSerializer(worker).data['photo_variants']
+        self.assertRegex(variants['card']['webp'], r'/card\.[0-9a-f]{12}\.webp$')
+        self.assertTrue(variants['avatar']['jpeg'].startswith('/media/derivatives/'))
+
+        # Saves that don't touch the photo don't rebuild anything.
+        with mock.patch('app.services.image_derivatives.generate_for') as generate:
+            with self.captureOnCommitCallbacks(execute=True):
+                worker.save()
+        generate.assert_not_called()
+
+    def test_stale_manifest_is_hidden_and_backfilled(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            worker = self._worker(photo=self._jpeg())
+        replacement = default_storage.save('fieldworker_images/new.jpg', self._jpeg((300, 200)))
+        broken = default_storage.save('fieldworker_images/notes.jpg', ContentFile(b'not an image'))
+        # .update() bypasses the save signal, as bulk writes and restores do.
+        models.FieldWorker.objects.filter(pk=worker.pk).update(photo=replacement)
+        other = self._worker()
+        models.FieldWorker.objects.filter(pk=other.pk).update(photo=broken)
+        worker.refresh_from_db()
+        self.assertIsNone(FieldWorkerSerializer(worker).data['photo_variants'])
+
+        out = StringIO()
+        call_command('backfill_photo_variants', model=['FieldWorker'], stdout=out)
+        self.assertIn('FieldWorker: 2 photo(s) need derivatives', out.getvalue())
+
+        out = StringIO()
+        call_command('backfill_photo_variants', apply=True, model=['FieldWorker'], stdout=out)
+        self.assertIn('Built derivatives for 1 of 2 photo(s).', out.getvalue())
+        self.assertIn('not a readable image', out.getvalue())
+        worker.refresh_from_db()
+        self.assertEqual(worker.photo_variants['source'], replacement)
+        with self._open(worker.photo_variants['sizes']['full']['jpeg']) as full:
+            self.assertEqual(full.size, (300, 200))
+
+        out = StringIO()
+        call_command('backfill_photo_variants', model=['FieldWorker'], stdout=out)
+        self.assertIn('Dry-run: 0 photo(s)', out.getvalue())
+
+    def test_project_reupload_replaces_derivatives(self):
+        url = reverse('project-upload-image', args=[self.project.pk]) + f'?user_id={self.pm_user.pk}'
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self.client.post(url, {'image': self._jpeg()})
+        self.assertEqual(r.status_code, 200)
+        self.project.refresh_from_db()
+        old = [name for formats in self.project.project_image_variants['sizes'].values() for name in formats.values()]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self.client.post(url, {'image': self._jpeg((900, 600), (20, 90, 160))})
+        self.assertEqual(r.status_code, 200)
+        self.project.refresh_from_db()
+        # Same original name, new bytes: the old derivatives are gone.
+        self.assertEqual(self.project.project_image_variants['source'], self.project.project_image)
+        self.assertFalse([name for name in old if default_storage.exists(name)])
+        with self._open(self.project.project_image_variants['sizes']['full']['jpeg']) as full:
+            self.assertEqual(full.size, (900, 600))
+
+    def test_inventory_photo_reupload_rebuilds_derivatives(self):
+        url = reverse('inventory-item-upload-photo', args=[self.cement.pk]) + f'?user_id={self.pm_user.pk}'
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self.client.post(url, {'image': self._jpeg()})
+        self.assertEqual(r.status_code, 200)
+        self.cement.refresh_from_db()
+        name = self.cement.photo.name
+        old = [n for formats in self.cement.photo_variants['sizes'].values() for n in formats.values()]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self.client.post(url, {'image': self._jpeg((600, 900), (20, 90, 160))})
+        self.assertEqual(r.status_code, 200)
+        self.cement.refresh_from_db()
+        self.assertEqual(self.cement.photo.name, name)
+        self.assertEqual(self.cement.photo_variants['source'], name)
+        self.assertFalse([n for n in old if default_storage.exists(n)])
+        with self._open(self.cement.photo_variants['sizes']['full']['jpeg']) as full:
+            self.assertEqual(full.size, (600, 900))
+
+    def test_builds_are_handed_to_the_pool(self):
+        executor = mock.Mock()
+        with mock.patch.object(image_derivatives, '_get_executor', return_value=executor), \
+                mock.patch.object(image_derivatives, 'generate_for') as generate:
+            with self.captureOnCommitCallbacks(execute=True):
+                worker = self._worker(photo=self._jpeg())
+        # Nothing is encoded on the saving thread; the pool gets the row's key.
+        generate.assert_not_called()
+        executor.submit.assert_called_once_with(image_derivatives._build_in_pool, models.FieldWorker, worker.pk)
+
+        # The job reloads the row, so it builds what is current by then.
+        image_derivatives._build(models.FieldWorker, worker.pk)
+        worker.refresh_from_db()
+        self.assertEqual(worker.photo_variants['source'], worker.photo.name)
+
+
+# ---------------------------------------------------------------------------
+# Content-addressed media storage
+# ---------------------------------------------------------------------------
+
+class ContentAddressedStorageTests(BudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root))
+        self.storage = ContentAddressedStorage(location=self.media_root)
+
+    def _inode(self, name):
+        return os.stat(self.storage.path(name)).st_ino
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self.storage.save('client_images/a.jpg', ContentFile(b'same selfie'))
+        with mock.patch.object(ContentAddressedStorage, '_write_blob') as write:
+            second = self.storage.save('fieldworker_images/b.jpg', ContentFile(b'same selfie'))
+        # The second copy is only a link: nothing was written.
+        write.assert_not_called()
+        self.assertEqual(self._inode(first), self._inode(second))
+        self.assertEqual(self.storage.refcount(first), 2)
+        with self.storage.open(second) as fh:
+            self.assertEqual(fh.read(), b'same selfie')
+
+        other = self.storage.save('client_images/a.jpg', ContentFile(b'another photo'))
+        self.assertNotEqual(other, first)
+        self.assertEqual(self.storage.refcount(other), 1)
+
+    def test_blob_is_freed_with_its_last_name(self):
+        first = self.storage.save('a.jpg', ContentFile(b'bytes'))
+        second = self.storage.save('b.jpg', ContentFile(b'bytes'))
+        blob = self.storage._blob_for(first)
+        self.storage.delete(first)
+        self.assertTrue(os.path.exists(blob))
+        self.assertEqual(self.storage.refcount(second), 1)
+        self.storage.delete(second)
+        self.assertFalse(os.path.exists(blob))
+
+    def test_project_image_reupload_goes_through_storage(self):
+        url = reverse('project-upload-image', args=[self.project.pk])
+        for content in (b'first', b'second'):
+            r = self.client.post(
+                f'{url}?user_id={self.pm_user.pk}',
+                {'image': SimpleUploadedFile('site.png', content)},
+                format='multipart',
+            )
+            self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.project.refresh_from_db()
+        name = self.project.project_image
+        self.assertEqual(name, f'project_images/pj_{self.pm_user.pk}_{self.project.pk}.png')
+        self.assertTrue(r.data['url'].endswith(name))
+        with default_storage.open(name) as fh:
+            self.assertEqual(fh.read(), b'second')
+        # The first upload's blob went away with it.
+        self.assertEqual(default_storage.refcount(name), 1)
+
+    def test_inventory_photo_reupload_leaves_shared_blob_alone(self):
+        url = reverse('inventory-item-upload-photo', args=[self.cement.pk]) + f'?user_id={self.pm_user.pk}'
+        r = self.client.post(url, {'image': SimpleUploadedFile('bag.jpg', b'shared bytes')}, format='multipart')
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.cement.refresh_from_db()
+        name = self.cement.photo.name
+        twin = default_storage.save('client_images/twin.jpg', ContentFile(b'shared bytes'))
+        self.assertEqual(default_storage.refcount(twin), 2)
+
+        r = self.client.post(url, {'image': SimpleUploadedFile('bag.jpg', b'new bytes')}, format='multipart')
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.cement.refresh_from_db()
+        self.assertEqual(self.cement.photo.name, name)
+        with default_storage.open(name) as fh:
+            self.assertEqual(fh.read(), b'new bytes')
+        # The other name linked to the old blob still has the old bytes.
+        with default_storage.open(twin) as fh:
+            self.assertEqual(fh.read(), b'shared bytes')
+        self.assertEqual(default_storage.refcount(twin), 1)
+
+    def test_dedupe_media_command(self):
+        for name in ('client_images/x.jpg', 'inventory_images/y.jpg'):
+            os.makedirs(os.path.dirname(self.storage.path(name)), exist_ok=True)
+            with open(self.storage.path(name), 'wb') as fh:
+                fh.write(b'x' * 2048)
+        out = StringIO()
+        call_command('dedupe_media', stdout=out)
+        self.assertIn('2 to link into blobs', out.getvalue())
+        self.assertNotEqual(self._inode('client_images/x.jpg'), self._inode('inventory_images/y.jpg'))
+
+        call_command('dedupe_media', apply=True, stdout=StringIO())
+        self.assertEqual(self._inode('client_images/x.jpg'), self._inode('inventory_images/y.jpg'))
+        self.assertEqual(self.storage.refcount('client_images/x.jpg'), 2)
+        self.assertEqual(
+            stored_digest(self.storage.path('client_images/x.jpg')),
+            hashlib.sha256(b'x' * 2048).hexdigest(),
+        )
+
+        out = StringIO()
+        call_command('dedupe_media', stdout=out)
+        self.assertIn('0 to link into blobs, 0 orphaned blob(s)', out.getvalue())
+
+
+# ---------------------------------------------------------------------------
+# Media serving
+# ---------------------------------------------------------------------------
+
+class MediaServingTests(TestCase):
+    body = bytes(range(256)) * 4
+
+    def setUp(self):
+        media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.name = default_storage.save('subtask_update_photos/site.jpg', ContentFile(self.body))
+        self.url = f'/media/{self.name}'
+
+    def _etag(self):
+        return '"%s"' % hashlib.sha256(self.body).hexdigest()
+
+    def test_validators_and_not_modified(self):
+        r = self.client.get(self.url)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(b''.join(r.streaming_content), self.body)
+        self.assertEqual(r['ETag'], self._etag())
+        self.assertEqual(r['Cache-Control'], 'no-cache')
+        self.assertEqual(r['Accept-Ranges'], 'bytes')
+        self.assertEqual(r['Content-Type'], 'image/jpeg')
+
+        r304 = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"other", W/{self._etag()}')
+        self.assertEqual(r304.status_code, 304)
+        self.assertEqual(r304['ETag'], self._etag())
+        r304 = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=r['Last-Modified'])
+        self.assertEqual(r304.status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_etag_is_recorded_at_store_time(self):
+        self.assertEqual(stored_digest(default_storage.path(self.name)), self._etag().strip('"'))
+        with mock.patch('rest_api.media.file_digest') as rehash:
+            r = self.client.get(self.url)
+        rehash.assert_not_called()
+        self.assertEqual(r['ETag'], self._etag())
+
+    def test_in_place_rewrite_changes_the_etag(self):
+        old_etag = self.client.get(self.url)['ETag']
+        path = default_storage.path(self.name)
+        stat = os.stat(path)
+        # Same size, same inode: only the mtime tells the versions apart.
+        with open(path, 'r+b') as fh:
+            fh.write(b'\xff' * 16)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertIsNone(stored_digest(path))
+
+        r = self.client.get(self.url, HTTP_IF_NONE_MATCH=old_etag)
+        self.assertEqual(r.status_code, 200)
+        with open(path, 'rb') as fh:
+            self.assertEqual(r['ETag'], '"%s"' % hashlib.sha256(fh.read()).hexdigest())
+        # Tagged again for the new version.
+        self.assertEqual(stored_digest(path), r['ETag'].strip('"'))
+
+    async def test_asgi_bodies_are_async_chunks(self):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            full = await self.async_client.get(self.url)
+            ranged = await self.async_client.get(self.url, headers={'Range': 'bytes=10-19'})
+            self.assertTrue(full.is_async and ranged.is_async)
+            full_body = b''.join([chunk async for chunk in full])
+            ranged_body = b''.join([chunk async for chunk in ranged])
+        self.assertEqual(
+            [str(w.message) for w in caught if 'StreamingHttpResponse' in str(w.message)], []
+        )
+        self.assertEqual(full_body, self.body)
+        self.assertEqual((ranged.status_code, ranged_body), (206, self.body[10:20]))
+
+    def test_byte_ranges(self):
+        r = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(r.status_code, 206)
+        self.assertEqual(r['Content-Range'], f'bytes 10-19/{len(self.body)}')
+        self.assertEqual(b''.join(r.streaming_content), self.body[10:20])
+
+        r = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(r.streaming_content), self.body[-5:])
+
+        r = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.body)}-')
+        self.assertEqual(r.status_code, 416)
+        self.assertEqual(r['Content-Range'], f'bytes */{len(self.body)}')
+
+        # A stale If-Range gets the whole (changed) file instead of a slice.
+        r = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(r.status_code, 200)
+
+    def test_derivatives_are_cached_forever_and_paths_are_confined(self):
+        name = default_storage.save('derivatives/x/card.0123456789ab.webp', ContentFile(b'w'))
+        r = self.client.get(f'/media/{name}')
+        self.assertEqual(r['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(self.client.get('/media/../settings.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/subtask_update_photos/').status_code, 404)
+
+
+# ---------------------------------------------------------------------------
+# Resumable subtask photo uploads
+# ---------------------------------------------------------------------------
+
+class ResumableSubtaskPhotoUploadTests(BudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.staging_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(
+            MEDIA_ROOT=self.media_root, PHOTO_UPLOAD_STAGING_ROOT=self.staging_root,
+        ))
+        self.subtask = models.Subtask.objects.create(
+            phase=self.phase_1, title='Pour slab', status='in_progress',
+        )
+        self.body = os.urandom(3000)
+
+    def _start(self, **extra):
+        payload = {'filename': 'slab.jpg', 'size': len(self.body), **extra}
+        return self.client.post(
+            reverse('subtask-start-photo-upload', args=[self.subtask.pk]), payload, format='json',
+        )
+
+    def _url(self, upload_id, name='subtask-photo-upload'):
+        return reverse(name, kwargs={'pk': self.subtask.pk, 'upload_id': upload_id})
+
+    def _put(self, upload_id, offset, data):
+        return self.client.put(
+            self._url(upload_id), data=data,
+            content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_upload_resumes_from_the_stored_offset(self):
+        r = self._start(sha256=hashlib.sha256(self.body).hexdigest())
+        self.assertEqual(r.status_code, 201)
+        upload_id = r.data['upload_id']
+        self.assertEqual(r.data['offset'], 0)
+
+        self.assertEqual(self._put(upload_id, 0, self.body[:1000]).data['offset'], 1000)
+        # Connection dropped: the client asks where to resume.
+        r = self.client.get(self._url(upload_id))
+        self.assertEqual((r.data['offset'], r.data['status']), (1000, 'pending'))
+
+        # A retry of the chunk already stored is refused with the real offset.
+        r = self._put(upload_id, 0, self.body[:1000])
+        self.assertEqual(r.status_code, 409)
+        self.assertEqual(r.data['offset'], 1000)
+
+        r = self.client.post(self._url(upload_id, 'subtask-finalize-photo-upload'))
+        self.assertEqual(r.status_code, 409)
+
+        self.assertEqual(self._put(upload_id, 1000, self.body[1000:]).data['offset'], 3000)
+        r = self.client.post(self._url(upload_id, 'subtask-finalize-photo-upload'))
+        self.assertEqual(r.status_code, 200)
+        photo = models.SubtaskPhoto.objects.get(subtask=self.subtask)
+        self.assertEqual(r.data['photo_id'], photo.photo_id)
+        with photo.photo.open('rb') as fh:
+            self.assertEqual(fh.read(), self.body)
+        self.assertEqual(os.listdir(self.staging_root), [])
+
+        # Finalizing again (a lost response) returns the same photo.
+        again = self.client.post(self._url(upload_id, 'subtask-finalize-photo-upload'))
+        self.assertEqual(again.data['photo_id'], photo.photo_id)
+        self.assertEqual(models.SubtaskPhoto.objects.filter(subtask=self.subtask).count(), 1)
+
+    def test_malformed_upload_id_is_404(self):
+        for upload_id in ('abc', '0-0', str(uuid.uuid4())):
+            r = self.client.get(self._url(upload_id))
+            self.assertEqual(r.status_code, 404, upload_id)
+            self.assertFalse(r.data['success'])
+        r = self.client.post(self._url('abc', 'subtask-finalize-photo-upload'))
+        self.assertEqual(r.status_code, 404)
+        r = self._put('abc', 0, b'x')
+        self.assertEqual(r.status_code, 404)
+
+    def test_checksum_mismatch_restarts_the_upload(self):
+        upload_id = self._start(sha256='0' * 64).data['upload_id']
+        self._put(upload_id, 0, self.body)
+        r = self.client.post(self._url(upload_id, 'subtask-finalize-photo-upload'))
+        self.assertEqual(r.status_code, 422)
+        self.assertEqual(r.data['offset'], 0)
+        self.assertEqual(self.client.get(self._url(upload_id)).data['offset'], 0)
+        self.assertFalse(models.SubtaskPhoto.objects.filter(subtask=self.subtask).exists())
+
+    def test_bytes_past_the_declared_size_are_rejected(self):
+        upload_id = self._start().data['upload_id']
+        r = self._put(upload_id, 0, self.body + b'extra')
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(self.client.get(self._url(upload_id)).data['offset'], 0)
+
+    def test_pending_uploads_count_towards_the_photo_limit(self):
+        for _ in range(5):
+            self.assertEqual(self._start().status_code, 201)
+        r = self._start()
+        self.assertEqual(r.status_code, 400)
+        self.assertFalse(r.data['success'])
+
+    def test_expired_pending_uploads_free_their_slot(self):
+        ids = [self._start().data['upload_id'] for _ in range(5)]
+        self._put(ids[0], 0, self.body[:10])
+        models.SubtaskPhotoUpload.objects.filter(pk=ids[0]).update(
+            created_at=timezone.now() - timedelta(hours=25)
+        )
+        self.assertEqual(self._start().status_code, 201)
+        self.assertFalse(models.SubtaskPhotoUpload.objects.filter(pk=ids[0]).exists())
+        self.assertNotIn(f'{ids[0]}.part', os.listdir(self.staging_root))
+
+    def test_pending_uploads_can_be_listed_and_cancelled(self):
+        ids = [self._start().data['upload_id'] for _ in range(5)]
+        self._put(ids[0], 0, self.body[:10])
+        r = self.client.get(reverse('subtask-start-photo-upload', args=[self.subtask.pk]))
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual([u['upload_id'] for u in r.data['uploads']], ids)
+        self.assertEqual(r.data['uploads'][0]['offset'], 10)
+
+        r = self.client.delete(self._url(ids[0]))
+        self.assertEqual(r.status_code, 204)
+        self.assertNotIn(f'{ids[0]}.part', os.listdir(self.staging_root))
+        self.assertEqual(self.client.get(self._url(ids[0])).status_code, 404)
+        # The cancelled upload's slot is free again.
+        upload_id = self._start().data['upload_id']
+
+        self._put(upload_id, 0, self.body)
+        self.client.post(self._url(upload_id, 'subtask-finalize-photo-upload'))
+        r = self.client.delete(self._url(upload_id))
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(models.SubtaskPhoto.objects.filter(subtask=self.subtask).count(), 1)
+
+    def test_purge_removes_abandoned_uploads(self):
+        upload_id = self._start().data['upload_id']
+        self._put(upload_id, 0, self.body[:10])
+        models.SubtaskPhotoUpload.objects.filter(pk=upload_id).update(
+            created_at=timezone.now() - timedelta(hours=48)
+        )
+        call_command('purge_photo_uploads', stdout=StringIO())
+        self.assertTrue(models.SubtaskPhotoUpload.objects.filter(pk=upload_id).exists())
+        call_command('purge_photo_uploads', '--apply', stdout=StringIO())
+        self.assertFalse(models.SubtaskPhotoUpload.objects.filter(pk=upload_id).exists())
+        self.assertEqual(os.listdir(self.staging_root), [])
+
+
+# ---------------------------------------------------------------------------
+# Email outbox
+# ---------------------------------------------------------------------------
+
+@override_settings(SENDGRID_API_KEY='', DEFAULT_FROM_EMAIL='noreply@structura.test')
+class EmailOutboxTests(TestCase):
+    def _queue(self, count=1, **extra):
+        for i in range(count):
+            send_signup_otp_email(to_email=f'user{i}@example.com', otp_code='123456', **extra)
+        return list(models.EmailOutbox.objects.order_by('email_id'))
+
+    def test_emails_are_queued_not_sent_inline(self):
+        with mock.patch('threading.Thread') as thread:
+            rows = self._queue()
+        thread.assert_not_called()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(rows[0].status, models.EmailOutbox.STATUS_PENDING)
+        self.assertIn('123456', rows[0].body)
+
+        out = StringIO()
+        call_command('run_email_worker', '--once', stdout=out)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['user0@example.com'])
+        rows[0].refresh_from_db()
+        self.assertEqual(rows[0].status, models.EmailOutbox.STATUS_SENT)
+        self.assertIsNotNone(rows[0].sent_at)
+        self.assertIn('Batch of 1: 1 sent.', out.getvalue())
+
+    @override_settings(EMAIL_OUTBOX_DELIVER_INLINE=True)
+    def test_inline_delivery_when_no_worker_runs(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            (row,) = self._queue()
+            self.assertEqual(len(mail.outbox), 0)  # Not before the commit.
+        row.refresh_from_db()
+        self.assertEqual(row.status, models.EmailOutbox.STATUS_SENT)
+        self.assertEqual(len(mail.outbox), 1)
+        # Already claimed and sent: the worker finds nothing to do.
+        self.assertEqual(email_outbox.claim_batch(), [])
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend', EMAIL_HOST='smtp.test')
+    def test_batch_shares_one_smtp_connection(self):
+        self._queue(3)
+        with mock.patch('django.core.mail.backends.smtp.smtplib.SMTP') as smtp:
+            transport = email_outbox.get_transport()
+            rows = email_outbox.process_batch(transport)
+            transport.close()
+        self.assertEqual(smtp.call_count, 1)
+        self.assertEqual(smtp.return_value.sendmail.call_count, 3)
+        self.assertEqual({row.status for row in rows}, {models.EmailOutbox.STATUS_SENT})
+
+    def test_failures_back_off_then_give_up(self):
+        row = self._queue()[0]
+        transport = mock.Mock()
+        transport.send.side_effect = RuntimeError('421 try later')
+        with override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2):
+            email_outbox.process_batch(transport)
+            row.refresh_from_db()
+            self.assertEqual((row.status, row.attempts), (models.EmailOutbox.STATUS_PENDING, 1))
+            self.assertGreater(row.next_attempt_at, timezone.now())
+            self.assertIn('421 try later', row.last_error)
+            # Not due yet: nothing is claimed.
+            self.assertEqual(email_outbox.claim_batch(), [])
+
+            models.EmailOutbox.objects.filter(pk=row.pk).update(next_attempt_at=timezone.now())
+            email_outbox.process_batch(transport)
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), (models.EmailOutbox.STATUS_FAILED, 2))
+
+    def test_refused_sender_falls_back_to_default_from(self):
+        send_invitation_email(
+            to_email='worker@example.com', role='Supervisor', temp_password='pw', invited_by_email='pm@example.com',
+            invited_by_name='Pat PM',
+        )
+        transport = mock.Mock()
+        transport.send.side_effect = [RuntimeError('sender not allowed'), 'accepted=1']
+        (row,) = email_outbox.process_batch(transport)
+        self.assertEqual(row.status, models.EmailOutbox.STATUS_SENT)
+        first, second = transport.send.call_args_list
+        self.assertEqual(first.args[1], 'Pat PM <pm@example.com>')
+        self.assertEqual(second.args[1:], ('noreply@structura.test', ''))
+        self.assertEqual(row.reply_to, 'pm@example.com')
+
+    def test_stale_claims_are_reclaimed(self):
+        rows = self._queue(2)
+        self.assertEqual(len(email_outbox.claim_batch()), 2)
+        self.assertEqual(email_outbox.claim_batch(), [])
+        models.EmailOutbox.objects.filter(pk=rows[0].pk).update(
+            claimed_at=timezone.now() - timedelta(hours=1)
+        )
+        (reclaimed,) = email_outbox.claim_batch()
+        self.assertEqual((reclaimed.pk, reclaimed.attempts), (rows[0].pk, 2))
+
+    def test_sendgrid_reuses_its_session_and_fails_fast_on_rejection(self):
+        self._queue(2)
+        session = mock.Mock(headers={})
+        session.post.side_effect = [
+            mock.Mock(status_code=202, text=''),
+            mock.Mock(status_code=400, text='invalid email'),
+        ]
+        transport = email_outbox.SendGridTransport('key', session=session)
+        first, second = email_outbox.process_batch(transport)
+        self.assertEqual(session.post.call_count, 2)
+        self.assertEqual(session.headers['Authorization'], 'Bearer key')
+        payload = session.post.call_args_list[0].kwargs['json']
+        self.assertEqual(payload['from'], {'email': 'noreply@structura.test'})
+        self.assertEqual(first.status, models.EmailOutbox.STATUS_SENT)
+        self.assertEqual(second.status, models.EmailOutbox.STATUS_FAILED)
+        self.assertEqual(second.attempts, 1)
@@ -1,8 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .streams import notification_stream
 from .views import (
     health_check,
     verify_profile_photo,
+    verify_profile_photos_batch,
     ListUser, 
     DetailUser, 
     login_user,
@@ -31,10 +33,13 @@ from .views import (
     InventoryUsageViewSet,
     PhaseMaterialPlanViewSet,
     pm_dashboard_summary,
+    pm_dashboard_cache_metrics,
+    pm_inbox,
     pm_inbox_mark_read,
     supervisor_inbox,
     supervisor_inbox_mark_read,
     pm_audit_trail,
+    pm_audit_trail_export,
     debug_projects,
     debug_all_data,
     SupervisorReportSubmissionViewSet,
@@ -85,19 +90,32 @@ urlpatterns = [
     path('subscription/paymongo-checkout/', create_paymongo_checkout, name='create_paymongo_checkout'),
     path('webhooks/paymongo/', paymongo_webhook, name='paymongo_webhook'),
     path('pm/dashboard/', pm_dashboard_summary, name='pm_dashboard_summary'),
+    path(
+        'pm/dashboard/cache-metrics/',
+        pm_dashboard_cache_metrics,
+        name='pm_dashboard_cache_metrics',
+    ),
+    path('pm/inbox/', pm_inbox, name='pm_inbox'),
     path(
         'pm/inbox/<int:notification_id>/read/',
         pm_inbox_mark_read,
         name='pm_inbox_mark_read',
     ),
     path('supervisor/inbox/', supervisor_inbox, name='supervisor_inbox'),
+    path('notifications/stream/', notification_stream, name='notification_stream'),
     path(
         'supervisor/inbox/<int:notification_id>/read/',
         supervisor_inbox_mark_read,
         name='supervisor_inbox_mark_read',
     ),
     path('pm/audit-trail/', pm_audit_trail, name='pm_audit_trail'),
+    path('pm/audit-trail/export/', pm_audit_trail_export, name='pm_audit_trail_export'),
     path('image-verification/', verify_profile_photo, name='verify_profile_photo'),
+    path(
+        'image-verification/batch/',
+        verify_profile_photos_batch,
+        name='verify_profile_photos_batch',
+    ),
     path('debug/projects/', debug_projects, name='debug_projects'),
     path('debug/all/', debug_all_data, name='debug_all_data'),
 ]
@@ -12,13 +12,18 @@ from django.db import transaction
 from django.db.models.functions import TruncDate, TruncMonth, ExtractMonth
 from django.utils import timezone
 from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.http import StreamingHttpResponse
+import csv
 import json
 import os
 import re
 import secrets
 import threading
 import time
-from datetime import timedelta
+import uuid
+import zlib
+from datetime import date, datetime, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
@@ -66,7 +71,8 @@ def _photo_path(photo_field):
         return None
 
 
-from app.image_verification import verify_image_has_human_face
+from .face_verification import has_human_face, has_human_faces
+from .streaming import is_asgi
 from .email_utils import (
     send_signup_otp_email,
     send_phase_update_summary_email,
@@ -398,7 +404,7 @@ def verify_profile_photo(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    if verify_image_has_human_face(image_bytes):
+    if has_human_face(image_bytes):
         return Response(
             {
                 'image_verification': 'ACCEPT',
@@ -415,9 +421,93 @@ def verify_profile_photo(request):
         status=status.HTTP_400_BAD_REQUEST,
     )
 
+
+@csrf_exempt
+@api_view(['POST'])
+@parser_classes([MultiPartParser, FormParser])
+def verify_profile_photos_batch(request):
+    """
+    `verify_profile_photo` for several photos in one request: every file in
+    the multipart field "images" is checked concurrently, and each gets the
+    ACCEPT/REJECT verdict and detail the single endpoint would give it.
+    """
+    uploads = request.FILES.getlist('images')
+    if not uploads:
+        return Response(
+            {'success': False, 'message': 'No files provided. Use multipart field "images".'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    max_images = settings.FACE_VERIFICATION_BATCH_MAX_IMAGES
+    if len(uploads) > max_images:
+        return Response(
+            {'success': False, 'message': f'At most {max_images} images per request.'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    # Every image is held in memory and copied to a worker; bound the total
+    # before reading any of them.
+    max_bytes = settings.FACE_VERIFICATION_BATCH_MAX_BYTES
+    if sum(uploaded.size or 0 for uploaded in uploads) > max_bytes:
+        return Response(
+            {
+                'success': False,
+                'message': f'At most {max_bytes // (1024 * 1024)} MB of images per request.',
+            },
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    images = [uploaded.read() for uploaded in uploads]
+    verdicts = has_human_faces(images)
+
+    results = []
+    for index, (uploaded, image_bytes, has_face) in enumerate(zip(uploads, images, verdicts)):
+        if not image_bytes:
+            verdict, detail = 'REJECT', 'Uploaded image appears to be empty.'
+        elif has_face:
+            verdict, detail = 'ACCEPT', 'Human face detected in the uploaded image.'
+        else:
+            verdict, detail = 'REJECT', 'No human face detected in the uploaded image.'
+        results.append({
+            'index': index,
+            'filename': uploaded.name,
+            'image_verification': verdict,
+            'detail': detail,
+        })
+
+    accepted = sum(1 for r in results if r['image_verification'] == 'ACCEPT')
+    return Response(
+        {
+            'success': True,
+            'accepted': accepted,
+            'rejected': len(results) - accepted,
+            'results': results,
+        },
+        status=status.HTTP_200_OK,
+    )
+
 # Create your views here.
 from app import models
 from app.services.phase_lifecycle import close_phase_material_plans
+from app.services import photo_uploads
+from app.services.project_status import sync_project_statuses
+from app.services.audit_trail import (
+    AUDIT_ROW_FIELDS,
+    audit_events_for,
+    aiter_audit_event_pages,
+    audit_row,
+    iter_audit_event_pages,
+)
+from app.services.budget_ledger import budget_as_of, post_payroll_delta
+from app.services.dashboard_cache import dashboard_cache_metrics, get_dashboard_payload
+from app.services.image_derivatives import discard_derivatives, variant_urls
+from app.services.inbox import (
+    DELTA_OVERLAP as INBOX_DELTA_OVERLAP,
+    InvalidSince,
+    inbox_delta,
+    mark_read as inbox_mark_read,
+    recipient_queryset,
+    unread_count as inbox_unread_count,
+)
+from app.services.subtask_activity import daily_series, monthly_completed
 from app.services.material_usage import (
     record_material_usage,
     MaterialUsageError,
@@ -429,6 +519,8 @@ from app.services.budget_validation import (
     check_phase_is_deletable,
     check_inventory_item_is_deletable,
 )
+from .pagination import AuditTrailPagination, KeysetPagination
+from .projections import AttendanceProjection, InventoryUsageProjection
 from .serializers import (
     UserSerializer, 
     RegionSerializer, 
@@ -452,6 +544,7 @@ from .serializers import (
     InventoryUnitSerializer,
     InventoryUnitMovementSerializer,
     PhaseMaterialPlanSerializer,
+    subtask_prefetches,
 )
 from rest_framework.exceptions import ValidationError
 from decimal import Decimal, InvalidOperation
@@ -1347,6 +1440,8 @@ def _as_of_date_from_request(request):
 
 class ProjectViewSet(viewsets.ModelViewSet):
     serializer_class = ProjectSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = '-created_at'
 
     @action(detail=True, methods=['post'], url_path='upload_image', parser_classes=[MultiPartParser, FormParser])
     def upload_image(self, request, pk=None):
@@ -1359,8 +1454,6 @@ class ProjectViewSet(viewsets.ModelViewSet):
             return Response({'error': 'No image file provided.'}, status=400)
 
         # Save to MEDIA_ROOT/project_images/pj_<user_id>_<project_id>.<ext>
-        media_root = getattr(settings, 'MEDIA_ROOT', 'media')
-        os.makedirs(os.path.join(media_root, 'project_images'), exist_ok=True)
         original_name = getattr(image_file, 'name', '') or ''
         ext = os.path.splitext(original_name)[1].lower()
         if not ext:
@@ -1368,13 +1461,16 @@ class ProjectViewSet(viewsets.ModelViewSet):
 
         owner_user_id = getattr(project, 'user_id', None) or '0'
         filename = f'pj_{owner_user_id}_{project.project_id}{ext}'
-        file_path = os.path.join(media_root, 'project_images', filename)
-        with open(file_path, 'wb+') as dest:
-            for chunk in image_file.chunks():
-                dest.write(chunk)
+        # Same file name on re-upload: delete the old derivatives and drop
+        # the manifest so they are rebuilt from the new bytes.
+        discard_derivatives(project)
+        # Replace the previous upload under the same name (through the
+        # storage, so its content blob is released).
+        if default_storage.exists(f'project_images/{filename}'):
+            default_storage.delete(f'project_images/{filename}')
+        rel_path = default_storage.save(f'project_images/{filename}', image_file)
 
         # Save path to project and return URL
-        rel_path = f'project_images/{filename}'
         project.project_image = rel_path
         project.save()
 
@@ -1383,7 +1479,12 @@ class ProjectViewSet(viewsets.ModelViewSet):
             url = request.build_absolute_uri(settings.MEDIA_URL + rel_path)
         else:
             url = settings.MEDIA_URL + rel_path
-        return Response({'url': url})
+        variants = variant_urls(
+            project.project_image_variants,
+            rel_path,
+            build_url=getattr(request, 'build_absolute_uri', None),
+        )
+        return Response({'url': url, 'variants': variants})
 
     @action(detail=True, methods=['post'], url_path='add-supervisor')
     def add_supervisor(self, request, pk=None):
@@ -1592,12 +1693,10 @@ class ProjectViewSet(viewsets.ModelViewSet):
         return models.Project.objects.all()
 
     def list(self, request, *args, **kwargs):
-        to_refresh = self.filter_queryset(self.get_queryset()).prefetch_related(
-            'phases__subtasks',
-        )
         as_of = _as_of_date_from_request(request)
-        for project in to_refresh:
-            project.refresh_overdue_status(as_of_date=as_of)
+        sync_project_statuses(
+            self.filter_queryset(self.get_queryset()), as_of=as_of
+        )
         qs = self.filter_queryset(self.get_queryset())
         st = (request.query_params.get('status') or '').strip()
         if st:
@@ -1612,8 +1711,10 @@ class ProjectViewSet(viewsets.ModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         as_of = _as_of_date_from_request(request)
-        instance.refresh_overdue_status(as_of_date=as_of)
-        instance.refresh_from_db()
+        if sync_project_statuses(
+            models.Project.objects.filter(pk=instance.pk), as_of=as_of
+        ):
+            instance.refresh_from_db()
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
@@ -1626,13 +1727,18 @@ class ProjectViewSet(viewsets.ModelViewSet):
             serializer.save(user_id=user_id)
         else:
             raise ValueError("user_id is required to create a project")
-        as_of = _as_of_date_from_request(self.request)
-        serializer.instance.refresh_overdue_status(as_of_date=as_of)
+        self._sync_instance_status(serializer.instance)
 
     def perform_update(self, serializer):
         super().perform_update(serializer)
+        self._sync_instance_status(serializer.instance)
+
+    def _sync_instance_status(self, instance):
         as_of = _as_of_date_from_request(self.request)
-        serializer.instance.refresh_overdue_status(as_of_date=as_of)
+        if sync_project_statuses(
+            models.Project.objects.filter(pk=instance.pk), as_of=as_of
+        ):
+            instance.refresh_from_db(fields=['status', 'on_hold_reason'])
 
     @action(detail=True, methods=['patch'], url_path='set-budget')
     def set_budget(self, request, pk=None):
@@ -1666,6 +1772,24 @@ class ProjectViewSet(viewsets.ModelViewSet):
         project = self.get_object()
         return Response(project_budget_summary(project))
 
+    @action(detail=True, methods=['get'], url_path='budget-as-of', url_name='budget-as-of')
+    def budget_as_of_date(self, request, pk=None):
+        """
+        Historic budget figures replayed from the budget ledger:
+        GET /projects/<id>/budget-as-of/?date=YYYY-MM-DD
+        """
+        project = self.get_object()
+        raw = (request.query_params.get('date') or '').strip()[:10]
+        if not raw:
+            return Response({'error': 'date is required (YYYY-MM-DD)'}, status=400)
+        from datetime import date
+
+        try:
+            as_of = date.fromisoformat(raw)
+        except ValueError:
+            return Response({'error': 'date must be YYYY-MM-DD'}, status=400)
+        return Response(budget_as_of(project, as_of))
+
 
 @csrf_exempt
 @api_view(['GET'])
@@ -1757,7 +1881,7 @@ class SupervisorsViewSet(viewsets.ModelViewSet):
         except Exception:
             pass
 
-        if not verify_image_has_human_face(image_bytes):
+        if not has_human_face(image_bytes):
             return Response(
                 {
                     'image_verification': 'REJECT',
@@ -1766,7 +1890,9 @@ class SupervisorsViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Delete existing photo so the next save reuses the same name.
+        # Delete existing photo so the next save reuses the same name, and its
+        # derivatives so they are rebuilt from the new bytes.
+        discard_derivatives(supervisor)
         if getattr(supervisor, 'photo', None):
             try:
                 supervisor.photo.delete(save=False)
@@ -1848,7 +1974,7 @@ class SupervisorViewSet(viewsets.ModelViewSet):
         except Exception:
             pass
 
-        if not verify_image_has_human_face(image_bytes):
+        if not has_human_face(image_bytes):
             return Response(
                 {
                     'image_verification': 'REJECT',
@@ -1857,6 +1983,8 @@ class SupervisorViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        # The new photo keeps this name: drop its derivatives so they are rebuilt.
+        discard_derivatives(supervisor)
         if getattr(supervisor, 'photo', None):
             try:
                 supervisor.photo.delete(save=False)
@@ -1883,10 +2011,14 @@ class SupervisorViewSet(viewsets.ModelViewSet):
 class FieldWorkerViewSet(viewsets.ModelViewSet):
     queryset = models.FieldWorker.objects.all()
     serializer_class = FieldWorkerSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = '-created_at'
 
     def get_queryset(self):
         def _with_damage_entries(qs):
-            return qs.prefetch_related('damage_entries')
+            # project_id feeds assigned_projects; the page's assignment rows
+            # are loaded in one query by FieldWorkerListSerializer.
+            return qs.select_related('project_id').prefetch_related('damage_entries')
 
         pm_user_id = _get_request_pm_user_id(self.request)
         project_id = self.request.query_params.get('project_id')
@@ -1996,7 +2128,7 @@ class FieldWorkerViewSet(viewsets.ModelViewSet):
         except Exception:
             pass
 
-        if not verify_image_has_human_face(image_bytes):
+        if not has_human_face(image_bytes):
             return Response(
                 {
                     'image_verification': 'REJECT',
@@ -2005,7 +2137,9 @@ class FieldWorkerViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Delete existing photo so the next save reuses the same name.
+        # Delete existing photo so the next save reuses the same name, and its
+        # derivatives so they are rebuilt from the new bytes.
+        discard_derivatives(field_worker)
         if getattr(field_worker, 'photo', None):
             try:
                 field_worker.photo.delete(save=False)
@@ -2324,7 +2458,7 @@ class ClientViewSet(viewsets.ModelViewSet):
         except Exception:
             pass
 
-        if not verify_image_has_human_face(image_bytes):
+        if not has_human_face(image_bytes):
             return Response(
                 {
                     'image_verification': 'REJECT',
@@ -2333,7 +2467,9 @@ class ClientViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Delete existing photo so the next save reuses the same name.
+        # Delete existing photo so the next save reuses the same name, and its
+        # derivatives so they are rebuilt from the new bytes.
+        discard_derivatives(client)
         if getattr(client, 'photo', None):
             try:
                 client.photo.delete(save=False)
@@ -2501,13 +2637,8 @@ def _report_total_salary_amount(report_data) -> Decimal:
 
 
 def _apply_project_payroll_budget_delta(project: models.Project, delta: Decimal) -> None:
-    """Apply payroll spend delta to project budget accounting safely."""
-    current = project.payroll_used_budget or Decimal('0')
-    next_value = current + delta
-    if next_value < Decimal('0'):
-        next_value = Decimal('0')
-    project.payroll_used_budget = next_value.quantize(Decimal('0.01'))
-    project.save(update_fields=['payroll_used_budget'])
+    """Apply payroll spend delta to project budget accounting safely (via the budget ledger)."""
+    post_payroll_delta(project=project, delta=delta, note='Supervisor report payroll')
 
 
 def _flatten_supervisor_report_for_client(instance: models.SupervisorReportSubmission) -> dict:
@@ -2684,15 +2815,16 @@ class PhaseViewSet(viewsets.ModelViewSet):
     serializer_class = PhaseSerializer
 
     def get_queryset(self):
-        queryset = models.Phase.objects.all().order_by('created_at', 'phase_id')
+        queryset = (
+            models.Phase.objects.select_related('project')
+            .order_by('created_at', 'phase_id')
+        )
         project_id = self.request.query_params.get('project_id')
         if project_id:
             queryset = queryset.filter(project_id=project_id)
-        subtask_qs = models.Subtask.objects.prefetch_related(
-            'completion_revert_requests',
-            'assigned_workers__field_worker',
-            'update_photos',
-        )
+        # SubtaskNestedSerializer reads these prefetches (including the
+        # pending revert request via to_attr) instead of querying per subtask.
+        subtask_qs = models.Subtask.objects.prefetch_related(*subtask_prefetches())
         return queryset.prefetch_related(
             Prefetch('subtasks', queryset=subtask_qs),
         )
@@ -3022,6 +3154,8 @@ class PhaseViewSet(viewsets.ModelViewSet):
 class SubtaskViewSet(viewsets.ModelViewSet):
     queryset = models.Subtask.objects.all()
     serializer_class = SubtaskSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = 'created_at'
 
     def get_queryset(self):
         queryset = models.Subtask.objects.all()
@@ -3035,18 +3169,13 @@ class SubtaskViewSet(viewsets.ModelViewSet):
 
     @staticmethod
     def _sync_parent_project_status(subtask) -> None:
-        try:
-            phase = subtask.phase
-            project = phase.project
-        except Exception:  # noqa: BLE001
+        project_id = getattr(getattr(subtask, 'phase', None), 'project_id', None)
+        if project_id is None:
             return
-        if project is None:
-            return
-        try:
-            proj = models.Project.objects.get(project_id=project.project_id)
-        except models.Project.DoesNotExist:  # noqa: BLE001
-            return
-        proj.update_status_based_on_progress()
+        sync_project_statuses(
+            models.Project.objects.filter(project_id=project_id),
+            reopen_completed=True,
+        )
 
     def perform_create(self, serializer):
         super().perform_create(serializer)
@@ -3062,11 +3191,10 @@ class SubtaskViewSet(viewsets.ModelViewSet):
             project_id = None
         super().perform_destroy(instance)
         if project_id is not None:
-            try:
-                proj = models.Project.objects.get(project_id=project_id)
-            except models.Project.DoesNotExist:  # noqa: BLE001
-                return
-            proj.update_status_based_on_progress()
+            sync_project_statuses(
+                models.Project.objects.filter(project_id=project_id),
+                reopen_completed=True,
+            )
 
     def perform_update(self, serializer):
         instance = serializer.instance
@@ -3087,6 +3215,62 @@ class SubtaskViewSet(viewsets.ModelViewSet):
                 )
         serializer.save()
 
+    def _queue_client_update_email(self, request, subtask, *, previous_status, has_photo):
+        phase = getattr(subtask, 'phase', None)
+        project = getattr(phase, 'project', None) if phase is not None else None
+        client = None
+        if project is not None:
+            if getattr(project, 'client', None) is not None:
+                client = project.client
+            if client is None:
+                client = models.Client.objects.filter(project_id=project).first()
+
+        if client is not None and (client.email or '').strip():
+            supervisor_name = "Supervisor"
+            supervisor_id_raw = (
+                request.query_params.get('supervisor_id')
+                or request.data.get('supervisor_id')
+                or request.headers.get('X-Supervisor-Id')
+            )
+            if supervisor_id_raw not in (None, ''):
+                try:
+                    supervisor = models.Supervisors.objects.filter(
+                        supervisor_id=int(supervisor_id_raw)
+                    ).first()
+                    if supervisor is not None:
+                        full_name = f"{(supervisor.first_name or '').strip()} {(supervisor.last_name or '').strip()}".strip()
+                        if full_name:
+                            supervisor_name = full_name
+                except (TypeError, ValueError):
+                    pass
+
+            queue_key = (
+                "phase_update_email_queue:"
+                f"{getattr(client, 'client_id', 'unknown')}:"
+                f"{getattr(phase, 'phase_id', 'unknown')}"
+            )
+            _queue_phase_update_notification(
+                queue_key=queue_key,
+                summary_payload={
+                    'to_email': client.email,
+                    'client_first_name': getattr(client, 'first_name', None),
+                    'project_name': getattr(project, 'project_name', None),
+                    'phase_name': getattr(phase, 'phase_name', None),
+                    'subtask_title': getattr(subtask, 'title', None),
+                    'subtask_status': (subtask.status or '').replace('_', ' ').title(),
+                    'update_action': (
+                        'Unsubmitted'
+                        if previous_status == 'completed' and subtask.status == 'pending'
+                        else 'Submitted'
+                        if previous_status != 'completed' and subtask.status == 'completed'
+                        else 'Updated'
+                    ),
+                    'progress_notes': subtask.progress_notes,
+                    'supervisor_name': supervisor_name,
+                    'has_photo': has_photo,
+                },
+            )
+
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
@@ -3130,60 +3314,12 @@ class SubtaskViewSet(viewsets.ModelViewSet):
         )
 
         if status_changed or notes_changed or has_photo_submission:
-            phase = getattr(updated_subtask, 'phase', None)
-            project = getattr(phase, 'project', None) if phase is not None else None
-            client = None
-            if project is not None:
-                if getattr(project, 'client', None) is not None:
-                    client = project.client
-                if client is None:
-                    client = models.Client.objects.filter(project_id=project).first()
-
-            if client is not None and (client.email or '').strip():
-                supervisor_name = "Supervisor"
-                supervisor_id_raw = (
-                    request.query_params.get('supervisor_id')
-                    or request.data.get('supervisor_id')
-                    or request.headers.get('X-Supervisor-Id')
-                )
-                if supervisor_id_raw not in (None, ''):
-                    try:
-                        supervisor = models.Supervisors.objects.filter(
-                            supervisor_id=int(supervisor_id_raw)
-                        ).first()
-                        if supervisor is not None:
-                            full_name = f"{(supervisor.first_name or '').strip()} {(supervisor.last_name or '').strip()}".strip()
-                            if full_name:
-                                supervisor_name = full_name
-                    except (TypeError, ValueError):
-                        pass
-
-                queue_key = (
-                    "phase_update_email_queue:"
-                    f"{getattr(client, 'client_id', 'unknown')}:"
-                    f"{getattr(phase, 'phase_id', 'unknown')}"
-                )
-                _queue_phase_update_notification(
-                    queue_key=queue_key,
-                    summary_payload={
-                        'to_email': client.email,
-                        'client_first_name': getattr(client, 'first_name', None),
-                        'project_name': getattr(project, 'project_name', None),
-                        'phase_name': getattr(phase, 'phase_name', None),
-                        'subtask_title': getattr(updated_subtask, 'title', None),
-                        'subtask_status': (new_status or '').replace('_', ' ').title(),
-                        'update_action': (
-                            'Unsubmitted'
-                            if previous_status == 'completed' and new_status == 'pending'
-                            else 'Submitted'
-                            if previous_status != 'completed' and new_status == 'completed'
-                            else 'Updated'
-                        ),
-                        'progress_notes': updated_subtask.progress_notes,
-                        'supervisor_name': supervisor_name,
-                        'has_photo': has_photo_submission,
-                    },
-                )
+            self._queue_client_update_email(
+                request,
+                updated_subtask,
+                previous_status=previous_status,
+                has_photo=has_photo_submission,
+            )
 
         if (
             new_status == 'completed'
@@ -3195,6 +3331,140 @@ class SubtaskViewSet(viewsets.ModelViewSet):
 
         return Response(serializer.data)
 
+    # Resumable photo uploads; see app/services/photo_uploads.py.
+    @staticmethod
+    def _upload_error(exc):
+        return Response(
+            {'success': False, 'message': exc.message, **exc.extra},
+            status=exc.status,
+        )
+
+    def _get_upload(self, subtask, upload_id):
+        # The URL pattern only admits hex and dashes; anything that still
+        # isn't a UUID is an unknown upload, not a 500.
+        try:
+            upload_id = uuid.UUID(str(upload_id))
+        except ValueError:
+            return None
+        return models.SubtaskPhotoUpload.objects.filter(
+            subtask=subtask, upload_id=upload_id
+        ).first()
+
+    @action(detail=True, methods=['get', 'post'], url_path='photo-uploads')
+    def start_photo_upload(self, request, pk=None):
+        subtask = self.get_object()
+        if request.method == 'GET':
+            # Lets a client that lost an upload_id resume or cancel it.
+            return Response({
+                'uploads': [
+                    {
+                        'upload_id': str(upload.upload_id),
+                        'filename': upload.filename,
+                        'offset': photo_uploads.current_offset(upload),
+                        'size': upload.size,
+                        'created_at': upload.created_at.isoformat(),
+                    }
+                    for upload in photo_uploads.pending_uploads(subtask).order_by('created_at')
+                ],
+            })
+        try:
+            upload = photo_uploads.start_upload(
+                subtask,
+                filename=request.data.get('filename'),
+                size=request.data.get('size'),
+                content_type=request.data.get('content_type') or '',
+                sha256=request.data.get('sha256') or '',
+            )
+        except photo_uploads.UploadError as exc:
+            return self._upload_error(exc)
+        return Response(
+            {
+                'upload_id': str(upload.upload_id),
+                'offset': 0,
+                'size': upload.size,
+                'chunk_size': photo_uploads.chunk_size(),
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+    @action(
+        detail=True,
+        methods=['get', 'put', 'delete'],
+        url_path=r'photo-uploads/(?P<upload_id>[0-9a-f-]+)',
+    )
+    def photo_upload(self, request, pk=None, upload_id=None):
+        subtask = self.get_object()
+        upload = self._get_upload(subtask, upload_id)
+        if upload is None:
+            return Response(
+                {'success': False, 'message': 'Upload not found'},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        if request.method == 'GET':
+            return Response({
+                'upload_id': str(upload.upload_id),
+                'offset': photo_uploads.current_offset(upload),
+                'size': upload.size,
+                'status': upload.status,
+            })
+        if request.method == 'DELETE':
+            try:
+                photo_uploads.cancel_upload(upload)
+            except photo_uploads.UploadError as exc:
+                return self._upload_error(exc)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        # Stream the raw body from the underlying request: request.data
+        # would buffer (and size-limit) the whole chunk.
+        length = request.META.get('CONTENT_LENGTH') or None
+        try:
+            offset = photo_uploads.append_chunk(
+                upload,
+                request.headers.get('Upload-Offset'),
+                request._request,
+                length=int(length) if length is not None else None,
+            )
+        except photo_uploads.UploadError as exc:
+            return self._upload_error(exc)
+        except ValueError:
+            return Response(
+                {'success': False, 'message': 'Invalid Content-Length'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response({'offset': offset}, headers={'Upload-Offset': str(offset)})
+
+    @action(
+        detail=True,
+        methods=['post'],
+        url_path=r'photo-uploads/(?P<upload_id>[0-9a-f-]+)/finalize',
+    )
+    def finalize_photo_upload(self, request, pk=None, upload_id=None):
+        subtask = self.get_object()
+        upload = self._get_upload(subtask, upload_id)
+        if upload is None:
+            return Response(
+                {'success': False, 'message': 'Upload not found'},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        already_complete = upload.status == models.SubtaskPhotoUpload.STATUS_COMPLETE
+        try:
+            photo = photo_uploads.finalize_upload(upload)
+        except photo_uploads.UploadError as exc:
+            return self._upload_error(exc)
+
+        if not already_complete:
+            self._queue_client_update_email(
+                request, subtask, previous_status=subtask.status, has_photo=True
+            )
+        return Response({
+            'photo_id': photo.photo_id,
+            'photo': photo.photo.url if photo.photo else None,
+            'photo_variants': variant_urls(
+                photo.photo_variants, getattr(photo.photo, 'name', None)
+            ),
+            'created_at': photo.created_at.isoformat() if photo.created_at else None,
+        })
+
 
 class SubtaskCompletionRevertRequestViewSet(
     viewsets.GenericViewSet,
@@ -3403,9 +3673,26 @@ class SubtaskFieldWorkerViewSet(viewsets.ModelViewSet):
 
 
 # Attendance ViewSet
+def _projected_list(view, projection):
+    """
+    `ListModelMixin.list` on the projection read path: same filtering and
+    (keyset) pagination, rows built from `.values()` instead of serializers.
+    """
+    rows = projection.values(view.filter_queryset(view.get_queryset()))
+    page = view.paginate_queryset(rows)
+    if page is not None:
+        return view.get_paginated_response(projection.render(page))
+    return Response(projection.render(rows))
+
+
 class AttendanceViewSet(viewsets.ModelViewSet):
     queryset = models.Attendance.objects.all()
     serializer_class = AttendanceSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = '-attendance_date'
+
+    def list(self, request, *args, **kwargs):
+        return _projected_list(self, AttendanceProjection)
 
     def get_queryset(self):
         queryset = models.Attendance.objects.all()
@@ -3534,18 +3821,31 @@ def pm_dashboard_summary(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
+    fresh = str(request.query_params.get('fresh', '')).lower() in ('1', 'true', 'yes')
+    payload, cache_state = get_dashboard_payload(
+        user_id, lambda: _build_pm_dashboard_payload(user_id), fresh=fresh
+    )
+    response = Response(payload, status=status.HTTP_200_OK)
+    response['X-Dashboard-Cache'] = cache_state
+    return response
+
+
+@csrf_exempt
+@api_view(['GET'])
+def pm_dashboard_cache_metrics(request):
+    """Hit/miss/bypass counters for the pm_dashboard_summary cache."""
+    return Response(
+        {'success': True, 'metrics': dashboard_cache_metrics()},
+        status=status.HTTP_200_OK,
+    )
+
+
+def _build_pm_dashboard_payload(user_id):
+    """Build the (uncached) pm_dashboard_summary payload for one PM."""
     # Projects (recent)
     projects_qs = (
         models.Project.objects.filter(user_id=user_id)
         .select_related('barangay', 'city', 'province')
-        .annotate(
-            total_subtasks=Count('phases__subtasks', distinct=True),
-            completed_subtasks=Count(
-                'phases__subtasks',
-                filter=Q(phases__subtasks__status='completed'),
-                distinct=True,
-            ),
-        )
         .order_by('-created_at')
     )
 
@@ -3563,9 +3863,9 @@ def pm_dashboard_summary(request):
             location_parts.append(p.province.name)
         location = ', '.join(location_parts) if location_parts else 'N/A'
 
-        total_subtasks = int(getattr(p, 'total_subtasks', 0) or 0)
-        completed_subtasks = int(getattr(p, 'completed_subtasks', 0) or 0)
-        progress = (completed_subtasks / total_subtasks) if total_subtasks else 0.0
+        total_subtasks = int(p.total_subtasks or 0)
+        completed_subtasks = int(p.completed_subtasks or 0)
+        progress = p.get_progress()
 
         recent_projects.append(
             {
@@ -3601,39 +3901,17 @@ def pm_dashboard_summary(request):
         (completed_subtasks / total_subtasks) * 100.0 if total_subtasks else 0.0
     )
 
-    # Activity (completed tasks per day for last 7 days)
+    # Activity (completed tasks per day for last 7 days), from the
+    # DailySubtaskActivity rollup rather than a scan over Subtask.
     start_day = timezone.localdate() - timedelta(days=6)
     end_day = timezone.localdate()
-
-    completed_by_day = (
-        subtasks_qs.filter(status='completed', updated_at__date__gte=start_day)
-        .annotate(day=TruncDate('updated_at'))
-        .values('day')
-        .annotate(count=Count('subtask_id'))
-        .order_by('day')
-    )
-    completed_map = {
-        row['day'].isoformat(): int(row['count']) for row in completed_by_day
-    }
-
-    activity_series = []
-    for i in range(7):
-        day = start_day + timedelta(days=i)
-        day_key = day.isoformat()
-        activity_series.append({'day': day_key, 'completed': completed_map.get(day_key, 0)})
+    activity_series = [
+        {'day': row.day.isoformat(), 'completed': row.completed}
+        for row in daily_series(user_id=user_id, start_day=start_day, end_day=end_day)
+    ]
 
     # Monthly activity for current year
-    current_year = timezone.now().year
-    monthly_completed = (
-        subtasks_qs.filter(status='completed', updated_at__year=current_year)
-        .annotate(month_index=ExtractMonth('updated_at'))
-        .values('month_index')
-        .annotate(count=Count('subtask_id'))
-        .order_by('month_index')
-    )
-    monthly_map = {
-        row['month_index']: int(row['count']) for row in monthly_completed
-    }
+    monthly_map = monthly_completed(user_id=user_id, year=timezone.now().year)
     monthly_series = []
     for m in range(1, 13):
         monthly_series.append({
@@ -3699,87 +3977,162 @@ def pm_dashboard_summary(request):
 
     tasks_today = recent_open_items[:5]
 
-    # Exclude "subtask created" style inbox items per PM requirement.
-    excluded_pm_inbox_kinds = [
-        'pm_subtask_created',
-        'pm_subtask_added',
-        'subtask_created',
-        'subtask_added',
-    ]
+    inbox_unread = inbox_unread_count(models.InAppNotification.KIND_PM, user_id)
+    inbox_qs = recipient_queryset(models.InAppNotification.KIND_PM, user_id).order_by(
+        '-created_at'
+    )[:25]
+    inbox_items = [_pm_inbox_item(n) for n in inbox_qs]
+
+    return {
+        'success': True,
+        'projects': {
+            'total': total_projects,
+            'recent': recent_projects,
+        },
+        'tasks': {
+            'total': total_subtasks,
+            'completed': completed_subtasks,
+            'in_progress': in_progress_subtasks,
+            'pending': pending_subtasks,
+            'assigned': assigned_subtasks,
+            'completion_rate': float(completion_rate),
+        },
+        'activity': {
+            'start_day': start_day.isoformat(),
+            'end_day': end_day.isoformat(),
+            'series': activity_series,
+            'monthly_series': monthly_series,
+        },
+        'workers': {
+            'supervisors': supervisors_count,
+            'field_workers_total': field_workers_total,
+            'by_role': by_role,
+        },
+        'tasks_today': tasks_today,
+        # PM request: disable subtask-derived notification feed.
+        'notifications': {
+            'count': 0,
+            'items': [],
+        },
+        'inbox': {
+            'unread_count': int(inbox_unread),
+            'items': inbox_items,
+        },
+    }
 
-    inbox_unread = models.InAppNotification.objects.filter(
-        recipient_kind=models.InAppNotification.KIND_PM,
-        recipient_user_id=user_id,
-        read_at__isnull=True,
-    ).exclude(kind__in=excluded_pm_inbox_kinds).count()
-    inbox_qs = (
-        models.InAppNotification.objects.filter(
-            recipient_kind=models.InAppNotification.KIND_PM,
-            recipient_user_id=user_id,
-        )
-        .exclude(kind__in=excluded_pm_inbox_kinds)
-        .order_by('-created_at')[:25]
-    )
-    inbox_items = []
-    for n in inbox_qs:
-        pl = n.payload if isinstance(n.payload, dict) else {}
-        inbox_items.append(
+
+def _pm_inbox_item(n):
+    pl = n.payload if isinstance(n.payload, dict) else {}
+    return {
+        'notification_id': n.notification_id,
+        'kind': n.kind,
+        'title': n.title,
+        'body': n.body,
+        'read': n.read_at is not None,
+        'created_at': n.created_at.isoformat() if n.created_at else None,
+        'subtask_id': pl.get('subtask_id'),
+        'project_id': pl.get('project_id'),
+        'phase_id': pl.get('phase_id'),
+        'supervisor_name': pl.get('supervisor_name') or '',
+        'target': pl.get('target'),
+    }
+
+
+def _supervisor_inbox_item(n):
+    pl = n.payload if isinstance(n.payload, dict) else {}
+    return {
+        'notification_id': n.notification_id,
+        'kind': n.kind,
+        'title': n.title,
+        'body': n.body,
+        'read': n.read_at is not None,
+        'created_at': n.created_at.isoformat() if n.created_at else None,
+        'target': pl.get('target'),
+        'project_id': pl.get('project_id'),
+        'phase_id': pl.get('phase_id'),
+        'subtask_id': pl.get('subtask_id'),
+        'plan_id': pl.get('plan_id'),
+        'item_id': pl.get('item_id'),
+        'unit_id': pl.get('unit_id'),
+    }
+
+
+def _inbox_response(request, recipient_kind, recipient_id, item_fn, *, limit):
+    """Full inbox (newest `limit` rows) or, with `?since=`, just the delta.
+
+    Both modes return `next_since`; pass it back as `?since=` on the next
+    poll to receive only new rows plus `tombstones` (ids read elsewhere).
+    """
+    since = request.query_params.get('since')
+    unread = inbox_unread_count(recipient_kind, recipient_id)
+    if since:
+        try:
+            delta = inbox_delta(recipient_kind, recipient_id, since)
+        except InvalidSince as exc:
+            return Response(
+                {'success': False, 'message': str(exc)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(
             {
-                'notification_id': n.notification_id,
-                'kind': n.kind,
-                'title': n.title,
-                'body': n.body,
-                'read': n.read_at is not None,
-                'created_at': n.created_at.isoformat() if n.created_at else None,
-                'subtask_id': pl.get('subtask_id'),
-                'project_id': pl.get('project_id'),
-                'phase_id': pl.get('phase_id'),
-                'supervisor_name': pl.get('supervisor_name') or '',
-                'target': pl.get('target'),
-            }
+                'success': True,
+                'inbox': {
+                    'delta': True,
+                    'unread_count': unread,
+                    'items': [item_fn(n) for n in delta.items],
+                    'tombstones': delta.tombstones,
+                    'resync': delta.resync,
+                    'next_since': delta.next_since.isoformat(),
+                },
+            },
+            status=status.HTTP_200_OK,
         )
 
+    next_since = timezone.now() - INBOX_DELTA_OVERLAP
+    rows = recipient_queryset(recipient_kind, recipient_id).order_by('-created_at')[:limit]
     return Response(
         {
             'success': True,
-            'projects': {
-                'total': total_projects,
-                'recent': recent_projects,
-            },
-            'tasks': {
-                'total': total_subtasks,
-                'completed': completed_subtasks,
-                'in_progress': in_progress_subtasks,
-                'pending': pending_subtasks,
-                'assigned': assigned_subtasks,
-                'completion_rate': float(completion_rate),
-            },
-            'activity': {
-                'start_day': start_day.isoformat(),
-                'end_day': end_day.isoformat(),
-                'series': activity_series,
-                'monthly_series': monthly_series,
-            },
-            'workers': {
-                'supervisors': supervisors_count,
-                'field_workers_total': field_workers_total,
-                'by_role': by_role,
-            },
-            'tasks_today': tasks_today,
-            # PM request: disable subtask-derived notification feed.
-            'notifications': {
-                'count': 0,
-                'items': [],
-            },
             'inbox': {
-                'unread_count': int(inbox_unread),
-                'items': inbox_items,
+                'unread_count': unread,
+                'items': [item_fn(n) for n in rows],
+                'next_since': next_since.isoformat(),
             },
         },
         status=status.HTTP_200_OK,
     )
 
 
+@api_view(['GET'])
+def pm_inbox(request):
+    """In-app notifications for a Project Manager, with `?since=` delta sync."""
+    user_id_raw = request.query_params.get('user_id')
+    if not user_id_raw:
+        return Response(
+            {'success': False, 'message': 'user_id is required'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        user_id = int(user_id_raw)
+    except (TypeError, ValueError):
+        return Response(
+            {'success': False, 'message': 'user_id must be an integer'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if not models.User.objects.filter(user_id=user_id).exists():
+        return Response(
+            {'success': False, 'message': 'User not found'},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+    return _inbox_response(
+        request,
+        models.InAppNotification.KIND_PM,
+        user_id,
+        _pm_inbox_item,
+        limit=25,
+    )
+
+
 @csrf_exempt
 @api_view(['POST'])
 def pm_inbox_mark_read(request, notification_id):
@@ -3808,8 +4161,7 @@ def pm_inbox_mark_read(request, notification_id):
             status=status.HTTP_404_NOT_FOUND,
         )
     if n.read_at is None:
-        n.read_at = timezone.now()
-        n.save(update_fields=['read_at'])
+        inbox_mark_read(n)
     return Response({'success': True})
 
 
@@ -3835,47 +4187,12 @@ def supervisor_inbox(request):
             status=status.HTTP_404_NOT_FOUND,
         )
 
-    inbox_unread = models.InAppNotification.objects.filter(
-        recipient_kind=models.InAppNotification.KIND_SUPERVISOR,
-        recipient_supervisor_id=sup_id,
-        read_at__isnull=True,
-    ).count()
-    inbox_qs = (
-        models.InAppNotification.objects.filter(
-            recipient_kind=models.InAppNotification.KIND_SUPERVISOR,
-            recipient_supervisor_id=sup_id,
-        )
-        .order_by('-created_at')[:40]
-    )
-    inbox_items = []
-    for n in inbox_qs:
-        pl = n.payload if isinstance(n.payload, dict) else {}
-        inbox_items.append(
-            {
-                'notification_id': n.notification_id,
-                'kind': n.kind,
-                'title': n.title,
-                'body': n.body,
-                'read': n.read_at is not None,
-                'created_at': n.created_at.isoformat() if n.created_at else None,
-                'target': pl.get('target'),
-                'project_id': pl.get('project_id'),
-                'phase_id': pl.get('phase_id'),
-                'subtask_id': pl.get('subtask_id'),
-                'plan_id': pl.get('plan_id'),
-                'item_id': pl.get('item_id'),
-                'unit_id': pl.get('unit_id'),
-            }
-        )
-    return Response(
-        {
-            'success': True,
-            'inbox': {
-                'unread_count': int(inbox_unread),
-                'items': inbox_items,
-            },
-        },
-        status=status.HTTP_200_OK,
+    return _inbox_response(
+        request,
+        models.InAppNotification.KIND_SUPERVISOR,
+        sup_id,
+        _supervisor_inbox_item,
+        limit=40,
     )
 
 
@@ -3912,24 +4229,18 @@ def supervisor_inbox_mark_read(request, notification_id):
             status=status.HTTP_404_NOT_FOUND,
         )
     if n.read_at is None:
-        n.read_at = timezone.now()
-        n.save(update_fields=['read_at'])
+        inbox_mark_read(n)
     return Response({'success': True})
 
 
-@csrf_exempt
-@api_view(['GET'])
-def pm_audit_trail(request):
-    """Return a list of recent audit events scoped to a Project Manager's organization.
+def _audit_trail_scope(request):
+    """Validate `user_id` / `kind` for the audit trail endpoints.
 
-    Aggregates creation / update events across projects, phases, subtasks,
-    task assignments, workforce changes, inventory operations and attendance
-    records that belong to the given Project Manager (`user_id`). Rows are
-    merged and sorted by timestamp (desc) then truncated to `limit`.
+    Returns `(user_id, kinds, None)` or `(None, None, error_response)`.
     """
     user_id_raw = request.query_params.get('user_id')
     if not user_id_raw:
-        return Response(
+        return None, None, Response(
             {'success': False, 'message': 'user_id is required'},
             status=status.HTTP_400_BAD_REQUEST,
         )
@@ -3937,390 +4248,202 @@ def pm_audit_trail(request):
     try:
         user_id = int(user_id_raw)
     except (TypeError, ValueError):
-        return Response(
+        return None, None, Response(
             {'success': False, 'message': 'user_id must be an integer'},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    try:
-        pm_user = models.User.objects.get(user_id=user_id)
-    except models.User.DoesNotExist:
-        return Response(
+    if not models.User.objects.filter(user_id=user_id).exists():
+        return None, None, Response(
             {'success': False, 'message': 'User not found'},
             status=status.HTTP_404_NOT_FOUND,
         )
 
-    try:
-        limit = int(request.query_params.get('limit', '100'))
-    except (TypeError, ValueError):
-        limit = 100
-    limit = max(1, min(limit, 500))
-
-    def _full_name(first, middle, last):
-        parts = [p for p in (first, middle, last) if p]
-        name = ' '.join(str(part).strip() for part in parts if str(part).strip())
-        return name or 'Unknown'
-
-    pm_name = _full_name(pm_user.first_name, pm_user.middle_name, pm_user.last_name)
-    pm_role_label = 'Project Manager'
-
-    per_type_cap = min(limit, 150)
-    events = []
-
-    def _push(
-        user_name,
-        user_role,
-        action_text,
-        ts,
-        category,
-        affected_record='—',
-        old_value='—',
-        new_value='—',
-        module='General',
-        status_result='Success',
-    ):
-        if not ts:
-            return
-        events.append({
-            'user_name': user_name or 'Unknown',
-            'user_role': user_role or 'User',
-            'action': action_text,
-            'timestamp': ts.isoformat(),
-            'category': category,
-            'affected_record': affected_record or '—',
-            'old_value': old_value or '—',
-            'new_value': new_value or '—',
-            'module': module or 'General',
-            'status_result': status_result or 'Success',
-        })
-
-    # Project creations
-    projects_qs = (
-        models.Project.objects.filter(user_id=user_id)
-        .order_by('-created_at')[:per_type_cap]
-    )
-    for p in projects_qs:
-        _push(
-            pm_name,
-            pm_role_label,
-            f"Created project '{p.project_name}'",
-            p.created_at,
-            'Project',
-            affected_record=f"Project #{p.project_id} - {p.project_name}",
-            old_value='—',
-            new_value=f"Status: {p.status or 'Active'}",
-            module='Projects',
-            status_result='Success',
+    kinds = [
+        kind.strip()
+        for raw in request.query_params.getlist('kind')
+        for kind in raw.split(',')
+        if kind.strip()
+    ]
+    valid_kinds = {choice for choice, _ in models.AuditEvent.KIND_CHOICES}
+    unknown = sorted(set(kinds) - valid_kinds)
+    if unknown:
+        return None, None, Response(
+            {
+                'success': False,
+                'message': f"Unknown kind: {', '.join(unknown)}",
+                'valid_kinds': sorted(valid_kinds),
+            },
+            status=status.HTTP_400_BAD_REQUEST,
         )
 
-    # Phase creations
-    phases_qs = (
-        models.Phase.objects.filter(project__user_id=user_id)
-        .select_related('project')
-        .order_by('-created_at')[:per_type_cap]
-    )
-    for ph in phases_qs:
-        proj_name = ph.project.project_name if ph.project_id else 'N/A'
-        _push(
-            pm_name,
-            pm_role_label,
-            f"Added phase '{ph.phase_name}' to '{proj_name}'",
-            ph.created_at,
-            'Phase',
-            affected_record=f"Phase #{ph.phase_id} - {ph.phase_name}",
-            old_value='—',
-            new_value=f"Project: {proj_name}",
-            module='Projects',
-            status_result='Success',
-        )
+    return user_id, kinds, None
 
-    # Subtask creations
-    subtask_qs = (
-        models.Subtask.objects.filter(phase__project__user_id=user_id)
-        .select_related('phase__project', 'phase__project__supervisor')
-        .order_by('-created_at')[:per_type_cap]
-    )
-    for st in subtask_qs:
-        proj_name = st.phase.project.project_name if st.phase_id else 'N/A'
-        _push(
-            pm_name,
-            pm_role_label,
-            f"Created task '{st.title}' in '{proj_name}'",
-            st.created_at,
-            'Task',
-            affected_record=f"Task #{st.subtask_id} - {st.title}",
-            old_value='—',
-            new_value=f"Status: {st.status or 'pending'}",
-            module='Tasks',
-            status_result='Success',
-        )
 
-    # Subtask status updates (approximated by updated_at differing from created_at)
-    subtask_updates_qs = (
-        models.Subtask.objects.filter(phase__project__user_id=user_id)
-        .select_related('phase__project', 'phase__project__supervisor')
-        .order_by('-updated_at')[:per_type_cap]
-    )
-    status_label_map = {
-        'pending': 'Pending',
-        'in_progress': 'In Progress',
-        'completed': 'Completed',
-    }
-    for st in subtask_updates_qs:
-        if not (st.created_at and st.updated_at):
-            continue
-        if (st.updated_at - st.created_at).total_seconds() < 2:
-            continue
+@csrf_exempt
+@api_view(['GET'])
+def pm_audit_trail(request):
+    """Return audit events scoped to a Project Manager's organization, newest first.
 
-        supv = st.phase.project.supervisor if st.phase_id else None
-        if supv:
-            actor_name = _full_name(supv.first_name, supv.middle_name, supv.last_name)
-            actor_role = 'Supervisor'
-        else:
-            actor_name = pm_name
-            actor_role = pm_role_label
-
-        label = status_label_map.get(st.status, (st.status or 'Updated').title())
-        proj_name = st.phase.project.project_name if st.phase_id else 'N/A'
-        result_label = 'Completed' if (st.status or '').lower() == 'completed' else 'Success'
-        _push(
-            actor_name,
-            actor_role,
-            f"Updated task '{st.title}' to {label} in '{proj_name}'",
-            st.updated_at,
-            'Task',
-            affected_record=f"Task #{st.subtask_id} - {st.title}",
-            old_value='Previous status',
-            new_value=f"Status: {label}",
-            module='Tasks',
-            status_result=result_label,
-        )
+    Reads the AuditEvent table (written on save by app.services.audit_trail)
+    with one indexed range scan. `?limit=` sets the page size (default 100,
+    max 500); follow `next_cursor` via `?cursor=` for older events, and
+    narrow with `?kind=` (repeatable or comma-separated).
+    """
+    user_id, kinds, error = _audit_trail_scope(request)
+    if error is not None:
+        return error
 
-    # Task assignments
-    assignments_qs = (
-        models.SubtaskFieldWorker.objects
-        .filter(subtask__phase__project__user_id=user_id)
-        .select_related('subtask__phase__project', 'field_worker')
-        .order_by('-assigned_at')[:per_type_cap]
-    )
-    for a in assignments_qs:
-        fw = a.field_worker
-        worker_name = (
-            _full_name(fw.first_name, fw.middle_name, fw.last_name)
-            if fw else 'Unknown'
-        )
-        task_title = a.subtask.title if a.subtask_id else 'Unknown task'
-        _push(
-            pm_name,
-            pm_role_label,
-            f"Assigned {worker_name} to task '{task_title}'",
-            a.assigned_at,
-            'Assignment',
-            affected_record=f"Task #{a.subtask_id} - {task_title}",
-            old_value='Unassigned',
-            new_value=f"Assigned: {worker_name}",
-            module='Tasks',
-            status_result='Success',
-        )
+    paginator = AuditTrailPagination()
+    rows = paginator.paginate_queryset(audit_events_for(user_id, kinds=kinds), request)
+    events = [audit_row(e.event_id, e.kind, e.ts, e.payload) for e in rows]
 
-    # Field worker additions
-    field_workers_qs = (
-        models.FieldWorker.objects.filter(user_id=user_id)
-        .order_by('-created_at')[:per_type_cap]
+    return Response(
+        {
+            'success': True,
+            'count': len(events),
+            'items': events,
+            'next': paginator.get_next_link(),
+            'next_cursor': (
+                paginator.encode_cursor(paginator.next_position)
+                if paginator.next_position is not None
+                else None
+            ),
+        },
+        status=status.HTTP_200_OK,
     )
-    for fw in field_workers_qs:
-        name = _full_name(fw.first_name, fw.middle_name, fw.last_name)
-        role_label = fw.role or 'Field Worker'
-        _push(
-            pm_name,
-            pm_role_label,
-            f"Added field worker {name} ({role_label})",
-            fw.created_at,
-            'Worker',
-            affected_record=f"Field Worker #{fw.fieldworker_id} - {name}",
-            old_value='—',
-            new_value=f"Role: {role_label}",
-            module='Workforce',
-            status_result='Success',
-        )
 
-    # Supervisor additions
-    supervisors_qs = (
-        models.Supervisors.objects.filter(
-            Q(created_by_id=user_id) | Q(project_id__user_id=user_id)
-        )
-        .distinct()
-        .order_by('-created_at')[:per_type_cap]
-    )
-    for sv in supervisors_qs:
-        name = _full_name(sv.first_name, sv.middle_name, sv.last_name)
-        _push(
-            pm_name,
-            pm_role_label,
-            f"Added supervisor {name}",
-            sv.created_at,
-            'Supervisor',
-            affected_record=f"Supervisor #{sv.supervisor_id} - {name}",
-            old_value='—',
-            new_value='Role: Supervisor',
-            module='Workforce',
-            status_result='Success',
-        )
 
-    # Client additions
-    clients_qs = (
-        models.Client.objects.filter(
-            Q(created_by_id=user_id) | Q(project_id__user_id=user_id)
-        )
-        .distinct()
-        .order_by('-created_at')[:per_type_cap]
-    )
-    for c in clients_qs:
-        name = _full_name(c.first_name, c.middle_name, c.last_name)
-        _push(
-            pm_name,
-            pm_role_label,
-            f"Added client {name}",
-            c.created_at,
-            'Client',
-            affected_record=f"Client #{c.client_id} - {name}",
-            old_value='—',
-            new_value=f"Status: {c.status or 'active'}",
-            module='Clients',
-            status_result='Success',
-        )
+_AUDIT_EXPORT_PAGE_SIZE = 500
 
-    # Inventory item creations
-    items_qs = (
-        models.InventoryItem.objects.filter(created_by_id=user_id)
-        .order_by('-created_at')[:per_type_cap]
-    )
-    for it in items_qs:
-        _push(
-            pm_name,
-            pm_role_label,
-            f"Added inventory item '{it.name}'",
-            it.created_at,
-            'Inventory',
-            affected_record=f"Item #{it.item_id} - {it.name}",
-            old_value='—',
-            new_value=f"Status: {it.status or 'Available'} • Qty: {it.quantity}",
-            module='Inventory',
-            status_result='Success',
-        )
 
-    # Inventory unit movements
-    movements_qs = (
-        models.InventoryUnitMovement.objects
-        .filter(
-            Q(unit__inventory_item__created_by_id=user_id)
-            | Q(from_project__user_id=user_id)
-            | Q(to_project__user_id=user_id)
-        )
-        .select_related('unit', 'moved_by', 'from_project', 'to_project')
-        .distinct()
-        .order_by('-created_at')[:per_type_cap]
-    )
-    for mv in movements_qs:
-        actor = mv.moved_by
-        if actor:
-            actor_name = _full_name(actor.first_name, actor.middle_name, actor.last_name)
-            if (actor.role or '').lower() == 'projectmanager':
-                actor_role = 'Project Manager'
-            else:
-                actor_role = actor.role or 'User'
-        else:
-            actor_name = 'System'
-            actor_role = 'System'
-
-        unit_code = mv.unit.unit_code if mv.unit_id else 'Unit'
-        to_name = mv.to_project.project_name if mv.to_project_id else None
-        from_name = mv.from_project.project_name if mv.from_project_id else None
-        if mv.action == 'Transferred' and from_name and to_name:
-            desc = f"Transferred unit {unit_code} from '{from_name}' to '{to_name}'"
-            old_val = f"Project: {from_name}"
-            new_val = f"Project: {to_name}"
-        elif mv.action == 'Assigned' and to_name:
-            desc = f"Assigned unit {unit_code} to '{to_name}'"
-            old_val = 'Unassigned'
-            new_val = f"Project: {to_name}"
-        elif mv.action == 'Returned' and from_name:
-            desc = f"Returned unit {unit_code} from '{from_name}'"
-            old_val = f"Project: {from_name}"
-            new_val = 'Returned to inventory'
+class _EchoBuffer:
+    """File-like sink for csv.writer that hands each row straight back."""
+
+    def write(self, value):
+        return value
+
+
+class _AuditExportEncoder:
+    """
+    Encodes audit rows page by page as NDJSON or CSV, gzipped on request.
+    Shared by the sync (WSGI) and async (ASGI) export bodies so both emit
+    the same bytes; one output chunk per page of rows.
+    """
+
+    def __init__(self, output, compress):
+        self._writer = csv.writer(_EchoBuffer()) if output == 'csv' else None
+        # wbits=31: gzip container
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def _out(self, data):
+        return self._compressor.compress(data) if self._compressor is not None else data
+
+    def start(self):
+        if self._writer is None:
+            return b''
+        return self._out(self._writer.writerow(AUDIT_ROW_FIELDS).encode('utf-8'))
+
+    def encode(self, rows):
+        if self._writer is not None:
+            lines = []
+            for row in rows:
+                item = audit_row(*row)
+                lines.append(self._writer.writerow([item[field] for field in AUDIT_ROW_FIELDS]))
         else:
-            desc = f"Unit {unit_code} {mv.action}"
-            old_val = '—'
-            new_val = f"Action: {mv.action}"
-        _push(
-            actor_name,
-            actor_role,
-            desc,
-            mv.created_at,
-            'Inventory',
-            affected_record=f"Unit {unit_code}",
-            old_value=old_val,
-            new_value=new_val,
-            module='Inventory',
-            status_result='Success',
-        )
+            lines = [json.dumps(audit_row(*row), ensure_ascii=False) + '\n' for row in rows]
+        return self._out(''.join(lines).encode('utf-8'))
 
-    # Attendance updates
-    attendance_qs = (
-        models.Attendance.objects.filter(project__user_id=user_id)
-        .select_related('field_worker', 'project')
-        .order_by('-updated_at')[:per_type_cap]
-    )
-    attendance_label_map = {
-        'on_site': 'Checked in (On Site)',
-        'on_break': 'Started break',
-        'absent': 'Marked absent',
-    }
-    attendance_status_map = {
-        'on_site': 'On Site',
-        'on_break': 'On Break',
-        'absent': 'Absent',
-    }
-    for at in attendance_qs:
-        fw = at.field_worker
-        worker_name = (
-            _full_name(fw.first_name, fw.middle_name, fw.last_name)
-            if fw else 'Unknown'
-        )
-        proj_name = at.project.project_name if at.project_id else 'N/A'
-        status_label = attendance_label_map.get(
-            at.status,
-            (at.status or 'Attendance update').title(),
-        )
-        new_val_label = attendance_status_map.get(
-            at.status,
-            (at.status or '—').title(),
+    def finish(self):
+        return self._compressor.flush() if self._compressor is not None else b''
+
+
+def _audit_export_body(pages, encoder):
+    for chunk in (encoder.start(), *(encoder.encode(page) for page in pages)):
+        if chunk:
+            yield chunk
+    tail = encoder.finish()
+    if tail:
+        yield tail
+
+
+async def _audit_export_abody(pages, encoder):
+    head = encoder.start()
+    if head:
+        yield head
+    async for page in pages:
+        chunk = encoder.encode(page)
+        if chunk:
+            yield chunk
+    tail = encoder.finish()
+    if tail:
+        yield tail
+
+
+@csrf_exempt
+@api_view(['GET'])
+def pm_audit_trail_export(request):
+    """Stream a Project Manager's full audit history as NDJSON or CSV.
+
+    Query params: `user_id` (required), `kind` (as for pm_audit_trail),
+    `from` / `to` (YYYY-MM-DD, inclusive, local time), `output`
+    (`ndjson` default, or `csv`) and `gzip=1` for a .gz download.
+    Events are written oldest-first, one page of rows in memory at a time,
+    under both WSGI and ASGI.
+    """
+    user_id, kinds, error = _audit_trail_scope(request)
+    if error is not None:
+        return error
+
+    output = (request.query_params.get('output') or 'ndjson').strip().lower()
+    if output not in ('ndjson', 'csv'):
+        return Response(
+            {'success': False, 'message': 'output must be ndjson or csv'},
+            status=status.HTTP_400_BAD_REQUEST,
         )
-        result_label = 'Absent' if (at.status or '').lower() == 'absent' else 'Success'
-        _push(
-            worker_name,
-            'Field Worker',
-            f"{status_label} at '{proj_name}' ({at.attendance_date})",
-            at.updated_at,
-            'Attendance',
-            affected_record=f"Attendance #{at.attendance_id} - {worker_name}",
-            old_value='Previous attendance state',
-            new_value=f"Status: {new_val_label} • {at.attendance_date}",
-            module='Attendance',
-            status_result=result_label,
+
+    bounds = {}
+    for param in ('from', 'to'):
+        raw = (request.query_params.get(param) or '').strip()
+        if not raw:
+            continue
+        try:
+            bounds[param] = date.fromisoformat(raw)
+        except ValueError:
+            return Response(
+                {'success': False, 'message': f'{param} must be YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+    since = until = None
+    if 'from' in bounds:
+        since = timezone.make_aware(datetime.combine(bounds['from'], datetime.min.time()))
+    if 'to' in bounds:
+        until = timezone.make_aware(
+            datetime.combine(bounds['to'] + timedelta(days=1), datetime.min.time())
         )
 
-    events.sort(key=lambda e: e['timestamp'], reverse=True)
-    events = events[:limit]
+    if output == 'csv':
+        content_type, ext = 'text/csv; charset=utf-8', 'csv'
+    else:
+        content_type, ext = 'application/x-ndjson', 'ndjson'
+    compress = str(request.query_params.get('gzip', '')).lower() in ('1', 'true', 'yes')
+    if compress:
+        content_type, ext = 'application/gzip', f'{ext}.gz'
+
+    encoder = _AuditExportEncoder(output, compress)
+    scope = {'kinds': kinds, 'since': since, 'until': until, 'chunk_size': _AUDIT_EXPORT_PAGE_SIZE}
+    if is_asgi(request):
+        # An async body, or the ASGI handler would drain a sync one into
+        # memory before sending (see rest_api/streaming.py).
+        stream = _audit_export_abody(aiter_audit_event_pages(user_id, **scope), encoder)
+    else:
+        stream = _audit_export_body(iter_audit_event_pages(user_id, **scope), encoder)
 
-    return Response(
-        {
-            'success': True,
-            'count': len(events),
-            'items': events,
-        },
-        status=status.HTTP_200_OK,
-    )
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    filename = f"audit-trail-{user_id}-{timezone.localdate().isoformat()}.{ext}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'no-store'
+    return response
 
 
 # ── Inventory ViewSets ───────────────────────────────────────────────────────
@@ -4336,6 +4459,8 @@ def _inventory_item_is_material_row(item) -> bool:
 
 class InventoryItemViewSet(viewsets.ModelViewSet):
     serializer_class = InventoryItemSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = '-created_at'
 
     def perform_update(self, serializer):
         """Serializer exposes [quantity] as a computed field; apply raw PATCH for materials."""
@@ -4456,11 +4581,15 @@ class InventoryItemViewSet(viewsets.ModelViewSet):
                 Q(units__current_project_id__in=project_ids)
                 | Q(project_id__in=project_ids)
                 | (Q(item_type='Material') & Q(created_by_id__in=pm_user_ids))
-            ).distinct()
+            ).select_related('created_by').distinct()
 
         # PM accessing inventory
         if pm_user_id is not None:
-            return models.InventoryItem.objects.filter(created_by_id=pm_user_id)
+            return (
+                models.InventoryItem.objects
+                .filter(created_by_id=pm_user_id)
+                .select_related('created_by')
+            )
 
         return models.InventoryItem.objects.none()
 
@@ -4906,17 +5035,19 @@ class InventoryItemViewSet(viewsets.ModelViewSet):
         if not image_file:
             return Response({'error': 'No image file provided.'}, status=400)
 
-        media_root = getattr(settings, 'MEDIA_ROOT', 'media')
-        os.makedirs(os.path.join(media_root, 'inventory_images'), exist_ok=True)
         original_name = getattr(image_file, 'name', '') or ''
         ext = os.path.splitext(original_name)[1].lower() or '.jpg'
         filename = f'inv_{item.created_by_id}_{item.item_id}{ext}'
-        file_path = os.path.join(media_root, 'inventory_images', filename)
-        with open(file_path, 'wb+') as dest:
-            for chunk in image_file.chunks():
-                dest.write(chunk)
+        # Same name on re-upload: delete the old derivatives and drop the
+        # manifest so they are rebuilt from the new bytes.
+        discard_derivatives(item)
+        # Replace the previous upload under the same name through the
+        # storage: the file may be a hard link to a blob other photos share,
+        # so it must never be rewritten in place.
+        if default_storage.exists(f'inventory_images/{filename}'):
+            default_storage.delete(f'inventory_images/{filename}')
+        rel_path = default_storage.save(f'inventory_images/{filename}', image_file)
 
-        rel_path = f'inventory_images/{filename}'
         item.photo = rel_path
         item.save()
 
@@ -5435,6 +5566,11 @@ class PhaseMaterialPlanViewSet(viewsets.ModelViewSet):
 
 class InventoryUsageViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = InventoryUsageSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = '-checkout_date'
+
+    def list(self, request, *args, **kwargs):
+        return _projected_list(self, InventoryUsageProjection)
 
     def get_queryset(self):
         qs = models.InventoryUsage.objects.select_related(
@@ -24,5 +24,44 @@ while [ "$i" -le "$TRIES" ]; do
   i=$((i + 1))
 done
 
-echo "Starting Gunicorn on 0.0.0.0:${PORT:-8000}…"
-exec gunicorn structura_backend.wsgi:application --bind 0.0.0.0:"${PORT:-8000}"
+# Fill the PM audit trail from existing rows the first time the AuditEvent
+# table is empty; a single query on later boots. Not fatal: the command can
+# be re-run by hand.
+python manage.py backfill_audit_events --apply --if-empty --quiet \
+  || echo "Audit trail backfill failed; run manage.py backfill_audit_events --apply."
+
+# Email is queued in the EmailOutbox table; deliver it from this instance
+# unless a separate worker service does (RUN_EMAIL_WORKER=0). Restarted if
+# it exits; claimed-but-unsent messages are retried after a timeout.
+if [ "${RUN_EMAIL_WORKER:-1}" = "1" ]; then
+  echo "Starting email worker…"
+  (
+    while true; do
+      python manage.py run_email_worker --quiet || true
+      echo "Email worker exited; restarting in 5s…"
+      sleep 5
+    done
+  ) &
+fi
+
+# Resumable photo uploads that were never finalized hold staged files;
+# purge the expired ones hourly (PHOTO_UPLOAD_PURGE_INTERVAL_SECONDS=0 to
+# leave it to a cron job).
+PURGE_SECONDS="${PHOTO_UPLOAD_PURGE_INTERVAL_SECONDS:-3600}"
+if [ "$PURGE_SECONDS" != "0" ]; then
+  (
+    while true; do
+      sleep "$PURGE_SECONDS"
+      python manage.py purge_photo_uploads --apply || true
+    done
+  ) &
+fi
+
+echo "Starting Gunicorn (ASGI) on 0.0.0.0:${PORT:-8000}…"
+# Uvicorn workers serve the regular API plus the long-lived SSE
+# notification streams (rest_api/streams.py) without a thread per client.
+# Streaming views return async bodies under ASGI (rest_api/streaming.py),
+# so exports and media are sent chunk by chunk, not buffered.
+exec gunicorn structura_backend.asgi:application \
+  --worker-class uvicorn_worker.UvicornWorker \
+  --bind 0.0.0.0:"${PORT:-8000}"
@@ -7,6 +7,7 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
+import logging
 import os
 from pathlib import Path
 
@@ -24,3 +25,14 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'structura_backend.settings')
 
 application = get_asgi_application()
+
+# With FACE_VERIFICATION_PREWARM, start the face-verification detector
+# processes in the background rather than on the first photo upload,
+# without holding up worker boot. Uploads still work (and start the pool)
+# if this fails.
+try:
+	from app.verification_pool import prewarm_in_background
+
+	prewarm_in_background()
+except Exception:
+	logging.getLogger(__name__).exception("Face verification prewarm could not be started")
@@ -27,6 +27,14 @@ if DEBUG:
 else:
     MEDIA_ROOT = '/var/data/media'
 
+# Resumable photo uploads (app/services/photo_uploads.py) are staged here
+# until finalized: outside MEDIA_ROOT, on the same volume.
+PHOTO_UPLOAD_STAGING_ROOT = os.path.join(os.path.dirname(MEDIA_ROOT), 'upload_staging')
+PHOTO_UPLOAD_MAX_BYTES = int(os.getenv("PHOTO_UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+PHOTO_UPLOAD_CHUNK_BYTES = int(os.getenv("PHOTO_UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+# Pending uploads older than this stop holding a photo slot and are purged.
+PHOTO_UPLOAD_PENDING_TTL_HOURS = float(os.getenv("PHOTO_UPLOAD_PENDING_TTL_HOURS", "24"))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -136,6 +144,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'structura_backend.wsgi.application'
+ASGI_APPLICATION = 'structura_backend.asgi.application'
 
 
 # Database
@@ -222,6 +231,21 @@ else:
     }
 
 
+# One cache shared by every gunicorn worker and instance: the PM dashboard
+# generations (app/services/dashboard_cache.py) and the face-verification
+# verdicts (app/verification_cache.py) rely on all workers seeing the same
+# keys. The table is created by migration 0087 (`createcachetable`).
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": os.getenv("CACHE_TABLE", "django_cache"),
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", "10000"))},
+    }
+}
+# Hit/miss counters for the PM dashboard cache: one extra cache write per
+# dashboard read, so only when investigating the hit ratio.
+PM_DASHBOARD_CACHE_METRICS = os.getenv("PM_DASHBOARD_CACHE_METRICS", "0") == "1"
 
 
 # Password validation
@@ -245,9 +269,49 @@ AUTH_PASSWORD_VALIDATORS = [
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
-    ]
+    ],
+    # orjson-backed JSON first (falls back to stdlib json on its own when
+    # orjson is missing); `?format=json-std` still negotiates the stock
+    # encoder. See rest_api/renderers.py.
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_api.renderers.FastJSONRenderer',
+        'rest_api.renderers.StdJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# In-app notification push (Server-Sent Events, see rest_api/streams.py).
+# The in-process bus is exact for a single ASGI worker; swap in a
+# broker-backed class with the same interface when running several.
+NOTIFICATION_BUS_BACKEND = os.getenv(
+    "NOTIFICATION_BUS_BACKEND", "app.services.notification_bus.InProcessBackend"
+)
+NOTIFICATION_STREAM_HEARTBEAT_SECONDS = int(os.getenv("NOTIFICATION_STREAM_HEARTBEAT_SECONDS", "20"))
+NOTIFICATION_STREAM_MAX_SECONDS = int(os.getenv("NOTIFICATION_STREAM_MAX_SECONDS", "1800"))
+
+# Photo derivatives (app/services/image_derivatives.py) are built by this
+# many background threads after the upload commits. 0 builds them inline.
+PHOTO_DERIVATIVE_THREADS = int(os.getenv("PHOTO_DERIVATIVE_THREADS", "1"))
+
+# Face verification runs in a pool of detector processes (see
+# app/verification_pool.py). 0 workers runs it inline in the request thread.
+# Each worker is its own interpreter with MediaPipe and OpenCV loaded, a few
+# hundred MB, so the default is one, started on the first verification;
+# FACE_VERIFICATION_PREWARM=1 starts it at boot instead.
+FACE_VERIFICATION_WORKERS = int(os.getenv("FACE_VERIFICATION_WORKERS", "1"))
+FACE_VERIFICATION_PREWARM = os.getenv("FACE_VERIFICATION_PREWARM", "0") == "1"
+FACE_VERIFICATION_QUEUE_SIZE = int(os.getenv("FACE_VERIFICATION_QUEUE_SIZE", "8"))
+FACE_VERIFICATION_TIMEOUT_SECONDS = float(os.getenv("FACE_VERIFICATION_TIMEOUT_SECONDS", "10"))
+FACE_VERIFICATION_BATCH_MAX_IMAGES = int(os.getenv("FACE_VERIFICATION_BATCH_MAX_IMAGES", "20"))
+FACE_VERIFICATION_BATCH_MAX_BYTES = int(
+    os.getenv("FACE_VERIFICATION_BATCH_MAX_BYTES", str(20 * 1024 * 1024))
+)
+# Verdicts cached by SHA-256 of the upload (app/verification_cache.py):
+# per-process LRU size, then the shared Django cache. TTL 0 disables.
+FACE_VERIFICATION_CACHE_TTL_SECONDS = int(os.getenv("FACE_VERIFICATION_CACHE_TTL_SECONDS", "86400"))
+FACE_VERIFICATION_CACHE_MAX_ENTRIES = int(os.getenv("FACE_VERIFICATION_CACHE_MAX_ENTRIES", "1024"))
+FACE_VERIFICATION_CACHE_ALIAS = os.getenv("FACE_VERIFICATION_CACHE_ALIAS", "default")
+
 
 
 # Internationalization
@@ -272,7 +336,7 @@ SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY", "").strip()
 SENDGRID_FROM_EMAIL = os.getenv("SENDGRID_FROM_EMAIL", "").strip()
 
 EMAIL_HOST = os.getenv("EMAIL_HOST", "").strip()
-EMAIL_PORT = int(os.getenv("EMAIL_PORT", "587"))
+EMAIL_PORT = int(os.getenv("EMAIL_PORT") or "587")
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "").strip()
 EMAIL_HOST_PASSWORD = (
     os.getenv("EMAIL_HOST_PASSWORD", "")
@@ -297,6 +361,19 @@ if EMAIL_HOST:
 else:
     EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
+# Outgoing email is queued in the EmailOutbox table and delivered by
+# `python manage.py run_email_worker` (app/services/email_outbox.py), which
+# start.sh runs next to the web server. Where no worker runs (runserver),
+# EMAIL_OUTBOX_DELIVER_INLINE sends each message after its commit.
+EMAIL_OUTBOX_DELIVER_INLINE = os.getenv(
+    "EMAIL_OUTBOX_DELIVER_INLINE", "1" if DEBUG else "0"
+).strip().lower() in {"1", "true", "yes"}
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "50"))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "6"))
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = int(os.getenv("EMAIL_OUTBOX_RETRY_BASE_SECONDS", "30"))
+EMAIL_OUTBOX_RETRY_MAX_SECONDS = int(os.getenv("EMAIL_OUTBOX_RETRY_MAX_SECONDS", "3600"))
+EMAIL_OUTBOX_CLAIM_TIMEOUT_SECONDS = int(os.getenv("EMAIL_OUTBOX_CLAIM_TIMEOUT_SECONDS", "600"))
+
 
 # If FRONTEND_URL is provided, default CORS/CSRF settings to allow it.
 # This prevents common "Failed to fetch" errors on Flutter Web when CORS/CSRF env vars
@@ -324,6 +401,12 @@ STATIC_URL = '/static/'
 
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# Media is stored deduplicated by content hash (app/content_storage.py).
+STORAGES = {
+    "default": {"BACKEND": "app.content_storage.ContentAddressedStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
 if not DEBUG:
     SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
     SECURE_SSL_REDIRECT = os.getenv("SECURE_SSL_REDIRECT", "1") == "1"
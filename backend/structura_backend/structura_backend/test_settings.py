@@ -41,8 +41,24 @@ class _DisableMigrations:
 
 MIGRATION_MODULES = _DisableMigrations()
 
+# Per-process cache: tests count queries, and a DatabaseCache read is one.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
 # Speed up password hashing in tests (Supervisors model hashes passwords
 # in save() and this otherwise dominates setUp cost).
 PASSWORD_HASHERS = [
     "django.contrib.auth.hashers.MD5PasswordHasher",
 ]
+
+# Verify faces inline; tests that exercise the process pool build their own.
+FACE_VERIFICATION_WORKERS = 0
+
+# Build photo derivatives inline, inside captureOnCommitCallbacks.
+PHOTO_DERIVATIVE_THREADS = 0
+
+# Tests drive the outbox explicitly (run_email_worker / process_batch).
+EMAIL_OUTBOX_DELIVER_INLINE = False
@@ -1,7 +1,9 @@
+import re
+
 from django.conf import settings
-from django.conf.urls.static import static
-from django.views.static import serve
 from django.urls import re_path
+
+from rest_api.media import serve_media
 """
 URL configuration for structura_backend project.
 
@@ -26,14 +28,7 @@ urlpatterns = [
     path('api/', include('rest_api.urls'))
 ]
 
-# Serve media files in development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-
-# Serve media files in production (Render)
-if not settings.DEBUG:
-    urlpatterns += [
-        re_path(r'^media/(?P<path>.*)$', serve, {
-            'document_root': settings.MEDIA_ROOT,
-        }),
-    ]
\ No newline at end of file
+# Media (development and production on Render): validators, 304s and ranges.
+urlpatterns += [
+    re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media),
+]